@@ -0,0 +1,656 @@
+"""
+Runs standardized Vesper performance benchmarks on a synthetic archive.
+
+Usage:
+
+    python -m scripts.benchmark.run_benchmarks ARCHIVE_DIR
+        [--config CONFIG_FILE] [--scenarios SCENARIO ...]
+
+If the archive directory does not exist, the script first creates it as
+a synthetic archive (see `scripts.benchmark.synthetic_archive`) with
+the default configuration, overridden by the items of the optional
+YAML configuration file. It then runs the benchmark scenarios in order:
+
+    import
+        imports the archive metadata and recordings.
+
+    detect
+        runs each configured detector on all recordings, one
+        detection job per detector.
+
+    classify
+        runs the configured classifier on the clips of the configured
+        classification detectors.
+
+    clips
+        creates synthetic clips and annotations for all recordings.
+
+    album
+        loads clip album pages of the synthetic clips via the Vesper
+        web server views, including the audio of the first page.
+
+    annotate
+        annotates a large set of synthetic clips with one bulk
+        annotation request.
+
+    export
+        exports detected clips to an HDF5 file and synthetic clip
+        metadata to a CSV file.
+
+    delete
+        deletes all synthetic clips.
+
+The `--scenarios` option selects a subset of the scenarios. Note that
+later scenarios depend on earlier ones, so a subset should be run on an
+archive on which the omitted earlier scenarios have already been run.
+
+Each scenario runs commands as Vesper jobs, just as the Vesper server
+does, or issues requests to the Vesper web server views. The script
+writes its results as JSON to a file in the "Benchmark Results"
+subdirectory of the archive directory, whose name is the UTC time at
+which the script started. The results include the elapsed time and
+item counts of each scenario, along with the Vesper version, the
+current Git commit of the Vesper source (if available), platform
+information, and the archive configuration, so that results of
+different runs can be compared to track performance over time. A
+scenario that fails is recorded as such, and later scenarios still run.
+"""
+
+
+from pathlib import Path
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import traceback
+
+import scripts.benchmark.synthetic_archive as synthetic_archive
+
+
+_SCENARIO_NAMES = (
+    'import', 'detect', 'classify', 'clips', 'album', 'annotate', 'export',
+    'delete')
+
+_RESULTS_DIR_NAME = 'Benchmark Results'
+_OUTPUT_DIR_NAME = 'Benchmark Output'
+_USER_NAME = 'benchmark'
+_JOB_POLLING_PERIOD = .1
+_JOB_END_STATUSES = frozenset(('Completed', 'Interrupted', 'Failed'))
+
+_ALBUM_PAGE_SIZE = 50
+_ALBUM_PAGE_COUNT = 20
+_BULK_ANNOTATION_CLIP_COUNT = 10000
+_BULK_ANNOTATION_VALUE = 'Call.WIWA'
+
+
+class _ScenarioError(Exception):
+    pass
+
+
+def main():
+
+    args = _parse_args()
+
+    archive_dir_path = Path(args.archive_dir).resolve()
+    config = synthetic_archive.get_config(args.config)
+    start_time = datetime.datetime.now(datetime.timezone.utc)
+
+    results = []
+
+    if not archive_dir_path.exists():
+        results.append(_run_scenario(
+            'Create Archive Directory', _create_archive_dir,
+            archive_dir_path, config))
+
+    # Vesper gets the archive directory from the current working
+    # directory when its archive settings are first imported, so we
+    # must change directories before setting up Django.
+    os.chdir(archive_dir_path)
+
+    context = _set_up(archive_dir_path, config)
+
+    try:
+
+        for name in args.scenarios:
+            results += _SCENARIOS[name](context)
+
+    finally:
+        _shut_down()
+
+    _write_results(archive_dir_path, config, start_time, results)
+
+
+def _parse_args():
+
+    parser = argparse.ArgumentParser(
+        description='Runs Vesper performance benchmarks.')
+
+    parser.add_argument(
+        'archive_dir',
+        help='the synthetic archive directory, created if it does not exist')
+
+    parser.add_argument(
+        '--config',
+        help='YAML file of synthetic archive configuration overrides')
+
+    parser.add_argument(
+        '--scenarios', nargs='+', choices=_SCENARIO_NAMES,
+        default=list(_SCENARIO_NAMES), help='the scenarios to run')
+
+    args = parser.parse_args()
+
+    # Run scenarios in standard order regardless of argument order.
+    args.scenarios = [n for n in _SCENARIO_NAMES if n in args.scenarios]
+
+    return args
+
+
+def _create_archive_dir(archive_dir_path, config):
+    count = synthetic_archive.create_archive(archive_dir_path, config)
+    return {'recording_count': count}
+
+
+def _set_up(archive_dir_path, config):
+
+    import vesper.util.django_utils as django_utils
+    django_utils.set_up_django()
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from vesper.util.bunch import Bunch
+
+    # Bring the archive database schema up to date.
+    call_command('migrate', verbosity=0)
+
+    user, _ = User.objects.get_or_create(username=_USER_NAME)
+
+    output_dir_path = archive_dir_path / _OUTPUT_DIR_NAME
+    output_dir_path.mkdir(exist_ok=True)
+
+    return Bunch(
+        archive_dir_path=archive_dir_path,
+        config=config,
+        user=user,
+        output_dir_path=output_dir_path,
+        station_names=synthetic_archive.get_station_names(config),
+        station_mics=
+            synthetic_archive.get_station_mic_output_pair_ui_names(config),
+        dates=synthetic_archive.get_dates(config))
+
+
+def _shut_down():
+    from vesper.singletons import job_manager
+    job_manager.instance.shutdown()
+
+
+def _run_scenario(name, function, *args):
+
+    """
+    Runs one benchmark scenario.
+
+    :Returns:
+        a result dictionary with the scenario name, the status
+        ("Succeeded" or "Failed"), the elapsed time in seconds, the
+        item counts returned by the scenario function, and an error
+        message if the scenario failed.
+    """
+
+    print(f'Running scenario "{name}"...')
+
+    start_time = time.time()
+
+    try:
+        counts = function(*args)
+
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        print(f'    Scenario failed with message: {str(e)}')
+        traceback.print_exc()
+        return {
+            'name': name,
+            'status': 'Failed',
+            'elapsed_time': elapsed_time,
+            'counts': {},
+            'error_message': str(e)
+        }
+
+    elapsed_time = time.time() - start_time
+
+    print(f'    Scenario completed in {elapsed_time:.1f} seconds: {counts}')
+
+    return {
+        'name': name,
+        'status': 'Succeeded',
+        'elapsed_time': elapsed_time,
+        'counts': counts,
+        'error_message': None
+    }
+
+
+def _run_job(command_spec, context):
+
+    """Runs a Vesper job and waits for it to complete."""
+
+    from vesper.django.app.models import Job
+    from vesper.singletons import job_manager
+
+    job_id = job_manager.instance.start_job(command_spec, context.user)
+
+    while True:
+
+        status = Job.objects.filter(id=job_id).values_list(
+            'status', flat=True).get()
+
+        if status in _JOB_END_STATUSES:
+            break
+
+        time.sleep(_JOB_POLLING_PERIOD)
+
+    if status != 'Completed':
+        raise _ScenarioError(
+            f'Job {job_id} ended with status "{status}". See the job log '
+            f'for details.')
+
+    return job_id
+
+
+def _run_import_scenarios(context):
+    return [
+        _run_scenario('Import Metadata', _import_metadata, context),
+        _run_scenario('Import Recordings', _import_recordings, context)]
+
+
+def _import_metadata(context):
+
+    import vesper.util.yaml_utils as yaml_utils
+
+    path = synthetic_archive.get_metadata_file_path(context.archive_dir_path)
+    with open(path) as file_:
+        metadata = yaml_utils.load(file_)
+
+    _run_job({
+        'name': 'import',
+        'arguments': {
+            'importer': {
+                'name': 'Metadata Importer',
+                'arguments': {
+                    'metadata': metadata
+                }
+            }
+        }
+    }, context)
+
+    return {'station_count': len(metadata['stations'])}
+
+
+def _import_recordings(context):
+
+    from vesper.django.app.models import Recording
+
+    dir_path = \
+        synthetic_archive.get_recordings_dir_path(context.archive_dir_path)
+
+    _run_job({
+        'name': 'import',
+        'arguments': {
+            'importer': {
+                'name': 'Recording Importer',
+                'arguments': {
+                    'paths': [str(dir_path)],
+                    'recursive': True,
+                    'recording_file_parser': {
+                        'name': 'MPG Ranch Recording File Parser',
+                        'arguments': {
+                            'station_name_aliases_preset':
+                                'Station Name Aliases'
+                        }
+                    }
+                }
+            }
+        }
+    }, context)
+
+    return {'recording_count': Recording.objects.count()}
+
+
+def _run_detect_scenarios(context):
+    return [
+        _run_scenario(f'Detect: {name}', _detect, context, name)
+        for name in context.config['detectors']]
+
+
+def _detect(context, detector_name):
+
+    from vesper.django.app.models import Clip
+
+    _run_job({
+        'name': 'detect',
+        'arguments': {
+            'detectors': [detector_name],
+            'stations': context.station_names,
+            'start_date': context.dates[0],
+            'end_date': context.dates[-1],
+            'schedule': '',
+            'defer_clip_creation': False
+        }
+    }, context)
+
+    clip_count = Clip.objects.filter(
+        creating_processor__name=detector_name).count()
+
+    return {'clip_count': clip_count}
+
+
+def _run_classify_scenarios(context):
+    return [_run_scenario('Classify', _classify, context)]
+
+
+def _classify(context):
+
+    from vesper.django.app.models import StringAnnotation
+
+    job_id = _run_job({
+        'name': 'classify',
+        'arguments': {
+            'classifier': context.config['classifier'],
+            'annotation_name': 'Classification',
+            'station_mics': context.station_mics,
+            'start_date': context.dates[0],
+            'end_date': context.dates[-1],
+            'detectors': context.config['classification_detectors'],
+            'tag': _get_not_applicable()
+        }
+    }, context)
+
+    annotation_count = \
+        StringAnnotation.objects.filter(creating_job_id=job_id).count()
+
+    return {'annotation_count': annotation_count}
+
+
+def _get_not_applicable():
+    from vesper.singletons import archive
+    return archive.instance.NOT_APPLICABLE
+
+
+def _run_clips_scenarios(context):
+    return [_run_scenario('Create Synthetic Clips', _create_clips, context)]
+
+
+def _create_clips(context):
+
+    from vesper.singletons import archive
+
+    clip_count = synthetic_archive.create_clips(context.config)
+
+    # Make the synthetic detector visible to the web views of this
+    # process.
+    archive.instance.refresh_processor_cache()
+
+    return {'clip_count': clip_count}
+
+
+def _run_album_scenarios(context):
+    return [_run_scenario('Clip Album Page Load', _load_album_pages, context)]
+
+
+def _load_album_pages(context):
+
+    client = _create_client(context)
+
+    params = {
+        'station_mic': context.station_mics[0],
+        'detector': context.config['synthetic_detector'],
+        'classification': _get_not_applicable(),
+        'tag': _get_not_applicable()
+    }
+
+    # Load the album page itself, which includes the first clip page.
+    _check_response(client.get('/clip-album/', params), 'Clip album')
+
+    # Load the first clip page again as JSON, with its clip audio.
+    page = _get_clip_page(client, params, None)
+    ids = page['ids']
+
+    response = client.post(
+        '/batch/read/clip-audios/', json.dumps({'clip_ids': ids}),
+        content_type='application/json')
+    _check_response(response, 'Clip audio batch read')
+
+    clip_count = len(ids)
+    page_count = 1
+
+    # Load more clip pages.
+    while page_count < _ALBUM_PAGE_COUNT and page['nextPageKey'] is not None:
+        page = _get_clip_page(client, params, page['nextPageKey'])
+        clip_count += len(page['ids'])
+        page_count += 1
+
+    return {
+        'page_count': page_count,
+        'clip_count': clip_count,
+        'audio_count': len(ids)
+    }
+
+
+def _create_client(context):
+    from django.test import Client
+    client = Client()
+    client.force_login(context.user)
+    return client
+
+
+def _get_clip_page(client, params, after):
+
+    params = dict(params, page_size=_ALBUM_PAGE_SIZE)
+    if after is not None:
+        params['after'] = after
+
+    response = client.get('/clips/json/', params)
+    _check_response(response, 'Clip page')
+
+    return json.loads(response.content)
+
+
+def _check_response(response, request_name):
+    if response.status_code != 200:
+        raise _ScenarioError(
+            f'{request_name} request failed with HTTP status '
+            f'{response.status_code}.')
+
+
+def _run_annotate_scenarios(context):
+    return [_run_scenario('Bulk Annotate', _annotate_clips, context)]
+
+
+def _annotate_clips(context):
+
+    from vesper.django.app.models import Clip
+
+    clip_ids = list(Clip.objects.filter(
+        creating_processor__name=context.config['synthetic_detector']
+    ).order_by('id').values_list('id', flat=True)[
+        :_BULK_ANNOTATION_CLIP_COUNT])
+
+    client = _create_client(context)
+
+    content = {'value': _BULK_ANNOTATION_VALUE, 'clip_ids': clip_ids}
+    response = client.post(
+        '/annotations/Classification/', json.dumps(content),
+        content_type='application/json')
+    _check_response(response, 'Bulk annotation')
+
+    return {'clip_count': len(clip_ids)}
+
+
+def _run_export_scenarios(context):
+    return [
+        _run_scenario(
+            'Export Clips to HDF5 File', _export_clips_to_hdf5_file,
+            context),
+        _run_scenario(
+            'Export Clip Metadata to CSV File',
+            _export_clip_metadata_to_csv_file, context)]
+
+
+def _export_clips_to_hdf5_file(context):
+
+    detectors = context.config['classification_detectors']
+    path = context.output_dir_path / 'Clips.h5'
+
+    _run_export_job(
+        'Clips HDF5 File Exporter', path, detectors, context)
+
+    return {
+        'clip_count': _get_clip_count(detectors),
+        'file_size': path.stat().st_size
+    }
+
+
+def _run_export_job(exporter_name, output_file_path, detectors, context):
+
+    not_applicable = _get_not_applicable()
+
+    _run_job({
+        'name': 'export',
+        'arguments': {
+            'exporter': {
+                'name': exporter_name,
+                'arguments': {
+                    'output_file_path': str(output_file_path)
+                }
+            },
+            'station_mics': context.station_mics,
+            'start_date': context.dates[0],
+            'end_date': context.dates[-1],
+            'detectors': detectors,
+            'classification': not_applicable,
+            'tag': not_applicable
+        }
+    }, context)
+
+
+def _get_clip_count(detector_names):
+    from vesper.django.app.models import Clip
+    return Clip.objects.filter(
+        creating_processor__name__in=detector_names).count()
+
+
+def _export_clip_metadata_to_csv_file(context):
+
+    detectors = [context.config['synthetic_detector']]
+    path = context.output_dir_path / 'Clips.csv'
+
+    _run_export_job(
+        'Clip Metadata CSV File Exporter', path, detectors, context)
+
+    return {
+        'clip_count': _get_clip_count(detectors),
+        'file_size': path.stat().st_size
+    }
+
+
+def _run_delete_scenarios(context):
+    return [_run_scenario('Delete Clips', _delete_clips, context)]
+
+
+def _delete_clips(context):
+
+    detectors = [context.config['synthetic_detector']]
+    clip_count = _get_clip_count(detectors)
+
+    not_applicable = _get_not_applicable()
+
+    _run_job({
+        'name': 'delete_clips',
+        'arguments': {
+            'station_mics': context.station_mics,
+            'start_date': context.dates[0],
+            'end_date': context.dates[-1],
+            'detectors': detectors,
+            'classification': not_applicable,
+            'tag': not_applicable,
+            'retain_count': 0
+        }
+    }, context)
+
+    remaining_count = _get_clip_count(detectors)
+
+    if remaining_count != 0:
+        raise _ScenarioError(
+            f'{remaining_count} of {clip_count} clips were not deleted.')
+
+    return {'clip_count': clip_count}
+
+
+_SCENARIOS = {
+    'import': _run_import_scenarios,
+    'detect': _run_detect_scenarios,
+    'classify': _run_classify_scenarios,
+    'clips': _run_clips_scenarios,
+    'album': _run_album_scenarios,
+    'annotate': _run_annotate_scenarios,
+    'export': _run_export_scenarios,
+    'delete': _run_delete_scenarios,
+}
+
+
+def _write_results(archive_dir_path, config, start_time, results):
+
+    from django.db import connection
+    import vesper.version as version
+
+    dir_path = archive_dir_path / _RESULTS_DIR_NAME
+    dir_path.mkdir(exist_ok=True)
+
+    file_name = f'{start_time:%Y-%m-%d_%H.%M.%S}_Z.json'
+    path = dir_path / file_name
+
+    data = {
+        'start_time': start_time.isoformat(),
+        'vesper_version': version.full_version,
+        'git_commit': _get_git_commit(),
+        'python_version': sys.version,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'database': connection.vendor,
+        'config': config,
+        'scenarios': results
+    }
+
+    with open(path, 'w') as file_:
+        json.dump(data, file_, indent=4, default=str)
+
+    print(f'Wrote results to "{path}".')
+
+
+def _get_git_commit():
+
+    """
+    Gets the current Git commit of the Vesper source, or `None` if
+    it is not available, for example if Vesper was installed from a
+    package.
+    """
+
+    import vesper
+
+    source_dir_path = Path(vesper.__file__).parent.parent
+
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=source_dir_path,
+            capture_output=True, text=True, check=True)
+
+    except Exception:
+        return None
+
+    return result.stdout.strip()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,474 @@
+"""
+Functions that create synthetic Vesper archives for benchmarking.
+
+A synthetic archive is created in two stages. The `create_archive`
+function creates an archive directory from the Vesper archive template,
+with a metadata YAML file (in the "Metadata YAML" subdirectory) that
+describes the archive's stations, devices, detectors, classifiers, and
+annotations, and synthetic recording files (in the "Recordings"
+subdirectory) that contain noise and chirps that resemble nocturnal
+flight calls. The metadata and recordings are then imported into the
+archive database, for example by the import scenarios of the benchmark
+harness. After the import the `create_clips` function can add large
+numbers of synthetic clips and annotations to the archive database.
+
+The archive is configured by a dictionary like `DEFAULT_CONFIG`. The
+`get_config` function creates a configuration from the defaults and
+optional overrides in a YAML file.
+"""
+
+
+from pathlib import Path
+import datetime
+
+import numpy as np
+import pytz
+
+
+DEFAULT_CONFIG = {
+
+    # stations
+    'station_count': 2,
+    'station_time_zone': 'US/Eastern',
+
+    # recordings
+    'start_date': datetime.date(2020, 9, 1),
+    'night_count': 2,
+    'recording_start_hour': 21,
+    'recording_duration': 3600,
+    'sample_rate': 22050,
+    'noise_level': 100,
+    'chirp_rate': 600,
+    'chirp_level': 2000,
+
+    # detectors and classifiers
+    'detectors': [
+        'Old Bird Thrush Detector Redux 1.1',
+        'Old Bird Tseep Detector Redux 1.1',
+        'MPG Ranch Thrush Detector 1.0 70',
+        'MPG Ranch Tseep Detector 1.0 60',
+        'BirdVoxDetect 0.2.5 FT 50',
+    ],
+    'classifier': 'MPG Ranch NFC Coarse Classifier 3.0',
+    'classification_detectors': [
+        'Old Bird Thrush Detector Redux 1.1',
+        'Old Bird Tseep Detector Redux 1.1',
+    ],
+
+    # synthetic clips
+    'synthetic_detector': 'Synthetic Detector',
+    'clips_per_recording': 250000,
+    'clip_duration': .6,
+    'annotated_fraction': .5,
+    'classifications': [
+        'Call.AMRE', 'Call.CHSP', 'Call.SAVS', 'Call.WIWA', 'Call.YRWA',
+        'Call', 'Noise', 'Other', 'Unknown'],
+
+    'seed': 0,
+
+}
+"""
+Default synthetic archive configuration.
+
+Times of day are local station times, and durations are in seconds.
+The chirp rate is the mean number of chirps per hour of a recording.
+Noise and chirp levels are in sample units. The archive has
+`station_count * night_count` recordings, and
+`station_count * night_count * clips_per_recording` synthetic clips.
+"""
+
+_METADATA_FILE_NAME = 'Synthetic Archive.yaml'
+_RECORDING_CHUNK_DURATION = 60
+_CLIP_INSERTION_BATCH_SIZE = 10000
+
+_CHIRP_TYPES = (
+    # (start frequency, end frequency, duration)
+    (8000, 5000, .06),
+    (4000, 2500, .1),
+)
+
+
+def get_config(file_path=None):
+
+    """
+    Gets a synthetic archive configuration.
+
+    :Parameters:
+
+        file_path : str or Path or None
+            the path of a YAML file whose items override the default
+            configuration items, or `None` for the default
+            configuration.
+
+    :Returns:
+        the configuration, a dictionary.
+    """
+
+    config = dict(DEFAULT_CONFIG)
+
+    if file_path is not None:
+
+        import vesper.util.yaml_utils as yaml_utils
+
+        with open(file_path) as file_:
+            overrides = yaml_utils.load(file_)
+
+        unknown_names = sorted(set(overrides) - set(config))
+        if len(unknown_names) != 0:
+            raise ValueError(
+                f'Unrecognized synthetic archive configuration items: '
+                f'{", ".join(unknown_names)}.')
+
+        config.update(overrides)
+
+    return config
+
+
+def get_station_names(config):
+    return [f'Station {i}' for i in range(config['station_count'])]
+
+
+def get_station_mic_output_pair_ui_names(config):
+    return [
+        f'Station {i} / 21c {i}' for i in range(config['station_count'])]
+
+
+def get_dates(config):
+    start_date = config['start_date']
+    return [
+        start_date + datetime.timedelta(days=i)
+        for i in range(config['night_count'])]
+
+
+def get_metadata_file_path(archive_dir_path):
+    return Path(archive_dir_path) / 'Metadata YAML' / _METADATA_FILE_NAME
+
+
+def get_recordings_dir_path(archive_dir_path):
+    return Path(archive_dir_path) / 'Recordings'
+
+
+def create_archive(archive_dir_path, config):
+
+    """
+    Creates the directory of a synthetic archive.
+
+    The directory includes a metadata YAML file and recording files,
+    but the metadata and recordings are not imported into the archive
+    database.
+
+    :Parameters:
+
+        archive_dir_path : str or Path
+            the path of the archive directory, which must not exist.
+
+        config : dict
+            the archive configuration.
+
+    :Returns:
+        the number of recording files created.
+    """
+
+    import vesper.util.os_utils as os_utils
+
+    archive_dir_path = Path(archive_dir_path)
+
+    if archive_dir_path.exists():
+        raise ValueError(
+            f'Synthetic archive directory "{archive_dir_path}" already '
+            f'exists.')
+
+    os_utils.copy_directory(_get_archive_template_path(), archive_dir_path)
+
+    _create_metadata_file(archive_dir_path, config)
+
+    return _create_recording_files(archive_dir_path, config)
+
+
+def _get_archive_template_path():
+
+    # We get the template directory path from the module that creates
+    # new archives, rather than duplicating it here.
+    import vesper.django.app.management.commands.createarchive as \
+        createarchive
+
+    return Path(createarchive.__file__).parent / createarchive._TEMPLATE_PATH
+
+
+def _create_metadata_file(archive_dir_path, config):
+
+    import vesper.util.yaml_utils as yaml_utils
+
+    station_names = get_station_names(config)
+    dates = get_dates(config)
+
+    metadata = {
+
+        'stations': [
+            {
+                'name': name,
+                'description': 'Synthetic station.',
+                'time_zone': config['station_time_zone'],
+                'latitude': 42.45,
+                'longitude': -76.5,
+                'elevation': 0
+            }
+            for name in station_names],
+
+        'device_models': [
+            {
+                'name': 'PC',
+                'type': 'Audio Recorder',
+                'manufacturer': 'Various',
+                'model': 'PC',
+                'description': 'Personal computer as an audio recorder.',
+                'num_inputs': 2
+            },
+            {
+                'name': '21c',
+                'type': 'Microphone',
+                'manufacturer': 'Old Bird, Inc.',
+                'model': '21c',
+                'description': 'Old Bird bucket microphone.',
+                'num_outputs': 1
+            }
+        ],
+
+        'devices': [
+            device
+            for i in range(len(station_names))
+            for device in (
+                {'name': f'PC {i}', 'model': 'PC', 'serial_number': i},
+                {'name': f'21c {i}', 'model': '21c', 'serial_number': i})],
+
+        'station_devices': [
+            {
+                'station': name,
+                'start_time': dates[0] - datetime.timedelta(days=1),
+                'end_time': dates[-1] + datetime.timedelta(days=2),
+                'devices': [f'PC {i}', f'21c {i}'],
+                'connections': [
+                    {'output': f'21c {i} Output', 'input': f'PC {i} Input 0'}
+                ]
+            }
+            for i, name in enumerate(station_names)],
+
+        'detectors': [
+            {'name': name} for name in config['detectors']],
+
+        'classifiers': [
+            {'name': config['classifier']}],
+
+        'annotations': [
+            {'name': 'Detector Score', 'type': 'String'},
+            {'name': 'Classification', 'type': 'String'}
+        ]
+
+    }
+
+    path = get_metadata_file_path(archive_dir_path)
+
+    with open(path, 'w') as file_:
+        yaml_utils.dump(metadata, file_, default_flow_style=False)
+
+
+def _create_recording_files(archive_dir_path, config):
+
+    rng = np.random.default_rng(config['seed'])
+    time_zone = pytz.timezone(config['station_time_zone'])
+    recordings_dir_path = get_recordings_dir_path(archive_dir_path)
+
+    count = 0
+
+    for station_name in get_station_names(config):
+
+        dir_path = recordings_dir_path / station_name
+        dir_path.mkdir(parents=True, exist_ok=True)
+
+        for date in get_dates(config):
+
+            local_start_time = time_zone.localize(datetime.datetime(
+                date.year, date.month, date.day,
+                config['recording_start_hour']))
+            start_time = local_start_time.astimezone(pytz.utc)
+
+            # Use Vesper Recorder file name format, which includes the
+            # UTC recording start time.
+            file_name = (
+                f'{station_name}_{start_time:%Y-%m-%d_%H.%M.%S}_Z.wav')
+
+            create_recording_file(dir_path / file_name, config, rng)
+
+            count += 1
+
+    return count
+
+
+def create_recording_file(file_path, config, rng):
+
+    """
+    Creates a synthetic mono recording file.
+
+    The file contains Gaussian noise and chirps. The file is written
+    one chunk at a time, so that long recordings can be created
+    without holding all of their samples in memory.
+    """
+
+    import vesper.util.audio_file_utils as audio_file_utils
+
+    sample_rate = config['sample_rate']
+    length = int(round(config['recording_duration'] * sample_rate))
+    chunk_length = _RECORDING_CHUNK_DURATION * sample_rate
+
+    with open(file_path, 'wb') as file_:
+
+        for start_index in range(0, length, chunk_length):
+            n = min(chunk_length, length - start_index)
+            samples = _create_recording_chunk(n, config, rng)
+            audio_file_utils.write_wave_file_frames(
+                file_, start_index, samples.reshape((1, -1)))
+
+        audio_file_utils.write_wave_file_header(
+            file_, 1, sample_rate, 16, length)
+
+
+def _create_recording_chunk(length, config, rng):
+
+    sample_rate = config['sample_rate']
+
+    samples = rng.normal(0, config['noise_level'], length)
+
+    # Add chirps, at uniformly distributed times.
+    duration = length / sample_rate
+    chirp_count = rng.poisson(config['chirp_rate'] * duration / 3600)
+
+    for _ in range(chirp_count):
+
+        f0, f1, chirp_duration = _CHIRP_TYPES[rng.integers(len(_CHIRP_TYPES))]
+        chirp = _create_chirp(f0, f1, chirp_duration, sample_rate)
+        chirp *= config['chirp_level'] * rng.uniform(.5, 1)
+
+        if len(chirp) < length:
+            start_index = rng.integers(length - len(chirp))
+            samples[start_index:start_index + len(chirp)] += chirp
+
+    samples = np.clip(np.round(samples), -32768, 32767)
+
+    return samples.astype(np.int16)
+
+
+def _create_chirp(f0, f1, duration, sample_rate):
+
+    """Creates a Hann-windowed linear chirp with unit amplitude."""
+
+    length = int(round(duration * sample_rate))
+    t = np.arange(length) / sample_rate
+    phases = 2 * np.pi * (f0 * t + (f1 - f0) * t ** 2 / (2 * duration))
+
+    return np.hanning(length) * np.sin(phases)
+
+
+def create_clips(config):
+
+    """
+    Creates synthetic clips in an archive database.
+
+    The function creates `clips_per_recording` clips at random times
+    for each channel of each recording in the archive, with the
+    detector `synthetic_detector`. About `annotated_fraction` of the
+    clips are given random "Classification" annotations. Clips are
+    created in transactions of up to `_CLIP_INSERTION_BATCH_SIZE`
+    clips. The clips have no audio files of their own, but their audio
+    can be extracted from the recordings.
+
+    Django must be set up before this function is called.
+
+    :Returns:
+        the number of clips created.
+    """
+
+    from django.db import transaction
+
+    from vesper.django.app.models import (
+        AnnotationInfo, Processor, RecordingChannel)
+    import vesper.util.archive_lock as archive_lock
+
+    rng = np.random.default_rng(config['seed'])
+
+    with archive_lock.atomic(), transaction.atomic():
+        detector, _ = Processor.objects.get_or_create(
+            name=config['synthetic_detector'], type='Detector')
+
+    annotation_info = AnnotationInfo.objects.get(name='Classification')
+
+    channels = RecordingChannel.objects.select_related(
+        'recording__station', 'mic_output').order_by('id')
+
+    count = 0
+
+    for channel in channels:
+        count += _create_channel_clips(
+            channel, detector, annotation_info, config, rng)
+
+    return count
+
+
+def _create_channel_clips(channel, detector, annotation_info, config, rng):
+
+    from django.db import transaction
+
+    from vesper.django.app.models import Clip, StringAnnotation
+    import vesper.django.app.model_utils as model_utils
+    import vesper.util.archive_lock as archive_lock
+    import vesper.util.time_utils as time_utils
+
+    recording = channel.recording
+    station = recording.station
+    sample_rate = recording.sample_rate
+    clip_length = int(round(config['clip_duration'] * sample_rate))
+    clip_duration = datetime.timedelta(seconds=config['clip_duration'])
+    night = station.get_night(recording.start_time)
+    creation_time = time_utils.get_utc_now()
+
+    # Random start indices can collide, though for realistic recording
+    # lengths they rarely do. We discard duplicates rather than violate
+    # the clip uniqueness constraint.
+    start_indices = np.unique(rng.integers(
+        recording.length - clip_length, size=config['clips_per_recording']))
+    clip_count = len(start_indices)
+
+    classifications = config['classifications']
+    annotated = rng.random(clip_count) < config['annotated_fraction']
+    classification_nums = rng.integers(len(classifications), size=clip_count)
+
+    for i in range(0, clip_count, _CLIP_INSERTION_BATCH_SIZE):
+
+        j = min(i + _CLIP_INSERTION_BATCH_SIZE, clip_count)
+
+        clips = []
+
+        for start_index in start_indices[i:j].tolist():
+            start_time = recording.start_time + \
+                datetime.timedelta(seconds=start_index / sample_rate)
+            clips.append(Clip(
+                station=station, mic_output=channel.mic_output,
+                recording_channel=channel, start_index=start_index,
+                length=clip_length, sample_rate=sample_rate,
+                start_time=start_time, end_time=start_time + clip_duration,
+                date=night, creation_time=creation_time,
+                creating_processor=detector))
+
+        with archive_lock.atomic(), transaction.atomic():
+
+            model_utils.create_clips(clips)
+
+            StringAnnotation.objects.bulk_create([
+                StringAnnotation(
+                    clip=clip, info=annotation_info,
+                    value=classifications[classification_nums[k]],
+                    creation_time=creation_time, creating_processor=detector)
+                for k, clip in enumerate(clips, i)
+                if annotated[k]])
+
+    return clip_count
+
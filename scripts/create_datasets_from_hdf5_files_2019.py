@@ -3,6 +3,7 @@
 
 from collections import defaultdict
 from pathlib import Path
+import functools
 import itertools
 import math
 import os
@@ -11,11 +12,15 @@ import resource
 import time
 
 import h5py
+import numpy as np
 # import resampy
 import tensorflow as tf
 
 from vesper.util.bunch import Bunch
+import vesper.util.data_windows as data_windows
 import vesper.util.os_utils as os_utils
+import vesper.util.sharded_dataset_builder as sharded_dataset_builder
+import vesper.util.time_frequency_analysis_utils as tfa_utils
 import vesper.util.time_utils as time_utils
 import vesper.signal.resampling_utils as resampling_utils
 import vesper.util.yaml_utils as yaml_utils
@@ -1164,6 +1169,32 @@ OUTPUT_DIR_PATH = DATA_DIR_PATH / 'Datasets' / CALL_TYPE
 OUTPUT_FILE_NAME_FORMAT = '{}_{}_{:04d}.tfrecords'
 OUTPUT_FILE_SIZE = 10000  # examples
 
+PROCESS_COUNT = None
+"""
+Number of processes that write output files, or `None` for one per CPU.
+"""
+
+RANDOM_SEED = 0
+"""
+Seed for the clip shuffles, so that a dataset can be rebuilt exactly.
+"""
+
+SPECTROGRAM_SETTINGS = None
+"""
+Settings for spectrograms to include in dataset examples, or `None`.
+
+When these settings are not `None`, each dataset example includes a
+precomputed log spectrogram of the example waveform, with the example
+feature name "spectrogram" and the spectrogram shape in the example
+feature "spectrogram_shape". For example:
+
+    SPECTROGRAM_SETTINGS = Bunch(
+        window_type='Hann',
+        window_size=.005,     # seconds
+        hop_size=50,          # percent of window size
+        reference_power=1)
+"""
+
 
 '''
 Following are some notes written in the fall of 2018, toward the beginning
@@ -1310,8 +1341,6 @@ def create_datasets(dataset_name_prefix):
     print('Writing clips to output files...')
     create_output_files(inputs, datasets, config)
     
-    close_input_files(inputs)
-    
     print('Done.')
 
 
@@ -1447,7 +1476,7 @@ def get_dataset_clips_aux(clips, config, clip_type_index):
             'clips but got only {}.').format(num_clips_needed, len(clips)))
     
     # Shuffle clips in place.
-    random.shuffle(clips)
+    get_random(clip_type_index).shuffle(clips)
     
     # Divide clips into training, validation, and test segments.
     test_start = -test_size
@@ -1470,7 +1499,8 @@ def get_dataset_clips_aux(clips, config, clip_type_index):
         # Repeat clips as needed, shuffling copies.
         n = train_size // num_train_clips
         r = train_size % num_train_clips
-        lists = [get_shuffled_copy(train_clips) for _ in range(n)]
+        random_ = get_random(clip_type_index)
+        lists = [get_shuffled_copy(train_clips, random_) for _ in range(n)]
         lists.append(train_clips[:r])
         train_clips = list(itertools.chain.from_iterable(lists))
         
@@ -1483,8 +1513,16 @@ def get_dataset_clips_aux(clips, config, clip_type_index):
     return train_clips, val_clips, test_clips
         
 
-def get_shuffled_copy(x):
-    return random.sample(x, len(x))
+def get_random(clip_type_index):
+    
+    # We use a separately seeded random number generator for each clip
+    # type so that the assignment of clips of one type to datasets
+    # does not depend on the number of clips of the other type.
+    return random.Random(RANDOM_SEED + clip_type_index)
+
+
+def get_shuffled_copy(x, random_):
+    return random_.sample(x, len(x))
 
 
 def show_dataset_stats(datasets):
@@ -1499,10 +1537,22 @@ def show_dataset_stats_aux(dataset, name):
     
     
 def create_output_files(inputs, datasets, config):
+    
+    # Close input files so that output file worker processes open
+    # their own copies of them rather than inheriting these ones.
+    close_input_files(inputs)
+    
     delete_output_directory(config.dataset_name_prefix)
-    create_output_files_aux(inputs, datasets.train, 'Training', config)
-    create_output_files_aux(inputs, datasets.val, 'Validation', config)
-    create_output_files_aux(inputs, datasets.test, 'Test', config)
+    
+    parts = dict(
+        (dataset_name, create_output_files_aux(dataset, dataset_name, config))
+        for dataset, dataset_name in (
+            (datasets.train, 'Training'),
+            (datasets.val, 'Validation'),
+            (datasets.test, 'Test')))
+    
+    sharded_dataset_builder.write_manifest(
+        get_output_dir_path(config), parts, get_manifest_settings(config))
     
     
 def delete_output_directory(dataset_name_prefix):
@@ -1511,42 +1561,44 @@ def delete_output_directory(dataset_name_prefix):
         os_utils.delete_directory(str(dir_path))
     
     
-def create_output_files_aux(inputs, dataset, dataset_name, config):
+def create_output_files_aux(dataset, dataset_name, config):
     
     start_time = time.time()
     
     clips = dataset.calls + dataset.noises
-    random.shuffle(clips)
     
     num_clips = len(clips)
     num_files = int(math.ceil(num_clips / OUTPUT_FILE_SIZE))
     
-    clip_num = 0
-    file_num = 0
+    print('    Writing {} {} clips to {} files...'.format(
+        num_clips, dataset_name, num_files))
     
-    while clip_num != num_clips:
-        
-        file_path = get_output_file_path(config, dataset_name, file_num)
-        
-        end_clip_num = min(clip_num + OUTPUT_FILE_SIZE, num_clips)
-        file_clips = clips[clip_num:end_clip_num]
-        
-        print(
-            '    Writing {} clips to file "{}" (file {} of {})...'.format(
-                len(file_clips), file_path, file_num + 1, num_files))
-    
-        write_output_file(inputs, file_clips, file_path)
-               
-        clip_num = end_clip_num
-        file_num += 1
+    def show_progress(shard_info):
+        print('        Wrote {} clips to file "{}".'.format(
+            shard_info['example_count'], shard_info['file_name']))
+            
+    file_name_format = OUTPUT_FILE_NAME_FORMAT.format(
+        config.dataset_name_prefix, '{}', '{:04d}')
+    
+    create_example = functools.partial(
+        create_tf_example, spectrogram_settings=SPECTROGRAM_SETTINGS)
+    
+    shard_infos = sharded_dataset_builder.build_dataset_part(
+        get_input_file_paths(), clips, dataset_name,
+        get_output_dir_path(config) / dataset_name, create_example,
+        shard_size=OUTPUT_FILE_SIZE, file_name_format=file_name_format,
+        seed=RANDOM_SEED, process_count=PROCESS_COUNT,
+        listener=show_progress)
         
     end_time = time.time()
     delta = end_time - start_time
-    rate = len(clips) / delta
+    rate = num_clips / delta
     print((
         '    Wrote {} {} clips to {} files in {:.1f} seconds, a rate of '
         '{:.1f} clips per second.').format(
-            len(clips), dataset_name, num_files, delta, rate))
+            num_clips, dataset_name, num_files, delta, rate))
+    
+    return shard_infos
         
         
 def close_input_files(inputs):
@@ -1554,55 +1606,41 @@ def close_input_files(inputs):
         i.file.close()
         
         
-def get_output_file_path(config, dataset_name, file_num):
-    
-    prefix = config.dataset_name_prefix
-    
-    file_name = OUTPUT_FILE_NAME_FORMAT.format(prefix, dataset_name, file_num)
-    
-    return OUTPUT_DIR_PATH / prefix / dataset_name / file_name
+def get_input_file_paths():
+    return [INPUT_DIR_PATH / file_name for file_name in INPUT_FILE_NAMES]
 
 
-def write_output_file(inputs, file_clips, file_path):
-    
-    print('        closing and reopening input files...')
-    
-    # Close and reopen input HDF5 files. I do not understand why this
-    # is necessary, but without it the script sometimes quits with no
-    # error messages before it completes.
-    close_input_files(inputs)
-    inputs = get_inputs()
-    clip_groups = dict((i.num, i.clips_group) for i in inputs)
+def get_output_dir_path(config):
+    return OUTPUT_DIR_PATH / config.dataset_name_prefix
+
+
+def get_manifest_settings(config):
     
-    print('        creating clip TF examples...')
+    settings = {
+        'input_file_names': list(INPUT_FILE_NAMES),
+        'example_start_offset': EXAMPLE_START_OFFSET,
+        'example_duration': EXAMPLE_DURATION,
+        'example_sample_rate': EXAMPLE_SAMPLE_RATE,
+        'random_seed': RANDOM_SEED,
+    }
     
-    tf_examples = []
-    for input_num, clip_id in file_clips:
-        clip_ds = clip_groups[input_num][clip_id]
-        tf_example = create_tf_example(clip_ds)
-        tf_examples.append(tf_example)
+    if SPECTROGRAM_SETTINGS is not None:
+        settings['spectrogram'] = dict(SPECTROGRAM_SETTINGS.__dict__)
         
-    print('        writing TF examples to file...')
-    
-    os_utils.create_parent_directory(file_path)
-    with tf.python_io.TFRecordWriter(str(file_path)) as writer:
-        for tf_example in tf_examples:
-            writer.write(tf_example.SerializeToString())
-            
-    print('        done')
-     
+    return settings
 
-def create_tf_example(clip_ds):
+
+def create_tf_example(clip_ds, spectrogram_settings=None):
     
-    waveform = clip_ds[:]
     attrs = clip_ds.attrs
     
     sample_rate = attrs['sample_rate']
     
-    # Trim waveform.
+    # Read only the part of the waveform that we need from the HDF5
+    # dataset, rather than reading all of it and then trimming it.
     start_index = int(round(EXAMPLE_START_OFFSET * sample_rate))
     length = int(round(EXAMPLE_DURATION * sample_rate))
-    waveform = waveform[start_index:start_index + length]
+    waveform = clip_ds[start_index:start_index + length]
     
     # Resample if needed.
     if sample_rate != EXAMPLE_SAMPLE_RATE:
@@ -1619,14 +1657,36 @@ def create_tf_example(clip_ds):
     clip_id = attrs['clip_id']
     clip_id_feature = create_int64_feature(clip_id)
     
-    features = tf.train.Features(
-        feature={
-            'waveform': waveform_feature,
-            'label': label_feature,
-            'clip_id': clip_id_feature
-        })
+    feature = {
+        'waveform': waveform_feature,
+        'label': label_feature,
+        'clip_id': clip_id_feature
+    }
+    
+    if spectrogram_settings is not None:
+        gram = compute_spectrogram(waveform, spectrogram_settings)
+        feature['spectrogram'] = create_bytes_feature(gram.tobytes())
+        feature['spectrogram_shape'] = create_int64_list_feature(gram.shape)
+        
+    features = tf.train.Features(feature=feature)
+    
+    example = tf.train.Example(features=features)
+    
+    return example.SerializeToString()
+
+
+def compute_spectrogram(waveform, settings):
+    
+    s = settings
+    
+    window_size = int(round(s.window_size * EXAMPLE_SAMPLE_RATE))
+    window = data_windows.create_window(s.window_type, window_size).samples
+    hop_size = int(round(window_size * s.hop_size / 100))
     
-    return tf.train.Example(features=features)
+    gram = tfa_utils.compute_spectrogram(waveform, window, hop_size)
+    tfa_utils.linear_to_log(gram, s.reference_power, out=gram)
+    
+    return gram.astype(np.float32)
 
 
 def create_bytes_feature(value):
@@ -1637,6 +1697,10 @@ def create_int64_feature(value):
     return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
 
 
+def create_int64_list_feature(values):
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=values))
+
+
 CREATE_DATASETS_TEST_CASES = [
     Bunch(**case) for case in yaml_utils.load('''
 
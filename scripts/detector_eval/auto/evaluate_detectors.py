@@ -31,6 +31,7 @@ import numpy as np
 import pandas as pd
 
 import scripts.detector_eval.auto.utils as utils
+import vesper.util.detector_evaluation_engine as engine
 
 
 def window(offset, duration):
@@ -184,8 +185,9 @@ def count_detected_calls(detected_clips, ground_truth_call_center_indices):
                 'Detector will not be evaluated.').format(detector_name))
             continue
         
-        matches = match_clips_with_calls(clips, call_center_indices, window)
-        detected_call_count = len(matches)
+        matched_clips, _ = engine.match_clips_with_calls(
+            clips, call_center_indices, window)
+        detected_call_count = len(matched_clips)
         
         detected_clip_count = len(clips)
         ground_truth_call_count = len(call_center_indices)
@@ -205,60 +207,6 @@ def get_detector_call_center_window(detector_name):
     return DETECTOR_CALL_CENTER_WINDOWS[detector_name]
     
     
-def match_clips_with_calls(clips, call_center_indices, window):
-    
-    clip_windows = [get_clip_window(clip, window) for clip in clips]
-    
-    clip_count = len(clips)
-    call_count = len(call_center_indices)
-    
-    i = 0
-    j = 0
-    
-    matches = []
-    
-    while i != clip_count and j != call_count:
-        
-        window_start_index, window_end_index = clip_windows[i]
-        call_center_index = call_center_indices[j]
-        
-        if window_end_index <= call_center_index:
-            # clip window i precedes call center j
-            
-            i += 1
-            
-        elif window_start_index > call_center_index:
-            # clip window i follows call center j
-            
-            j += 1
-            
-        else:
-            # clip window i includes call center j
-                        
-            matches.append((i, j))
-            
-            i += 1
-            j += 1
-            
-    return matches
-            
-
-def get_clip_window(clip, window):
-    
-    clip_start_index, clip_length = clip
-    clip_end_index = clip_start_index + clip_length
-    
-    window_start_offset, window_length = window
-    
-    window_start_index = min(
-        clip_start_index + window_start_offset, clip_end_index)
-        
-    window_end_index = min(
-        window_start_index + window_length, clip_end_index)
-    
-    return (window_start_index, window_end_index)
-
-    
 def create_unaggregated_df(rows):
     columns = [
         'Detector', 'Unit', 'Threshold', 'Ground Truth Calls',
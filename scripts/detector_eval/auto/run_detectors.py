@@ -20,18 +20,20 @@ The outputs produced by this script are:
 value of the DETECTOR_TYPE module attribute. Each line of the file contains
 data describing one clip produced by a detector. The directory of the file
 is specified by scripts.detector_eval.auto.utils.WORKING_DIR_PATH.
+
+The script runs detectors with the shared detector evaluation engine of
+the `vesper.util.detector_evaluation_engine` module, which processes
+recordings in parallel and caches detector score tracks in the directory
+specified by the SCORE_TRACK_CACHE_DIR_PATH module attribute.
 """
 
 
-from multiprocessing import Pool
-import csv
-import math
-import time
+import functools
 
-from scripts.detector_eval.auto.wave_file_reader import WaveFileReader
 import scripts.detector_eval.auto.utils as utils
 import vesper.old_bird.old_bird_detector_redux_1_1_mt as old_bird_redux
 import vesper.mpg_ranch.nfc_detector_0_0.detector as mpg_ranch
+import vesper.util.detector_evaluation_engine as engine
 
 
 def create_detector_classes_dict(classes):
@@ -59,7 +61,8 @@ NUM_WORKER_PROCESSES = 3
 """
 Number of worker processes in process pool.
 
-This is the maximum number of detectors that will run simultaneously.
+This is the maximum number of recordings that will be processed
+simultaneously.
 """
 
 CHUNK_SIZE = 100000
@@ -74,6 +77,15 @@ large enough to harm performance, while for larger chunk sizes memory cache
 misses become a problem.
 """
 
+SCORE_TRACK_CACHE_DIR_PATH = utils.WORKING_DIR_PATH / 'Score Track Cache'
+"""
+Directory in which to cache detector score tracks, or `None`.
+
+Detectors that support score tracks (currently the Old Bird redux
+detectors) are rerun from their cached tracks, so changing thresholds
+does not require rerunning them.
+"""
+
 
 def main():
     
@@ -82,132 +94,44 @@ def main():
         'MPG Ranch Tseep Detector 0.0'
     ]
     
-    args = [(detector_names, i) for i in UNIT_NUMS]
-    
-    with Pool(NUM_WORKER_PROCESSES) as pool:
-        results = pool.starmap(run_detectors_on_one_recording, args)
-        
-    results = sorted(results)
-    
-    write_clips_file(results)
-    
-    utils.announce('Harold, your detection script has finished.')
+    specs = [create_detector_spec(name) for name in detector_names]
     
+    recordings = [
+        (unit_num, utils.get_recording_file_path(unit_num))
+        for unit_num in UNIT_NUMS]
     
-def run_detectors_on_one_recording(detector_names, unit_num):
-        
-    file_path = utils.get_recording_file_path(unit_num)
-        
-    print('Running detectors for unit {} on file "{}"...'.format(
-        unit_num, file_path))
+    detections = engine.run_detectors(
+        specs, recordings, SCORE_TRACK_CACHE_DIR_PATH, NUM_WORKER_PROCESSES,
+        CHUNK_SIZE)
     
-    start_time = time.time()
+    show_clip_counts(detections)
     
-    reader = WaveFileReader(str(file_path))
-    num_chunks = int(math.ceil(reader.length / CHUNK_SIZE))
-    sample_rate = reader.sample_rate
-    
-    detectors, listeners = create_detectors(
-        detector_names, sample_rate, unit_num)
-        
-    for i, samples in enumerate(generate_sample_buffers(reader)):
-        if i != 0 and i % 1000 == 0:
-            print('    Unit {} chunk {} of {}...'.format(
-                unit_num, i, num_chunks))
-        for detector in detectors:
-            detector.detect(samples[0])
-                       
-    for detector in detectors:
-        detector.complete_detection()
-
-    reader.close()
+    engine.write_detections_file(
+        utils.get_clips_file_path('Clips'), detections)
     
-    processing_time = time.time() - start_time
-    file_duration = reader.length / sample_rate
-    show_processing_time(processing_time, unit_num, file_duration)
+    utils.announce('Harold, your detection script has finished.')
     
-    return unit_num, listeners
-        
-
-def create_detectors(detector_names, sample_rate, unit_num):
     
-    pairs = [
-        create_detector(detector_name, sample_rate, unit_num)
-        for detector_name in detector_names]
-
-    return zip(*pairs)
+def create_detector_spec(detector_name):
+    create_detector = functools.partial(
+        _create_detector, DETECTOR_CLASSES[detector_name])
+    return engine.DetectorSpec(detector_name, create_detector, THRESHOLDS)
 
 
-def create_detector(detector_name, sample_rate, unit_num):
+def _create_detector(cls, thresholds, sample_rate, listener, score_listener):
     
-    listener = Listener(detector_name, unit_num)
+    if issubclass(cls, old_bird_redux._Detector):
+        return cls(thresholds, sample_rate, listener, score_listener)
     
-    cls = DETECTOR_CLASSES[detector_name]
-    detector = cls(sample_rate, listener, THRESHOLDS)
-        
-    return detector, listener
-
-
-def generate_sample_buffers(file_reader):
-    start_index = 0
-    while start_index < file_reader.length:
-        length = min(CHUNK_SIZE, file_reader.length - start_index)
-        yield file_reader.read(start_index, length)
-        start_index += CHUNK_SIZE
+    else:
+        return cls(sample_rate, listener, thresholds)
 
 
-def show_processing_time(processing_time, unit_num, file_duration):
-    factor = file_duration / processing_time
-    print(
-        ('Ran detectors for unit {} on {}-second file in {} seconds, {} '
-         'times faster than real time.').format(
-             unit_num, round_(file_duration), round_(processing_time),
-             round_(factor)))
-        
-        
-def round_(t):
-    return round(10 * t) / 10
-
-
-def write_clips_file(results):
-    
-    file_path = utils.get_clips_file_path('Clips')
-    
-    with open(file_path, 'w') as file_:
-        
-        writer = csv.writer(file_)
-        
-        writer.writerow(
-            ['Detector', 'Unit', 'Threshold', 'Start Index', 'Length'])
-        
-        for unit_num, listeners in results:
-            
-            for listener in listeners:
-                
-                print('For unit {}, {} detector produced {} clips.'.format(
-                    unit_num, listener.detector_name, len(listener.clips)))
-                
-                listener.clips.sort()
-                
-                writer.writerows(listener.clips)
-                
-
-class Listener:
-    
-    
-    def __init__(self, detector_name, unit_num):
-        self.detector_name = detector_name
-        self.unit_num = unit_num
-        self.clips = []
-        
-        
-    def process_clip(self, start_index, length, threshold):
-        self.clips.append([
-            self.detector_name, self.unit_num, threshold, start_index, length])
-        
-        
-    def complete_processing(self):
-        pass
+def show_clip_counts(detections):
+    for (detector_name, unit_num), clips in sorted(detections.items()):
+        count = sum(len(c) for c in clips.values())
+        print('For unit {}, {} detector produced {} clips.'.format(
+            unit_num, detector_name, count))
         
         
 if __name__ == '__main__':
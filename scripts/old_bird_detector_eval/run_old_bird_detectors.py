@@ -5,20 +5,25 @@ This script runs the Old Bird Tseep and Thrush detectors on all of the
 BirdVox-full-night recordings with multiple detection thresholds. It
 writes metadata for the resulting detections to an output CSV file for
 further processing, for example for plotting precision vs. recall curves.
+
+The script runs detectors with the shared detector evaluation engine of
+the `vesper.util.detector_evaluation_engine` module, which processes
+recordings in parallel and caches detector score tracks in the directory
+specified by the SCORE_TRACK_CACHE_DIR_PATH module attribute. Since the
+detectors are rerun from their cached score tracks, changing thresholds
+does not require rerunning the detectors' signal processing.
 """
 
 
-import csv
-import time
+import functools
 
 import matplotlib.pyplot as plt
 import numpy as np
 
 from vesper.old_bird.old_bird_detector_redux_1_1_mt import (
     ThrushDetector, TseepDetector)
-from vesper.signal.wave_audio_file import WaveAudioFileReader
-
 import scripts.old_bird_detector_eval.utils as utils
+import vesper.util.detector_evaluation_engine as engine
 
 
 QUICK_RUN = False
@@ -28,20 +33,18 @@ DETECTOR_CLASSES = {
     'Tseep': TseepDetector
 }
 
+NUM_WORKER_PROCESSES = None
+"""
+Number of worker processes in process pool, or `None` for one per CPU.
+"""
+
+CHUNK_SIZE = 1000000
+"""Wave file read chunk size in samples."""
+
+SCORE_TRACK_CACHE_DIR_PATH = \
+    utils.BIRDVOX_70K_DIR_PATH / 'Other' / 'Old Bird Score Track Cache'
+"""Directory in which to cache detector score tracks, or `None`."""
 
-class Listener:
-    
-    
-    def __init__(self, name):
-        self.name = name
-        self.unit_num = None
-        self.clips = []
-        
-        
-    def process_clip(self, start_index, length, threshold):
-        self.clips.append(
-            [self.name, self.unit_num, threshold, start_index, length])
-        
         
 def main():
     
@@ -53,73 +56,51 @@ def main():
 #     plot_detection_thresholds()
 #     return
 
-    listeners = create_listeners()
+    specs = create_detector_specs()
     
-    recordings_dir_path = utils.BIRDVOX_70K_ARCHIVE_RECORDINGS_DIR_PATH
-    recording_file_paths = sorted(recordings_dir_path.iterdir())
-        
-    for file_path in recording_file_paths:
-        
-        if not file_path.name.endswith('.wav'):
-            continue
-        
-        else:
-            run_detectors_on_file(file_path, listeners)
-            
-        if QUICK_RUN:
-            break
+    recordings = get_recordings()
             
-    write_detections_file(listeners)
+    detections = engine.run_detectors(
+        specs, recordings, SCORE_TRACK_CACHE_DIR_PATH, NUM_WORKER_PROCESSES,
+        CHUNK_SIZE)
     
+    show_clip_counts(detections)
     
-def create_listeners():
-    names = sorted(DETECTOR_CLASSES.keys())
-    return [Listener(name) for name in names]
+    engine.write_detections_file(utils.OLD_BIRD_CLIPS_FILE_PATH, detections)
     
     
-def run_detectors_on_file(file_path, listeners):
-        
-    print('Running detectors on file "{}"...'.format(file_path))
+def create_detector_specs():
+    thresholds = get_detection_thresholds(utils.DETECTION_THRESHOLDS_POWER)
+    return [
+        engine.DetectorSpec(
+            name, functools.partial(_create_detector, cls), thresholds)
+        for name, cls in sorted(DETECTOR_CLASSES.items())]
     
-    unit_num = get_unit_num(file_path)
     
-    for listener in listeners:
-        listener.unit_num = unit_num
+def _create_detector(cls, thresholds, sample_rate, listener, score_listener):
+    return cls(thresholds, sample_rate, listener, score_listener)
+
+
+def get_recordings():
     
-    start_time = time.time()
+    recordings_dir_path = utils.BIRDVOX_70K_ARCHIVE_RECORDINGS_DIR_PATH
+    recording_file_paths = sorted(recordings_dir_path.iterdir())
     
-    reader = WaveAudioFileReader(str(file_path))
-            
-    sample_rate = reader.sample_rate
+    recordings = [
+        (get_unit_num(file_path), file_path)
+        for file_path in recording_file_paths
+        if file_path.name.endswith('.wav')]
     
-    detectors = [create_detector(sample_rate, l) for l in listeners]
+    if QUICK_RUN:
+        recordings = recordings[:1]
         
-    for i, samples in enumerate(generate_sample_buffers(reader)):
-        if i != 0 and i % 100 == 0:
-            print('    Chunk {}...'.format(i))
-        for detector in detectors:
-            detector.detect(samples[0])
-                       
-    for detector in detectors:
-        detector.complete_detection()
-
-    reader.close()
-    
-    processing_time = time.time() - start_time
-    file_duration = reader.length / sample_rate
-    show_processing_time(processing_time, file_duration)
+    return recordings
         
 
 def get_unit_num(file_path):
     return int(file_path.name.split()[1][:2])
     
     
-def create_detector(sample_rate, listener):
-    cls = DETECTOR_CLASSES[listener.name]
-    thresholds = get_detection_thresholds(utils.DETECTION_THRESHOLDS_POWER)
-    return cls(thresholds, sample_rate, listener)
-
-
 def get_detection_thresholds(p):
     
     min_t = utils.MIN_DETECTION_THRESHOLD
@@ -134,47 +115,11 @@ def get_detection_thresholds(p):
     return t
 
 
-def generate_sample_buffers(file_reader):
-    
-    chunk_size = 1000000
-    
-    start_index = 0
-    
-    while start_index < file_reader.length:
-        length = min(chunk_size, file_reader.length - start_index)
-        yield file_reader.read(start_index, length)
-        start_index += chunk_size
-
-
-def show_processing_time(processing_time, file_duration):
-    factor = file_duration / processing_time
-    print(
-        ('Ran detectors on {}-second file in {} seconds, {} times faster '
-         'than real time.').format(
-             round_(file_duration), round_(processing_time), round_(factor)))
-        
-        
-def round_(t):
-    return round(10 * t) / 10
-
-
-def write_detections_file(listeners):
-    
-    with open(utils.OLD_BIRD_CLIPS_FILE_PATH, 'w') as file_:
-        
-        writer = csv.writer(file_)
-        
-        writer.writerow(
-            ['Detector', 'Unit', 'Threshold', 'Start Index', 'Length'])
-        
-        for listener in listeners:
-            
-            print('{} listener got {} clips.'.format(
-                listener.name, len(listener.clips)))
-            
-            listener.clips.sort()
-            
-            writer.writerows(listener.clips)
+def show_clip_counts(detections):
+    for (detector_name, unit_num), clips in sorted(detections.items()):
+        count = sum(len(c) for c in clips.values())
+        print('For unit {}, {} detector produced {} clips.'.format(
+            unit_num, detector_name, count))
     
     
 def plot_detection_thresholds():
@@ -20,19 +20,23 @@ The outputs produced by this script are:
 value of the DETECTOR_TYPE module attribute. Each line of the file contains
 data describing one clip produced by a detector. The directory of the file
 is specified by scripts.pnf_energy_detector_eval.utils.WORKING_DIR_PATH.
+
+The script runs detectors with the shared detector evaluation engine of
+the `vesper.util.detector_evaluation_engine` module, which processes
+recordings in parallel and caches detector score tracks in the directory
+specified by the SCORE_TRACK_CACHE_DIR_PATH module attribute. Since the
+detectors are rerun from their cached score tracks, changing thresholds
+does not require rerunning the detectors' signal processing.
 """
 
 
-from multiprocessing import Pool
-import csv
-import math
-import time
+import functools
 
 from vesper.pnf.pnf_2018_baseline_detector_1_0 import BaselineDetector
 from vesper.pnf.pnf_energy_detector_1_0 import Detector
 from vesper.util.bunch import Bunch
-from scripts.pnf_energy_detector_eval.wave_file_reader import WaveFileReader
 import scripts.pnf_energy_detector_eval.utils as utils
+import vesper.util.detector_evaluation_engine as engine
 
 
 DETECTOR_TYPE = 'Tseep'
@@ -138,7 +142,8 @@ NUM_WORKER_PROCESSES = 3
 """
 Number of worker processes in process pool.
 
-This is the maximum number of detectors that will run simultaneously.
+This is the maximum number of recordings that will be processed
+simultaneously.
 """
 
 CHUNK_SIZE = 100000
@@ -153,23 +158,47 @@ large enough to harm performance, while for larger chunk sizes memory cache
 misses become a problem.
 """
 
+SCORE_TRACK_CACHE_DIR_PATH = utils.WORKING_DIR_PATH / 'Score Track Cache'
+"""Directory in which to cache detector score tracks, or `None`."""
+
 
 def main():
     
-    detector_settings = create_detector_settings()
+    specs = create_detector_specs()
     
-    args = [(detector_settings, i) for i in UNIT_NUMS]
+    recordings = [
+        (unit_num, utils.get_recording_file_path(unit_num))
+        for unit_num in UNIT_NUMS]
     
-    with Pool(NUM_WORKER_PROCESSES) as pool:
-        results = pool.starmap(run_detectors_on_one_recording, args)
-        
-    results = sorted(results)
+    detections = engine.run_detectors(
+        specs, recordings, SCORE_TRACK_CACHE_DIR_PATH, NUM_WORKER_PROCESSES,
+        CHUNK_SIZE)
     
-    write_clips_file(results)
+    show_clip_counts(detections)
+    
+    engine.write_detections_file(
+        utils.get_clips_file_path(DETECTOR_TYPE), detections)
     
     utils.announce('Harold, your detection script has finished.')
     
     
+def create_detector_specs():
+    
+    if INCLUDE_BASELINE_DETECTOR:
+        specs = [create_baseline_detector_spec()]
+    else:
+        specs = []
+        
+    detector_settings = create_detector_settings()
+    detector_names = sorted(detector_settings.keys())
+    
+    specs += [
+        create_detector_spec(name, detector_settings[name])
+        for name in detector_names]
+    
+    return specs
+
+
 def create_detector_settings():
     return dict([
         create_detector_settings_aux(DETECTOR_TYPE, PARAMETER_NAME, value)
@@ -197,139 +226,32 @@ def format_parameter_value(value):
     return str(value)
 
 
-def run_detectors_on_one_recording(detector_settings, unit_num):
-        
-    file_path = utils.get_recording_file_path(unit_num)
-        
-    print('Running detectors for unit {} on file "{}"...'.format(
-        unit_num, file_path))
-    
-    start_time = time.time()
-    
-    reader = WaveFileReader(str(file_path))
-    num_chunks = int(math.ceil(reader.length / CHUNK_SIZE))
-    sample_rate = reader.sample_rate
-    
-    detectors, listeners = create_detectors(
-        detector_settings, sample_rate, unit_num)
-        
-    for i, samples in enumerate(generate_sample_buffers(reader)):
-        if i != 0 and i % 1000 == 0:
-            print('    Unit {} chunk {} of {}...'.format(
-                unit_num, i, num_chunks))
-        for detector in detectors:
-            detector.detect(samples[0])
-                       
-    for detector in detectors:
-        detector.complete_detection()
-
-    reader.close()
-    
-    processing_time = time.time() - start_time
-    file_duration = reader.length / sample_rate
-    show_processing_time(processing_time, unit_num, file_duration)
-    
-    return unit_num, listeners
-        
-
-def create_detectors(detector_settings, sample_rate, unit_num):
-    
-    if INCLUDE_BASELINE_DETECTOR:
-        pairs = [create_baseline_detector(sample_rate, unit_num)]
-    else:
-        pairs = []
-        
-    detector_names = sorted(detector_settings.keys())
-    
-    pairs += [
-        create_detector(
-            detector_name, detector_settings, sample_rate, unit_num)
-        for detector_name in detector_names]
-
-    return zip(*pairs)
-
-
-def create_baseline_detector(sample_rate, unit_num):
-    
+def create_baseline_detector_spec():
     settings = BASELINE_DETECTOR_SETTINGS[DETECTOR_TYPE]
-    settings.thresholds = THRESHOLDS
-    
     detector_name = 'Baseline {}'.format(DETECTOR_TYPE)
-    listener = Listener(detector_name, unit_num)
-    
-    detector = BaselineDetector(settings, sample_rate, listener)
-        
-    return detector, listener
+    create_detector = functools.partial(
+        _create_detector, BaselineDetector, settings)
+    return engine.DetectorSpec(
+        detector_name, create_detector, THRESHOLDS, settings)
              
 
-def create_detector(detector_name, detector_settings, sample_rate, unit_num):
-    
-    settings = detector_settings[detector_name]
-    settings.thresholds = THRESHOLDS
-    
-    listener = Listener(detector_name, unit_num)
-    
-    detector = Detector(settings, sample_rate, listener)
-        
-    return detector, listener
+def create_detector_spec(detector_name, settings):
+    create_detector = functools.partial(_create_detector, Detector, settings)
+    return engine.DetectorSpec(
+        detector_name, create_detector, THRESHOLDS, settings)
 
 
-def generate_sample_buffers(file_reader):
-    start_index = 0
-    while start_index < file_reader.length:
-        length = min(CHUNK_SIZE, file_reader.length - start_index)
-        yield file_reader.read(start_index, length)
-        start_index += CHUNK_SIZE
+def _create_detector(
+        cls, settings, thresholds, sample_rate, listener, score_listener):
+    settings = Bunch(settings, thresholds=thresholds)
+    return cls(settings, sample_rate, listener, score_listener=score_listener)
 
 
-def show_processing_time(processing_time, unit_num, file_duration):
-    factor = file_duration / processing_time
-    print(
-        ('Ran detectors for unit {} on {}-second file in {} seconds, {} '
-         'times faster than real time.').format(
-             unit_num, round_(file_duration), round_(processing_time),
-             round_(factor)))
-        
-        
-def round_(t):
-    return round(10 * t) / 10
-
-
-def write_clips_file(results):
-    
-    file_path = utils.get_clips_file_path(DETECTOR_TYPE)
-    
-    with open(file_path, 'w') as file_:
-        
-        writer = csv.writer(file_)
-        
-        writer.writerow(
-            ['Detector', 'Unit', 'Threshold', 'Start Index', 'Length'])
-        
-        for unit_num, listeners in results:
-            
-            for listener in listeners:
-                
-                print('For unit {}, {} detector produced {} clips.'.format(
-                    unit_num, listener.detector_name, len(listener.clips)))
-                
-                listener.clips.sort()
-                
-                writer.writerows(listener.clips)
-                
-
-class Listener:
-    
-    
-    def __init__(self, detector_name, unit_num):
-        self.detector_name = detector_name
-        self.unit_num = unit_num
-        self.clips = []
-        
-        
-    def process_clip(self, start_index, length, threshold):
-        self.clips.append([
-            self.detector_name, self.unit_num, threshold, start_index, length])
+def show_clip_counts(detections):
+    for (detector_name, unit_num), clips in sorted(detections.items()):
+        count = sum(len(c) for c in clips.values())
+        print('For unit {}, {} detector produced {} clips.'.format(
+            unit_num, detector_name, count))
         
         
 if __name__ == '__main__':
@@ -0,0 +1,155 @@
+"""
+Compares clip audio storage in one WAVE file per clip with storage in
+a clip segment store.
+
+The script creates the same synthetic clips in both layouts in a
+temporary directory and reports for each layout the time to create
+the clips, the latency of reads of randomly chosen clips, and the
+number of files and directories and disk space used.
+"""
+
+
+from pathlib import Path
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from vesper.util.clip_segment_store import ClipSegmentStore
+import vesper.util.audio_file_utils as audio_file_utils
+
+
+CLIP_COUNT = 20000
+CLIP_DURATION = .6
+SAMPLE_RATE = 24000
+READ_COUNT = 5000
+
+# Directory layout of `ClipManager` clip audio files.
+CLIPS_DIR_FORMAT = (3, 3, 3)
+
+
+def main():
+
+    clip_length = int(round(CLIP_DURATION * SAMPLE_RATE))
+    samples = create_samples(clip_length)
+
+    read_ids = [random.randrange(CLIP_COUNT) for _ in range(READ_COUNT)]
+
+    with tempfile.TemporaryDirectory() as dir_path:
+
+        dir_path = Path(dir_path)
+
+        print(
+            f'Timing storage of {CLIP_COUNT} clips of {clip_length} '
+            f'samples each and {READ_COUNT} random clip reads...')
+        print()
+
+        time_files(dir_path / 'Clips', samples, read_ids)
+        time_segments(dir_path / 'Clip Segments', samples, read_ids)
+
+
+def create_samples(clip_length):
+    samples = 1000 * np.random.randn(clip_length)
+    return samples.astype('<i2')
+
+
+def time_files(dir_path, samples, read_ids):
+
+    start_time = time.time()
+
+    for clip_id in range(CLIP_COUNT):
+        path = get_clip_file_path(dir_path, clip_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        audio_file_utils.write_wave_file(
+            str(path), samples.reshape((1, -1)), SAMPLE_RATE)
+
+    write_time = time.time() - start_time
+
+    def read(clip_id):
+        path = get_clip_file_path(dir_path, clip_id)
+        return audio_file_utils.read_wave_file(str(path))[0][0]
+
+    read_times = time_reads(read, read_ids)
+
+    show_results('One file per clip', dir_path, write_time, read_times)
+
+
+def get_clip_file_path(dir_path, clip_id):
+    digits = f'{clip_id:09d}'
+    parts = [digits[0:3], digits[3:6], digits[6:9]]
+    file_name = f'Clip {" ".join(parts)}.wav'
+    return dir_path.joinpath(*parts[:-1], file_name)
+
+
+def time_segments(dir_path, samples, read_ids):
+
+    store = ClipSegmentStore(dir_path)
+
+    start_time = time.time()
+
+    for clip_id in range(CLIP_COUNT):
+        store.put_samples(clip_id, samples)
+
+    write_time = time.time() - start_time
+
+    read_times = time_reads(store.get_samples, read_ids)
+
+    store.close()
+
+    show_results('Clip segment store', dir_path, write_time, read_times)
+
+
+def time_reads(read, clip_ids):
+
+    times = np.zeros(len(clip_ids))
+
+    for i, clip_id in enumerate(clip_ids):
+        start_time = time.perf_counter()
+        read(clip_id)
+        times[i] = time.perf_counter() - start_time
+
+    return times
+
+
+def show_results(name, dir_path, write_time, read_times):
+
+    file_count, dir_count, size, disk_usage = get_disk_usage(dir_path)
+
+    read_times = 1e6 * read_times
+
+    print(f'{name}:')
+    print(f'    write time: {write_time:.2f} seconds')
+    print(
+        f'    read latency: mean {np.mean(read_times):.1f}, '
+        f'median {np.median(read_times):.1f}, '
+        f'95th percentile {np.percentile(read_times, 95):.1f} microseconds')
+    print(f'    files: {file_count}, directories: {dir_count}')
+    print(f'    file sizes: {size / 2 ** 20:.1f} MB')
+    print(f'    disk usage: {disk_usage / 2 ** 20:.1f} MB')
+    print()
+
+
+def get_disk_usage(dir_path):
+
+    file_count = 0
+    dir_count = 0
+    size = 0
+    disk_usage = 0
+
+    for parent_path, dir_names, file_names in os.walk(dir_path):
+
+        dir_count += len(dir_names)
+
+        for file_name in file_names:
+            stat = os.stat(os.path.join(parent_path, file_name))
+            file_count += 1
+            size += stat.st_size
+            disk_usage += stat.st_blocks * 512
+
+    return file_count, dir_count, size, disk_usage
+
+
+if __name__ == '__main__':
+    main()
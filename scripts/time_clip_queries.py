@@ -0,0 +1,402 @@
+"""
+Measures the performance of the clip queries of a large Vesper archive.
+
+Run this script in an empty directory. The first time it runs there,
+the script creates a synthetic archive database with `STATION_COUNT`
+stations, each with one recording per night for `NIGHT_COUNT` nights
+and `CLIPS_PER_NIGHT` clips per night for each of `DETECTOR_COUNT`
+detectors. About `ANNOTATED_FRACTION` of the clips have a
+"Classification" annotation, and about `TAGGED_FRACTION` have a
+"Review" tag. Later runs in the same directory reuse the database.
+The synthetic archive has no clip audio, and is suitable only for
+benchmarking.
+
+The script times the clip queries of the clip calendar, clip album,
+and clip export for several clip filters (no filter, unannotated
+clips, an exact annotation value, an annotation value prefix, and a
+tag), and records the query plan of each query. It times the queries
+both without and with the annotation and tag query indexes, dropping
+the indexes for the first set of timings and then recreating them.
+The results are printed and written as JSON to the file
+`RESULTS_FILE_NAME` in the archive directory.
+"""
+
+
+from pathlib import Path
+import datetime
+import json
+import random
+import statistics
+import time
+
+import pytz
+
+import vesper.util.django_utils as django_utils
+
+
+STATION_COUNT = 4
+NIGHT_COUNT = 100
+DETECTOR_COUNT = 2
+CLIPS_PER_NIGHT = 2500
+ANNOTATED_FRACTION = .5
+TAGGED_FRACTION = .05
+CLASSIFICATIONS = (
+    'Call.AMRE', 'Call.CHSP', 'Call.SAVS', 'Call.WIWA', 'Call.YRWA',
+    'Call', 'Noise', 'Other', 'Unknown')
+
+STATION_TIME_ZONE = 'US/Eastern'
+START_NIGHT = datetime.date(2020, 8, 1)
+RECORDING_START_HOUR = 20
+RECORDING_DURATION = 10 * 3600
+SAMPLE_RATE = 24000
+CLIP_DURATION = .6
+
+ANNOTATION_NAME = 'Classification'
+TAG_NAME = 'Review'
+DETECTOR_NAME_FORMAT = 'Query Benchmark Detector {}'
+
+INSERTION_BATCH_SIZE = 10000
+RUN_COUNT = 3
+ALBUM_PAGE_SIZE = 50
+ALBUM_PAGE_NUM = 20
+
+FILTERS = (
+    ('None', None, None, None),
+    ('Unannotated', ANNOTATION_NAME, None, None),
+    ('Exact Value', ANNOTATION_NAME, 'Call.WIWA', None),
+    ('Value Prefix', ANNOTATION_NAME, 'Call*', None),
+    ('Tag', None, None, TAG_NAME))
+"""Clip filters, as (name, annotation name, annotation value, tag) tuples."""
+
+RESULTS_FILE_NAME = 'Clip Query Benchmark Results.json'
+
+
+def main():
+
+    django_utils.set_up_django()
+
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+
+    if not archive_exists():
+        print('Creating synthetic archive...')
+        start_time = time.time()
+        create_archive()
+        elapsed_time = time.time() - start_time
+        print(f'Created synthetic archive in {elapsed_time:.1f} seconds.')
+        print()
+
+    results = []
+
+    results += time_queries(with_indexes=False)
+    results += time_queries(with_indexes=True)
+
+    write_results(results)
+
+
+def archive_exists():
+    from vesper.django.app.models import Processor
+    name = DETECTOR_NAME_FORMAT.format(0)
+    return Processor.objects.filter(name=name, type='Detector').exists()
+
+
+def create_archive():
+
+    from django.db import connection, transaction
+
+    with transaction.atomic():
+        stations, detectors, annotation_info, tag_info = \
+            create_archive_metadata()
+
+    random.seed(0)
+
+    clip_id = 1
+
+    for station in stations:
+
+        for night_num in range(NIGHT_COUNT):
+
+            night = START_NIGHT + datetime.timedelta(days=night_num)
+
+            with transaction.atomic():
+                clip_id = create_night_clips(
+                    station, night, detectors, annotation_info, tag_info,
+                    clip_id)
+
+        print(f'    Created clips for station "{station.name}".')
+
+    # Update SQLite's query planner statistics.
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+
+def create_archive_metadata():
+
+    from vesper.django.app.models import (
+        AnnotationInfo, Device, DeviceModel, DeviceModelOutput,
+        DeviceOutput, Processor, Station, TagInfo)
+    import vesper.util.time_utils as time_utils
+
+    now = time_utils.get_utc_now()
+
+    recorder_model = DeviceModel.objects.create(
+        name='Synthetic Recorder', type='Audio Recorder',
+        manufacturer='Vesper', model='Recorder')
+
+    mic_model = DeviceModel.objects.create(
+        name='Synthetic Microphone', type='Microphone',
+        manufacturer='Vesper', model='Microphone')
+
+    mic_model_output = DeviceModelOutput.objects.create(
+        model=mic_model, local_name='Output', channel_num=0)
+
+    stations = []
+
+    for i in range(STATION_COUNT):
+
+        station = Station.objects.create(
+            name=f'Station {i}', time_zone=STATION_TIME_ZONE)
+
+        station.recorder = Device.objects.create(
+            name=f'Recorder {i}', model=recorder_model, serial_number=str(i))
+
+        mic = Device.objects.create(
+            name=f'Microphone {i}', model=mic_model, serial_number=str(i))
+
+        station.mic_output = DeviceOutput.objects.create(
+            device=mic, model_output=mic_model_output)
+
+        stations.append(station)
+
+    detectors = [
+        Processor.objects.create(
+            name=DETECTOR_NAME_FORMAT.format(i), type='Detector')
+        for i in range(DETECTOR_COUNT)]
+
+    annotation_info = AnnotationInfo.objects.create(
+        name=ANNOTATION_NAME, type=AnnotationInfo.TYPE_STRING,
+        creation_time=now)
+
+    tag_info = TagInfo.objects.create(name=TAG_NAME, creation_time=now)
+
+    return stations, detectors, annotation_info, tag_info
+
+
+def create_night_clips(
+        station, night, detectors, annotation_info, tag_info, clip_id):
+
+    from vesper.django.app.models import (
+        Clip, Recording, RecordingChannel, StringAnnotation, Tag)
+    import vesper.util.time_utils as time_utils
+
+    now = time_utils.get_utc_now()
+
+    time_zone = pytz.timezone(station.time_zone)
+    start_time = time_zone.localize(datetime.datetime(
+        night.year, night.month, night.day, RECORDING_START_HOUR))
+    start_time = start_time.astimezone(pytz.utc)
+    length = RECORDING_DURATION * SAMPLE_RATE
+
+    recording = Recording.objects.create(
+        station=station, recorder=station.recorder, num_channels=1,
+        length=length, sample_rate=SAMPLE_RATE, start_time=start_time,
+        end_time=start_time + datetime.timedelta(seconds=RECORDING_DURATION),
+        creation_time=now)
+
+    channel = RecordingChannel.objects.create(
+        recording=recording, channel_num=0, recorder_channel_num=0,
+        mic_output=station.mic_output)
+
+    clip_length = int(round(CLIP_DURATION * SAMPLE_RATE))
+    clip_duration = datetime.timedelta(seconds=CLIP_DURATION)
+
+    clips = []
+    annotations = []
+    tags = []
+
+    for detector in detectors:
+
+        start_indices = sorted(
+            random.randrange(length - clip_length)
+            for _ in range(CLIPS_PER_NIGHT))
+
+        for start_index in start_indices:
+
+            clip_start_time = start_time + \
+                datetime.timedelta(seconds=start_index / SAMPLE_RATE)
+
+            clips.append(Clip(
+                id=clip_id, station=station, mic_output=station.mic_output,
+                recording_channel=channel, start_index=start_index,
+                length=clip_length, sample_rate=SAMPLE_RATE,
+                start_time=clip_start_time,
+                end_time=clip_start_time + clip_duration, date=night,
+                creation_time=now, creating_processor=detector))
+
+            if random.random() < ANNOTATED_FRACTION:
+                annotations.append(StringAnnotation(
+                    clip_id=clip_id, info=annotation_info,
+                    value=random.choice(CLASSIFICATIONS), creation_time=now))
+
+            if random.random() < TAGGED_FRACTION:
+                tags.append(Tag(
+                    clip_id=clip_id, info=tag_info, creation_time=now))
+
+            clip_id += 1
+
+    # We specify clip IDs explicitly since SQLite does not return the
+    # IDs of bulk-created objects.
+    Clip.objects.bulk_create(clips, INSERTION_BATCH_SIZE)
+    StringAnnotation.objects.bulk_create(annotations, INSERTION_BATCH_SIZE)
+    Tag.objects.bulk_create(tags, INSERTION_BATCH_SIZE)
+
+    return clip_id
+
+
+def time_queries(with_indexes):
+
+    from django.db import connection
+    from vesper.django.app.models import Processor, Station
+
+    set_indexes(with_indexes)
+
+    indexes_text = 'with' if with_indexes else 'without'
+    print(f'Timing queries {indexes_text} annotation and tag indexes...')
+
+    station = Station.objects.get(name='Station 0')
+    mic_output = station.recordings.first().channels.first().mic_output
+    detector = Processor.objects.get(
+        name=DETECTOR_NAME_FORMAT.format(0), type='Detector')
+    night = START_NIGHT + datetime.timedelta(days=NIGHT_COUNT // 2)
+
+    queries = (
+        ('Calendar', get_calendar_query),
+        ('Night', get_night_query),
+        ('Album Page', get_album_page_query),
+        ('Export', get_export_query))
+
+    results = []
+
+    for filter_name, annotation_name, annotation_value, tag_name in FILTERS:
+
+        kwargs = {
+            'station': station,
+            'mic_output': mic_output,
+            'detector': detector,
+            'annotation_name': annotation_name,
+            'annotation_value': annotation_value,
+            'tag_name': tag_name,
+            'order': False
+        }
+
+        for query_name, get_query in queries:
+
+            query = get_query(kwargs, night)
+
+            times = []
+            for _ in range(RUN_COUNT):
+                start_time = time.time()
+                row_count = len(list(query.all()))
+                times.append(time.time() - start_time)
+
+            time_ = statistics.median(times)
+
+            print(
+                f'    {query_name} query with filter "{filter_name}": '
+                f'{row_count} rows in {time_:.3f} seconds')
+
+            results.append({
+                'query': query_name,
+                'filter': filter_name,
+                'indexes': with_indexes,
+                'database': connection.vendor,
+                'row_count': row_count,
+                'times': times,
+                'median_time': time_,
+                'plan': query.explain()
+            })
+
+    print()
+
+    return results
+
+
+def set_indexes(enabled):
+
+    """Drops or creates the annotation and tag query indexes."""
+
+    from django.db import connection
+    from vesper.django.app.models import StringAnnotation, Tag
+
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, StringAnnotation._meta.db_table)
+        constraints.update(connection.introspection.get_constraints(
+            cursor, Tag._meta.db_table))
+
+    with connection.schema_editor() as editor:
+        for model in (StringAnnotation, Tag):
+            for index in model._meta.indexes:
+                exists = index.name in constraints
+                if enabled and not exists:
+                    editor.add_index(model, index)
+                elif not enabled and exists:
+                    editor.remove_index(model, index)
+
+
+def get_calendar_query(kwargs, night):
+    from django.db.models import Count
+    import vesper.django.app.model_utils as model_utils
+    clips = model_utils.get_clips(**kwargs)
+    return clips.values('date').annotate(count=Count('date'))
+
+
+def get_night_query(kwargs, night):
+    import vesper.django.app.model_utils as model_utils
+    clips = model_utils.get_clips(date=night, **kwargs)
+    return clips.order_by('start_time', 'id').values_list('id', 'start_time')
+
+
+def get_album_page_query(kwargs, night):
+
+    import vesper.django.app.model_utils as model_utils
+
+    clips = model_utils.get_clips(date=night, **kwargs)
+    field_names = model_utils.CLIP_PAGE_FIELD_NAMES
+    start = ALBUM_PAGE_NUM * ALBUM_PAGE_SIZE
+
+    return clips.order_by('start_time', 'id').values_list(
+        *field_names)[start:start + ALBUM_PAGE_SIZE]
+
+
+def get_export_query(kwargs, night):
+    import vesper.django.app.model_utils as model_utils
+    clips = model_utils.get_clips(**kwargs)
+    return clips.order_by('start_time').values_list(
+        'id', 'start_index', 'length', 'start_time')
+
+
+def write_results(results):
+
+    path = Path.cwd() / RESULTS_FILE_NAME
+
+    settings = {
+        'station_count': STATION_COUNT,
+        'night_count': NIGHT_COUNT,
+        'detector_count': DETECTOR_COUNT,
+        'clips_per_night': CLIPS_PER_NIGHT,
+        'annotated_fraction': ANNOTATED_FRACTION,
+        'tagged_fraction': TAGGED_FRACTION,
+        'run_count': RUN_COUNT
+    }
+
+    with open(path, 'w') as file_:
+        json.dump({'settings': settings, 'results': results}, file_, indent=4)
+
+    print(f'Wrote results to "{path}".')
+
+
+if __name__ == '__main__':
+    main()
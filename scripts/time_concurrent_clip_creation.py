@@ -0,0 +1,203 @@
+"""
+Measures the rate at which concurrent processes can create clips in the
+database of a Vesper archive.
+
+Run this script in an archive directory. To benchmark PostgreSQL, use
+an archive whose archive settings specify a local PostgreSQL database,
+for example:
+
+    database:
+        engine: PostgreSQL
+        name: vesper
+        user: vesper
+        password: vesper
+        host: localhost
+        port: 5432
+
+For each of several process counts, the script starts that many
+processes that create clips at the same time, each in transactions of
+`BATCH_SIZE` clips, and reports the total clip creation rate. Rates
+are reported both with the SQLite archive lock, which serializes all
+archive transactions, and (for databases other than SQLite) without
+it.
+
+The clips are created for the first recording channel of the archive,
+with a creating processor named "Concurrency Benchmark" that the
+script creates. The script deletes the clips and the processor when
+it finishes.
+"""
+
+
+from multiprocessing import Barrier, Process, Queue, RLock
+import datetime
+import time
+
+import vesper.util.django_utils as django_utils
+
+
+PROCESSOR_NAME = 'Concurrency Benchmark'
+PROCESSOR_TYPE = 'Detector'
+PROCESS_COUNTS = (1, 2, 4, 8)
+CLIPS_PER_PROCESS = 5000
+BATCH_SIZE = 100
+CLIP_PERIOD = 1
+CLIP_DURATION = .5
+
+
+def main():
+
+    django_utils.set_up_django()
+
+    from vesper.django.app.models import Processor, RecordingChannel
+    import vesper.util.archive_lock as archive_lock
+
+    channel = RecordingChannel.objects.order_by('id').first()
+
+    if channel is None:
+        print('Archive has no recording channels. Please add a recording.')
+        return
+
+    processor, _ = Processor.objects.get_or_create(
+        name=PROCESSOR_NAME, type=PROCESSOR_TYPE)
+
+    locks = [('with archive lock', RLock())]
+    if not archive_lock.serializes_writes():
+        locks.append(('without archive lock', archive_lock.DoNothingLock()))
+
+    print(
+        f'Timing creation of {CLIPS_PER_PROCESS} clips per process in '
+        f'transactions of {BATCH_SIZE} clips...')
+    print()
+
+    try:
+
+        for lock_name, lock in locks:
+
+            print(f'{lock_name}:')
+
+            for process_count in PROCESS_COUNTS:
+                rate = time_clip_creation(
+                    process_count, lock, channel.id, processor.id)
+                print(
+                    f'    {process_count} processes: {rate:.0f} clips '
+                    f'per second')
+                delete_clips(processor)
+
+            print()
+
+    finally:
+        delete_clips(processor)
+        processor.delete()
+
+
+def time_clip_creation(process_count, lock, channel_id, processor_id):
+
+    # Close database connections so worker processes do not inherit them.
+    from django import db
+    db.connections.close_all()
+
+    barrier = Barrier(process_count + 1)
+    results = Queue()
+
+    processes = [
+        Process(
+            target=create_clips,
+            args=(
+                i, lock, channel_id, processor_id, barrier, results))
+        for i in range(process_count)]
+
+    for p in processes:
+        p.start()
+
+    # Start all processes creating clips at once.
+    barrier.wait()
+    start_time = time.time()
+
+    for p in processes:
+        p.join()
+
+    elapsed_time = time.time() - start_time
+
+    errors = [results.get() for _ in processes]
+    errors = [e for e in errors if e is not None]
+    if len(errors) != 0:
+        raise RuntimeError(f'Clip creation failed: {errors[0]}')
+
+    return process_count * CLIPS_PER_PROCESS / elapsed_time
+
+
+def create_clips(
+        process_num, lock, channel_id, processor_id, barrier, results):
+
+    django_utils.set_up_django()
+
+    from django.db import transaction
+    from vesper.django.app.models import Clip, Processor, RecordingChannel
+    import vesper.django.app.model_utils as model_utils
+    import vesper.util.archive_lock as archive_lock
+    import vesper.util.time_utils as time_utils
+
+    archive_lock.set_lock(lock)
+
+    channel = RecordingChannel.objects.select_related(
+        'recording__station', 'mic_output').get(id=channel_id)
+    recording = channel.recording
+    station = recording.station
+    processor = Processor.objects.get(id=processor_id)
+
+    sample_rate = recording.sample_rate
+    length = int(round(CLIP_DURATION * sample_rate))
+    creation_time = time_utils.get_utc_now()
+
+    def create_clip(clip_num):
+        start_index = int(round(clip_num * CLIP_PERIOD * sample_rate))
+        start_time = recording.start_time + \
+            datetime.timedelta(seconds=clip_num * CLIP_PERIOD)
+        end_time = start_time + datetime.timedelta(seconds=CLIP_DURATION)
+        return Clip(
+            station=station,
+            mic_output=channel.mic_output,
+            recording_channel=channel,
+            start_index=start_index,
+            length=length,
+            sample_rate=sample_rate,
+            start_time=start_time,
+            end_time=end_time,
+            date=station.get_night(start_time),
+            creation_time=creation_time,
+            creating_processor=processor)
+
+    # Give each process its own range of clip start times.
+    start_num = process_num * CLIPS_PER_PROCESS
+    clips = [
+        create_clip(start_num + i) for i in range(CLIPS_PER_PROCESS)]
+
+    barrier.wait()
+
+    try:
+        for i in range(0, len(clips), BATCH_SIZE):
+            with archive_lock.atomic(), transaction.atomic():
+                model_utils.create_clips(clips[i:i + BATCH_SIZE])
+
+    except Exception as e:
+        results.put(str(e))
+
+    else:
+        results.put(None)
+
+
+def delete_clips(processor):
+
+    from django.db import connection, transaction
+    from vesper.django.app.models import Clip
+
+    # The benchmark clips have no annotations or tags, so we can delete
+    # them with one statement.
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Clip._meta.db_table} '
+            f'WHERE creating_processor_id = %s', [processor.id])
+
+
+if __name__ == '__main__':
+    main()
@@ -24,12 +24,20 @@ def initialize(archive_dir_path, archive_settings):
     archive_paths = Bunch(
         archive_dir_path=archive_dir_path,
         clip_dir_path=archive_dir_path / 'Clips',
+        clip_segment_dir_path=archive_dir_path / 'Clip Segments',
+        clip_audio_file_deletion_queue_dir_path=
+            archive_dir_path / 'Clip Audio File Deletion Queue',
+        clip_audio_cache_dir_path=
+            archive_dir_path / 'Cache' / 'Clip Audio Files',
+        clip_spectrogram_cache_dir_path=
+            archive_dir_path / 'Cache' / 'Clip Spectrograms',
         deferred_action_dir_path=archive_dir_path / 'Deferred Actions',
         job_log_dir_path=archive_dir_path / 'Logs' / 'Jobs',
         preference_file_path=archive_dir_path / 'Preferences.yaml',
         preset_dir_path=archive_dir_path / 'Presets',
         recording_dir_paths=_create_recording_dir_paths(
             archive_settings, archive_dir_path),
+        score_track_dir_path=archive_dir_path / 'Score Tracks',
         sqlite_database_file_path=archive_dir_path / 'Archive Database.sqlite')
     
     
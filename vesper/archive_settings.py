@@ -19,8 +19,40 @@ import vesper.archive_paths as archive_paths
 
 
 _DEFAULT_SETTINGS = Settings.create_from_yaml('''
+# The archive database. The engine is either "SQLite" or "PostgreSQL".
+# For PostgreSQL, also specify the database "name", "user", "password",
+# "host", and "port", and optionally "connection_max_age", the number
+# of seconds for which the server keeps an idle database connection
+# open for reuse (the default is 600). Archive database transactions
+# are serialized with a lock for SQLite but not for PostgreSQL, so jobs
+# and users can write to a PostgreSQL archive concurrently.
 database:
     engine: SQLite
+
+# Whether or not to perform archive database writes with a write-behind
+# service, for archives that use SQLite. The service performs the writes
+# of jobs and users on a single writer thread that groups writes that
+# arrive close together into one transaction, and puts the database in
+# SQLite's write-ahead logging (WAL) mode. This can speed up workloads
+# that comprise many small writes, such as the classification of clips
+# by several jobs at once. This setting has no effect for PostgreSQL.
+write_behind: false
+
+# How clip audio is stored. With "Files", each clip's audio is stored
+# in its own WAVE file in the "Clips" archive directory. With "Segments",
+# clip audio is packed into large segment files in the "Clip Segments"
+# archive directory. Use the "migrateclipaudio" management command to
+# move the audio of an existing archive from files to segments.
+clip_audio_storage: Files
+
+# Maximum size in megabytes of the cache of clip audio files created
+# from recordings for clips that have no audio files of their own.
+# Set this to zero to disable the cache.
+clip_audio_cache_max_size: 1000
+
+# Maximum size in megabytes of the cache of clip spectrograms computed
+# by the server. Set this to zero to disable the cache.
+clip_spectrogram_cache_max_size: 1000
 ''')
 
 
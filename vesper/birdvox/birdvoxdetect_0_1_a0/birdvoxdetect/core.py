@@ -56,35 +56,14 @@ def process_file(
     logging.info("Loading model: {}".format(detector_name))
 
     # Load the detector.
-    if detector_name == "pcen_snr":
-        detector = "pcen_snr"
-    else:
-        model_path = get_model_path(detector_name)
-        if not os.path.exists(model_path):
-            raise BirdVoxDetectError(
-                'Model "{}" could not be found.'.format(detector_name))
-        try:
-            with warnings.catch_warnings():
-                # Suppress TF and Keras warnings when importing
-                warnings.simplefilter("ignore")
-                import keras
-                detector = keras.models.load_model(
-                    model_path, custom_objects=custom_objects)
-        except Exception:
-            exc_str = 'Could not open model "{}":\n{}'
-            formatted_trace = traceback.format_exc()
-            exc_formatted_str = exc_str.format(model_path, formatted_trace)
-            raise BirdVoxDetectError(exc_formatted_str)
+    detector = load_detector(detector_name, custom_objects)
 
     # Define chunk size.
-    has_context = (len(detector_name) > 6) and (detector_name[-6:-4] == "-T")
-    if has_context:
-        percentiles = [0.1, 1, 10, 25, 50, 75, 90, 99, 99.9]
-        queue_length = 4
-        chunk_duration = int(detector_name[-4:]) / queue_length
-    else:
-        chunk_duration = 450
-        queue_length = 1
+    chunk_settings = get_chunk_settings(detector_name)
+    has_context = chunk_settings["has_context"]
+    percentiles = chunk_settings["percentiles"]
+    queue_length = chunk_settings["queue_length"]
+    chunk_duration = chunk_settings["chunk_duration"]
 
     # Define number of chunks.
     sr = sound_file.samplerate
@@ -130,11 +109,8 @@ def process_file(
     # Print chunk duration.
     logging.info("Chunk duration: {} seconds".format(chunk_duration))
 
-    # Define padding. Set to one second, i.e. 750 hops @ 24 kHz.
-    # Any value above clip duration (150 ms) would work.
-    pcen_settings = get_pcen_settings()
-    chunk_padding = pcen_settings["hop_length"] *\
-        int(pcen_settings["sr"] / pcen_settings["hop_length"])
+    # Define padding.
+    chunk_padding = get_chunk_padding()
 
     # Pre-load double-ended queue.
     deque = collections.deque()
@@ -155,9 +131,7 @@ def process_file(
             concat_deque, percentiles, axis=1, overwrite_input=True)
 
     # Define frame rate.
-    frame_rate =\
-        pcen_settings["sr"] /\
-        (pcen_settings["hop_length"] * pcen_settings["stride_length"])
+    frame_rate = get_frame_rate()
 
     # early termination for testing
     done = False
@@ -450,6 +424,58 @@ def process_file(
         logging.info(event_str.format(confidence_path))
 
 
+def load_detector(detector_name, custom_objects=None):
+    if detector_name == "pcen_snr":
+        return "pcen_snr"
+    model_path = get_model_path(detector_name)
+    if not os.path.exists(model_path):
+        raise BirdVoxDetectError(
+            'Model "{}" could not be found.'.format(detector_name))
+    try:
+        with warnings.catch_warnings():
+            # Suppress TF and Keras warnings when importing
+            warnings.simplefilter("ignore")
+            import keras
+            return keras.models.load_model(
+                model_path, custom_objects=custom_objects)
+    except Exception:
+        exc_str = 'Could not open model "{}":\n{}'
+        formatted_trace = traceback.format_exc()
+        exc_formatted_str = exc_str.format(model_path, formatted_trace)
+        raise BirdVoxDetectError(exc_formatted_str)
+
+
+def get_chunk_settings(detector_name):
+    has_context = (len(detector_name) > 6) and (detector_name[-6:-4] == "-T")
+    if has_context:
+        percentiles = [0.1, 1, 10, 25, 50, 75, 90, 99, 99.9]
+        queue_length = 4
+        chunk_duration = int(detector_name[-4:]) / queue_length
+    else:
+        percentiles = None
+        chunk_duration = 450
+        queue_length = 1
+    return {
+        "has_context": has_context,
+        "percentiles": percentiles,
+        "queue_length": queue_length,
+        "chunk_duration": chunk_duration}
+
+
+def get_chunk_padding():
+    # Define padding. Set to one second, i.e. 750 hops @ 24 kHz.
+    # Any value above clip duration (150 ms) would work.
+    pcen_settings = get_pcen_settings()
+    return pcen_settings["hop_length"] *\
+        int(pcen_settings["sr"] / pcen_settings["hop_length"])
+
+
+def get_frame_rate():
+    pcen_settings = get_pcen_settings()
+    return pcen_settings["sr"] /\
+        (pcen_settings["hop_length"] * pcen_settings["stride_length"])
+
+
 def compute_pcen(audio, sr):
     # Load settings.
     pcen_settings = get_pcen_settings()
@@ -6,27 +6,22 @@ created by the BirdVox project (https://wp.nyu.edu/birdvox/).
 """
 
 
-import csv
-import os.path
-import tempfile
-import wave
+import collections
+import logging
 
 import numpy as np
+import scipy.signal
 import tensorflow as tf
 
 from vesper.util.settings import Settings
 import vesper.util.open_mp_utils as open_mp_utils
-import vesper.util.os_utils as os_utils
 import vesper.util.signal_utils as signal_utils
 
 
-# Uncomment this to use the BirdVoxDetect of the `birdvoxdetect` package
-# of the current Conda environment.
-# import birdvoxdetect
-
-# Uncomment this to use the BirdVoxDetect that is included in the Vesper
-# Conda package.
-import vesper.birdvox.birdvoxdetect_0_1_a0.birdvoxdetect as birdvoxdetect
+# We use the BirdVoxDetect that is included in the Vesper Conda package,
+# since we use functions of its `core` module that are not part of the
+# public API of the `birdvoxdetect` package.
+import vesper.birdvox.birdvoxdetect_0_1_a0.birdvoxdetect.core as bvd_core
 
 
 _CLIP_DURATION = .6
@@ -40,12 +35,26 @@ class _Detector:
     An instance of this class wraps BirdVoxDetect as a Vesper detector.
     The instance operates on a single audio channel. It accepts a sequence
     of consecutive sample arrays of any sizes via its `detect` method,
-    concatenates them in a temporary audio file, and runs BirdVoxDetect
-    on the audio file when its `complete_detection` method is called.
-    After BirdVoxDetect finishes processing the file, `complete_detection`
-    invokes a listener's `process_clip` method for each of the resulting
-    clips. The `process_clip` method must accept two arguments, the start
+    and invokes a listener's `process_clip` method for each detected
+    clip. The `process_clip` method must accept two arguments, the start
     index and length of the detected clip.
+    
+    The detector processes its input in memory, one BirdVoxDetect chunk
+    at a time, in the same way that the `birdvoxdetect.process_file`
+    function processes an audio file. Each chunk is padded with audio
+    from the start of the next chunk, and the detector computes the
+    PCEN and the BirdVoxDetect model confidence of a chunk as soon as
+    it has received both the chunk and its padding, and it can tell
+    whether or not the chunk is the last one of its input (which
+    `process_file` processes differently from the others). It then
+    invokes the listener's `process_clip` method for the peaks of the
+    chunk's confidence that exceed the detection threshold. Since the
+    adaptive threshold of a chunk depends on PCEN statistics computed
+    over several consecutive chunks, the detector starts emitting clips
+    only after it has received the first several chunks of its input,
+    and thereafter emits clips for each chunk shortly after receiving
+    it. The detector thus neither writes its input to a temporary
+    audio file nor waits until its input is complete to emit clips.
     """
     
     
@@ -63,19 +72,49 @@ class _Detector:
         self._clip_length = signal_utils.seconds_to_frames(
             _CLIP_DURATION, self._input_sample_rate)
         
-        # Create and open temporary wave file. Do not delete
-        # automatically on close. We will close the file after we
-        # finish writing it, and then BirdVoxDetect will open it
-        # again for reading. We delete the file ourselves after
-        # BirdVoxDetect finishes processing it.
-        self._audio_file = tempfile.NamedTemporaryFile(
-            suffix='.wav', delete=False)
+        if self.settings.threshold_adaptation_enabled:
+            self._detector_name = \
+                'birdvoxdetect_pcen_cnn_adaptive-threshold-T1800'
+        else:
+            self._detector_name = 'birdvoxdetect_pcen_cnn'
+            
+        self._detector = bvd_core.load_detector(self._detector_name)
+        
+        chunk_settings = bvd_core.get_chunk_settings(self._detector_name)
+        self._has_context = chunk_settings['has_context']
+        self._percentiles = chunk_settings['percentiles']
+        self._queue_length = chunk_settings['queue_length']
+        self._chunk_duration = chunk_settings['chunk_duration']
+        
+        # As in `process_file`, chunk lengths and padding are in
+        # input samples.
+        self._chunk_length = \
+            int(self._chunk_duration * self._input_sample_rate)
+        self._chunk_padding = bvd_core.get_chunk_padding()
+        
+        self._frame_rate = bvd_core.get_frame_rate()
+        
+        # Input samples that have not yet been processed, starting
+        # at the start of chunk `self._chunk_num`. We keep the samples
+        # in a list of arrays rather than concatenating them on every
+        # `detect` call.
+        self._samples = []
+        self._sample_count = 0
+        
+        self._chunk_num = 0
+        
+        # PCENs of the most recent non-last chunks, from which we
+        # compute the PCEN statistics on which the adaptive threshold
+        # is based.
+        self._pcens = collections.deque()
+        
+        self._context = None
+        
+        # Numbers of chunks whose PCENs have been computed but whose
+        # confidences have not. These are the chunks at the start of
+        # the input, which must wait for the queue of PCENs to fill.
+        self._pending_chunk_nums = []
         
-        # Create wave file writer, through which we will write to the
-        # wave file.
-        self._audio_file_writer = WaveFileWriter(
-            self._audio_file, 1, self._input_sample_rate)
-           
 
     @property
     def settings(self):
@@ -93,87 +132,149 @@ class _Detector:
     
     
     def detect(self, samples):
-        # print('_Detector.detect {} {}'.format(samples.shape, samples.dtype))
-        self._audio_file_writer.write(samples)
- 
+        
+        # Convert samples to the values `process_file` would read from
+        # a 16-bit wave file.
+        samples = np.clip(np.round(samples), -32768, 32767) / 32768.
+        
+        self._samples.append(samples)
+        self._sample_count += len(samples)
+        
+        # Process chunks that we know are not last. Like `process_file`,
+        # we consider the last chunk to be everything after the end of
+        # the last complete chunk of the input that is followed by at
+        # least another complete chunk, so a chunk is not last if at
+        # least two complete chunks' worth of input start with it.
+        while self._sample_count >= 2 * self._chunk_length:
+            self._process_chunk()
             
-    def complete_detection(self):
+            
+    def _process_chunk(self):
         
-        """
-        Completes detection after the `detect` method has been called
-        for all input.
-        """
+        samples = np.concatenate(self._samples)
         
-        # print('_Detector.complete_detection')
+        chunk = samples[:self._chunk_length + self._chunk_padding]
+        pcen = bvd_core.compute_pcen(chunk, self._input_sample_rate)
         
-        # Close wave writer and wave file.
-        self._audio_file_writer.close()
-        self._audio_file.close()
+        # Discard chunk samples, retaining those of the following
+        # chunks, including the padding of this chunk.
+        samples = samples[self._chunk_length:]
+        self._samples = [samples]
+        self._sample_count = len(samples)
         
-        with tempfile.TemporaryDirectory() as output_dir_path:
+        chunk_num = self._chunk_num
+        self._chunk_num += 1
+        
+        if chunk_num < self._queue_length:
+            # queue of PCENs not yet full
             
-            # output_dir_path = '/Users/harold/Desktop/BirdVoxDetect Output'
+            self._pcens.append(pcen)
+            self._pending_chunk_nums.append(chunk_num)
             
-            audio_file_path = self._audio_file.name
+            if len(self._pcens) == self._queue_length:
+                self._update_context()
+                self._process_pending_chunks()
+                
+        else:
+            # queue of PCENs full
             
-            if self.settings.threshold_adaptation_enabled:
-                detector_name = \
-                    'birdvoxdetect_pcen_cnn_adaptive-threshold-T1800'
-            else:
-                detector_name = 'birdvoxdetect_pcen_cnn'
+            self._pcens.popleft()
+            self._pcens.append(pcen)
+            self._update_context()
+            self._process_pcen(pcen, chunk_num, self._chunk_padding)
             
-            birdvoxdetect.process_file(
-                audio_file_path,
-                detector_name=detector_name,
-                threshold=self.settings.threshold,
-                output_dir=output_dir_path)
- 
-            timestamp_file_path = self._get_timestamp_file_path(
-                output_dir_path, audio_file_path)
             
-            self._process_timestamps(timestamp_file_path)
-                
-        os_utils.delete_file(audio_file_path)
+    def _update_context(self):
+        if self._has_context:
+            pcens = np.concatenate(self._pcens, axis=1)
+            self._context = np.percentile(
+                pcens, self._percentiles, axis=1, overwrite_input=True)
+            
+            
+    def _process_pending_chunks(self):
         
-        self._listener.complete_processing()
+        for i, chunk_num in enumerate(self._pending_chunk_nums):
+            
+            # The pending chunks are at the start of the queue.
+            pcen = self._pcens[i]
+            
+            self._process_pcen(pcen, chunk_num, self._chunk_padding)
+            
+        self._pending_chunk_nums = []
         
         
-    def _get_timestamp_file_path(self, output_dir_path, audio_file_path):
+    def _process_pcen(self, pcen, chunk_num, padding):
         
-        audio_file_name_base = \
-            os.path.splitext(os.path.basename(audio_file_path))[0]
+        if self._has_context:
+            confidence = bvd_core.predict_with_context(
+                pcen, self._context, self._detector, logging.WARN,
+                padding=padding)
+        else:
+            confidence = bvd_core.predict(
+                pcen, self._detector, logging.WARN, padding=padding)
             
-        timestamp_file_name = '{}_{}.csv'.format(
-            audio_file_name_base, 'timestamps')
+        confidence = np.squeeze(confidence)
+        confidence = bvd_core.map_confidence(confidence, self._detector_name)
         
-        return os.path.join(output_dir_path, timestamp_file_name)
-    
-    
-    def _process_timestamps(self, timestamp_file_path):
+        # Find peaks that exceed threshold.
+        peak_indices, _ = scipy.signal.find_peaks(confidence)
+        peak_values = confidence[peak_indices]
+        peak_indices = peak_indices[peak_values > self.settings.threshold]
         
-        with open(timestamp_file_path) as timestamp_file:
-                
-            reader = csv.reader(timestamp_file)
+        chunk_start_time = self._chunk_duration * chunk_num
+        
+        for i in peak_indices:
             
-            # Skip header
-            next(reader)
+            peak_time = chunk_start_time + i / self._frame_rate
             
-            for row in reader:
-                
-                peak_time = float(row[1])
-                
-                # Get clip start index from peak time.
-                peak_index = signal_utils.seconds_to_frames(
-                    peak_time, self._input_sample_rate)
-                start_index = peak_index - self._clip_length // 2
-                
-                score = float(row[2])
-                annotations = {'Detector Score': score}
-                
-                # print('processing clip', peak_time, start_index, score)
-                
-                self._listener.process_clip(
-                    start_index, self._clip_length, annotations=annotations)
+            # Get clip start index from peak time.
+            peak_index = signal_utils.seconds_to_frames(
+                peak_time, self._input_sample_rate)
+            start_index = peak_index - self._clip_length // 2
+            
+            annotations = {'Detector Score': float(confidence[i])}
+            
+            self._listener.process_clip(
+                start_index, self._clip_length, annotations=annotations)
+ 
+            
+    def complete_detection(self):
+        
+        """
+        Completes detection after the `detect` method has been called
+        for all input.
+        """
+        
+        if self._sample_count == 0:
+            # no input
+            
+            # Since `detect` always leaves at least a chunk's worth of
+            # input unprocessed, this can happen only if there was no
+            # input at all.
+            self._listener.complete_processing()
+            return
+        
+        samples = np.concatenate(self._samples)
+        self._samples = []
+        self._sample_count = 0
+            
+        # Like `process_file`, if the queue of PCENs never filled,
+        # compute the context from the PCENs in the queue.
+        if len(self._pending_chunk_nums) != 0:
+            self._update_context()
+            self._process_pending_chunks()
+        
+        pcen = bvd_core.compute_pcen(samples, self._input_sample_rate)
+        
+        if self._has_context and self._chunk_num == 0:
+            # last chunk is only chunk
+            
+            self._context = np.percentile(
+                pcen, self._percentiles, axis=1, overwrite_input=True)
+            
+        self._process_pcen(pcen, self._chunk_num, 0)
+        
+        self._listener.complete_processing()
 
 
 def _create_at_settings(threshold):
@@ -277,29 +378,3 @@ class DetectorAT70(_Detector):
     def __init__(self, sample_rate, listener):
         settings = _create_at_settings(70)
         super().__init__(settings, sample_rate, listener)
-
-
-class WaveFileWriter:
-    
-    """Writes a .wav file one sample array at a time."""
-    
-    
-    def __init__(self, file_, num_channels, sample_rate):
-        self._writer = wave.open(file_, 'wb')
-        self._writer.setparams((num_channels, 2, sample_rate, 0, 'NONE', None))
-        
-        
-    def write(self, samples):
-        
-        # Convert samples to wave file dtype if needed.
-        if samples.dtype != np.dtype('<i2'):
-            samples = np.array(np.round(samples), dtype='<i2')
-            
-        # Convert samples to bytes.
-        data = samples.transpose().tobytes()
-        
-        self._writer.writeframes(data)
-                
-        
-    def close(self):
-        self._writer.close()
@@ -1,8 +1,18 @@
 """Module containing class `Annotator`."""
 
 
+from collections import deque
+
 from vesper.django.app.models import StringAnnotation
 import vesper.django.app.model_utils as model_utils
+import vesper.django.app.write_behind_service as write_behind_service
+
+
+_MAX_PENDING_ANNOTATION_COUNT = 1000
+"""
+Maximum number of annotations that an annotator submits to the
+write-behind service without waiting for them to complete.
+"""
 
 
 class Annotator:
@@ -19,6 +29,9 @@ class Annotator:
         self._creating_job = creating_job
         self._creating_processor = creating_processor
         
+        self._write_behind = write_behind_service.is_enabled()
+        self._pending_annotations = deque()
+        
         
     def begin_annotations(self):
         pass
@@ -29,16 +42,55 @@ class Annotator:
     
     
     def end_annotations(self):
-        pass
+        
+        """
+        Ends annotation, waiting for all annotations to complete.
+        
+        Subclasses that override this method must invoke it.
+        """
+        
+        self._wait_for_annotations(0)
     
     
     def _annotate(self, clip, annotation_value):
         
-        model_utils.annotate_clip(
-            clip, self._annotation_info, annotation_value,
-            creating_user=self._creating_user,
-            creating_job=self._creating_job,
-            creating_processor=self._creating_processor)
+        if self._write_behind:
+            # write-behind service enabled
+            
+            # Submit annotation without waiting for it to complete, so
+            # that it can share a transaction with later annotations.
+            operation = write_behind_service.AnnotateClip(
+                clip.id, self._annotation_info.name, annotation_value,
+                creating_user_id=_get_id(self._creating_user),
+                creating_job_id=_get_id(self._creating_job),
+                creating_processor_id=_get_id(self._creating_processor))
+            
+            self._pending_annotations.append(
+                write_behind_service.submit(operation))
+            
+            self._wait_for_annotations(_MAX_PENDING_ANNOTATION_COUNT)
+            
+        else:
+            
+            model_utils.annotate_clip(
+                clip, self._annotation_info, annotation_value,
+                creating_user=self._creating_user,
+                creating_job=self._creating_job,
+                creating_processor=self._creating_processor)
+
+
+    def _wait_for_annotations(self, max_pending_count):
+        
+        """
+        Waits for submitted annotations to complete until no more than
+        the specified number are pending, raising the exception of any
+        that failed.
+        """
+        
+        pending = self._pending_annotations
+        
+        while len(pending) > max_pending_count:
+            pending.popleft().result()
 
 
     def _get_annotation_value(self, clip):
@@ -49,4 +101,8 @@ class Annotator:
             return None
         else:
             return annotation.value
-    
\ No newline at end of file
+    
+
+
+def _get_id(obj):
+    return None if obj is None else obj.id
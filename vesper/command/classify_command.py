@@ -8,6 +8,7 @@ from vesper.command.command import Command
 from vesper.django.app.models import AnnotationInfo, Job, Processor
 from vesper.singletons import extension_manager
 import vesper.command.command_utils as command_utils
+import vesper.command.job_telemetry as job_telemetry
 import vesper.django.app.model_utils as model_utils
 import vesper.util.text_utils as text_utils
 
@@ -179,18 +180,30 @@ def _classify_clips(clips, classifier):
 
 
 def _classify_clip_batches(clips, classifier):
-    return classifier.annotate_clips(clips)
+    
+    telemetry = job_telemetry.get_reporter()
+    
+    with telemetry.stage('classification'):
+        num_classified_clips = classifier.annotate_clips(clips)
+        
+    telemetry.add_done(len(clips))
+    
+    return num_classified_clips
 
 
 def _classify_clips_individually(clips, classifier):
     
+    telemetry = job_telemetry.get_reporter()
+    
     num_visited_clips = 0
     num_classified_clips = 0
     
     for clip in clips:
         
         try:
-            if classifier.annotate(clip):
+            with telemetry.stage('classification'):
+                classified = classifier.annotate(clip)
+            if classified:
                 num_classified_clips += 1
                         
         except Exception as e:
@@ -199,6 +212,7 @@ def _classify_clips_individually(clips, classifier):
                 f'Error message was: {str(e)}')
         
         num_visited_clips += 1
+        telemetry.add_done()
         
         if num_visited_clips % _LOGGING_PERIOD == 0:
             _logger.info(f'Visited {num_visited_clips} clips...')
@@ -1,6 +1,7 @@
 import logging
 
 from vesper.command.command import CommandSyntaxError
+import vesper.util.text_utils as text_utils
 
 
 # TODO: Add type checking to functions that get arguments.
@@ -42,6 +43,36 @@ def get_timing_text(elapsed_time, item_count, items_name):
 _logger = logging.getLogger()
 
 
+def wait_for_clip_audio_file_deletions(deleter, logging_period=10):
+    
+    """
+    Waits for the clip audio file deletions of a `BulkDeleter` to
+    complete, logging their progress periodically.
+    """
+    
+    if deleter.wait_for_audio_file_deletions(0):
+        return
+    
+    _logger.info('Waiting for clip audio file deletions to complete...')
+    
+    while not deleter.wait_for_audio_file_deletions(logging_period):
+        stats = deleter.get_audio_file_deletion_stats()
+        _logger.info(
+            f'Deleted {stats.deleted_count} of {stats.queued_count} clip '
+            f'audio files, {stats.rate:.1f} files per second...')
+        
+    stats = deleter.get_audio_file_deletion_stats()
+    
+    failures_text = ''
+    if stats.failure_count != 0:
+        failures_text = ' with ' + text_utils.create_count_text(
+            stats.failure_count, 'failure')
+        
+    _logger.info(
+        f'Deleted {stats.deleted_count} clip audio files{failures_text}, '
+        f'{stats.rate:.1f} files per second.')
+
+
 def log_and_reraise_fatal_exception(exception, action_text, result_text=None):
     
     error = _logger.error
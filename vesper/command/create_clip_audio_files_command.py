@@ -1,11 +1,14 @@
 """Module containing class `CreateClipAudioFilesCommand`."""
 
 
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import time
 
 from vesper.command.clip_set_command import ClipSetCommand
-from vesper.singletons import clip_manager
+from vesper.signal.wave_audio_file import WaveAudioFileReader
+from vesper.singletons import clip_manager, recording_manager
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
 import vesper.util.text_utils as text_utils
@@ -14,6 +17,22 @@ import vesper.util.text_utils as text_utils
 _logger = logging.getLogger()
 
 
+_READ_BLOCK_SIZE = 2 ** 23
+"""
+Approximate size in sample frames of the blocks in which recording
+files are read when creating clip audio files by recording file.
+"""
+
+_WRITE_THREAD_COUNT = 4
+"""Number of threads that write clip audio files."""
+
+_MAX_PENDING_WRITE_COUNT = 1000
+"""
+Maximum number of clip audio file writes that can be pending at once.
+This limits the memory occupied by samples waiting to be written.
+"""
+
+
 class CreateClipAudioFilesCommand(ClipSetCommand):
     
     
@@ -21,13 +40,32 @@ class CreateClipAudioFilesCommand(ClipSetCommand):
     
     
     def __init__(self, args):
+        
         super().__init__(args, True)
         
+        # Whether or not to create clip audio files by recording file,
+        # reading each recording file sequentially in large blocks and
+        # writing clip audio files on multiple threads. Otherwise we
+        # create audio files one clip at a time.
+        self._by_recording_file = command_utils.get_optional_arg(
+            'by_recording_file', args, True)
+        
         
     def execute(self, job_info):
+        
         self._job_info = job_info
         self._clip_manager = clip_manager.instance
-        self._create_clip_audio_files()
+        self._recording_manager = recording_manager.instance
+        
+        if self._by_recording_file:
+            with ThreadPoolExecutor(_WRITE_THREAD_COUNT) as executor:
+                self._executor = executor
+                self._create_clip_audio_files()
+        
+        else:
+            self._executor = None
+            self._create_clip_audio_files()
+            
         return True
     
     
@@ -52,12 +90,18 @@ class CreateClipAudioFilesCommand(ClipSetCommand):
                 tag_name=self._tag_name,
                 order=False)
             
-            num_clips = len(clips)
-            num_created_files = 0
-            
-            for clip in clips:
-                if self._create_clip_audio_file_if_needed(clip):
-                    num_created_files += 1
+            if self._by_recording_file:
+                num_clips, num_created_files = \
+                    self._create_clip_audio_files_by_recording_file(clips)
+                
+            else:
+                
+                num_clips = len(clips)
+                num_created_files = 0
+                
+                for clip in clips:
+                    if self._create_clip_audio_file_if_needed(clip):
+                        num_created_files += 1
                 
             # Log file creations for this detector/station/mic_output/date.
             count_text = text_utils.create_count_text(num_clips, 'clip')
@@ -92,3 +136,195 @@ class CreateClipAudioFilesCommand(ClipSetCommand):
         except Exception as e:
             command_utils.log_and_reraise_fatal_exception(
                 e, f'Creation of audio file for clip "{str(clip)}"')
+
+
+    def _create_clip_audio_files_by_recording_file(self, clips):
+        
+        """
+        Creates audio files for the specified clips, reading each of
+        their recording files once, sequentially.
+        
+        :Returns:
+            the number of clips and the number of created files.
+        """
+        
+        clips = list(clips.select_related('recording_channel__recording'))
+        
+        try:
+            needy_clips = [
+                c for c in clips if not self._clip_manager.has_audio_file(c)]
+        except Exception as e:
+            command_utils.log_and_reraise_fatal_exception(
+                e, 'Check for existing clip audio files')
+        
+        # Group clips by recording.
+        recording_clips = defaultdict(list)
+        for clip in needy_clips:
+            recording_clips[clip.recording].append(clip)
+            
+        pending_writes = deque()
+        
+        for recording, clips_ in recording_clips.items():
+            
+            file_clips, other_clips = _get_file_clips(recording, clips_)
+            
+            for file_, clips_ in file_clips:
+                self._create_clip_audio_files_for_recording_file(
+                    file_, clips_, pending_writes)
+                
+            # Create audio files for clips that we could not assign to a
+            # single recording file one at a time. This will raise an
+            # exception for any clip that has no start index, is not in
+            # a recording file, or crosses a recording file boundary.
+            for clip in other_clips:
+                self._create_clip_audio_file(clip, None, pending_writes)
+                
+        _wait_for_writes(pending_writes, 0)
+        
+        return len(clips), len(needy_clips)
+    
+    
+    def _create_clip_audio_files_for_recording_file(
+            self, file_, clips, pending_writes):
+        
+        try:
+            path = self._recording_manager.get_absolute_recording_file_path(
+                file_.path)
+            reader = WaveAudioFileReader(str(path))
+        except Exception as e:
+            command_utils.log_and_reraise_fatal_exception(
+                e, f'Open of recording file "{file_.path}"')
+            
+        try:
+            
+            for block_start, block_end, block_clips in \
+                    _generate_read_blocks(file_, clips):
+                
+                try:
+                    samples = reader.read(
+                        block_start, block_end - block_start)
+                except Exception as e:
+                    command_utils.log_and_reraise_fatal_exception(
+                        e, f'Read from recording file "{file_.path}"')
+                
+                for clip in block_clips:
+                    start = clip.start_index - file_.start_index - block_start
+                    end = start + clip.length
+                    clip_samples = samples[clip.channel_num, start:end].copy()
+                    self._create_clip_audio_file(
+                        clip, clip_samples, pending_writes)
+                    
+        finally:
+            reader.close()
+    
+    
+    def _create_clip_audio_file(self, clip, samples, pending_writes):
+        
+        future = self._executor.submit(
+            self._clip_manager.create_audio_file, clip, samples)
+        
+        pending_writes.append((clip, future))
+        
+        _wait_for_writes(pending_writes, _MAX_PENDING_WRITE_COUNT)
+        
+        
+def _get_file_clips(recording, clips):
+    
+    """
+    Assigns clips to the recording files that contain them.
+    
+    :Returns:
+        a list of (recording file, clips) pairs, with the clips of each
+        pair sorted by start index, and a list of the clips that do not
+        lie entirely within one recording file.
+    """
+    
+    files = sorted(recording.files.all(), key=lambda f: f.start_index)
+    
+    file_clips = defaultdict(list)
+    other_clips = []
+    
+    for clip in clips:
+        
+        file_ = None
+        
+        if clip.start_index is not None:
+            
+            for f in files:
+                if clip.start_index >= f.start_index and \
+                        clip.end_index <= f.end_index:
+                    file_ = f
+                    break
+                
+        if file_ is None or file_.path is None:
+            other_clips.append(clip)
+        else:
+            file_clips[file_].append(clip)
+            
+    result = []
+    
+    for file_ in files:
+        clips = file_clips.get(file_)
+        if clips is not None:
+            clips.sort(key=lambda c: c.start_index)
+            result.append((file_, clips))
+        
+    return result, other_clips
+    
+    
+def _generate_read_blocks(file_, clips):
+    
+    """
+    Generates blocks of a recording file to read to get the samples of
+    the specified clips.
+    
+    Each block is a (start index, end index, clips) triple, with indices
+    relative to the start of the file. A block starts at the start of
+    its first clip and extends through the end of its last one. Blocks
+    are about `_READ_BLOCK_SIZE` sample frames long, except that a block
+    may be longer to accommodate one long clip.
+    """
+    
+    block_clips = []
+    block_start = None
+    block_end = None
+    
+    for clip in clips:
+        
+        start = clip.start_index - file_.start_index
+        end = start + clip.length
+        
+        if block_start is not None and end - block_start > _READ_BLOCK_SIZE:
+            # clip would make current block too long
+            
+            yield block_start, block_end, block_clips
+            block_clips = []
+            block_start = None
+            
+        if block_start is None:
+            block_start = start
+            block_end = end
+            
+        block_clips.append(clip)
+        block_end = max(block_end, end)
+        
+    if len(block_clips) != 0:
+        yield block_start, block_end, block_clips
+        
+        
+def _wait_for_writes(pending_writes, max_pending_count):
+    
+    """
+    Waits for pending clip audio file writes to complete until no more
+    than the specified number remain, re-raising any write exception.
+    """
+    
+    while len(pending_writes) > max_pending_count:
+        
+        clip, future = pending_writes.popleft()
+        
+        try:
+            future.result()
+        except Exception as e:
+            command_utils.log_and_reraise_fatal_exception(
+                e, f'Creation of audio file for clip "{str(clip)}"')
@@ -5,14 +5,10 @@ import logging
 import random
 import time
 
-from django.db import transaction
-
 from vesper.command.clip_set_command import ClipSetCommand
-from vesper.django.app.models import Clip
-from vesper.singletons import clip_manager
+from vesper.django.app.bulk_deleter import BulkDeleter
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
-import vesper.util.archive_lock as archive_lock
 import vesper.util.text_utils as text_utils
 
 
@@ -36,8 +32,16 @@ class DeleteClipsCommand(ClipSetCommand):
     def execute(self, job_info):
         self._job_info = job_info
         retain_indices = self._get_retain_clip_indices()
-        self._clip_manager = clip_manager.instance
-        self._delete_clips(retain_indices)
+        
+        deleter = BulkDeleter()
+        
+        try:
+            self._delete_clips(deleter, retain_indices)
+            command_utils.wait_for_clip_audio_file_deletions(deleter)
+            
+        finally:
+            deleter.close()
+            
         return True
     
     
@@ -87,7 +91,7 @@ class DeleteClipsCommand(ClipSetCommand):
         return count
             
 
-    def _delete_clips(self, retain_indices):
+    def _delete_clips(self, deleter, retain_indices):
         
         start_time = time.time()
         
@@ -116,12 +120,13 @@ class DeleteClipsCommand(ClipSetCommand):
             
             count = 0
             retained_count = 0
-            clips_to_delete = []
+            clip_ids = []
             
-            for clip in clips:
+            # We get only clip IDs here, not entire clips.
+            for clip_id in clips.values_list('id', flat=True):
                 
                 if index not in retain_indices:
-                    clips_to_delete.append(clip)
+                    clip_ids.append(clip_id)
                 else:
                     retained_count += 1
                     
@@ -131,7 +136,7 @@ class DeleteClipsCommand(ClipSetCommand):
                 
             # Delete clips.
             try:
-                self._delete_clip_batch(clips_to_delete)
+                deleter.delete_clips(clip_ids)
             except Exception as e:
                 batch_text = \
                     _get_batch_text(station, mic_output, date, detector)
@@ -167,43 +172,6 @@ class DeleteClipsCommand(ClipSetCommand):
         _logger.info(f'{prefix} a total of {count_text}{timing_text}.')
 
 
-    def _delete_clip_batch(self, clips):
-        
-        with archive_lock.atomic():
-             
-            with transaction.atomic():
-            
-                # Delete clips in chunks to limit the number of clip IDs
-                # we pass to `Clip.objects.filter`.
-                
-                # Setting this too large can result in a
-                # django.db.utils.OperationalError exception with the
-                # message "too many SQL variables". We have seen this
-                # happen with a maximum chunk size of 1000 on Windows,
-                # though not on macOS. The web page
-                # https://stackoverflow.com/questions/7106016/
-                # too-many-sql-variables-error-in-django-witih-sqlite3
-                # suggests that the maximum chunk size that will work
-                # on Windows is somewhere between 900 and 1000, and
-                # 900 seems to work.
-                max_chunk_size = 900
-                
-                for i in range(0, len(clips), max_chunk_size):
-                    
-                    chunk = clips[i:i + max_chunk_size]
-                    
-                    # Delete clips from archive database.
-                    ids = [clip.id for clip in chunk]
-                    Clip.objects.filter(id__in=ids).delete()
-                    
-        # Delete clip audio files. We do this after the transaction so
-        # that if the transaction fails, leaving the clips in the
-        # database and raising an exception, we don't delete any clip
-        # files.
-        for clip in clips:
-            self._clip_manager.delete_audio_file(clip)
-
-
 def _get_batch_text(station, mic_output, date, detector):
     return (
         f'station "{station.name}", mic output "{mic_output.name}", '
@@ -3,14 +3,13 @@
 
 import itertools
 import logging
-
-from django.db import transaction
+import time
 
 from vesper.command.command import Command, CommandExecutionError
-from vesper.django.app.models import Clip, Recording, Station
-from vesper.singletons import clip_manager
+from vesper.django.app.bulk_deleter import BulkDeleter
+from vesper.django.app.models import Recording, Station
 import vesper.command.command_utils as command_utils
-import vesper.util.archive_lock as archive_lock
+import vesper.util.text_utils as text_utils
 
 
 class DeleteRecordingsCommand(Command):
@@ -31,10 +30,17 @@ class DeleteRecordingsCommand(Command):
         
         self._job_info = job_info
         self._logger = logging.getLogger()
-        self._clip_manager = clip_manager.instance
 
-        recordings = self._get_recordings()  
-        self._delete_recordings(recordings)
+        recordings = self._get_recordings()
+        
+        deleter = BulkDeleter()
+        
+        try:
+            self._delete_recordings(deleter, recordings)
+            command_utils.wait_for_clip_audio_file_deletions(deleter)
+            
+        finally:
+            deleter.close()
             
         return True
     
@@ -82,12 +88,16 @@ class DeleteRecordingsCommand(Command):
             start_time__range=time_interval)
 
 
-    def _delete_recordings(self, recordings):
+    def _delete_recordings(self, deleter, recordings):
+        
+        start_time = time.time()
+        total_clip_count = 0
         
         for recording in recordings:
             
             try:
-                self._delete_recording(recording)
+                total_clip_count += \
+                    self._delete_recording(deleter, recording)
                 
             except Exception as e:
                 self._logger.error((
@@ -96,26 +106,29 @@ class DeleteRecordingsCommand(Command):
                     '    {}\n'
                     'The recording and associated clips and annotations '
                     'were not modified.\n'
-                    'See below for exception traceback.').format(str(e)))
+                    'See below for exception traceback.').format(
+                        str(recording), str(e)))
                 raise
+            
+        recordings_text = text_utils.create_count_text(
+            len(recordings), 'recording')
+        clips_text = text_utils.create_count_text(total_clip_count, 'clip')
+        elapsed_time = time.time() - start_time
+        timing_text = command_utils.get_timing_text(
+            elapsed_time, total_clip_count, 'clips')
+        self._logger.info(
+            f'Deleted {recordings_text} and {clips_text}{timing_text}.')
 
 
-    def _delete_recording(self, recording):
+    def _delete_recording(self, deleter, recording):
         
         self._logger.info('Deleting recording "{}"...'.format(str(recording)))
         
-        with archive_lock.atomic():
-            
-            with transaction.atomic():
-            
-                # TODO: Consider moving file deletions outside of database
-                # transaction.
-                
-                clips = Clip.objects.filter(
-                    recording_channel__recording=recording)
-                
-                # Delete clip files.
-                for clip in clips:
-                    self._clip_manager.delete_audio_file(clip)
-                
-                recording.delete()
+        # Clip audio files are deleted in the background after the
+        # database transaction that deletes their clips commits.
+        clip_count = deleter.delete_recordings([recording.id])
+        
+        clips_text = text_utils.create_count_text(clip_count, 'clip')
+        self._logger.info(f'Deleted recording and {clips_text}.')
+        
+        return clip_count
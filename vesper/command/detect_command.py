@@ -3,26 +3,34 @@
 
 from collections import defaultdict
 import datetime
+import hashlib
 import itertools
+import json
 import logging
-import pickle
 import random
 import time
 
 from django.db import transaction
+import numpy as np
 
 from vesper.archive_paths import archive_paths
 from vesper.command.command import Command, CommandExecutionError
 from vesper.django.app.models import (
-    AnnotationInfo, Clip, Job, Recording, RecordingChannel, Station)
+    AnnotationInfo, Clip, DetectionWorkUnit, Job, Recording,
+    RecordingChannel, Station)
 from vesper.old_bird.old_bird_detector_runner import OldBirdDetectorRunner
 from vesper.signal.wave_audio_file import WaveAudioFileReader
 from vesper.singletons import (
-    archive, clip_manager, extension_manager, preset_manager)
+    archive, clip_manager, clip_spectrogram_manager, extension_manager,
+    preference_manager, preset_manager)
+from vesper.util.deferred_clip_file import DeferredClipFileWriter
 from vesper.util.schedule import Interval, Schedule
 import vesper.command.command_utils as command_utils
+import vesper.command.job_telemetry as job_telemetry
+import vesper.command.score_track_utils as score_track_utils
 import vesper.django.app.model_utils as model_utils
 import vesper.util.archive_lock as archive_lock
+import vesper.util.deferred_clip_file as deferred_clip_file
 import vesper.util.os_utils as os_utils
 import vesper.util.signal_utils as signal_utils
 import vesper.util.text_utils as text_utils
@@ -74,6 +82,43 @@ which is important for concurrency support, and fast detection.
 """
 
 
+_CHECKPOINT_PERIOD = 60
+"""
+Detection checkpoint period in seconds.
+
+While running detectors on a recording file interval, the command
+commits the clips detected so far and records its progress in the
+detection work units of the detectors about this often. If the command
+is interrupted, a rerun resumes from near the last checkpoint.
+"""
+
+
+_RESUME_OVERLAP_DURATION = 120
+"""
+Minimum duration in seconds of the portion of a detection interval
+preceding the last checkpoint of an interrupted detector run that is
+reprocessed when the run is resumed.
+
+Detectors emit some clips only after processing input that follows
+them, and need some input to settle after they start. Resuming before
+the last checkpoint gives detectors time to settle and redetects clips
+that had not yet been emitted at the checkpoint. Redetected clips that
+overlap clips that are already in the archive are skipped.
+"""
+
+
+_RESUME_ALIGNMENT_DURATION = 3600
+"""
+Alignment in seconds of resumed detection start indices, relative to
+the detection interval start.
+
+Some detectors, for example the MPG Ranch NFC detectors, process their
+input in fixed-size chunks that begin at the start of the detection
+interval. Aligning resumed detection with those chunks ensures that
+such detectors process the same chunks as an uninterrupted run.
+"""
+
+
 _PROCESS_RANDOM_STATION_NIGHTS = False
 """
 `True` if command should run detectors on only a random subset of the
@@ -96,7 +141,7 @@ End index of shuffled station-nights for which to run detectors, when
 """
 
 
-_DEFERRED_DATABASE_WRITE_FILE_NAME_FORMAT = 'Job {} Part {:03d}.pkl'
+_DEFERRED_DATABASE_WRITE_FILE_NAME_FORMAT = 'Job {} Part {:03d}{}'
 
 
 # TODO: Remove command argument and code for creating clip files if we
@@ -123,6 +168,10 @@ class DetectCommand(Command):
         self._schedule_name = get('schedule', args)
         self._defer_clip_creation = get('defer_clip_creation', args)
         self._create_clip_files = False  # get('create_clip_files', args)
+        self._store_score_tracks = command_utils.get_optional_arg(
+            'store_score_tracks', args, False)
+        self._skip_completed_work = command_utils.get_optional_arg(
+            'skip_completed_work', args, True)
         
         self._schedule = _get_schedule(self._schedule_name)
         self._station_schedules = {}
@@ -135,14 +184,22 @@ class DetectCommand(Command):
     def execute(self, job_info):
         
         self._job_info = job_info
+        self._job = Job.objects.get(id=job_info.job_id)
         self._logger = logging.getLogger()
+        self._telemetry = job_telemetry.get_reporter()
 
         detectors = self._get_detectors()
         old_bird_detectors, other_detectors = _partition_detectors(detectors)
         
+        if self._store_score_tracks:
+            self._log_score_track_support(other_detectors)
+        
         recording_lists = self._get_recording_lists()
         station_nights = sorted(recording_lists.keys())
         
+        if len(other_detectors) != 0:
+            self._set_telemetry_total(recording_lists.values())
+        
         for i, station_night in enumerate(station_nights):
             
             self._log_station_night(station_night, i, len(station_nights))
@@ -151,9 +208,91 @@ class DetectCommand(Command):
             self._run_old_bird_detectors(old_bird_detectors, recordings)
             self._run_other_detectors(other_detectors, recordings)
             
+        self._warm_clip_spectrogram_cache()
+        
         return True
     
     
+    def _warm_clip_spectrogram_cache(self):
+        
+        """
+        Computes and caches spectrograms of the clips created by this
+        command for the default clip album settings preset, so that
+        clip albums of the clips display quickly.
+        """
+        
+        if self._defer_clip_creation or not _RUN_DETECTORS or \
+                not _CREATE_CLIPS:
+            return
+        
+        preset_path = preference_manager.instance.preferences.get(
+            'default_presets.Clip Album Settings')
+        
+        if preset_path is None:
+            return
+        
+        preset = preset_manager.instance.get_preset(
+            'Clip Album Settings', tuple(preset_path.split('/')))
+        
+        if preset is None:
+            return
+        
+        # Order clips by recording channel and start index so that
+        # their samples are read from recording files sequentially.
+        clips = Clip.objects.filter(
+            creating_job_id=self._job_info.job_id
+        ).select_related(
+            'recording_channel__recording'
+        ).order_by(
+            'recording_channel_id', 'start_index')
+        
+        start_time = time.time()
+        
+        try:
+            count = clip_spectrogram_manager.instance.warm_cache(
+                clips.iterator(), preset.data)
+            
+        except Exception as e:
+            self._logger.warning(
+                f'Computation of clip spectrograms for clip spectrogram '
+                f'cache failed with message: {str(e)}. The clips were '
+                f'still created.')
+            
+        else:
+            
+            if count != 0:
+                
+                duration = text_utils.format_number(time.time() - start_time)
+                clips_text = text_utils.create_count_text(count, 'clip')
+                
+                self._logger.info(
+                    f'Cached spectrograms of {clips_text} for clip album '
+                    f'settings preset "{preset_path}" in {duration} '
+                    f'seconds.')
+            
+            
+    def _set_telemetry_total(self, recording_lists):
+        
+        """
+        Sets the total units of work of this command's telemetry to
+        the duration in seconds of the audio on which the command will
+        run detectors other than the Old Bird detectors.
+        """
+        
+        duration = sum(
+            self._get_detection_duration(recording)
+            for recordings in recording_lists
+            for recording in recordings)
+        
+        self._telemetry.set_total(duration, 'audio second')
+        
+        
+    def _get_detection_duration(self, recording):
+        return sum(
+            (i.end - i.start).total_seconds()
+            for i in self._get_detection_intervals(recording))
+    
+    
     def _get_detectors(self):
         
         try:
@@ -172,6 +311,18 @@ class DetectCommand(Command):
             raise
             
             
+    def _log_score_track_support(self, detector_models):
+        
+        for detector_model in detector_models:
+            
+            cls = _get_detector_class(detector_model.name)
+            
+            if not score_track_utils.supports_score_tracks(cls):
+                self._logger.info(
+                    f'Detector "{detector_model.name}" does not support '
+                    f'score tracks, so none will be stored for it.')
+            
+            
     def _get_recording_lists(self):
         
         try:
@@ -336,6 +487,14 @@ class DetectCommand(Command):
                 '    Processing recording {} of {} - "{}"...'.format(
                     i + 1, num_recordings, str(recording)))
             
+            # Telemetry units done after this recording is processed.
+            # Detection reports units done as it processes audio, but
+            # some of a recording's audio may not be processed, for
+            # example if it was processed by an earlier job or a file
+            # is missing, so we account for the rest below.
+            units_done = self._telemetry.units_done + \
+                self._get_detection_duration(recording)
+            
             recording_files = recording.files.all()
             
             if len(recording_files) == 0:
@@ -351,6 +510,10 @@ class DetectCommand(Command):
                     self._run_other_detectors_on_file(
                         detector_models, file_, recording_intervals)
                     
+            remaining_units = units_done - self._telemetry.units_done
+            if remaining_units > 0:
+                self._telemetry.add_done(remaining_units)
+                    
                     
     def _get_detection_intervals(self, recording):
                     
@@ -449,27 +612,80 @@ class DetectCommand(Command):
                 
         start_time = time.time()
         
+        detector_count = len(detector_models)
+        interval_duration = \
+            (time_interval.end - time_interval.start).total_seconds()
+        
         if _RUN_DETECTORS:
             
             # Convert time interval to index interval.
             index_interval = _get_index_interval(
                 time_interval, file_.start_time, file_.sample_rate)
-                 
+            
+            # Get detection work units, omitting detectors that have
+            # already processed this interval.
+            work_units = self._get_work_units(
+                detector_models, file_, index_interval)
+            detector_models, work_units = \
+                self._get_incomplete_work(detector_models, work_units)
+            
+            if len(detector_models) == 0:
+                return
+            
+            start_index = self._get_resume_index(
+                work_units, index_interval, file_.sample_rate)
+            
             # Create detectors.
             detectors = self._create_detectors(
                 detector_models, file_.recording, file_reader,
-                file_.start_index, index_interval.start)
-                  
+                file_.start_index, start_index, index_interval.end)
+            
             # Detect.
+            detection_interval = \
+                Interval(start=start_index, end=index_interval.end)
+            index = start_index
+            checkpoint_time = time.time()
             for samples in _generate_sample_buffers(
-                    file_reader, index_interval):
-                for detector in detectors:
-                    channel_samples = samples[detector.channel_num]
-                    detector.detect(channel_samples)
+                    file_reader, detection_interval, self._telemetry):
+                
+                with self._telemetry.stage('detection'):
+                    
+                    for detector in detectors:
+                        
+                        if detector.channel_num is None:
+                            # multichannel detector
+                            
+                            detector.detect(samples)
+                            
+                        else:
+                            # single-channel detector
+                            
+                            channel_samples = samples[detector.channel_num]
+                            detector.detect(channel_samples)
+                    
+                length = samples.shape[-1]
+                index += length
+                
+                self._telemetry.add_done(
+                    signal_utils.get_duration(length, file_.sample_rate))
+                
+                if time.time() - checkpoint_time >= _CHECKPOINT_PERIOD:
+                    with self._telemetry.stage('checkpoint'):
+                        self._checkpoint(detectors, work_units, index)
+                    checkpoint_time = time.time()
                       
             # Wrap up detection.
-            for detector in detectors:
-                detector.complete_detection()
+            with self._telemetry.stage('detection'):
+                for detector in detectors:
+                    detector.complete_detection()
+                    for writer in detector.score_track_writers:
+                        writer.close()
+                    
+            self._update_work_units(work_units, index_interval.end, True)
+            
+            detector_count = len(detector_models)
+            interval_duration = signal_utils.get_duration(
+                index_interval.end - start_index, file_.sample_rate)
                 
         else:
             # don't run detectors
@@ -479,13 +695,153 @@ class DetectCommand(Command):
         processing_time = time.time() - start_time
         
         # Log detection performance message.
-        interval_duration = \
-            (time_interval.end - time_interval.start).total_seconds()
         self._log_detection_performance(
-            len(detector_models), file_.num_channels, interval_duration,
+            detector_count, file_.num_channels, interval_duration,
             processing_time)
                     
                 
+    def _get_work_units(self, detector_models, file_, index_interval):
+        
+        """
+        Gets the detection work units of the specified detectors for the
+        specified recording file interval, creating any that do not yet
+        exist.
+        """
+        
+        work_units = []
+        
+        update_time = time_utils.get_utc_now()
+        
+        with archive_lock.atomic(), transaction.atomic():
+            
+            for detector_model in detector_models:
+                
+                cls = _get_detector_class(detector_model.name)
+                store_score_tracks = self._store_score_tracks and \
+                    score_track_utils.supports_score_tracks(cls)
+                settings_hash = _get_detector_settings_hash(
+                    detector_model, cls, store_score_tracks)
+                
+                work_unit, created = \
+                    DetectionWorkUnit.objects.get_or_create(
+                        recording_file=file_,
+                        start_index=index_interval.start,
+                        end_index=index_interval.end,
+                        detector=detector_model,
+                        settings_hash=settings_hash,
+                        defaults={
+                            'processed_index': index_interval.start,
+                            'job': self._job,
+                            'update_time': update_time
+                        })
+                
+                if not created and not self._skip_completed_work:
+                    # will redo work unit
+                    
+                    work_unit.processed_index = index_interval.start
+                    work_unit.complete = False
+                    work_unit.job = self._job
+                    work_unit.update_time = update_time
+                    work_unit.save()
+                    
+                work_units.append(work_unit)
+                
+        return work_units
+    
+    
+    def _get_incomplete_work(self, detector_models, work_units):
+        
+        incomplete_work = [
+            (m, u) for m, u in zip(detector_models, work_units)
+            if not u.complete]
+        
+        skip_count = len(detector_models) - len(incomplete_work)
+        
+        if skip_count != 0:
+            
+            if len(incomplete_work) == 0:
+                self._logger.info(
+                    '        All detectors have already processed this '
+                    'interval, so it will be skipped.')
+                
+            else:
+                detectors_text = text_utils.create_count_text(
+                    skip_count, 'detector')
+                self._logger.info(
+                    f'        Skipping {detectors_text} that have already '
+                    f'processed this interval.')
+                
+        if len(incomplete_work) == 0:
+            return [], []
+        else:
+            detector_models, work_units = zip(*incomplete_work)
+            return list(detector_models), list(work_units)
+    
+    
+    def _get_resume_index(self, work_units, index_interval, sample_rate):
+        
+        """
+        Gets the recording file index at which to start running detectors
+        on the specified interval, resuming the work of any previous
+        interrupted run.
+        """
+        
+        start_index = index_interval.start
+        processed_index = min(u.processed_index for u in work_units)
+        
+        if processed_index == start_index:
+            return start_index
+        
+        s2f = signal_utils.seconds_to_frames
+        overlap = s2f(_RESUME_OVERLAP_DURATION, sample_rate)
+        alignment = s2f(_RESUME_ALIGNMENT_DURATION, sample_rate)
+        
+        count = max(processed_index - start_index - overlap, 0) // alignment
+        resume_index = start_index + count * alignment
+        
+        if resume_index != start_index:
+            
+            duration = signal_utils.get_duration(
+                resume_index - start_index, sample_rate)
+            
+            duration = text_utils.format_number(duration)
+            self._logger.info(
+                f'        Resuming detection {duration} seconds into '
+                f'interval, where a previous run left off.')
+            
+        return resume_index
+    
+    
+    def _checkpoint(self, detectors, work_units, processed_index):
+        
+        # When clip creation is deferred, clips are written to the
+        # archive database only after detection completes, and when
+        # score tracks are stored, a track is stored only if detection
+        # completes. In either case, work units record only complete
+        # work, so that an interrupted run starts over on the rerun.
+        if self._defer_clip_creation or self._store_score_tracks:
+            return
+        
+        # Commit clips detected so far.
+        for detector in detectors:
+            for listener in detector.detector_listeners:
+                listener.flush()
+            
+        self._update_work_units(work_units, processed_index, False)
+        
+        
+    def _update_work_units(self, work_units, processed_index, complete):
+        
+        ids = [u.id for u in work_units]
+        
+        with archive_lock.atomic(), transaction.atomic():
+            DetectionWorkUnit.objects.filter(id__in=ids).update(
+                processed_index=processed_index,
+                complete=complete,
+                job=self._job,
+                update_time=time_utils.get_utc_now())
+                
+                
     def _log_detection_start(
             self, detector_models, file_path, file_, time_interval):
          
@@ -526,39 +882,96 @@ class DetectCommand(Command):
 
     def _create_detectors(
             self, detector_models, recording, file_reader,
-            file_start_index, interval_start_index):
+            file_start_index, interval_start_index, interval_end_index):
         
         num_channels = recording.num_channels
         
         detectors = []
         
-        job = Job.objects.get(id=self._job_info.job_id)
-
         for detector_model in detector_models:
             
+            cls = _get_detector_class(detector_model.name)
+            
+            listeners = []
+            score_track_writers = []
+            
             for channel_num in range(num_channels):
                 
                 recording_channel = RecordingChannel.objects.get(
                     recording=recording, channel_num=channel_num)
                 
-                listener = _DetectorListener(
+                existing_clips = _get_existing_clips(
+                    detector_model, recording_channel,
+                    file_start_index + interval_start_index,
+                    file_start_index + interval_end_index)
+                
+                listener = DetectorListener(
                     detector_model, recording, recording_channel,
                     file_start_index, interval_start_index,
                     self._defer_clip_creation, self._create_clip_files,
-                    file_reader, job, self._logger)
+                    file_reader, self._job, self._logger, existing_clips)
                 
+                score_track_writer = self._create_score_track_writer(
+                    cls, recording, recording_channel, file_start_index,
+                    interval_start_index)
+                
+                listeners.append(listener)
+                score_track_writers.append(score_track_writer)
+                
+            if _supports_multichannel_input(cls):
+                # detector can process all channels at once
+                
+                # Create one detector for all channels.
+                listener = _MultichannelDetectorListener(listeners)
+                score_listener = \
+                    _get_multichannel_score_listener(score_track_writers)
                 detector = _create_detector(
-                    detector_model, recording, listener)
+                    cls, recording, listener, score_listener, num_channels)
+                detector_channels = [
+                    (detector, None, listeners, score_track_writers)]
+                
+            else:
+                # detector processes one channel at a time
+                
+                # Create one detector per channel.
+                detector_channels = [
+                    (_create_detector(cls, recording, listener, writer),
+                     channel_num, [listener], [writer])
+                    for channel_num, (listener, writer)
+                    in enumerate(zip(listeners, score_track_writers))]
+                    
+            for detector, channel_num, detector_listeners, writers in \
+                    detector_channels:
                 
                 # We add a `channel_num` attribute to each detector to keep
-                # track of which recording channel it is for.
+                # track of which recording channel it is for (`None` for a
+                # multichannel detector, which is for all channels), a
+                # `detector_listeners` attribute so we can commit its clips
+                # at checkpoints, and a `score_track_writers` attribute so
+                # we can complete its score tracks, if any, after detection.
                 detector.channel_num = channel_num
+                detector.detector_listeners = detector_listeners
+                detector.score_track_writers = \
+                    [w for w in writers if w is not None]
                 
                 detectors.append(detector)
             
         return detectors
 
 
+    def _create_score_track_writer(
+            self, detector_class, recording, recording_channel,
+            file_start_index, interval_start_index):
+        
+        if not self._store_score_tracks or \
+                not score_track_utils.supports_score_tracks(detector_class):
+            return None
+        
+        return score_track_utils.create_score_track_writer(
+            detector_class, recording_channel, file_start_index,
+            interval_start_index, recording.sample_rate)
+        
+        
     def _log_detection_performance(
             self, num_detectors, num_channels, interval_duration,
             processing_time):
@@ -673,14 +1086,20 @@ def _get_index_interval(time_interval, start_time, sample_rate):
     return Interval(start=start_index, end=start_index + length)
 
 
-def _generate_sample_buffers(file_reader, interval):
+def _generate_sample_buffers(file_reader, interval, telemetry):
     
     index = interval.start
     end_index = interval.end
     
     while index != end_index:
+        
         length = min(_DETECTION_CHUNK_SIZE, end_index - index)
-        yield file_reader.read(index, length)
+        
+        with telemetry.stage('read'):
+            samples = file_reader.read(index, length)
+            
+        yield samples
+        
         index += length
         
         
@@ -697,18 +1116,173 @@ def _format_datetime(dt):
 # themselves. How might we eliminate the redundancy? Be sure to consider
 # versioning and the possibility of processing parameters when thinking
 # about this.
-def _create_detector(detector_model, recording, listener):
+def _get_detector_settings_hash(
+        detector_model, detector_class, store_score_tracks):
+    
+    settings = {
+        'detector': detector_model.name,
+        'class': f'{detector_class.__module__}.{detector_class.__qualname__}',
+        'store_score_tracks': store_score_tracks
+    }
+    
+    data = json.dumps(settings, sort_keys=True).encode('utf-8')
+    
+    return hashlib.sha256(data).hexdigest()
+
+
+def _get_existing_clips(
+        detector_model, recording_channel, start_index, end_index):
+    
+    """
+    Gets the clips of the specified detector and recording channel that
+    are already in the archive and that might overlap clips detected in
+    the specified recording index interval.
+    """
+    
+    sample_rate = recording_channel.recording.sample_rate
+    margin = signal_utils.seconds_to_frames(
+        _RESUME_OVERLAP_DURATION, sample_rate)
+    
+    clips = Clip.objects.filter(
+        recording_channel=recording_channel,
+        creating_processor=detector_model,
+        start_index__gte=start_index - margin,
+        start_index__lt=end_index
+    ).values_list('start_index', 'length')
+    
+    return _ExistingClips(clips)
+
+
+class _ExistingClips:
+    
+    """
+    Clips of a detector and recording channel that are already in the
+    archive.
+    
+    The detect command skips detected clips that overlap existing clips,
+    so that rerunning an interrupted detection job does not duplicate
+    the clips that the job created before it was interrupted.
+    """
     
-    detector_name = detector_model.name
+    
+    def __init__(self, clips):
+        
+        clips = np.array(list(clips), dtype='int64').reshape((-1, 2))
+        clips = clips[np.argsort(clips[:, 0], kind='stable')]
+        
+        self._start_indices = clips[:, 0]
+        
+        # `self._max_end_indices[i]` is the maximum end index of
+        # clips zero through `i`.
+        end_indices = clips[:, 0] + clips[:, 1]
+        self._max_end_indices = np.maximum.accumulate(end_indices)
+        
+        
+    def __len__(self):
+        return len(self._start_indices)
+    
+    
+    def overlaps(self, start_index, length):
+        
+        """
+        Determines whether or not any existing clip overlaps the
+        specified clip.
+        """
+        
+        # Get number of existing clips that start before the end of
+        # the specified clip.
+        i = np.searchsorted(self._start_indices, start_index + length)
+        
+        return i != 0 and self._max_end_indices[i - 1] > start_index
+
+
+def _get_detector_class(detector_name):
     
     classes = extension_manager.instance.get_extensions('Detector')
     
     try:
-        cls = classes[detector_name]
+        return classes[detector_name]
     except KeyError:
         raise ValueError('Unrecognized detector "{}".'.format(detector_name))
     
-    return cls(recording.sample_rate, listener)
+    
+def _supports_multichannel_input(detector_class):
+    
+    """
+    Determines whether or not a detector class supports multichannel
+    input.
+    
+    A detector class that supports multichannel input has a true
+    `supports_multichannel_input` attribute and an initializer that
+    accepts a `channel_count` keyword argument. A detector created with
+    a channel count processes all channels of its input at once and
+    invokes its listener's `process_clip` method with a `channel_num`
+    keyword argument.
+    """
+    
+    return getattr(detector_class, 'supports_multichannel_input', False)
+
+
+def _create_detector(
+        cls, recording, listener, score_listener=None, channel_count=None):
+    
+    kwargs = {}
+    
+    if score_listener is not None:
+        kwargs['score_listener'] = score_listener
+        
+    if channel_count is not None:
+        kwargs['channel_count'] = channel_count
+        
+    return cls(recording.sample_rate, listener, **kwargs)
+
+
+class _MultichannelDetectorListener:
+    
+    """
+    Listener for a multichannel detector that forwards the clips of
+    each channel to the detector listener for that channel.
+    """
+    
+    
+    def __init__(self, listeners):
+        self._listeners = listeners
+        
+        
+    def process_clip(self, *args, channel_num, **kwargs):
+        self._listeners[channel_num].process_clip(*args, **kwargs)
+        
+        
+    def complete_processing(self, *args, **kwargs):
+        for listener in self._listeners:
+            listener.complete_processing(*args, **kwargs)
+            
+            
+def _get_multichannel_score_listener(score_listeners):
+    
+    if all(listener is None for listener in score_listeners):
+        return None
+    
+    else:
+        return _MultichannelScoreListener(score_listeners)
+    
+    
+class _MultichannelScoreListener:
+    
+    """
+    Score listener for a multichannel detector that forwards the scores
+    of each channel to the score listener for that channel.
+    """
+    
+    
+    def __init__(self, listeners):
+        self._listeners = listeners
+        
+        
+    def process_scores(self, scores, offset):
+        for listener, channel_scores in zip(self._listeners, scores):
+            if listener is not None:
+                listener.process_scores(channel_scores, offset)
 
 
 class _ClipCreationError(Exception):
@@ -717,7 +1291,7 @@ class _ClipCreationError(Exception):
         self.wrapped_exception = wrapped_exception
         
         
-class _DetectorListener:
+class DetectorListener:
     
     
     next_serial_number = 0
@@ -726,11 +1300,12 @@ class _DetectorListener:
     def __init__(
             self, detector_model, recording, recording_channel,
             file_start_index, interval_start_index, defer_clip_creation,
-            create_clip_files, file_reader, job, logger):
+            create_clip_files, file_reader, job, logger,
+            existing_clips=None):
         
         # Give this detector listener a unique serial number.
-        self._serial_number = _DetectorListener.next_serial_number
-        _DetectorListener.next_serial_number += 1
+        self._serial_number = DetectorListener.next_serial_number
+        DetectorListener.next_serial_number += 1
         
         self._detector_model = detector_model
         self._recording = recording
@@ -743,12 +1318,17 @@ class _DetectorListener:
         self._job = job
         self._logger = logger
         
+        if existing_clips is not None and len(existing_clips) == 0:
+            existing_clips = None
+        self._existing_clips = existing_clips
+        
         self._clip_manager = clip_manager.instance
         self._clips = []
-        self._deferred_clips = []
+        self._deferred_clip_file_writer = None
         self._num_clips = 0
         self._num_database_failures = 0
         self._num_file_failures = 0
+        self._num_existing_clips = 0
         
         self._annotation_info_cache = {}
  
@@ -762,6 +1342,16 @@ class _DetectorListener:
     def process_clip(
             self, start_index, length, threshold=None, annotations=None):
         
+        if self._existing_clips is not None:
+            
+            recording_start_index = \
+                start_index + self._file_start_index + \
+                self._interval_start_index
+                
+            if self._existing_clips.overlaps(recording_start_index, length):
+                self._num_existing_clips += 1
+                return
+            
         self._clips.append((start_index, length, annotations))
         self._num_clips += 1
         
@@ -769,9 +1359,20 @@ class _DetectorListener:
             self._create_clips(threshold)
         
         
+    def _create_clips(self, threshold):
+        
+        if self._defer_clip_creation:
+            stage_name = 'deferred_clip_write'
+        else:
+            stage_name = 'database_write'
+            
+        with job_telemetry.get_reporter().stage(stage_name):
+            self._create_clips_aux(threshold)
+            
+            
     # TODO: Consider dropping threshold argument. It seems that we don't
     # actually do anything with it, so its presence is a little confusing.
-    def _create_clips(self, threshold):
+    def _create_clips_aux(self, threshold):
         
         if not _CREATE_CLIPS:
             return
@@ -790,12 +1391,13 @@ class _DetectorListener:
         
         if self._defer_clip_creation:
             
+            writer = self._get_deferred_clip_file_writer()
+            
             for start_index, length, annotations in self._clips:
-                start_index += start_offset
-                clip = [
-                    recording_channel.id, start_index, length, creation_time,
-                    self._job.id, detector_model.id, annotations]
-                self._deferred_clips.append(clip)
+                writer.write_clip(
+                    recording_channel.id, start_index + start_offset, length,
+                    creation_time, self._job.id, detector_model.id,
+                    annotations)
                 
         else:
             # database writes not deferred
@@ -816,26 +1418,24 @@ class _DetectorListener:
                 
                 with archive_lock.atomic(), transaction.atomic():
                     
-                    for start_index, length, annotations in self._clips:
+                    try:
                         
-                        # Get clip start time as a `datetime`.
-                        start_index += start_offset
-                        start_delta = datetime.timedelta(
-                            seconds=start_index / sample_rate)
-                        start_time = \
-                            self._recording.start_time + start_delta
+                        new_clips = []
+                        new_annotations = []
+                    
+                        for start_index, length, annotations in self._clips:
+                        
+                            # Get clip start time as a `datetime`.
+                            start_index += start_offset
+                            start_delta = datetime.timedelta(
+                                seconds=start_index / sample_rate)
+                            start_time = \
+                                self._recording.start_time + start_delta
                          
-                        end_time = signal_utils.get_end_time(
-                            start_time, length, sample_rate)
+                            end_time = signal_utils.get_end_time(
+                                start_time, length, sample_rate)
                          
-                        try:
-                        
-                            # It would be nice to use Django's
-                            # `bulk_create` here, but unfortunately that
-                            # won't automatically set clip IDs for us
-                            # except (as of this writing) if we're using
-                            # PostgreSQL.
-                            clip = Clip.objects.create(
+                            clip = Clip(
                                 station=station,
                                 mic_output=mic_output,
                                 recording_channel=recording_channel,
@@ -850,35 +1450,46 @@ class _DetectorListener:
                                 creating_job=self._job,
                                 creating_processor=detector_model
                             )
-                            
-                            if create_clip_files:
-                                
-                                # Save clip so we can create clip file
-                                # outside of transaction.
-                                clips.append(clip)
-                                
+                        
+                            new_clips.append(clip)
+                        
                             if annotations is not None:
-                                
+                            
                                 for name, value in annotations.items():
-                                    
+                                
                                     annotation_info = \
                                         self._get_annotation_info(name)
-                                    
-                                    model_utils.annotate_clip(
-                                        clip, annotation_info, str(value),
-                                        creation_time=creation_time,
-                                        creating_user=None,
-                                        creating_job=self._job,
-                                        creating_processor=detector_model)
+                                
+                                    new_annotations.append(
+                                        (clip, annotation_info, str(value)))
+                                
+                        # This creates the clips with one bulk insert
+                        # if the database returns the IDs of inserted
+                        # rows (e.g. PostgreSQL), and one at a time
+                        # otherwise (e.g. SQLite).
+                        model_utils.create_clips(new_clips)
                         
-                        except Exception as e:
-                            
-                            # Note that it's important not to perform any
-                            # database queries here. If the database raised
-                            # the exception, we have to wait until we're
-                            # outside of the transaction to query the
-                            # database again.
-                            raise _ClipCreationError(e)
+                        model_utils.annotate_new_clips(
+                            new_annotations,
+                            creation_time=creation_time,
+                            creating_user=None,
+                            creating_job=self._job,
+                            creating_processor=detector_model)
+                        
+                    except Exception as e:
+                        
+                        # Note that it's important not to perform any
+                        # database queries here. If the database raised
+                        # the exception, we have to wait until we're
+                        # outside of the transaction to query the
+                        # database again.
+                        raise _ClipCreationError(e)
+                        
+                    if create_clip_files:
+                        
+                        # Save clips so we can create clip files
+                        # outside of transaction.
+                        clips = new_clips
 
 #                     trans_end_time = time.time()
 #                     self._num_transactions += 1
@@ -956,11 +1567,27 @@ class _DetectorListener:
                 return info
 
         
+    def flush(self):
+        
+        """Creates any clips that this listener has not yet created."""
+        
+        if len(self._clips) != 0:
+            self._create_clips(None)
+            
+            
     def complete_processing(self, threshold=None):
         
         # Create remaining clips.
         self._create_clips(threshold)
         
+        if self._num_existing_clips != 0:
+            clips_text = text_utils.create_count_text(
+                self._num_existing_clips, 'clip')
+            self._logger.info(
+                f'        Skipped {clips_text} from detector '
+                f'"{self._detector_model.name}" that overlapped clips '
+                f'already in the archive.')
+            
         clips_text = text_utils.create_count_text(self._num_clips, 'clip')
         
         if self._defer_clip_creation:
@@ -1005,25 +1632,26 @@ class _DetectorListener:
 #             'seconds.').format(avg))
 
 
+    def _get_deferred_clip_file_writer(self):
+        
+        if self._deferred_clip_file_writer is None:
+            
+            dir_path = archive_paths.deferred_action_dir_path
+            os_utils.create_directory(dir_path)
+            
+            file_name = _DEFERRED_DATABASE_WRITE_FILE_NAME_FORMAT.format(
+                self._job.id, self._serial_number,
+                deferred_clip_file.FILE_NAME_EXTENSION)
+            file_path = dir_path / file_name
+            
+            self._deferred_clip_file_writer = \
+                DeferredClipFileWriter(file_path)
+            
+        return self._deferred_clip_file_writer
+    
+    
     def _write_deferred_clips_file(self):
         
-        actions = {
-            'actions': [
-                {
-                    'name': 'create_clips',
-                    'arguments': {
-                        'clips': self._deferred_clips
-                    }
-                }
-            ]
-        }
-        
-        dir_path = archive_paths.deferred_action_dir_path
-        os_utils.create_directory(dir_path)
-        
-        file_name = _DEFERRED_DATABASE_WRITE_FILE_NAME_FORMAT.format(
-            self._job.id, self._serial_number)
-        file_path = dir_path / file_name
-        
-        with open(file_path, 'wb') as file_:
-            pickle.dump(actions, file_)
+        # Close deferred clip file writer, completing its file.
+        if self._deferred_clip_file_writer is not None:
+            self._deferred_clip_file_writer.close()
@@ -1,29 +1,54 @@
 """Module containing class `ExecuteDeferredActionsCommand`."""
 
 
+from collections import defaultdict
 import datetime
+import json
 import logging
+import os
 import pickle
 import time
 
 from django.db import transaction
-import pytz
+import numpy as np
 
 from vesper.archive_paths import archive_paths
 from vesper.command.command import Command, CommandExecutionError
 from vesper.django.app.models import (
-    AnnotationInfo, Clip, Job, Processor, RecordingChannel)
+    AnnotationInfo, Clip, Job, Processor, RecordingChannel, StringAnnotation,
+    StringAnnotationEdit)
 import vesper.command.command_utils as command_utils
-import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
+import vesper.util.deferred_clip_file as deferred_clip_file
 import vesper.util.signal_utils as signal_utils
 
 
-_LOGGING_PERIOD = 10000
+_PROGRESS_FILE_NAME_SUFFIX = '.progress'
+"""
+Suffix of the name of the file that records the number of batches of a
+deferred action file that have been loaded into the archive database.
+"""
 
 
 class ExecuteDeferredActionsCommand(Command):
     
     
+    """
+    Executes deferred archive actions.
+    
+    The command loads the clips of deferred clip files, and of the
+    pickled deferred action files of earlier Vesper versions, into the
+    archive database. Clips are loaded a batch at a time, each batch
+    in its own database transaction with bulk inserts. After each batch
+    the command records in a progress file how many batches of the
+    file it has loaded, and when it has loaded all of the batches of a
+    file it moves the file to the `Executed` subdirectory of the
+    deferred action directory. If the command fails, the clips of the
+    batches it loaded remain in the archive, and rerunning the command
+    resumes the load where it stopped.
+    """
+    
+    
     extension_name = 'execute_deferred_actions'
     
     
@@ -56,126 +81,202 @@ class ExecuteDeferredActionsCommand(Command):
             
         else:
 
-            file_paths = sorted(dir_path.glob('*.pkl'))
+            file_paths = sorted(
+                list(dir_path.glob('*.pkl')) +
+                list(dir_path.glob(
+                    '*' + deferred_clip_file.FILE_NAME_EXTENSION)))
             num_files = len(file_paths)
             
             self._logger.info((
                 'Executing deferred actions from {} files of directory '
                 '"{}"...').format(num_files, dir_path))
+            
+            start_time = time.time()
+            self._num_clips = 0
                 
             try:
-                with transaction.atomic():
-                    for i, file_path in enumerate(file_paths):
-                        self._logger.info((
-                            'Executing actions from file {} of {} - '
-                            '"{}"...').format(
-                                i + 1, num_files, file_path.name))
-                        self._execute_deferred_actions(file_path)
+                
+                for i, file_path in enumerate(file_paths):
+                    self._logger.info((
+                        'Executing actions from file {} of {} - '
+                        '"{}"...').format(i + 1, num_files, file_path.name))
+                    self._execute_deferred_actions(file_path)
+                    self._move_deferred_action_file(file_path)
               
             except Exception:
                 self._logger.error(
                     'Execution of deferred actions failed with an '
-                    'exception. Archive database has been restored '
-                    'to its state before the job began. See below '
-                    'for exception traceback.')
+                    'exception. Clips created before the failure remain '
+                    'in the archive database, and running the command '
+                    'again will resume execution where it stopped. See '
+                    'below for exception traceback.')
                 raise
             
-            # If we get here, the execution of all of the deferred
-            # actions succeeded and we can move the action files
-            # to the `Executed` directory.
-            self._move_deferred_action_files(file_paths)
+            elapsed_time = time.time() - start_time
+            timing_text = command_utils.get_timing_text(
+                elapsed_time, self._num_clips, 'clips')
+            self._logger.info(
+                'Created {} clips{}.'.format(self._num_clips, timing_text))
               
         return True
     
     
     def _execute_deferred_actions(self, file_path):
         
-        with open(file_path, 'rb') as file_:
-            data = pickle.load(file_)
+        start_batch_num = _read_progress_file(file_path)
+        
+        if start_batch_num != 0:
+            self._logger.info(
+                'Resuming at batch {} of file.'.format(start_batch_num + 1))
             
-        actions = data.get('actions', [])
+        if file_path.suffix == '.pkl':
+            batches = _read_pickle_file_batches(file_path, start_batch_num)
+        else:
+            batches = deferred_clip_file.read_batches(
+                file_path, start_batch_num)
+            
+        # The last batch of a previous, failed execution may have been
+        # committed to the database without its progress being recorded,
+        # so we check the first batch we load for existing clips.
+        check_for_existing_clips = True
         
-        for action in actions:
-            self._execute_deferred_action(action)
+        for batch_num, batch in batches:
+            
+            with archive_lock.atomic(), transaction.atomic():
+                self._create_clips(batch, check_for_existing_clips)
+                
+            _write_progress_file(file_path, batch_num + 1)
+            
+            check_for_existing_clips = False
             
             
-    def _execute_deferred_action(self, action):
+    def _create_clips(self, batch, check_for_existing_clips):
+        
+        num_clips = batch.clip_count
+        
+        if num_clips == 0:
+            return
+        
+        self._logger.info('Creating {} clips...'.format(num_clips))
         
-        name = action['name']
-        args = action['arguments']
+        clips = self._create_clip_objects(batch)
         
-        if name == 'create_clips':
-            self._execute_create_clips_action(args)
+        if check_for_existing_clips:
+            
+            existing_clip_ids = _get_clip_ids(clips)
+            
+            if len(existing_clip_ids) != 0:
+                self._logger.info((
+                    'Skipping {} clips that are already in the archive '
+                    'database.').format(len(existing_clip_ids)))
+            
+            rows = [
+                i for i, clip in enumerate(clips)
+                if _get_clip_key(clip) not in existing_clip_ids]
+            
+        else:
+            rows = range(len(clips))
             
+        clips = [clips[i] for i in rows]
         
-    def _execute_create_clips_action(self, args):
+        Clip.objects.bulk_create(clips)
         
-        clips = args['clips']
-        num_clips = len(clips)
+        if len(batch.annotations) != 0:
+            self._create_annotations(batch, clips, rows)
+            
+        self._num_clips += len(clips)
         
-        self._logger.info('Creating {} clips...'.format(num_clips))
         
-        start_time = time.time()
+    def _create_clip_objects(self, batch):
+        
+        """
+        Creates unsaved `Clip` objects for the clips of a batch.
+        
+        Related objects are retrieved from the database at most once
+        per command execution, and clip start time offsets are
+        computed for all clips of a batch at once.
+        """
+        
+        channels = [
+            self._get_recording_channel_info(i)
+            for i in batch.recording_channel_ids.tolist()]
+        
+        sample_rates = np.array([c[3] for c in channels])
+        start_offsets = batch.start_indices / sample_rates
         
-        clip_num = 0
+        creation_times = {}
         
-        for clip in clips:
+        clips = []
+        
+        for i, (channel, station, mic_output, sample_rate, start_time) in \
+                enumerate(channels):
             
-            self._create_clip(clip)
+            start_index = int(batch.start_indices[i])
+            length = int(batch.lengths[i])
             
-            clip_num += 1
+            start_time += datetime.timedelta(seconds=start_offsets[i])
+            end_time = signal_utils.get_end_time(
+                start_time, length, sample_rate)
             
-            if clip_num % _LOGGING_PERIOD == 0:
-                self._logger.info('Created {} clips...'.format(clip_num))
-                    
-        elapsed_time = time.time() - start_time
-        timing_text = command_utils.get_timing_text(
-            elapsed_time, num_clips, 'clips')
-        self._logger.info(
-            'Created {} clips{}.'.format(num_clips, timing_text))
-
-
-    def _create_clip(self, clip_info):
+            creation_time = _get_creation_time(
+                batch.creation_times[i], creation_times)
+            
+            clips.append(Clip(
+                station=station,
+                mic_output=mic_output,
+                recording_channel=channel,
+                start_index=start_index,
+                length=length,
+                sample_rate=sample_rate,
+                start_time=start_time,
+                end_time=end_time,
+                date=station.get_night(start_time),
+                creation_time=creation_time,
+                creating_user=None,
+                creating_job=self._get_job(int(batch.creating_job_ids[i])),
+                creating_processor=self._get_processor(
+                    int(batch.creating_processor_ids[i]))))
+            
+        return clips
+    
+    
+    def _create_annotations(self, batch, clips, rows):
         
-        (recording_channel_id, start_index, length, creation_time,
-         creating_job_id, creating_processor_id, annotations) = clip_info
-         
-        channel, station, mic_output, sample_rate, start_time = \
-            self._get_recording_channel_info(recording_channel_id)
+        # As of this writing Django's `bulk_create` sets the IDs of
+        # created objects only for PostgreSQL, so for other databases
+        # we query for the IDs of the clips we just created.
+        if len(clips) != 0 and clips[0].id is None:
+            clip_ids = _get_clip_ids(clips)
+            for clip in clips:
+                clip.id = clip_ids[_get_clip_key(clip)]
+            
+        annotations = []
+        edits = []
+        
+        for name, (codes, values) in batch.annotations.items():
             
-        start_offset = signal_utils.get_duration(start_index, sample_rate)
-        start_time += datetime.timedelta(seconds=start_offset)
-        end_time = signal_utils.get_end_time(start_time, length, sample_rate)
+            info = self._get_annotation_info(name)
             
-        job = self._get_job(creating_job_id)
-        processor = self._get_processor(creating_processor_id)
-         
-        clip = Clip.objects.create(
-            station=station,
-            mic_output=mic_output,
-            recording_channel=channel,
-            start_index=start_index,
-            length=length,
-            sample_rate=sample_rate,
-            start_time=start_time,
-            end_time=end_time,
-            date=station.get_night(start_time),
-            creation_time=creation_time,
-            creating_user=None,
-            creating_job=job,
-            creating_processor=processor
-        )
-        
-        if annotations is not None:
-            
-            for name, value in annotations.items():
-                
-                annotation_info = self._get_annotation_info(name)
+            for clip, code in zip(clips, codes[rows].tolist()):
                 
-                model_utils.annotate_clip(
-                    clip, annotation_info, str(value),
-                    creation_time=creation_time, creating_user=None,
-                    creating_job=self._job, creating_processor=processor)
+                if code != -1:
+                    
+                    kwargs = {
+                        'clip_id': clip.id,
+                        'info': info,
+                        'value': values[code],
+                        'creation_time': clip.creation_time,
+                        'creating_user': None,
+                        'creating_job': self._job,
+                        'creating_processor': clip.creating_processor
+                    }
+                    
+                    annotations.append(StringAnnotation(**kwargs))
+                    edits.append(StringAnnotationEdit(
+                        action=StringAnnotationEdit.ACTION_SET, **kwargs))
+                    
+        StringAnnotation.objects.bulk_create(annotations)
+        StringAnnotationEdit.objects.bulk_create(edits)
 
 
     # TODO: The `_get_annotation_info` method and the code above that
@@ -251,21 +352,119 @@ class ExecuteDeferredActionsCommand(Command):
             return processor
         
         
-    def _move_deferred_action_files(self, file_paths):
+    def _move_deferred_action_file(self, file_path):
         
-        if len(file_paths) > 0:
-            
-            self._logger.info(
-                'Moving deferred action files to "Executed" directory...')
+        executed_dir_path = file_path.parent / 'Executed'
+        executed_dir_path.mkdir(parents=True, exist_ok=True)
+        
+        file_path.rename(executed_dir_path / file_path.name)
+        
+        progress_file_path = _get_progress_file_path(file_path)
+        if progress_file_path.exists():
+            progress_file_path.unlink()
+        
+        
+def _get_progress_file_path(file_path):
+    return file_path.parent / (file_path.name + _PROGRESS_FILE_NAME_SUFFIX)
+
+
+def _read_progress_file(file_path):
+    
+    """Gets the number of batches of a file that have been loaded."""
+    
+    progress_file_path = _get_progress_file_path(file_path)
+    
+    try:
+        with open(progress_file_path) as file_:
+            return json.load(file_)['batch_count']
+        
+    except FileNotFoundError:
+        return 0
+    
+    
+def _write_progress_file(file_path, batch_count):
+    
+    progress_file_path = _get_progress_file_path(file_path)
+    temp_file_path = progress_file_path.with_name(
+        progress_file_path.name + '.tmp')
+    
+    with open(temp_file_path, 'w') as file_:
+        json.dump({'batch_count': batch_count}, file_)
+        
+    os.replace(temp_file_path, progress_file_path)
+    
+    
+def _read_pickle_file_batches(file_path, start_batch_num):
+    
+    """
+    Generates clip batches from a pickled deferred action file.
+    
+    Each `create_clips` action of the file yields one batch.
+    """
+    
+    with open(file_path, 'rb') as file_:
+        data = pickle.load(file_)
+        
+    actions = [
+        a for a in data.get('actions', [])
+        if a['name'] == 'create_clips']
+    
+    for batch_num in range(start_batch_num, len(actions)):
+        clips = actions[batch_num]['arguments']['clips']
+        yield batch_num, deferred_clip_file.create_batch(clips)
+        
+        
+def _get_creation_time(epoch_microseconds, cache):
+    
+    # The clips of a batch usually have just a few distinct creation
+    # times, so we cache them.
+    try:
+        return cache[epoch_microseconds]
+    
+    except KeyError:
+        dt = deferred_clip_file.get_datetime(epoch_microseconds)
+        cache[epoch_microseconds] = dt
+        return dt
+        
+        
+def _get_clip_key(clip):
+    
+    # Clips are unique by recording channel, start time, and creating
+    # processor.
+    return (
+        clip.recording_channel_id, clip.start_time,
+        clip.creating_processor_id)
+    
+
+def _get_clip_ids(clips):
+    
+    """
+    Gets the IDs of the archive database clips that match some clips.
+    
+    :Returns:
+        a mapping from the keys of the clips that are in the database
+        to their IDs.
+    """
+    
+    channel_ids = defaultdict(list)
+    for clip in clips:
+        channel_ids[clip.recording_channel_id].append(clip.start_time)
+        
+    clip_ids = {}
+    
+    processor_ids = set(c.creating_processor_id for c in clips)
+    
+    for channel_id, start_times in channel_ids.items():
+        
+        rows = Clip.objects.filter(
+            recording_channel_id=channel_id,
+            creating_processor_id__in=processor_ids,
+            start_time__range=(min(start_times), max(start_times))
+        ).values_list(
+            'recording_channel_id', 'start_time', 'creating_processor_id',
+            'id')
             
-            executed_dir_path = file_paths[0].parent / 'Executed'
-            executed_dir_path.mkdir(parents=True, exist_ok=True)
+        for channel_id, start_time, processor_id, clip_id in rows:
+            clip_ids[(channel_id, start_time, processor_id)] = clip_id
             
-            for old_path in file_paths:
-                new_path = executed_dir_path / old_path.name
-                old_path.rename(new_path)
-        
-         
-def _parse_datetime(dt):
-    dt = datetime.datetime.strptime(dt, '%Y-%m-%d %H:%M:%S')
-    return pytz.utc.localize(dt)
+    return clip_ids
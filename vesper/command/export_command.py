@@ -7,6 +7,7 @@ from vesper.command.clip_set_command import ClipSetCommand
 from vesper.command.command import CommandSyntaxError
 from vesper.singletons import extension_manager
 import vesper.command.command_utils as command_utils
+import vesper.command.job_telemetry as job_telemetry
 import vesper.django.app.model_utils as model_utils
 import vesper.util.text_utils as text_utils
 
@@ -47,13 +48,22 @@ class ExportCommand(ClipSetCommand):
     
         value_tuples = self._create_clip_query_values_iterator()
         
+        # Get clip querysets and their counts before exporting any
+        # clips, so we can report the total number of clips to visit
+        # via telemetry.
+        clip_sets = []
         for station, mic_output, date, detector in value_tuples:
-            
             clips = _get_clips(
                 station, mic_output, date, detector, self._annotation_name,
                 self._annotation_value, self._tag_name)
+            clip_sets.append(
+                (station, mic_output, date, detector, clips, clips.count()))
+            
+        total_count = sum(clip_set[-1] for clip_set in clip_sets)
+        job_telemetry.get_reporter().set_total(total_count, 'clip')
+        
+        for station, mic_output, date, detector, clips, count in clip_sets:
             
-            count = clips.count()
             count_text = text_utils.create_count_text(count, 'clip')
             
             _logger.info(
@@ -126,15 +136,21 @@ _LOGGING_PERIOD = 500    # clips
 
 def _export_clips(clips, exporter):
     
+    telemetry = job_telemetry.get_reporter()
+    
     visited_count = 0
     exported_count = 0
     
     for clip in clips:
         
-        if exporter.export(clip):
+        with telemetry.stage('export'):
+            exported = exporter.export(clip)
+            
+        if exported:
             exported_count += 1
         
         visited_count += 1
+        telemetry.add_done()
         
         if visited_count % _LOGGING_PERIOD == 0:
             _logger.info(f'Visited {visited_count} clips...')
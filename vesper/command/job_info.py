@@ -2,6 +2,7 @@
 
 
 from vesper.command.job_logging_manager import JobLoggingManager
+import vesper.command.job_telemetry as job_telemetry
 
 
 class JobInfo:
@@ -32,13 +33,26 @@ class JobInfo:
             
             This event is set when it has been requested that this job
             stop without completing.
+            
+        telemetry_config : picklable object
+            the telemetry configuration for this job.
+            
+            The main job process is configured for telemetry before
+            the job's command executes. Each additional process of
+            this job that reports telemetry should configure itself by
+            invoking the `configure_telemetry` method of this object
+            (or the `vesper.command.job_telemetry.configure` function
+            with this configuration) exactly once.
     """
     
     
-    def __init__(self, job_id, logging_config, stop_event):
+    def __init__(
+            self, job_id, logging_config, stop_event, telemetry_config=None):
+        
         self.job_id = job_id
         self._logging_config = logging_config
         self._stop_event = stop_event
+        self.telemetry_config = telemetry_config
         
         
     @property
@@ -48,3 +62,7 @@ class JobInfo:
     
     def configure_logger(self, logger):
         JobLoggingManager.configure_logger(logger, self._logging_config)
+        
+        
+    def configure_telemetry(self):
+        job_telemetry.configure(self.telemetry_config)
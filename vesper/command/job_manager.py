@@ -1,10 +1,16 @@
 """Module containing class `JobManager`."""
 
 
-from multiprocessing import Event, Lock, Process
+from multiprocessing import Event, Lock, Process, Queue
 import datetime
 import json
+import logging
+import re
 
+from django import db
+
+from vesper.command.job_scheduler import JobScheduler, JobSchedulerError
+from vesper.command.job_telemetry import TelemetryCollector
 from vesper.django.app.models import Job
 from vesper.util.bunch import Bunch
 from vesper.util.repeating_timer import RepeatingTimer
@@ -13,6 +19,21 @@ import vesper.util.archive_lock as archive_lock
 import vesper.util.time_utils as time_utils
 
 
+_SCHEDULING_PERIOD = 1
+"""
+Period in seconds of the job manager's scheduling timer.
+
+Each time the timer fires, the job manager notes the jobs that have
+terminated and starts queued jobs that the job scheduler allows to start.
+"""
+
+
+_DATE_RE = re.compile(r'^\d\d\d\d-\d\d-\d\d$')
+
+
+_logger = logging.getLogger()
+
+
 class JobManager:
     
     """
@@ -20,10 +41,21 @@ class JobManager:
 
     A Vesper job executes one Vesper command. Each job runs in its own
     process, which may or may not start additional processes. The
-    `start_job` method of this class starts a job for a specified command,
-    and the `stop_job` method requests that a running job stop. A job is
-    not required to honor a stop request, but most jobs should, especially
-    longer-running ones.
+    `start_job` method of this class submits a job for a specified
+    command, and the `stop_job` method requests that a job stop. A job
+    is not required to honor a stop request, but most jobs should,
+    especially longer-running ones.
+    
+    A submitted job waits in a queue with status "Queued" until the
+    job scheduler allows it to start. See the `job_scheduler` module
+    for how scheduling is configured. By default there are no limits,
+    so jobs start as soon as they are submitted. The queue is persistent:
+    it comprises the archive's jobs with status "Queued", so queued jobs
+    survive a server restart, and start after it.
+    
+    The job manager also collects the telemetry that jobs report (see
+    the `job_telemetry` module), which is available via the
+    `get_job_telemetry` and `get_command_telemetry` methods.
     """
     
     
@@ -38,60 +70,277 @@ class JobManager:
         The removal is performed by the `_delete_terminated_jobs` method,
         which runs off a repeating timer.
         """
+        
+        self._queued_jobs = None
+        """
+        Mapping from job IDs to `Bunch` objects containing information
+        about queued jobs, or `None` if the queued jobs have not yet been
+        read from the archive.
+        """
 
         self._lock = Lock()
         """
-        Lock used to synchronize access to the `_job_infos` dictionary
-        from multiple threads. (The lock can synchronize access from
-        multiple threads and/or processes, but we access the dictionary
-        only from threads of the main Vesper process.)
+        Lock used to synchronize access to the `_job_infos` and
+        `_queued_jobs` dictionaries from multiple threads. (The lock can
+        synchronize access from multiple threads and/or processes, but we
+        access the dictionaries only from threads of the main Vesper
+        process.)
+        """
+        
+        self._scheduling_preference_error = None
+        """The last scheduling preference error message logged."""
+        
+        self._telemetry_queue = Queue()
+        """Queue through which job processes report telemetry."""
+        
+        self._telemetry_collector = TelemetryCollector(self._telemetry_queue)
+        """
+        Collector of job telemetry. Access to the collector is
+        synchronized by `_lock`.
         """
 
-        self._timer = RepeatingTimer(10, self._delete_terminated_jobs)
-        """Repeating timer that deletes terminated jobs from `_job_infos`."""
+        self._timer = RepeatingTimer(_SCHEDULING_PERIOD, self._schedule)
+        """
+        Repeating timer that deletes terminated jobs from `_job_infos`
+        and starts queued jobs.
+        """
         
         self._timer.start()
 
 
     def start_job(self, command_spec, user):
         
+        job_id = _create_job(command_spec, user)
+        
+        with self._lock:
+            queued_jobs = self._get_queued_jobs()
+            queued_jobs[job_id] = _create_queued_job(job_id, command_spec)
+            self._start_jobs()
+            
+        return job_id
+        
+        
+    def stop_job(self, job_id):
+        
+        with self._lock:
+            
+            job_info = self._job_infos.get(job_id)
+            
+            if job_info is not None:
+                # job is running
+                
+                job_info.stop_event.set()
+                
+            elif job_id in self._get_queued_jobs():
+                # job is queued
+                
+                del self._queued_jobs[job_id]
+                _set_job_status(job_id, 'Interrupted')
+            
+            
+    def get_queue_position(self, job_id):
+        
+        """
+        Gets the position of a job in the job queue.
+        
+        :Parameters:
+            job_id : int
+                the ID of the job.
+                
+        :Returns:
+            a `(position, queue_length)` pair, where `position` is one
+            for the job that will be considered for starting first, or
+            `None` if the job is not queued.
+        """
+        
+        with self._lock:
+            
+            queued_jobs = self._get_queued_jobs()
+            
+            if job_id not in queued_jobs:
+                return None
+            
+            scheduler = self._get_scheduler()
+            jobs = scheduler.sort_queue(queued_jobs.values())
+            job_ids = [job.job_id for job in jobs]
+            
+            return (job_ids.index(job_id) + 1, len(job_ids))
+        
+        
+    def get_job_telemetry(self, job_id):
+        
+        """
+        Gets the telemetry of a job.
+        
+        See the `TelemetryCollector.get_job_telemetry` method for a
+        description of the return value.
+        """
+        
+        with self._lock:
+            self._telemetry_collector.process_reports()
+            return self._telemetry_collector.get_job_telemetry(job_id)
+        
+        
+    def get_command_telemetry(self):
+        
+        """
+        Gets job telemetry aggregated by command.
+        
+        See the `TelemetryCollector.get_command_telemetry` method for
+        a description of the return value.
+        """
+        
+        with self._lock:
+            self._telemetry_collector.process_reports()
+            return self._telemetry_collector.get_command_telemetry()
+        
+        
+    def _get_queued_jobs(self):
+        
+        if self._queued_jobs is None:
+            # have not yet read queued jobs from archive
+            
+            jobs = Job.objects.filter(status='Queued').order_by('id')
+            
+            self._queued_jobs = dict(
+                (job.id, _create_queued_job(
+                    job.id, _parse_command_spec(job.command)))
+                for job in jobs)
+            
+        return self._queued_jobs
+    
+    
+    def _get_scheduler(self):
+        
+        # We put this here to avoid a circular import problem.
+        from vesper.singletons import preference_manager
+        
+        manager = preference_manager.instance
+        manager.reload_preferences()
+        
+        try:
+            scheduler = JobScheduler.create_from_preferences(
+                manager.preferences)
+            
+        except JobSchedulerError as e:
+            
+            message = str(e)
+            
+            # Log each distinct error only once, since this method
+            # runs every time the scheduling timer fires.
+            if message != self._scheduling_preference_error:
+                _logger.warning(
+                    f'Bad job scheduling preference. {message} Jobs will '
+                    f'be scheduled without limits until the preference '
+                    f'is fixed.')
+                self._scheduling_preference_error = message
+                
+            return JobScheduler()
+        
+        else:
+            self._scheduling_preference_error = None
+            return scheduler
+        
+        
+    def _schedule(self):
+        
+        try:
+            with self._lock:
+                self._delete_terminated_jobs()
+                self._start_jobs()
+                
+        except Exception:
+            _logger.exception('Job scheduling failed.')
+            
+        finally:
+            # Close the database connections of this timer thread, since
+            # each firing of the timer runs in a new thread.
+            db.connections.close_all()
+            
+            
+    def _start_jobs(self):
+        
+        queued_jobs = self._get_queued_jobs()
+        
+        if len(queued_jobs) == 0:
+            return
+        
+        scheduler = self._get_scheduler()
+        
+        running_command_names = [
+            info.command_spec['name'] for info in self._job_infos.values()]
+        
+        jobs = scheduler.get_jobs_to_start(
+            queued_jobs.values(), running_command_names)
+        
+        for job in jobs:
+            del queued_jobs[job.job_id]
+            self._start_job(job)
+            
+            
+    def _start_job(self, queued_job):
+        
         info = Bunch()
-        info.command_spec = command_spec
-        info.job_id = _create_job(command_spec, user)
+        info.command_spec = queued_job.command_spec
+        info.job_id = queued_job.job_id
         info.archive_lock = archive_lock.get_lock()
+        info.write_behind_service_address = \
+            _get_write_behind_service_address()
         info.stop_event = Event()
+        info.telemetry_queue = self._telemetry_queue
+        
+        # Mark job as dequeued. The job process marks the job as running
+        # once it has started.
+        _set_job_status(info.job_id, 'Unstarted')
 
-        with self._lock:
-            self._job_infos[info.job_id] = info
+        self._job_infos[info.job_id] = info
+        
+        self._telemetry_collector.add_job(
+            info.job_id, queued_job.command_name)
             
+        # Close the database connections of this thread before starting
+        # the job process. On platforms where the job process is forked
+        # it would otherwise inherit the connections, and using them
+        # from two processes (e.g. sharing one PostgreSQL connection
+        # socket) would corrupt them. Django reopens connections in
+        # this thread as needed.
+        db.connections.close_all()
+        
         info.process = Process(target=job_runner.run_job, args=(info,))
         info.process.start()
         
-        return info.job_id
         
+
+    def shutdown(self):
+        
+        """
+        Shuts down this manager.
+        
+        This stops the timer thread of this manager, so that a process
+        that uses the manager can exit. Jobs that are running continue
+        to run.
+        """
+        
+        self._timer.cancel()
         
-    def stop_job(self, job_id):
-        with self._lock:
-            try:
-                job_info = self._job_infos[job_id]
-            except KeyError:
-                return
-            else:
-                job_info.stop_event.set()
-            
         
     def _delete_terminated_jobs(self):
         
         terminated_job_ids = set()
         
-        with self._lock:
-            
-            for info in self._job_infos.values():
-                if not info.process.is_alive():
-                    terminated_job_ids.add(info.job_id)
-                    
-            for job_id in terminated_job_ids:
-                del self._job_infos[job_id]
+        for info in self._job_infos.values():
+            if not info.process.is_alive():
+                terminated_job_ids.add(info.job_id)
+                
+        # Process telemetry reports before noting terminations. The
+        # final reports of a job are in the telemetry queue by the time
+        # its process has exited, so this includes them in the job's
+        # telemetry.
+        self._telemetry_collector.process_reports()
+        
+        for job_id in terminated_job_ids:
+            del self._job_infos[job_id]
+            self._telemetry_collector.end_job(job_id)
 
 
 def _create_job(command_spec, user):
@@ -101,11 +350,70 @@ def _create_job(command_spec, user):
             command=json.dumps(command_spec, default=_json_date_serializer),
             creation_time=time_utils.get_utc_now(),
             creating_user=user,
-            status='Unstarted')
+            status='Queued')
     
     return job.id
+
+
+def _create_queued_job(job_id, command_spec):
+    return Bunch(
+        job_id=job_id,
+        command_name=command_spec['name'],
+        command_spec=command_spec)
+
+
+def _parse_command_spec(command):
+    
+    """
+    Parses the JSON command specification of an archive job.
     
+    Dates are serialized as strings of the form "YYYY-MM-DD" when job
+    command specifications are stored in the archive (see
+    `_json_date_serializer`), so this function converts such strings
+    back to dates.
+    """
+    
+    return json.loads(command, object_hook=_parse_dates)
+
+
+def _parse_dates(obj):
     
+    for key, value in obj.items():
+        
+        if isinstance(value, str) and _DATE_RE.match(value):
+            obj[key] = datetime.date.fromisoformat(value)
+            
+        elif isinstance(value, list):
+            obj[key] = [
+                datetime.date.fromisoformat(v)
+                if isinstance(v, str) and _DATE_RE.match(v) else v
+                for v in value]
+            
+    return obj
+
+
+def _set_job_status(job_id, status):
+    
+    fields = {'status': status}
+    
+    if status == 'Interrupted':
+        fields['end_time'] = time_utils.get_utc_now()
+        
+    with archive_lock.atomic():
+        Job.objects.filter(id=job_id).update(**fields)
+    
+    
+def _get_write_behind_service_address():
+    
+    # We put this here to avoid a circular import problem.
+    import vesper.django.app.write_behind_service as write_behind_service
+    
+    if write_behind_service.is_enabled():
+        return write_behind_service.get_server_address()
+    else:
+        return None
+
+
 def _json_date_serializer(obj):
     
     """Date serializer for `json.dumps`."""
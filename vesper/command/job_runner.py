@@ -17,6 +17,7 @@ import traceback
 from vesper.command.command import CommandSyntaxError
 from vesper.command.job_info import JobInfo
 from vesper.command.job_logging_manager import JobLoggingManager
+import vesper.command.job_telemetry as job_telemetry
 import vesper.util.django_utils as django_utils
 import vesper.util.time_utils as time_utils
 
@@ -24,6 +25,7 @@ import vesper.util.time_utils as time_utils
 '''
 Job status values:
 
+Queued
 Unstarted
 Running
 Completed
@@ -64,7 +66,8 @@ def run_job(job_info):
             
             The information includes the command specification for the
             new job, the ID of the Django Job model instance for the job,
-            and the stop event for the job.
+            the stop event for the job, and the queue through which the
+            job reports telemetry.
             
             The information includes the ID of the Django job model
             instance rather than the instance itself so that the job
@@ -92,11 +95,17 @@ def run_job(job_info):
     # they will be executed after Django is set up in the main job process.
     # from django.conf import settings as django_settings
     from vesper.django.app.models import Job
+    import vesper.django.app.write_behind_service as write_behind_service
     import vesper.util.archive_lock as archive_lock
     
     # Set the archive lock for this process. The lock is provided to
     # this process by its creator.
     archive_lock.set_lock(job_info.archive_lock)
+    
+    # Connect to the write-behind service of the process that started
+    # this one, if the service is enabled.
+    write_behind_service.set_server_address(
+        job_info.write_behind_service_address)
 
     # Get the Django model instance for this job.
     job = Job.objects.get(id=job_info.job_id)
@@ -112,6 +121,10 @@ def run_job(job_info):
     logging_config = logging_manager.logging_config
     JobLoggingManager.configure_logger(logger, logging_config)
     
+    # Configure telemetry for the main job process.
+    telemetry_config = (job_info.job_id, job_info.telemetry_queue)
+    job_telemetry.configure(telemetry_config)
+    
     try:
         
         # Mark job as running.
@@ -141,7 +154,9 @@ def run_job(job_info):
                 logger.info('    {}'.format(line))
     
         # Execute command.
-        info = JobInfo(job_info.job_id, logging_config, job_info.stop_event)
+        info = JobInfo(
+            job_info.job_id, logging_config, job_info.stop_event,
+            telemetry_config)
         complete = command.execute(info)
         
     except Exception:
@@ -187,6 +202,8 @@ def run_job(job_info):
         # reported in log displays. See record counts handler
         # TODO in `job_logging_manager` module for more detail.
         
+        job_telemetry.get_reporter().flush()
+        
         logging_manager.shut_down_logging()
 
 
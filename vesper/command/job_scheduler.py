@@ -0,0 +1,348 @@
+"""
+Module containing class `JobScheduler`.
+
+A job scheduler decides which queued Vesper jobs to start, given the
+jobs that are already running. The `JobManager` class consults a job
+scheduler each time a job is submitted or terminates, and periodically
+in between.
+
+Scheduling is configured by the `job_scheduling` preference, for
+example::
+
+    job_scheduling:
+        max_running_jobs: 3
+        command_limits:
+            detect: 1
+            classify: 1
+        command_priorities:
+            export: 10
+            detect: -10
+        max_cpu_load: 1.5
+        min_available_memory: 2
+
+All of the items are optional. `max_running_jobs` limits the number of
+jobs that run at once, and `command_limits` limits the numbers of jobs
+of particular commands that run at once. Queued jobs start in order of
+decreasing command priority (the default priority is zero) and then of
+submission. A job whose command is at its limit does not hold up jobs
+of other commands behind it.
+
+`max_cpu_load` and `min_available_memory` enable admission control.
+When either is specified, a job can start only if the one-minute load
+average per CPU is at most `max_cpu_load` and at least
+`min_available_memory` gigabytes of memory are available. Admission
+control never keeps a job from starting when no other job is running,
+so a busy computer cannot starve the queue. The available memory is
+measured with the optional `psutil` package, and the load average is
+not available on Windows. A resource that cannot be measured does not
+limit admission.
+"""
+
+
+import os
+
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class JobSchedulerError(Exception):
+    pass
+
+
+class JobScheduler:
+
+    """Chooses the queued jobs to start."""
+
+
+    @staticmethod
+    def create_from_preferences(preferences):
+
+        """
+        Creates a job scheduler from the `job_scheduling` preference.
+
+        :Parameters:
+            preferences : mapping
+                Vesper preferences.
+
+        :Returns:
+            the job scheduler.
+
+        :Raises JobSchedulerError:
+            if the `job_scheduling` preference is invalid.
+        """
+
+        settings = preferences.get('job_scheduling')
+
+        if settings is None:
+            return JobScheduler()
+
+        if not isinstance(settings, dict):
+            raise JobSchedulerError(
+                'The "job_scheduling" preference must be a mapping.')
+
+        return JobScheduler(
+            settings.get('max_running_jobs'),
+            settings.get('command_limits'),
+            settings.get('command_priorities'),
+            settings.get('max_cpu_load'),
+            settings.get('min_available_memory'))
+
+
+    def __init__(
+            self, max_running_jobs=None, command_limits=None,
+            command_priorities=None, max_cpu_load=None,
+            min_available_memory=None):
+
+        """
+        Initializes this scheduler.
+
+        :Parameters:
+            max_running_jobs : int
+                the maximum number of jobs that can run at once, or
+                `None` for no limit.
+            command_limits : dict
+                mapping from command names to the maximum numbers of
+                jobs of those commands that can run at once, or `None`.
+            command_priorities : dict
+                mapping from command names to integer priorities, or
+                `None`. The default priority is zero.
+            max_cpu_load : float
+                the maximum one-minute load average per CPU at which
+                a job can start while other jobs are running, or `None`.
+            min_available_memory : float
+                the minimum available memory in gigabytes at which a
+                job can start while other jobs are running, or `None`.
+
+        :Raises JobSchedulerError:
+            if any of the arguments is invalid.
+        """
+
+        self._max_running_jobs = _check_limit(
+            max_running_jobs, 'maximum number of running jobs')
+
+        self._command_limits = _check_mapping(
+            command_limits, _check_limit, 'command limit')
+
+        self._command_priorities = _check_mapping(
+            command_priorities, _check_priority, 'command priority')
+
+        self._max_cpu_load = _check_resource_threshold(
+            max_cpu_load, 'maximum CPU load')
+
+        self._min_available_memory = _check_resource_threshold(
+            min_available_memory, 'minimum available memory')
+
+
+    @property
+    def max_running_jobs(self):
+        return self._max_running_jobs
+
+
+    @property
+    def admission_control_enabled(self):
+        return self._max_cpu_load is not None or \
+            self._min_available_memory is not None
+
+
+    def get_command_limit(self, command_name):
+        return self._command_limits.get(command_name)
+
+
+    def get_command_priority(self, command_name):
+        return self._command_priorities.get(command_name, 0)
+
+
+    def sort_queue(self, queued_jobs):
+
+        """
+        Sorts queued jobs in the order in which they should start.
+
+        :Parameters:
+            queued_jobs : sequence
+                the queued jobs. Each job must have `job_id` and
+                `command_name` attributes. Job IDs increase in order
+                of submission.
+
+        :Returns:
+            a list of the jobs, in order of decreasing command priority
+            and then of increasing job ID.
+        """
+
+        def get_key(job):
+            return (-self.get_command_priority(job.command_name), job.job_id)
+
+        return sorted(queued_jobs, key=get_key)
+
+
+    def get_jobs_to_start(
+            self, queued_jobs, running_command_names, resource_usage=None):
+
+        """
+        Gets the queued jobs that should start now.
+
+        :Parameters:
+            queued_jobs : sequence
+                the queued jobs, as for the `sort_queue` method.
+            running_command_names : sequence
+                the command names of the running jobs, one per job.
+            resource_usage : ResourceUsage
+                the current resource usage of this computer, or `None`.
+                Resource usage is consulted only if admission control
+                is enabled. If it is enabled and this argument is `None`,
+                the current resource usage is measured.
+
+        :Returns:
+            a list of the jobs to start, in the order in which they
+            should start.
+        """
+
+        running_count = len(running_command_names)
+
+        if self.admission_control_enabled and running_count != 0:
+
+            if resource_usage is None:
+                resource_usage = get_resource_usage()
+
+            if not self._admit(resource_usage):
+                return []
+
+        command_counts = {}
+        for name in running_command_names:
+            command_counts[name] = command_counts.get(name, 0) + 1
+
+        jobs = []
+
+        for job in self.sort_queue(queued_jobs):
+
+            if self._max_running_jobs is not None and \
+                    running_count >= self._max_running_jobs:
+                break
+
+            name = job.command_name
+            count = command_counts.get(name, 0)
+            limit = self.get_command_limit(name)
+
+            if limit is not None and count >= limit:
+                continue
+
+            jobs.append(job)
+            command_counts[name] = count + 1
+            running_count += 1
+
+            if self.admission_control_enabled:
+                # Admit at most one job at a time, so that each admission
+                # is decided from resource usage that reflects the jobs
+                # admitted before it.
+                break
+
+        return jobs
+
+
+    def _admit(self, usage):
+
+        if self._max_cpu_load is not None and usage.cpu_load is not None \
+                and usage.cpu_load > self._max_cpu_load:
+            return False
+
+        if self._min_available_memory is not None and \
+                usage.available_memory is not None and \
+                usage.available_memory < self._min_available_memory:
+            return False
+
+        return True
+
+
+def _check_limit(limit, name):
+
+    if limit is None:
+        return None
+
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+        raise JobSchedulerError(
+            f'Bad {name} {limit!r}: value must be a positive integer.')
+
+    return limit
+
+
+def _check_priority(priority, name):
+
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise JobSchedulerError(
+            f'Bad {name} {priority!r}: value must be an integer.')
+
+    return priority
+
+
+def _check_mapping(mapping, check_value, name):
+
+    if mapping is None:
+        return {}
+
+    if not isinstance(mapping, dict):
+        raise JobSchedulerError(
+            f'Bad {name}s {mapping!r}: value must be a mapping from '
+            f'command names to values.')
+
+    return dict(
+        (command_name, check_value(value, name))
+        for command_name, value in mapping.items())
+
+
+def _check_resource_threshold(threshold, name):
+
+    if threshold is None:
+        return None
+
+    if isinstance(threshold, bool) or \
+            not isinstance(threshold, (int, float)) or threshold < 0:
+        raise JobSchedulerError(
+            f'Bad {name} {threshold!r}: value must be a nonnegative '
+            f'number.')
+
+    return threshold
+
+
+class ResourceUsage:
+
+    """
+    Resource usage of this computer.
+
+    The `cpu_load` attribute is the one-minute load average per CPU,
+    and the `available_memory` attribute is the available memory in
+    gigabytes. Either attribute is `None` if it cannot be measured.
+    """
+
+
+    def __init__(self, cpu_load=None, available_memory=None):
+        self.cpu_load = cpu_load
+        self.available_memory = available_memory
+
+
+def get_resource_usage():
+
+    """Measures the resource usage of this computer."""
+
+    return ResourceUsage(_get_cpu_load(), _get_available_memory())
+
+
+def _get_cpu_load():
+
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        # load average not available on this platform
+
+        return None
+
+    return load / (os.cpu_count() or 1)
+
+
+def _get_available_memory():
+
+    if psutil is None:
+        return None
+
+    return psutil.virtual_memory().available / 2 ** 30
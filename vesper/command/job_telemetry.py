@@ -0,0 +1,592 @@
+"""
+Module containing the Vesper job telemetry channel.
+
+Job telemetry is structured progress and performance information that
+job processes report to the main Vesper process while they run. It
+comprises:
+
+    * the number of units of work a job has done, the total number of
+      units of work it has to do (if known), and the name of the unit
+      (for example "clip" or "audio second").
+
+    * for each processing stage of a job (for example reading audio,
+      detection, inference, or database writes), the total time the
+      job has spent in the stage and the number of times it entered
+      the stage.
+
+A command reports telemetry through the `TelemetryReporter` returned by
+this module's `get_reporter` function. A reporter accumulates reports
+locally and sends them through a `multiprocessing` queue to the main
+process at most once per `_REPORTING_PERIOD` seconds, so reporting is
+cheap enough to do for every block of samples or every clip. Stage
+times are exclusive: time spent in a stage that is entered while
+another stage is active counts toward the inner stage only.
+
+In the main process, a `TelemetryCollector` reads reports from the
+queue and aggregates them per job and per command. The job manager
+owns the collector, and the server makes its aggregates available as
+JSON. Telemetry is held in memory only, so aggregates cover jobs that
+have run since the server started.
+
+Each process of a job that reports telemetry must configure this
+module once, with the `configure` function and the job's telemetry
+configuration, and should call the `flush` method of its reporter
+before it exits.
+"""
+
+
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+import queue
+import time
+
+
+_REPORTING_PERIOD = 1
+"""
+Minimum period in seconds between reports sent by a telemetry reporter.
+"""
+
+
+_RATE_WINDOW_DURATION = 10
+"""
+Duration in seconds of the window over which a telemetry collector
+computes the recent rate at which a job does work.
+"""
+
+
+_MAX_JOB_COUNT = 1000
+"""
+Maximum number of jobs for which a telemetry collector retains
+telemetry. When there are more, the collector discards the telemetry
+of the least recently started terminated jobs. Per-command aggregates
+still include discarded telemetry.
+"""
+
+
+class TelemetryReporter:
+
+    """
+    Reports job telemetry to the main Vesper process.
+
+    A reporter that is not connected to a telemetry queue, for example
+    in a process that is not part of a job, accumulates telemetry
+    without sending it anywhere.
+    """
+
+
+    def __init__(self, job_id=None, telemetry_queue=None):
+
+        self._job_id = job_id
+        self._queue = telemetry_queue
+
+        self._units_done = 0
+        self._stage_stack = []
+
+        self._total_units = None
+        self._unit_name = None
+        self._total_changed = False
+        self._pending_units_done = 0
+        self._pending_stage_stats = defaultdict(lambda: [0, 0])
+        self._report_time = time.time()
+
+
+    @property
+    def units_done(self):
+
+        """The number of units of work this reporter has reported done."""
+
+        return self._units_done
+
+
+    def set_total(self, total_units, unit_name=None):
+
+        """
+        Sets the total number of units of work of this job.
+
+        :Parameters:
+            total_units : int or float
+                the total number of units of work.
+            unit_name : str
+                the singular name of the unit of work, or `None`.
+        """
+
+        self._total_units = total_units
+        self._unit_name = unit_name
+        self._total_changed = True
+        self.flush()
+
+
+    def add_done(self, units=1):
+
+        """Reports that the specified number of units of work are done."""
+
+        self._units_done += units
+        self._pending_units_done += units
+        self._report_if_due()
+
+
+    @contextmanager
+    def stage(self, name):
+
+        """
+        Returns a context manager that times a processing stage.
+
+        For example::
+
+            with reporter.stage('read'):
+                samples = reader.read(start_index, length)
+        """
+
+        frame = [time.perf_counter(), 0]
+        self._stage_stack.append(frame)
+
+        try:
+            yield
+
+        finally:
+
+            self._stage_stack.pop()
+
+            duration = time.perf_counter() - frame[0]
+
+            if len(self._stage_stack) != 0:
+                # stage nested in another
+
+                # Exclude this stage's time from the enclosing stage.
+                self._stage_stack[-1][1] += duration
+
+            self.add_stage_time(name, duration - frame[1])
+
+
+    def add_stage_time(self, name, duration, count=1):
+
+        """
+        Reports time spent in a processing stage.
+
+        :Parameters:
+            name : str
+                the stage name.
+            duration : float
+                the time spent in the stage, in seconds.
+            count : int
+                the number of times the stage was entered.
+        """
+
+        stats = self._pending_stage_stats[name]
+        stats[0] += duration
+        stats[1] += count
+        self._report_if_due()
+
+
+    def _report_if_due(self):
+        if time.time() - self._report_time >= _REPORTING_PERIOD:
+            self.flush()
+
+
+    def flush(self):
+
+        """Sends any telemetry that this reporter has not yet sent."""
+
+        self._report_time = time.time()
+
+        if self._queue is None:
+            self._clear_pending()
+            return
+
+        if not self._total_changed and self._pending_units_done == 0 and \
+                len(self._pending_stage_stats) == 0:
+            return
+
+        report = {
+            'job_id': self._job_id,
+            'time': self._report_time,
+            'units_done': self._pending_units_done,
+            'stages': dict(
+                (name, tuple(stats))
+                for name, stats in self._pending_stage_stats.items())
+        }
+
+        if self._total_changed:
+            report['total_units'] = self._total_units
+            report['unit_name'] = self._unit_name
+
+        self._queue.put(report)
+
+        self._clear_pending()
+
+
+    def _clear_pending(self):
+        self._total_changed = False
+        self._pending_units_done = 0
+        self._pending_stage_stats.clear()
+
+
+_reporter = TelemetryReporter()
+
+
+def configure(telemetry_config):
+
+    """
+    Configures job telemetry for the current process.
+
+    :Parameters:
+        telemetry_config : picklable object
+            the telemetry configuration of the job of which the current
+            process is a part, or `None` to discard telemetry.
+    """
+
+    global _reporter
+
+    if telemetry_config is None:
+        _reporter = TelemetryReporter()
+    else:
+        job_id, telemetry_queue = telemetry_config
+        _reporter = TelemetryReporter(job_id, telemetry_queue)
+
+
+def get_reporter():
+
+    """Gets the telemetry reporter of the current process."""
+
+    return _reporter
+
+
+class TelemetryCollector:
+
+    """
+    Collects job telemetry in the main Vesper process.
+
+    This class is not thread safe: the job manager synchronizes access
+    to its collector.
+    """
+
+
+    def __init__(self, telemetry_queue, max_job_count=_MAX_JOB_COUNT):
+
+        self._queue = telemetry_queue
+        self._max_job_count = max_job_count
+
+        self._jobs = OrderedDict()
+        """Mapping from job IDs to `_JobTelemetry` objects."""
+
+        self._commands = {}
+        """Mapping from command names to `_CommandTelemetry` objects."""
+
+
+    def add_job(self, job_id, command_name):
+
+        """Notes that a job has started."""
+
+        job = _JobTelemetry(job_id, command_name, time.time())
+        self._jobs[job_id] = job
+
+        command = self._commands.get(command_name)
+        if command is None:
+            command = _CommandTelemetry(command_name)
+            self._commands[command_name] = command
+        command.job_count += 1
+
+        self._discard_old_jobs()
+
+
+    def _discard_old_jobs(self):
+
+        excess_count = len(self._jobs) - self._max_job_count
+
+        if excess_count <= 0:
+            return
+
+        job_ids = [
+            job_id for job_id, job in self._jobs.items()
+            if job.end_time is not None][:excess_count]
+
+        for job_id in job_ids:
+            del self._jobs[job_id]
+
+
+    def end_job(self, job_id):
+
+        """Notes that a job has terminated."""
+
+        job = self._jobs.get(job_id)
+
+        if job is not None and job.end_time is None:
+            job.end_time = time.time()
+            command = self._commands[job.command_name]
+            command.completed_elapsed_time += job.get_elapsed_time()
+
+
+    def process_reports(self):
+
+        """Processes the telemetry reports that are in the queue."""
+
+        while True:
+
+            try:
+                report = self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+            job = self._jobs.get(report['job_id'])
+
+            if job is not None:
+                job.process_report(report)
+                command = self._commands[job.command_name]
+                command.process_report(report)
+
+
+    def get_job_telemetry(self, job_id):
+
+        """
+        Gets the telemetry of a job.
+
+        :Parameters:
+            job_id : int
+                the job ID.
+
+        :Returns:
+            a dictionary with the following items, or `None` if there
+            is no telemetry for the job:
+
+                job_id
+                    the job ID.
+
+                command_name
+                    the name of the job's command.
+
+                running
+                    `True` if and only if the job is running.
+
+                unit_name
+                    the name of the job's unit of work, or `None`.
+
+                units_done
+                    the number of units of work done.
+
+                total_units
+                    the total number of units of work, or `None` if
+                    not known.
+
+                fraction_done
+                    the fraction of the total units of work done, or
+                    `None` if the total is not known.
+
+                elapsed_time
+                    the time in seconds since the job started, or for
+                    a terminated job the running time of the job.
+
+                units_per_second
+                    the average rate at which the job has done work.
+
+                recent_units_per_second
+                    the rate at which the job has done work over about
+                    the last `_RATE_WINDOW_DURATION` seconds, or `None`
+                    if the job is not running.
+
+                stages
+                    list of dictionaries, one per processing stage in
+                    order of decreasing stage time, with items `name`
+                    (the stage name), `time` (the total time spent in
+                    the stage, in seconds), `count` (the number of times
+                    the stage was entered), `mean_time` (the mean time
+                    per entry), and `fraction` (the fraction of the
+                    total time of all stages spent in the stage).
+        """
+
+        job = self._jobs.get(job_id)
+
+        if job is None:
+            return None
+
+        else:
+            return job.get_telemetry()
+
+
+    def get_command_telemetry(self):
+
+        """
+        Gets job telemetry aggregated by command.
+
+        :Returns:
+            a list of dictionaries, one per command in order of command
+            name, with the following items:
+
+                command_name
+                    the command name.
+
+                job_count
+                    the number of jobs of the command that have started.
+
+                running_job_count
+                    the number of jobs of the command that are running.
+
+                units_done
+                    the total number of units of work done by the jobs.
+
+                elapsed_time
+                    the total elapsed time of the jobs, in seconds.
+
+                units_per_second
+                    the aggregate rate at which the jobs have done work.
+
+                stages
+                    stage statistics, as for the `get_job_telemetry`
+                    method.
+        """
+
+        running_elapsed_times = defaultdict(float)
+        running_job_counts = defaultdict(int)
+
+        for job in self._jobs.values():
+            if job.end_time is None:
+                name = job.command_name
+                running_elapsed_times[name] += job.get_elapsed_time()
+                running_job_counts[name] += 1
+
+        return [
+            command.get_telemetry(
+                running_job_counts[name], running_elapsed_times[name])
+            for name, command in sorted(self._commands.items())]
+
+
+class _JobTelemetry:
+
+
+    def __init__(self, job_id, command_name, start_time):
+        self.job_id = job_id
+        self.command_name = command_name
+        self.start_time = start_time
+        self.end_time = None
+        self.unit_name = None
+        self.units_done = 0
+        self.total_units = None
+        self.stage_stats = defaultdict(lambda: [0, 0])
+
+        # (time, units done) pairs for computing recent rate.
+        self._progress = deque()
+
+
+    def process_report(self, report):
+
+        if 'total_units' in report:
+            self.total_units = report['total_units']
+            self.unit_name = report['unit_name']
+
+        self.units_done += report['units_done']
+
+        _add_stage_stats(self.stage_stats, report['stages'])
+
+        report_time = report['time']
+        self._progress.append((report_time, self.units_done))
+
+        window_start_time = report_time - _RATE_WINDOW_DURATION
+        while len(self._progress) > 2 and \
+                self._progress[1][0] <= window_start_time:
+            self._progress.popleft()
+
+
+    def get_elapsed_time(self):
+        end_time = self.end_time if self.end_time is not None else time.time()
+        return max(end_time - self.start_time, 0)
+
+
+    def get_telemetry(self):
+
+        elapsed_time = self.get_elapsed_time()
+
+        if self.total_units:
+            fraction_done = min(self.units_done / self.total_units, 1)
+        else:
+            fraction_done = None
+
+        return {
+            'job_id': self.job_id,
+            'command_name': self.command_name,
+            'running': self.end_time is None,
+            'unit_name': self.unit_name,
+            'units_done': self.units_done,
+            'total_units': self.total_units,
+            'fraction_done': fraction_done,
+            'elapsed_time': elapsed_time,
+            'units_per_second': _get_rate(self.units_done, elapsed_time),
+            'recent_units_per_second': self._get_recent_rate(),
+            'stages': _get_stage_telemetry(self.stage_stats)
+        }
+
+
+    def _get_recent_rate(self):
+
+        if self.end_time is not None:
+            return None
+
+        now = time.time()
+
+        # Find progress at start of rate window.
+        start_time, start_units_done = self.start_time, 0
+        for progress in self._progress:
+            if progress[0] > now - _RATE_WINDOW_DURATION:
+                break
+            start_time, start_units_done = progress
+
+        return _get_rate(self.units_done - start_units_done, now - start_time)
+
+
+class _CommandTelemetry:
+
+
+    def __init__(self, command_name):
+        self.command_name = command_name
+        self.job_count = 0
+        self.units_done = 0
+        self.completed_elapsed_time = 0
+        self.stage_stats = defaultdict(lambda: [0, 0])
+
+
+    def process_report(self, report):
+        self.units_done += report['units_done']
+        _add_stage_stats(self.stage_stats, report['stages'])
+
+
+    def get_telemetry(self, running_job_count, running_elapsed_time):
+
+        elapsed_time = self.completed_elapsed_time + running_elapsed_time
+
+        return {
+            'command_name': self.command_name,
+            'job_count': self.job_count,
+            'running_job_count': running_job_count,
+            'units_done': self.units_done,
+            'elapsed_time': elapsed_time,
+            'units_per_second': _get_rate(self.units_done, elapsed_time),
+            'stages': _get_stage_telemetry(self.stage_stats)
+        }
+
+
+def _add_stage_stats(stage_stats, report_stages):
+    for name, (duration, count) in report_stages.items():
+        stats = stage_stats[name]
+        stats[0] += duration
+        stats[1] += count
+
+
+def _get_rate(units, duration):
+    return units / duration if duration > 0 else None
+
+
+def _get_stage_telemetry(stage_stats):
+
+    total_time = sum(stats[0] for stats in stage_stats.values())
+
+    stages = [
+        {
+            'name': name,
+            'time': duration,
+            'count': count,
+            'mean_time': duration / count if count != 0 else None,
+            'fraction': duration / total_time if total_time > 0 else None
+        }
+        for name, (duration, count) in stage_stats.items()]
+
+    stages.sort(key=lambda stage: -stage['time'])
+
+    return stages
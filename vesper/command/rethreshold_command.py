@@ -0,0 +1,185 @@
+"""Module containing class `RethresholdCommand`."""
+
+
+import logging
+import time
+
+from vesper.command.command import Command, CommandExecutionError
+from vesper.command.detect_command import DetectorListener
+from vesper.django.app.models import Job, Recording, Station
+from vesper.singletons import archive, extension_manager
+import vesper.command.command_utils as command_utils
+import vesper.command.score_track_utils as score_track_utils
+import vesper.util.score_track_file as score_track_file
+import vesper.util.text_utils as text_utils
+
+
+_logger = logging.getLogger()
+
+
+class RethresholdCommand(Command):
+
+    """
+    Command that runs detectors on stored score tracks.
+
+    The command runs each specified detector on the score tracks stored
+    by the detect command for the detector's score track name, creating
+    clips much as the detect command would if it ran the detector on the
+    recordings from which the tracks were computed, but without
+    recomputing the scores. Since in Vesper a detector's threshold is
+    part of its identity, a typical use of the command is to create
+    clips for a detector with one threshold from the score tracks stored
+    by a run of another detector with the same score track name but a
+    different threshold, for example to create clips for the
+    "MPG Ranch Tseep Detector 1.0 60" from tracks stored when running
+    the "MPG Ranch Tseep Detector 1.0".
+    """
+
+
+    extension_name = 'rethreshold'
+
+
+    def __init__(self, args):
+
+        super().__init__(args)
+
+        get = command_utils.get_required_arg
+        self._detector_names = get('detectors', args)
+        self._station_names = get('stations', args)
+        self._start_date = get('start_date', args)
+        self._end_date = get('end_date', args)
+        self._defer_clip_creation = get('defer_clip_creation', args)
+
+
+    def execute(self, job_info):
+
+        self._job = Job.objects.get(id=job_info.job_id)
+
+        detectors = self._get_detectors()
+        recordings = self._get_recordings()
+
+        num_recordings = len(recordings)
+
+        for i, recording in enumerate(recordings):
+
+            _logger.info(
+                f'Processing recording {i + 1} of {num_recordings} - '
+                f'"{str(recording)}"...')
+
+            channels = recording.channels.all().order_by('channel_num')
+
+            for recording_channel in channels:
+                for detector_model, detector_class in detectors:
+                    self._run_detector(
+                        detector_model, detector_class, recording,
+                        recording_channel)
+
+        return True
+
+
+    def _get_detectors(self):
+
+        classes = extension_manager.instance.get_extensions('Detector')
+
+        detectors = []
+
+        for name in self._detector_names:
+
+            detector_model = archive.instance.get_processor(name)
+
+            try:
+                cls = classes[detector_model.name]
+            except KeyError:
+                raise CommandExecutionError(
+                    f'Unrecognized detector "{detector_model.name}".')
+
+            if not score_track_utils.supports_score_tracks(cls):
+                raise CommandExecutionError(
+                    f'Detector "{detector_model.name}" does not support '
+                    f'score tracks.')
+
+            detectors.append((detector_model, cls))
+
+        return detectors
+
+
+    def _get_recordings(self):
+
+        recordings = []
+
+        for station_name in self._station_names:
+
+            try:
+                station = Station.objects.get(name=station_name)
+            except Station.DoesNotExist:
+                raise CommandExecutionError(
+                    f'Unrecognized station "{station_name}".')
+
+            time_interval = station.get_night_interval_utc(
+                self._start_date, self._end_date)
+
+            recordings += Recording.objects.filter(
+                station=station, start_time__range=time_interval)
+
+        recordings.sort(key=lambda r: (r.station.name, r.start_time))
+
+        return recordings
+
+
+    def _run_detector(
+            self, detector_model, detector_class, recording,
+            recording_channel):
+
+        file_paths = score_track_utils.get_score_track_file_paths(
+            detector_class, recording_channel)
+
+        channel_num = recording_channel.channel_num
+
+        if len(file_paths) == 0:
+            _logger.info(
+                f'    Archive has no score tracks for detector '
+                f'"{detector_model.name}" and channel {channel_num}, '
+                f'so the detector will not be run on that channel.')
+            return
+
+        start_time = time.time()
+        num_scores = 0
+
+        for file_path in file_paths:
+
+            track = score_track_file.read_score_track(file_path)
+
+            if track.sample_rate != recording.sample_rate:
+                _logger.error(
+                    f'    Sample rate {track.sample_rate} of score track '
+                    f'"{file_path}" differs from recording sample rate '
+                    f'{recording.sample_rate}, so the track will be '
+                    f'ignored.')
+                continue
+
+            attributes = track.attributes
+
+            listener = DetectorListener(
+                detector_model, recording, recording_channel,
+                attributes['file_start_index'],
+                attributes['interval_start_index'],
+                self._defer_clip_creation, False, None, self._job, _logger)
+
+            detector = detector_class(recording.sample_rate, listener)
+
+            for scores, offset in track.get_chunks():
+                detector.process_scores(scores, offset)
+
+            detector.complete_detection()
+
+            num_scores += len(track.scores)
+
+        processing_time = text_utils.format_number(time.time() - start_time)
+        tracks_text = text_utils.create_count_text(
+            len(file_paths), 'score track')
+        scores_text = text_utils.create_count_text(num_scores, 'score')
+
+        _logger.info(
+            f'    Ran detector "{detector_model.name}" on {tracks_text} '
+            f'with {scores_text} for channel {channel_num} in '
+            f'{processing_time} seconds.')
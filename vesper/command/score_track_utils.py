@@ -0,0 +1,110 @@
+"""
+Utility functions pertaining to archive detector score tracks.
+
+When the detect command runs with the `store_score_tracks` argument
+set, it stores the score track of each detector that supports score
+tracks for each recording channel and detection interval on which
+the detector runs. The tracks are stored in subdirectories of the
+archive's "Score Tracks" directory, one subdirectory for each detector
+score track name and, within that, one for each recording channel.
+The rethreshold command creates clips from the stored tracks.
+
+See the `vesper.util.score_track_file` module for more about score
+tracks.
+"""
+
+
+import inspect
+
+from vesper.archive_paths import archive_paths
+from vesper.util.score_track_file import ScoreTrackWriter
+import vesper.util.score_track_file as score_track_file
+
+
+SCORE_TRACK_DTYPE = 'float16'
+"""Data type of stored score tracks."""
+
+
+def supports_score_tracks(detector_class):
+
+    """
+    Determines whether or not a detector class supports score tracks.
+
+    A detector class supports score tracks if it has a `score_track_name`
+    attribute, its initializer accepts a `score_listener` keyword
+    argument, and its instances have a `process_scores` method.
+    Detectors whose classes have the same score track name compute
+    the same scores, so they can detect clips from each other's tracks.
+    """
+
+    return hasattr(detector_class, 'score_track_name') and \
+        _accepts_score_listener(detector_class) and \
+        hasattr(detector_class, 'process_scores')
+
+
+def _accepts_score_listener(detector_class):
+
+    try:
+        parameters = inspect.signature(detector_class).parameters
+    except (TypeError, ValueError):
+        # could not get initializer signature
+        return False
+
+    return 'score_listener' in parameters or any(
+        p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+
+
+def get_score_track_dir_path(detector_class, recording_channel):
+    return archive_paths.score_track_dir_path / \
+        detector_class.score_track_name / \
+        'Recording Channel {}'.format(recording_channel.id)
+
+
+def create_score_track_writer(
+        detector_class, recording_channel, file_start_index,
+        interval_start_index, sample_rate):
+
+    """
+    Creates a writer for the score track of a detector run.
+
+    :Parameters:
+        detector_class : class
+            the class of the detector.
+        recording_channel : RecordingChannel
+            the recording channel on which the detector runs.
+        file_start_index : int
+            the index in the recording of the start of the recording
+            file on which the detector runs.
+        interval_start_index : int
+            the index in the recording file of the start of the interval
+            on which the detector runs.
+        sample_rate : int or float
+            the recording sample rate.
+
+    :Returns:
+        the score track writer.
+    """
+
+    dir_path = get_score_track_dir_path(detector_class, recording_channel)
+
+    start_index = file_start_index + interval_start_index
+    file_path = dir_path / 'Start {:012d}'.format(start_index)
+
+    attributes = {
+        'file_start_index': file_start_index,
+        'interval_start_index': interval_start_index
+    }
+
+    return ScoreTrackWriter(
+        file_path, sample_rate, SCORE_TRACK_DTYPE, attributes=attributes)
+
+
+def get_score_track_file_paths(detector_class, recording_channel):
+
+    """
+    Gets the file paths of the stored score tracks for a detector and
+    recording channel, in order of start index.
+    """
+
+    dir_path = get_score_track_dir_path(detector_class, recording_channel)
+    return score_track_file.get_score_track_file_paths(dir_path)
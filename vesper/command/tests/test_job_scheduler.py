@@ -0,0 +1,130 @@
+from vesper.command.job_scheduler import (
+    JobScheduler, JobSchedulerError, ResourceUsage)
+from vesper.tests.test_case import TestCase
+from vesper.util.bunch import Bunch
+
+
+class JobSchedulerTests(TestCase):
+
+
+    def test_no_limits(self):
+        scheduler = JobScheduler()
+        jobs = _create_jobs('detect', 'classify', 'detect')
+        self._assert_jobs(
+            scheduler.get_jobs_to_start(jobs, ['detect']), [1, 2, 3])
+
+
+    def test_max_running_jobs(self):
+        scheduler = JobScheduler(max_running_jobs=2)
+        jobs = _create_jobs('detect', 'classify', 'export')
+        self._assert_jobs(scheduler.get_jobs_to_start(jobs, []), [1, 2])
+        self._assert_jobs(
+            scheduler.get_jobs_to_start(jobs, ['detect']), [1])
+        self._assert_jobs(
+            scheduler.get_jobs_to_start(jobs, ['detect', 'detect']), [])
+
+
+    def test_command_limits(self):
+
+        scheduler = JobScheduler(command_limits={'detect': 1})
+        jobs = _create_jobs('detect', 'detect', 'classify')
+
+        self._assert_jobs(scheduler.get_jobs_to_start(jobs, []), [1, 3])
+
+        # A job whose command is at its limit does not hold up other jobs.
+        self._assert_jobs(
+            scheduler.get_jobs_to_start(jobs, ['detect']), [3])
+
+
+    def test_command_priorities(self):
+
+        scheduler = JobScheduler(
+            max_running_jobs=2,
+            command_priorities={'export': 10, 'detect': -1})
+
+        jobs = _create_jobs('detect', 'classify', 'export', 'classify')
+
+        self._assert_jobs(scheduler.sort_queue(jobs), [3, 2, 4, 1])
+        self._assert_jobs(scheduler.get_jobs_to_start(jobs, []), [3, 2])
+
+
+    def test_admission_control(self):
+
+        scheduler = JobScheduler(max_cpu_load=1.5, min_available_memory=2)
+        jobs = _create_jobs('detect', 'classify')
+
+        cases = [
+
+            # Admission control does not apply when no job is running.
+            ([], ResourceUsage(3, 1), [1]),
+
+            # At most one job is admitted at a time.
+            (['export'], ResourceUsage(1, 4), [1]),
+
+            (['export'], ResourceUsage(2, 4), []),
+            (['export'], ResourceUsage(1, 1), []),
+
+            # Resources that cannot be measured do not limit admission.
+            (['export'], ResourceUsage(), [1]),
+
+        ]
+
+        for running_command_names, usage, expected in cases:
+            jobs_to_start = scheduler.get_jobs_to_start(
+                jobs, running_command_names, usage)
+            self._assert_jobs(jobs_to_start, expected)
+
+
+    def test_create_from_preferences(self):
+
+        preferences = {
+            'job_scheduling': {
+                'max_running_jobs': 2,
+                'command_limits': {'detect': 1},
+                'command_priorities': {'export': 5},
+                'max_cpu_load': 1.5
+            }
+        }
+
+        scheduler = JobScheduler.create_from_preferences(preferences)
+
+        self.assertEqual(scheduler.max_running_jobs, 2)
+        self.assertEqual(scheduler.get_command_limit('detect'), 1)
+        self.assertIsNone(scheduler.get_command_limit('export'))
+        self.assertEqual(scheduler.get_command_priority('export'), 5)
+        self.assertEqual(scheduler.get_command_priority('detect'), 0)
+        self.assertTrue(scheduler.admission_control_enabled)
+
+        scheduler = JobScheduler.create_from_preferences({})
+        self.assertIsNone(scheduler.max_running_jobs)
+        self.assertFalse(scheduler.admission_control_enabled)
+
+
+    def test_preference_errors(self):
+
+        cases = [
+            'bobo',
+            {'max_running_jobs': 0},
+            {'max_running_jobs': 1.5},
+            {'command_limits': ['detect']},
+            {'command_limits': {'detect': True}},
+            {'command_priorities': {'detect': 'high'}},
+            {'max_cpu_load': -1},
+            {'min_available_memory': 'lots'},
+        ]
+
+        for settings in cases:
+            preferences = {'job_scheduling': settings}
+            self._assert_raises(
+                JobSchedulerError, JobScheduler.create_from_preferences,
+                preferences)
+
+
+    def _assert_jobs(self, jobs, expected_job_ids):
+        self.assertEqual([job.job_id for job in jobs], expected_job_ids)
+
+
+def _create_jobs(*command_names):
+    return [
+        Bunch(job_id=i + 1, command_name=name)
+        for i, name in enumerate(command_names)]
@@ -0,0 +1,133 @@
+import queue
+import time
+
+from vesper.command.job_telemetry import TelemetryCollector, TelemetryReporter
+from vesper.tests.test_case import TestCase
+import vesper.command.job_telemetry as job_telemetry
+
+
+class JobTelemetryTests(TestCase):
+
+
+    def test_reporting(self):
+
+        telemetry_queue = queue.Queue()
+        collector = TelemetryCollector(telemetry_queue)
+        collector.add_job(1, 'export')
+
+        reporter = TelemetryReporter(1, telemetry_queue)
+        reporter.set_total(10, 'clip')
+
+        for _ in range(4):
+            with reporter.stage('export'):
+                pass
+            reporter.add_done()
+
+        reporter.add_stage_time('read', 3, 2)
+
+        # Reports are sent at most once per reporting period.
+        collector.process_reports()
+        telemetry = collector.get_job_telemetry(1)
+        self.assertEqual(telemetry['units_done'], 0)
+        self.assertEqual(telemetry['total_units'], 10)
+
+        reporter.flush()
+        collector.process_reports()
+
+        telemetry = collector.get_job_telemetry(1)
+        self.assertEqual(telemetry['command_name'], 'export')
+        self.assertTrue(telemetry['running'])
+        self.assertEqual(telemetry['unit_name'], 'clip')
+        self.assertEqual(telemetry['units_done'], 4)
+        self.assertEqual(telemetry['fraction_done'], .4)
+        self.assertEqual(reporter.units_done, 4)
+
+        read, export = telemetry['stages']
+        self.assertEqual(read['name'], 'read')
+        self.assertEqual(read['time'], 3)
+        self.assertEqual(read['count'], 2)
+        self.assertEqual(read['mean_time'], 1.5)
+        self.assertEqual(export['name'], 'export')
+        self.assertEqual(export['count'], 4)
+        self.assertAlmostEqual(read['fraction'] + export['fraction'], 1)
+
+        collector.end_job(1)
+        telemetry = collector.get_job_telemetry(1)
+        self.assertFalse(telemetry['running'])
+        self.assertIsNone(telemetry['recent_units_per_second'])
+
+        self.assertIsNone(collector.get_job_telemetry(2))
+
+
+    def test_nested_stages(self):
+
+        telemetry_queue = queue.Queue()
+        collector = TelemetryCollector(telemetry_queue)
+        collector.add_job(1, 'detect')
+
+        reporter = TelemetryReporter(1, telemetry_queue)
+
+        with reporter.stage('detection'):
+            time.sleep(.02)
+            with reporter.stage('database_write'):
+                time.sleep(.05)
+
+        reporter.flush()
+        collector.process_reports()
+
+        stages = dict(
+            (stage['name'], stage)
+            for stage in collector.get_job_telemetry(1)['stages'])
+
+        # Time spent in a nested stage counts only toward that stage.
+        self.assertGreaterEqual(stages['database_write']['time'], .05)
+        self.assertLess(stages['detection']['time'], .05)
+
+
+    def test_command_telemetry(self):
+
+        telemetry_queue = queue.Queue()
+        collector = TelemetryCollector(telemetry_queue, max_job_count=2)
+
+        for job_id, command_name, units in \
+                ((1, 'export', 5), (2, 'detect', 60), (3, 'export', 3)):
+
+            collector.add_job(job_id, command_name)
+
+            reporter = TelemetryReporter(job_id, telemetry_queue)
+            reporter.add_done(units)
+            reporter.add_stage_time('read', 1)
+            reporter.flush()
+
+            collector.process_reports()
+            collector.end_job(job_id)
+
+        # Oldest job telemetry is discarded, but still aggregated.
+        self.assertIsNone(collector.get_job_telemetry(1))
+
+        detect, export = collector.get_command_telemetry()
+
+        self.assertEqual(detect['command_name'], 'detect')
+        self.assertEqual(detect['job_count'], 1)
+        self.assertEqual(detect['units_done'], 60)
+
+        self.assertEqual(export['command_name'], 'export')
+        self.assertEqual(export['job_count'], 2)
+        self.assertEqual(export['running_job_count'], 0)
+        self.assertEqual(export['units_done'], 8)
+        [read] = export['stages']
+        self.assertEqual(read['time'], 2)
+        self.assertEqual(read['count'], 2)
+
+
+    def test_unconfigured_reporter(self):
+
+        job_telemetry.configure(None)
+        reporter = job_telemetry.get_reporter()
+
+        reporter.set_total(2)
+        with reporter.stage('read'):
+            reporter.add_done()
+        reporter.flush()
+
+        self.assertEqual(reporter.units_done, 1)
@@ -2,12 +2,18 @@
 
 
 import logging
+import time
+
+from django.db import transaction
+import numpy as np
 
 from vesper.command.command import Command
-from vesper.django.app.models import AnnotationInfo, Job, Processor
+from vesper.django.app.models import (
+    AnnotationInfo, Job, Processor, StringAnnotation, StringAnnotationEdit)
 from vesper.singletons import archive
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
 import vesper.util.time_utils as time_utils
 
 
@@ -74,6 +80,13 @@ after the clip start.
 """
 
 
+_DATE_SEPARATION = 1e6
+"""
+Separation in seconds of call start window centers of clips of
+consecutive dates. See `_get_call_start_window_centers`.
+"""
+
+
 _logger = logging.getLogger()
 
 
@@ -121,16 +134,15 @@ class TransferCallClassificationsCommand(Command):
         return True
     
     
-    def _create_clip_query_values_iterator(self):
+    def _get_station_mic_output_pairs(self):
         
         try:
-            return model_utils.create_clip_query_values_iterator(
-                self._sm_pair_ui_names, self._start_date, self._end_date,
-                [self._source_detector_name])
+            pairs = model_utils.get_station_mic_output_pairs_dict()
+            return [pairs[name] for name in self._sm_pair_ui_names]
             
         except Exception as e:
             command_utils.log_and_reraise_fatal_exception(
-                e, 'Clip query values iterator construction',
+                e, 'Station/mic output pair lookup',
                 'The archive was not modified.')
 
 
@@ -140,134 +152,169 @@ class TransferCallClassificationsCommand(Command):
     
     
     def _transfer_classifications(self):
-        value_tuples = self._create_clip_query_values_iterator()
-        for station, mic_output, date, _ in value_tuples:
-            self._transfer_classifications_aux(station, mic_output, date)
-            
+        
+        start_time = time.time()
+        total_count = 0
+        
+        for station, mic_output in self._get_station_mic_output_pairs():
+            total_count += \
+                self._transfer_station_mic_classifications(station, mic_output)
             
-    def _transfer_classifications_aux(self, station, mic_output, date):
+        elapsed_time = time.time() - start_time
+        timing_text = command_utils.get_timing_text(
+            elapsed_time, total_count, 'classifications')
+        _logger.info(
+            f'Transferred {total_count} classifications{timing_text}.')
         
-        source_clips = model_utils.get_clips(
-            station=station,
-            mic_output=mic_output,
-            date=date,
-            detector=self._source_detector,
-            annotation_name=self._annotation_name,
-            annotation_value=self._annotation_value)
-                
-        target_clips = model_utils.get_clips(
-            station=station,
-            mic_output=mic_output,
-            date=date,
-            detector=self._target_detector,
-            annotation_name=self._annotation_name)
         
-        matches = self._match_clips_with_calls(source_clips, target_clips)
+    def _transfer_station_mic_classifications(self, station, mic_output):
         
-        _logger.info(
-            f'{self._source_detector.name} -> {self._target_detector.name} / '
-            f'{station.name} / {mic_output.name} / {date} / '
-            f'{source_clips.count()}  {target_clips.count()} {len(matches)}')
+        """
+        Transfers classifications for one station/mic output pair and
+        all dates of this command.
         
-        if len(matches) > 0:
-            
-            source_clips = list(source_clips.all())
-            target_clips = list(target_clips.all())
-            
-            # self._show_matches(matches, source_clips, target_clips)
-            
-            for i, j in matches:
-                self._transfer_classification(source_clips[i], target_clips[j])
-            
-
-    def _match_clips_with_calls(self, source_clips, target_clips):
+        The start times, dates, and classifications of the source and
+        target clips of all dates are retrieved with one query each,
+        the clips are matched for all dates at once, and the resulting
+        annotations and annotation edits are created in bulk in one
+        database transaction.
+        """
         
-        if source_clips.count() == 0 or target_clips.count() == 0:
-            # have no source clips or no target clips
-            
-            # In this simple case we know there are no matches, so
-            # we go ahead and return an empty list. We would get the
-            # same result if we executed the code in the `else` clause
-            # below, but that might waste considerable time (for example,
-            # if there are no source clips but many target clips).
-            return []
-        
-        else:
-            # have both source clips and target clips
-            
-            source_centers = _get_call_start_window_centers(
-                source_clips, self._reference_time,
-                self._source_call_start_window)
-            
-            target_centers = _get_call_start_window_centers(
-                target_clips, self._reference_time,
-                self._target_call_start_window)
-            
-            # self._show_clips(
-            #     source_clips, source_centers, target_clips, target_centers)
+        source_clips = self._get_clips(
+            station, mic_output, self._source_detector,
+            self._annotation_value)
+        
+        source_rows = StringAnnotation.objects.filter(
+            info=self._annotation_info,
+            clip__in=source_clips
+        ).order_by('clip__start_time').values_list(
+            'clip__start_time', 'clip__date', 'value')
+        source_start_times, source_dates, source_values = \
+            _get_columns(source_rows, 3)
             
-            max_distance = _get_matching_max_distance(
-                self._source_call_start_window, self._target_call_start_window)
+        target_clips = self._get_clips(
+            station, mic_output, self._target_detector, None)
+        
+        target_rows = target_clips.order_by('start_time').values_list(
+            'start_time', 'date', 'id')
+        target_start_times, target_dates, target_ids = \
+            _get_columns(target_rows, 3)
             
-            return _match_events(source_centers, target_centers, max_distance)
+        # Match clips of all dates at once. Matching respects date
+        # boundaries, as it would if we matched the clips of each date
+        # separately.
+        date_nums = self._get_date_nums(source_dates + target_dates)
         
-
-    def _show_clips(
-            self, source_clips, source_centers, target_clips, target_centers):
+        source_centers = _get_call_start_window_centers(
+            source_start_times, source_dates, date_nums,
+            self._reference_time, self._source_call_start_window)
         
-        source_start_times = [c.start_time for c in source_clips.all()]
-        target_start_times = [c.start_time for c in target_clips.all()]
+        target_centers = _get_call_start_window_centers(
+            target_start_times, target_dates, date_nums,
+            self._reference_time, self._target_call_start_window)
         
-        source_data = [
-            ('source', i, str(start_time), center)
-            for i, (start_time, center)
-            in enumerate(zip(source_start_times, source_centers))]
+        max_distance = _get_matching_max_distance(
+            self._source_call_start_window, self._target_call_start_window)
         
-        target_data = [
-            ('target', i, str(start_time), center)
-            for i, (start_time, center)
-            in enumerate(zip(target_start_times, target_centers))]
+        matches = _match_events(source_centers, target_centers, max_distance)
         
-        data = source_data + target_data
-        data.sort(key=lambda d: d[2])
+        self._log_date_counts(
+            station, mic_output, date_nums, source_dates, target_dates,
+            matches)
         
-        for d in data:
-            print(d)
-
-
-    def _show_matches(self, matches, source_clips, target_clips):
-        
-        min_diff = 1e6
-        max_diff = -1e6
-        
-        for k, (i, j) in enumerate(matches):
-            
-            s = source_clips[i]
-            t = target_clips[j]
+        if len(matches) != 0:
             
-            fs = s.sample_rate
+            classifications = [source_values[i] for i in matches[:, 0]]
+            clip_ids = [target_ids[j] for j in matches[:, 1]]
             
-            diff = (t.start_index - s.start_index) / fs
+            self._annotate_clips(clip_ids, classifications)
             
-            print('{} {:.3f} {:.3f} {:.3f}'.format(
-                k, s.start_index / fs, t.start_index / fs, diff))
-            
-            min_diff = min(diff, min_diff)
-            max_diff = max(diff, max_diff)
+        return len(matches)
+    
+    
+    def _get_clips(self, station, mic_output, detector, annotation_value):
+        
+        clips = model_utils.get_clips(
+            station=station,
+            mic_output=mic_output,
+            detector=detector,
+            annotation_name=self._annotation_name,
+            annotation_value=annotation_value,
+            order=False)
+        
+        return clips.filter(date__range=(self._start_date, self._end_date))
+    
+    
+    def _get_date_nums(self, dates):
+        
+        """
+        Gets a mapping from dates to their numbers of days after the
+        start date of this command.
+        """
+        
+        start_ordinal = self._start_date.toordinal()
+        return dict((d, d.toordinal() - start_ordinal) for d in set(dates))
+    
+    
+    def _log_date_counts(
+            self, station, mic_output, date_nums, source_dates, target_dates,
+            matches):
+        
+        num_dates = (self._end_date - self._start_date).days + 1
+        
+        def count(dates, indices=None):
+            nums = np.array([date_nums[d] for d in dates], dtype=int)
+            if indices is not None:
+                nums = nums[indices]
+            return np.bincount(nums, minlength=num_dates)
+        
+        source_counts = count(source_dates)
+        target_counts = count(target_dates)
+        match_counts = count(target_dates, matches[:, 1])
+        
+        for date, source_count, target_count, match_count in zip(
+                model_utils.create_date_iterator(
+                    self._start_date, self._end_date),
+                source_counts, target_counts, match_counts):
             
-        print('diff range [{:.3f}, {:.3f}]'.format(min_diff, max_diff))
+            _logger.info(
+                f'{self._source_detector.name} -> '
+                f'{self._target_detector.name} / {station.name} / '
+                f'{mic_output.name} / {date} / {source_count}  '
+                f'{target_count} {match_count}')
+    
+    
+    def _annotate_clips(self, clip_ids, classifications):
         
+        # The target clips are unclassified, so we can create their
+        # annotations and annotation edits in bulk rather than with
+        # `model_utils.annotate_clip`, which handles the more general
+        # case of clips that might already be annotated.
         
-    def _transfer_classification(self, source_clip, target_clip):
+        creation_time = time_utils.get_utc_now()
         
-        # Get source clip classification.
-        annotations = model_utils.get_clip_annotations(source_clip)
-        classification = annotations.get(self._annotation_name)
+        annotations = []
+        edits = []
         
-        # Classify target clip. 
-        model_utils.annotate_clip(
-            target_clip, self._annotation_info, classification,
-            creating_job=self._job)
+        for clip_id, classification in zip(clip_ids, classifications):
+            
+            kwargs = {
+                'clip_id': clip_id,
+                'info': self._annotation_info,
+                'value': classification,
+                'creation_time': creation_time,
+                'creating_user': None,
+                'creating_job': self._job,
+                'creating_processor': None
+            }
+            
+            annotations.append(StringAnnotation(**kwargs))
+            edits.append(StringAnnotationEdit(
+                action=StringAnnotationEdit.ACTION_SET, **kwargs))
+            
+        with archive_lock.atomic(), transaction.atomic():
+            StringAnnotation.objects.bulk_create(annotations)
+            StringAnnotationEdit.objects.bulk_create(edits)
             
             
 def _get_detector(name):
@@ -300,15 +347,43 @@ def _get_call_start_window(detector_name):
     return result
         
 
-def _get_call_start_window_centers(clips, reference_time, window):
+def _get_call_start_window_centers(
+        start_times, dates, date_nums, reference_time, window):
+    
+    """
+    Gets the call start window centers of clips, in seconds after a
+    reference time.
+    
+    So that clips of different dates never match, each center is offset
+    by an amount that is proportional to the number of the clip's date.
+    The offset is large enough that it separates the centers of
+    different dates by much more than any matching distance, but it
+    preserves the order of the centers.
+    """
     
     # Get offset from start of clip to center of call start window.
     start, end = window
     offset = (start + end) / 2
     
-    return [
-        (c.start_time - reference_time).total_seconds() + offset
-        for c in clips.all()]
+    times = np.array(
+        [(t - reference_time).total_seconds() for t in start_times])
+    
+    date_offsets = _DATE_SEPARATION * np.array(
+        [date_nums[d] for d in dates], dtype=float)
+    
+    return times + offset + date_offsets
+
+
+def _get_columns(rows, column_count):
+    
+    """Gets the columns of query result rows as lists."""
+    
+    columns = tuple(list(c) for c in zip(*rows))
+    
+    if len(columns) == 0:
+        return ([],) * column_count
+    else:
+        return columns
 
 
 def _get_annotation_info(name):
@@ -344,34 +419,58 @@ def _get_matching_max_distance(source_window, target_window):
 # algorithm be modified to yield the optimal matching?
 def _match_events(references, estimates, max_distance):
     
-    num_references = len(references)
+    """
+    Matches reference events with estimate events.
+    
+    The references and estimates must be sorted in increasing order.
+    The matching is that of a greedy algorithm that considers the
+    references in order and matches each with the first unmatched
+    estimate that follows all previously matched estimates and that
+    is within the maximum distance of it.
+    
+    The candidate estimate for each reference (the first estimate not
+    less than the reference minus the maximum distance) is found for
+    all references at once with `np.searchsorted`. Only references
+    whose candidates are within the maximum distance can match, and
+    the remaining sequential step of the algorithm considers only
+    those references.
+    
+    :Returns:
+        an array of shape (n, 2) of the index pairs (i, j) of the n
+        matched references and estimates.
+    """
+    
+    references = np.asarray(references, dtype=float)
+    estimates = np.asarray(estimates, dtype=float)
+    
     num_estimates = len(estimates)
     
-    i = 0
-    j = 0
+    candidates = np.searchsorted(
+        estimates, references - max_distance, side='left')
+    
+    # Find references with candidates within max distance.
+    possible = candidates < num_estimates
+    possible[possible] = \
+        estimates[candidates[possible]] - references[possible] <= max_distance
     
     matches = []
     
-    while i != num_references and j != num_estimates:
+    # index of first estimate that is available for matching
+    j = 0
+    
+    for i in np.flatnonzero(possible).tolist():
         
-        diff = references[i] - estimates[j]
+        # Skip estimates that precede reference i by more than max
+        # distance, and matched estimates.
+        j = max(j, int(candidates[i]))
         
-        if diff < -max_distance:
-            # reference i precedes estimate j by more than max distance
-            
-            i += 1
-            
-        elif diff > max_distance:
-            # reference i follows reference j by more than max distance
-            
-            j += 1
-            
-        else:
+        if j == num_estimates:
+            break
+        
+        if estimates[j] - references[i] <= max_distance:
             # reference i is within max distance of estimate j
-                        
-            matches.append((i, j))
             
-            i += 1
+            matches.append((i, j))
             j += 1
             
-    return matches
+    return np.array(matches, dtype=int).reshape((-1, 2))
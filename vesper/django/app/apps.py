@@ -16,3 +16,11 @@ class VesperConfig(AppConfig):
         
         # Create the one and only archive lock.
         archive_lock.create_lock()
+        
+        # Increment the archive metadata version whenever archive
+        # metadata change. This is here instead of at the top of this
+        # module since the archive module imports models, which cannot
+        # be imported until the app registry is ready.
+        from vesper.django.app.archive import \
+            connect_metadata_signal_handlers
+        connect_metadata_signal_handlers()
@@ -2,9 +2,17 @@
 
 
 from collections import defaultdict
+import pickle
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 
 from vesper.django.app.models import (
-    AnnotationConstraint, AnnotationInfo, Processor, TagInfo)
+    AnnotationConstraint, AnnotationInfo, ArchiveMetadataVersion, Processor,
+    TagInfo)
+import vesper.util.archive_lock as archive_lock
 import vesper.util.yaml_utils as yaml_utils
 
 
@@ -19,6 +27,26 @@ _STRING_ANNOTATION_VALUE_COMPONENT_SEPARATOR = '.'
 _STRING_ANNOTATION_VALUE_WILDCARD = '*'
 _STRING_ANNOTATION_VALUE_NONE = '-None-'
 
+_METADATA_MODELS = (AnnotationConstraint, AnnotationInfo, Processor, TagInfo)
+"""Models whose instances are cached by the `Archive` class."""
+
+_METADATA_VERSION_ID = 1
+"""ID of the one and only `ArchiveMetadataVersion` row."""
+
+_METADATA_VERSION_CHECK_PERIOD = 1
+"""
+Minimum period in seconds between checks of the archive metadata version.
+
+An `Archive` checks the archive metadata version at most once per period,
+so that a process that uses archive metadata heavily does not query the
+database for the version on every use. Changes made by other processes
+may thus take up to a period to become visible. Changes made by the
+current process are visible immediately.
+"""
+
+_metadata_change_count = 0
+"""Number of archive metadata changes made by this process."""
+
 
 class Archive:
     
@@ -29,6 +57,17 @@ class Archive:
     objects of several types. They also support object UI names and
     object hiding, which are specified via preferences and not
     supported by the archive database.
+    
+    The cached objects are shared by all of the processes that use an
+    archive via a versioned snapshot stored in the archive database.
+    The archive metadata version is incremented whenever a processor,
+    annotation constraint, annotation info, or tag info is saved or
+    deleted, and an `Archive` whose cache is older than the current
+    version loads the current snapshot, or rebuilds its cache and
+    saves a new snapshot if the current snapshot is stale. Note that
+    since the version is incremented by model signal handlers, changes
+    made with `QuerySet.update` or raw SQL must be followed by a call
+    to the `increment_metadata_version` function of this module.
     """
     
     
@@ -110,8 +149,20 @@ class Archive:
         no value, any or no value, and any value, respectively.
         """
 
-        self._processor_cache_dirty = True
-        self._string_anno_values_cache_dirty = True
+        self._tag_specs = None
+        """List of tag specs."""
+        
+        self._metadata_version = None
+        """Archive metadata version of cached objects."""
+        
+        self._metadata_version_check_time = None
+        """Time of last archive metadata version check."""
+        
+        self._metadata_change_count = None
+        """
+        Value of this process's archive metadata change count at time of
+        last archive metadata version check.
+        """
         
     
     @property
@@ -140,16 +191,71 @@ class Archive:
     
     
     def get_processors_of_type(self, processor_type):
-        self._refresh_processor_cache_if_needed()
+        self._refresh_cache_if_needed()
         return self._processors_by_type.get(processor_type, [])
     
     
-    def _refresh_processor_cache_if_needed(self):
-        if self._processor_cache_dirty:
-            self.refresh_processor_cache()
+    def _refresh_cache_if_needed(self):
+        
+        if self._is_metadata_version_check_due():
+            
+            version = _get_metadata_version()
             
+            self._metadata_version_check_time = time.monotonic()
+            self._metadata_change_count = _metadata_change_count
+            
+            if version != self._metadata_version:
+                self._refresh_cache(version, True)
+                
+                
+    def _is_metadata_version_check_due(self):
+        
+        if self._metadata_version is None:
+            # cache is empty
+            
+            return True
+        
+        elif self._metadata_change_count != _metadata_change_count:
+            # this process has changed archive metadata since last check
+            
+            return True
+        
+        else:
+            elapsed_time = time.monotonic() - self._metadata_version_check_time
+            return elapsed_time >= _METADATA_VERSION_CHECK_PERIOD
+        
+        
+    def _refresh_cache(self, version, use_snapshot):
+        
+        snapshot = _get_metadata_snapshot(version) if use_snapshot else None
+        
+        if snapshot is None:
+            snapshot = _create_metadata_snapshot()
+            _save_metadata_snapshot(snapshot, version)
             
+        self._set_processor_cache(snapshot['processors'])
+        self._set_string_annotation_values_cache(
+            snapshot['string_annotation_values'])
+        self._tag_specs = [_NOT_APPLICABLE] + snapshot['tag_names']
+        
+        self._metadata_version = version
+        
+        
     def refresh_processor_cache(self):
+        
+        """
+        Refreshes this archive's cache from the archive database.
+        
+        The cache is rebuilt from the database regardless of the archive
+        metadata version. It is not usually necessary to call this method
+        since the cache is refreshed automatically when the archive
+        metadata version changes.
+        """
+        
+        self._refresh_cache(_get_metadata_version(), False)
+        
+        
+    def _set_processor_cache(self, processors):
             
         ui_names_pref = self._ui_names.get('processors', {})
         
@@ -157,9 +263,9 @@ class Archive:
         by_name = {}
         ui_names = {}
         
-        # We iterate over processors in order of name so that processor
-        # lists in the `by_type` mappings will be ordered by name.
-        for p in Processor.objects.all().order_by('name'):
+        # The processors are ordered by name, so the processor lists
+        # in the `by_type` mappings will be, too.
+        for p in processors:
         
             by_type[p.type].append(p)
             
@@ -183,8 +289,6 @@ class Archive:
                 (k, self._get_visible_processors(v, hidden_names))
                 for k, v in self._processors_by_type.items())
             
-        self._processor_cache_dirty = False
-        
             
     def _get_visible_processors(self, processors, hidden_names):
         return [
@@ -194,12 +298,12 @@ class Archive:
         
         
     def get_visible_processors_of_type(self, processor_type):
-        self._refresh_processor_cache_if_needed()
+        self._refresh_cache_if_needed()
         return self._visible_processors_by_type.get(processor_type, [])
         
         
     def get_processor(self, processor_name):
-        self._refresh_processor_cache_if_needed()
+        self._refresh_cache_if_needed()
         try:
             return self._processors_by_name[processor_name]
         except KeyError:
@@ -207,7 +311,7 @@ class Archive:
 
 
     def get_processor_ui_name(self, processor):
-        self._refresh_processor_cache_if_needed()
+        self._refresh_cache_if_needed()
         try:
             return self._processor_ui_names[processor.name]
         except KeyError:
@@ -215,51 +319,53 @@ class Archive:
         
         
     def get_string_annotation_values(self, annotation_name):
-        self._refresh_string_annotation_values_cache_if_needed()
+        self._refresh_cache_if_needed()
         try:
             return self._string_anno_archive_value_tuples[annotation_name]
         except KeyError:
             _handle_unrecognized_annotation_name(annotation_name)
      
     
-    def _refresh_string_annotation_values_cache_if_needed(self):
-        if self._string_anno_values_cache_dirty:
-            self.refresh_string_annotation_values_cache()
-             
-             
     def refresh_string_annotation_values_cache(self):
         
-        infos = AnnotationInfo.objects.all()
+        """
+        Refreshes this archive's cache from the archive database.
+        
+        This method is equivalent to `refresh_processor_cache`.
+        """
+        
+        self.refresh_processor_cache()
         
-        self._string_anno_archive_value_tuples = dict(
-            (i.name, _get_string_annotation_archive_values(i.name))
-            for i in infos)
+        
+    def _set_string_annotation_values_cache(self, archive_value_tuples):
+        
+        names = archive_value_tuples.keys()
+        
+        self._string_anno_archive_value_tuples = archive_value_tuples
         
         ui_values_pref = self._ui_names.get('annotation_values', {})
         
         self._string_anno_ui_values = dict(
-            (i.name, ui_values_pref.get(i.name, {}))
-            for i in infos)
+            (name, ui_values_pref.get(name, {}))
+            for name in names)
         
         self._string_anno_archive_values = dict(
-            (i.name, _invert(ui_values_pref.get(i.name, {})))
-            for i in infos)
+            (name, _invert(ui_values_pref.get(name, {})))
+            for name in names)
         
         hidden_values_pref = self._hidden_objects.get('annotation_values', {})
         
         self._visible_string_anno_ui_values = dict(
-            (i.name, self._get_visible_string_annotation_ui_values(
-                i.name, hidden_values_pref))
-            for i in AnnotationInfo.objects.all())
+            (name, self._get_visible_string_annotation_ui_values(
+                name, hidden_values_pref))
+            for name in names)
         
         self._visible_string_anno_ui_value_specs = dict(
-            (i.name,
+            (name,
              self._get_visible_string_annotation_ui_value_specs(
-                 i.name, hidden_values_pref))
-            for i in AnnotationInfo.objects.all())
+                 name, hidden_values_pref))
+            for name in names)
                 
-        self._string_anno_values_cache_dirty = False
-         
              
     def _get_visible_string_annotation_ui_values(
             self, annotation_name, hidden_values_pref):
@@ -317,7 +423,7 @@ class Archive:
     def get_string_annotation_archive_value(
             self, annotation_name, annotation_value):
         
-        self._refresh_string_annotation_values_cache_if_needed()
+        self._refresh_cache_if_needed()
         
         return self._get_string_annotation_archive_value(
             annotation_name, annotation_value)
@@ -325,7 +431,7 @@ class Archive:
         
     # We define this method so we can call it instead of the public
     # `get_string_annotation_archive_value` method from within the
-    # `_refresh_string_annotation_values_cache` method. Calling the
+    # `_set_string_annotation_values_cache` method. Calling the
     # public method would initiate an endless recursion.
     def _get_string_annotation_archive_value(
             self, annotation_name, annotation_value):
@@ -352,7 +458,7 @@ class Archive:
     def get_string_annotation_ui_value(
             self, annotation_name, annotation_value):
         
-        self._refresh_string_annotation_values_cache_if_needed()
+        self._refresh_cache_if_needed()
         
         return self._get_string_annotation_ui_value(
             annotation_name, annotation_value)
@@ -360,7 +466,7 @@ class Archive:
         
     # We define this method so we can call it instead of the public
     # `get_string_annotation_ui_value` method from within the
-    # `_refresh_string_annotation_values_cache` method. Calling the
+    # `_set_string_annotation_values_cache` method. Calling the
     # public method would initiate an endless recursion.
     def _get_string_annotation_ui_value(
             self, annotation_name, annotation_value):
@@ -371,7 +477,7 @@ class Archive:
     
     def get_visible_string_annotation_ui_values(self, annotation_name):
         
-        self._refresh_string_annotation_values_cache_if_needed()
+        self._refresh_cache_if_needed()
         
         try:
             return self._visible_string_anno_ui_values[annotation_name]
@@ -382,7 +488,7 @@ class Archive:
     def get_visible_string_annotation_ui_value_specs(
             self, annotation_name):
         
-        self._refresh_string_annotation_values_cache_if_needed()
+        self._refresh_cache_if_needed()
         
         try:
             return self._visible_string_anno_ui_value_specs[
@@ -392,12 +498,103 @@ class Archive:
             
             
     def get_tag_specs(self):
-        infos = TagInfo.objects.all().order_by('name')
-        names = [i.name for i in infos]
-        specs = [_NOT_APPLICABLE] + names
-        return specs
+        self._refresh_cache_if_needed()
+        return list(self._tag_specs)
+    
+    
+def connect_metadata_signal_handlers():
+    
+    """
+    Connects model signal handlers that increment the archive metadata
+    version when archive metadata change.
+    
+    This function should be called once per process, at Django startup.
+    """
+    
+    for model in _METADATA_MODELS:
+        
+        post_save.connect(
+            _handle_metadata_change, sender=model,
+            dispatch_uid='vesper_archive_metadata_save_' + model.__name__)
+        
+        post_delete.connect(
+            _handle_metadata_change, sender=model,
+            dispatch_uid='vesper_archive_metadata_delete_' + model.__name__)
+
+
+def _handle_metadata_change(**kwargs):
+    increment_metadata_version()
+
+
+def increment_metadata_version():
+    
+    """
+    Increments the archive metadata version.
+    
+    Every `Archive` of every process that uses the archive will refresh
+    its cache before its next use.
+    """
+    
+    global _metadata_change_count
+    
+    with archive_lock.atomic(), transaction.atomic():
+        ArchiveMetadataVersion.objects.filter(
+            id=_METADATA_VERSION_ID).update(version=F('version') + 1)
+        
+    _metadata_change_count += 1
+    
+    
+def _get_metadata_version():
+    return ArchiveMetadataVersion.objects.values_list(
+        'version', flat=True).get(id=_METADATA_VERSION_ID)
+
+
+def _get_metadata_snapshot(version):
+    
+    snapshot = ArchiveMetadataVersion.objects.filter(
+        id=_METADATA_VERSION_ID, snapshot_version=version).values_list(
+            'snapshot', flat=True).first()
+        
+    if snapshot is None:
+        return None
+    
+    else:
+        # Some database backends return a `memoryview` rather than a
+        # `bytes` object for a binary field.
+        return pickle.loads(bytes(snapshot))
+    
     
+def _create_metadata_snapshot():
     
+    processors = list(Processor.objects.all().order_by('name'))
+    
+    string_annotation_values = dict(
+        (i.name, _get_string_annotation_archive_values(i))
+        for i in AnnotationInfo.objects.all().select_related('constraint'))
+    
+    tag_names = list(
+        TagInfo.objects.all().order_by('name').values_list('name', flat=True))
+    
+    return {
+        'processors': processors,
+        'string_annotation_values': string_annotation_values,
+        'tag_names': tag_names
+    }
+
+
+def _save_metadata_snapshot(snapshot, version):
+    
+    snapshot = pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+    
+    # We save the snapshot only if the archive metadata version has not
+    # changed since we got it, since otherwise the snapshot might
+    # include changes made after the version was incremented.
+    with archive_lock.atomic(), transaction.atomic():
+        ArchiveMetadataVersion.objects.filter(
+            id=_METADATA_VERSION_ID, version=version).update(
+                snapshot=snapshot, snapshot_version=version)
+
+
 def _get_hidden_objects(preferences):
     
     objects = preferences.get('hidden_objects', {})
@@ -425,12 +622,7 @@ def _handle_unrecognized_annotation_name(name):
         'Archive cache does not recognize annotation name "{}".'.format(name))
 
 
-def _get_string_annotation_archive_values(annotation_name):
-    
-    try:
-        info = AnnotationInfo.objects.get(name=annotation_name)
-    except AnnotationInfo.DoesNotExist:
-        return None
+def _get_string_annotation_archive_values(info):
     
     constraint = info.constraint
     
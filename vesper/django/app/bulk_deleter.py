@@ -0,0 +1,311 @@
+"""Module containing class `BulkDeleter`."""
+
+
+from django.db import connection, transaction
+from django.db.models import CASCADE
+import numpy as np
+
+from vesper.archive_paths import archive_paths
+from vesper.django.app.models import Clip, Recording
+from vesper.singletons import clip_manager
+from vesper.util.bunch import Bunch
+from vesper.util.deletion_queue import DeletionQueue
+import vesper.util.archive_lock as archive_lock
+
+
+_ID_TABLE_NAME = 'vesper_deletion_ids'
+"""Name of temporary table that holds IDs of objects to delete."""
+
+_ID_INSERTION_CHUNK_SIZE = 10000
+
+_EXISTENCE_QUERY_CHUNK_SIZE = 900
+"""
+Maximum number of clip IDs per existence query. Queries with many more
+IDs can exceed the SQLite limit on the number of SQL variables, which
+can be as low as 999.
+"""
+
+
+class BulkDeleter:
+
+    """
+    Deletes clips and recordings from an archive.
+
+    A bulk deleter deletes clips and recordings and all of the database
+    rows that depend on them with set-based SQL `DELETE` statements,
+    without loading any of the rows into Python. The IDs of the objects
+    to delete are inserted into a temporary table, so that any number
+    of them can be deleted with a fixed number of statements.
+
+    Clip audio files are deleted by a background thread after the
+    transaction that deletes their clips commits, via a persistent
+    deletion queue in the archive directory. The queue is crash safe:
+    audio file deletions that are interrupted by a crash are resumed
+    by the next bulk deleter that is created for the archive.
+    """
+
+
+    def __init__(self, delete_audio_files=True):
+
+        if delete_audio_files:
+            self._queue = _create_audio_file_deletion_queue()
+        else:
+            self._queue = None
+
+
+    def delete_recordings(self, recording_ids):
+
+        """
+        Deletes recordings and their channels, files, and clips.
+
+        :Parameters:
+
+            recording_ids : sequence of int
+                the IDs of the recordings to delete.
+
+        :Returns:
+            the number of clips deleted.
+        """
+
+        clip_where = (
+            f'recording_channel_id IN (SELECT id FROM '
+            f'vesper_recording_channel WHERE recording_id IN '
+            f'(SELECT id FROM {_ID_TABLE_NAME}))')
+
+        return self._delete(Recording, recording_ids, clip_where)
+
+
+    def delete_clips(self, clip_ids):
+
+        """
+        Deletes clips and their annotations, tags, and edits.
+
+        The detection work units of the detectors and recordings of
+        the clips are also deleted, so that detection can recreate
+        the clips.
+
+        :Parameters:
+
+            clip_ids : sequence of int
+                the IDs of the clips to delete.
+
+        :Returns:
+            the number of clips deleted.
+        """
+
+        clip_where = f'id IN (SELECT id FROM {_ID_TABLE_NAME})'
+
+        return self._delete(Clip, clip_ids, clip_where)
+
+
+    def _delete(self, model, ids, clip_where):
+
+        ticket = None
+
+        # A deletion queue that recovers pending deletions ignores the
+        # pending files of processes that exist, so it never sees the
+        # pending deletions of a transaction that is in progress, even
+        # when the archive lock does nothing (as for PostgreSQL).
+        with archive_lock.atomic():
+
+            try:
+
+                with transaction.atomic():
+
+                    with connection.cursor() as cursor:
+
+                        _create_id_table(cursor, ids)
+
+                        if self._queue is not None:
+                            rows = _get_clip_audio_file_rows(
+                                cursor, clip_where)
+                            ticket = self._queue.prepare(rows)
+
+                        cursor.execute(
+                            f'SELECT COUNT(*) FROM vesper_clip '
+                            f'WHERE {clip_where}')
+                        clip_count = cursor.fetchone()[0]
+
+                        _delete_detection_work_units(cursor, clip_where)
+
+                        _delete_rows(
+                            cursor, model,
+                            f'id IN (SELECT id FROM {_ID_TABLE_NAME})')
+
+                        cursor.execute(f'DROP TABLE {_ID_TABLE_NAME}')
+
+            except Exception:
+                if ticket is not None:
+                    self._queue.abort(ticket)
+                raise
+
+            if ticket is not None:
+                self._queue.commit(ticket)
+
+        return clip_count
+
+
+    def get_audio_file_deletion_stats(self):
+
+        """
+        Gets statistics for the clip audio file deletions of this
+        deleter.
+
+        :Returns:
+            a `Bunch` as returned by `DeletionQueue.get_stats`, or
+            `None` if this deleter does not delete clip audio files.
+        """
+
+        if self._queue is None:
+            return None
+        else:
+            return self._queue.get_stats()
+
+
+    def wait_for_audio_file_deletions(self, timeout=None):
+
+        """
+        Waits for the clip audio file deletions of this deleter to
+        complete.
+
+        :Returns:
+            `True` if the deletions completed, or `False` if the wait
+            timed out.
+        """
+
+        if self._queue is None:
+            return True
+        else:
+            return self._queue.join(timeout)
+
+
+    def close(self):
+
+        """
+        Closes this deleter.
+
+        Clip audio file deletions that have not yet been performed
+        remain queued, to be performed by the next bulk deleter created
+        for the archive.
+        """
+
+        if self._queue is not None:
+            self._queue.close()
+
+
+def _create_audio_file_deletion_queue():
+
+    manager = clip_manager.instance
+
+    def delete(row):
+        clip_id, start_index, length = row
+        if start_index == -1:
+            start_index = None
+        clip = Bunch(id=clip_id, start_index=start_index, length=length)
+        manager.delete_audio_file(clip)
+
+    queue = DeletionQueue(
+        archive_paths.clip_audio_file_deletion_queue_dir_path, delete, 3)
+
+    queue.recover(_get_deleted_clip_rows)
+
+    queue.start()
+
+    return queue
+
+
+def _get_deleted_clip_rows(rows):
+
+    """Gets the rows of clips that are not in the archive database."""
+
+    clip_ids = rows[:, 0].tolist()
+    existing_ids = set()
+
+    for i in range(0, len(clip_ids), _EXISTENCE_QUERY_CHUNK_SIZE):
+        chunk = clip_ids[i:i + _EXISTENCE_QUERY_CHUNK_SIZE]
+        existing_ids.update(
+            Clip.objects.filter(id__in=chunk).values_list('id', flat=True))
+
+    deleted = np.array([i not in existing_ids for i in clip_ids], dtype=bool)
+
+    return rows[deleted]
+
+
+def _create_id_table(cursor, ids):
+
+    cursor.execute(
+        f'CREATE TEMPORARY TABLE {_ID_TABLE_NAME} '
+        f'(id BIGINT PRIMARY KEY)')
+
+    ids = [(int(i),) for i in ids]
+
+    for i in range(0, len(ids), _ID_INSERTION_CHUNK_SIZE):
+        cursor.executemany(
+            f'INSERT INTO {_ID_TABLE_NAME} (id) VALUES (%s)',
+            ids[i:i + _ID_INSERTION_CHUNK_SIZE])
+
+
+def _get_clip_audio_file_rows(cursor, clip_where):
+
+    cursor.execute(
+        f'SELECT id, start_index, length FROM vesper_clip '
+        f'WHERE {clip_where}')
+
+    rows = [
+        (clip_id, -1 if start_index is None else start_index, length)
+        for clip_id, start_index, length in cursor.fetchall()]
+
+    return np.array(rows, dtype='<i8').reshape((-1, 3))
+
+
+def _delete_detection_work_units(cursor, clip_where):
+
+    """
+    Deletes the detection work units of the detectors and recordings
+    of the clips that satisfy a condition.
+
+    The detect command skips the work of complete work units, so we
+    delete the units of deleted clips to ensure that running their
+    detectors again on their recordings creates them again.
+    """
+
+    cursor.execute(
+        f'DELETE FROM vesper_detection_work_unit WHERE id IN ('
+        f'SELECT u.id FROM vesper_detection_work_unit u '
+        f'JOIN vesper_recording_file f ON u.recording_file_id = f.id '
+        f'JOIN vesper_recording_channel rc '
+        f'ON rc.recording_id = f.recording_id '
+        f'JOIN vesper_clip c ON c.recording_channel_id = rc.id '
+        f'AND c.creating_processor_id = u.detector_id '
+        f'WHERE c.id IN (SELECT id FROM vesper_clip WHERE {clip_where}))')
+
+
+def _delete_rows(cursor, model, where):
+
+    """
+    Deletes the rows of a model's table that satisfy a condition,
+    along with all rows that depend on them.
+
+    Dependent rows are deleted first, with one `DELETE` statement
+    per dependent table whose condition selects the rows that refer
+    to the rows being deleted.
+    """
+
+    meta = model._meta
+    table = meta.db_table
+    pk = meta.pk.column
+
+    for relation in meta.related_objects:
+
+        if relation.on_delete is not CASCADE:
+            raise ValueError(
+                f'Bulk deletion does not support relation from '
+                f'"{relation.related_model.__name__}" to '
+                f'"{model.__name__}", which does not cascade deletes.')
+
+        _delete_rows(
+            cursor, relation.related_model,
+            f'{relation.field.column} IN '
+            f'(SELECT {pk} FROM {table} WHERE {where})')
+
+    cursor.execute(f'DELETE FROM {table} WHERE {where}')
@@ -8,6 +8,8 @@ import vesper.django.app.form_utils as form_utils
 _FORM_TITLE = 'Detect'
 _SCHEDULE_FIELD_LABEL = 'Schedule'
 _DEFER_CLIP_CREATION_LABEL = 'Defer clip creation'
+_STORE_SCORE_TRACKS_LABEL = 'Store score tracks'
+_SKIP_COMPLETED_WORK_LABEL = 'Skip completed work'
     
     
 def _get_field_default(name, default):
@@ -33,6 +35,18 @@ class DetectForm(forms.Form):
         initial=_get_field_default(_DEFER_CLIP_CREATION_LABEL, False),
         required=False)
     
+    store_score_tracks = forms.BooleanField(
+        label=_STORE_SCORE_TRACKS_LABEL,
+        label_suffix='',
+        initial=_get_field_default(_STORE_SCORE_TRACKS_LABEL, False),
+        required=False)
+    
+    skip_completed_work = forms.BooleanField(
+        label=_SKIP_COMPLETED_WORK_LABEL,
+        label_suffix='',
+        initial=_get_field_default(_SKIP_COMPLETED_WORK_LABEL, True),
+        required=False)
+    
     
     def __init__(self, *args, **kwargs):
         
@@ -0,0 +1,163 @@
+"""
+Django management command that moves the clip audio files of a Vesper
+archive into a clip segment store.
+"""
+
+
+import os
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vesper.archive_paths import archive_paths
+from vesper.util.clip_segment_store import ClipSegmentStore
+import vesper.util.audio_file_utils as audio_file_utils
+import vesper.util.os_utils as os_utils
+
+
+_CLIP_FILE_NAME_RE = re.compile(r'^Clip ([\d ]+)\.wav$')
+
+_PROGRESS_PERIOD = 10000
+"""Number of clip audio files between progress messages."""
+
+_DELETION_BATCH_SIZE = 1000
+"""
+Number of clip audio files to delete at once when the `--delete`
+option is specified. The store is synced before each batch is deleted.
+"""
+
+
+class Command(BaseCommand):
+
+
+    help = (
+        'Moves the clip audio files of the archive in the current '
+        'directory into a clip segment store. Set the archive\'s '
+        '"clip_audio_storage" setting to "Segments" after running '
+        'this command to use the store.')
+
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='delete clip audio files after moving them to the store')
+
+        parser.add_argument(
+            '--compact', action='store_true',
+            help='compact the store after moving clip audio files to it')
+
+
+    def handle(self, *args, **options):
+
+        clip_dir_path = archive_paths.clip_dir_path
+        store_dir_path = archive_paths.clip_segment_dir_path
+
+        if not clip_dir_path.exists():
+            raise CommandError(
+                f'Archive clip directory "{clip_dir_path}" does not exist.')
+
+        start_time = time.time()
+
+        try:
+            store = ClipSegmentStore(store_dir_path)
+        except Exception as e:
+            raise CommandError(
+                f'Could not open clip segment store "{store_dir_path}". '
+                f'Error message was: {str(e)}')
+
+        migrated_count = 0
+        skipped_count = 0
+
+        # Paths of migrated clip audio files to delete.
+        deletion_paths = []
+
+        try:
+
+            for file_path, clip_id in _generate_clip_files(clip_dir_path):
+
+                # Skip clips already in store, so that an interrupted
+                # migration can be resumed.
+                if clip_id in store:
+                    skipped_count += 1
+
+                else:
+
+                    try:
+                        samples, _ = audio_file_utils.read_wave_file(
+                            file_path)
+                    except Exception as e:
+                        raise CommandError(
+                            f'Could not read clip audio file "{file_path}". '
+                            f'Error message was: {str(e)}')
+
+                    store.put_samples(clip_id, samples[0])
+                    migrated_count += 1
+
+                if options['delete']:
+
+                    deletion_paths.append(file_path)
+
+                    if len(deletion_paths) == _DELETION_BATCH_SIZE:
+                        _delete_files(deletion_paths, store)
+                        deletion_paths = []
+
+                count = migrated_count + skipped_count
+                if count % _PROGRESS_PERIOD == 0:
+                    self.stdout.write(f'Processed {count} clip audio files...')
+
+            _delete_files(deletion_paths, store)
+
+            if options['compact']:
+                store.compact()
+
+            stats = store.get_stats()
+
+        finally:
+            store.close()
+
+        elapsed_time = time.time() - start_time
+
+        self.stdout.write(
+            f'Moved {migrated_count} clip audio files to clip segment '
+            f'store "{store_dir_path}" in {elapsed_time:.1f} seconds, '
+            f'skipping {skipped_count} clips already in store. The store '
+            f'contains {stats["clip_count"]} clips in '
+            f'{stats["segment_count"]} segment files totaling '
+            f'{stats["size"]} bytes.')
+
+
+def _delete_files(file_paths, store):
+
+    """
+    Deletes migrated clip audio files.
+
+    The store is synced first, so that the samples of the clips are
+    on disk before the files are deleted.
+    """
+
+    if len(file_paths) == 0:
+        return
+
+    store.sync()
+
+    for file_path in file_paths:
+        os_utils.delete_file(file_path)
+
+
+def _generate_clip_files(clip_dir_path):
+
+    for dir_path, dir_names, file_names in os.walk(clip_dir_path):
+
+        # Visit directories in order, so clips are migrated roughly
+        # in order of ID.
+        dir_names.sort()
+
+        for file_name in sorted(file_names):
+
+            m = _CLIP_FILE_NAME_RE.match(file_name)
+
+            if m is not None:
+                clip_id = int(m.group(1).replace(' ', ''))
+                yield os.path.join(dir_path, file_name), clip_id
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vesper', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stringannotation',
+            index=models.Index(fields=['info', 'value', 'clip'], name='vesper_sa_info_value_clip_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['info', 'clip'], name='vesper_tag_info_clip_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def create_archive_metadata_version(apps, schema_editor):
+    ArchiveMetadataVersion = apps.get_model('vesper', 'ArchiveMetadataVersion')
+    ArchiveMetadataVersion.objects.create(id=1, version=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vesper', '0002_annotation_and_tag_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveMetadataVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('snapshot_version', models.BigIntegerField(blank=True, null=True)),
+                ('snapshot', models.BinaryField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'vesper_archive_metadata_version',
+            },
+        ),
+        migrations.RunPython(
+            create_archive_metadata_version, migrations.RunPython.noop),
+    ]
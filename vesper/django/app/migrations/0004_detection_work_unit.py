@@ -0,0 +1,31 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vesper', '0003_archive_metadata_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionWorkUnit',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_index', models.BigIntegerField()),
+                ('end_index', models.BigIntegerField()),
+                ('settings_hash', models.CharField(max_length=64)),
+                ('processed_index', models.BigIntegerField()),
+                ('complete', models.BooleanField(default=False)),
+                ('update_time', models.DateTimeField()),
+                ('detector', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detection_work_units', related_query_name='detection_work_unit', to='vesper.Processor')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detection_work_units', related_query_name='detection_work_unit', to='vesper.Job')),
+                ('recording_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detection_work_units', related_query_name='detection_work_unit', to='vesper.RecordingFile')),
+            ],
+            options={
+                'db_table': 'vesper_detection_work_unit',
+                'unique_together': {('recording_file', 'start_index', 'end_index', 'detector', 'settings_hash')},
+            },
+        ),
+    ]
@@ -6,14 +6,15 @@ from pathlib import Path
 import datetime
 import itertools
 
-from django.db import transaction
-from django.db.models import Count, F
+from django.db import connections, transaction
+from django.db.models import Count, F, Q
 
 from vesper.django.app.models import (
     AnnotationInfo, Clip, DeviceConnection, Recording, RecordingChannel,
     StationDevice, StringAnnotation, StringAnnotationEdit, TagInfo)
 from vesper.singletons import archive, recording_manager
 from vesper.util.bunch import Bunch
+import vesper.util.text_utils as text_utils
 import vesper.util.time_utils as time_utils
 import vesper.util.archive_lock as archive_lock
 
@@ -440,6 +441,56 @@ def get_clips(**kwargs):
     return clips
 
 
+CLIP_PAGE_FIELD_NAMES = (
+    'id', 'start_index', 'length', 'sample_rate', 'start_time')
+"""Names of the clip fields of the rows returned by `get_clip_page`."""
+
+
+def get_clip_page(clips, after=None, size=None):
+    
+    """
+    Gets one page of clips using keyset pagination.
+    
+    Clips are ordered by start time and then ID, and a page comprises
+    the clips that follow a specified (start time, ID) key in that
+    order. Unlike offset pagination, the cost of getting a page does
+    not grow with the number of clips that precede it. The clips are
+    fetched as tuples of field values rather than as model instances.
+    
+    :Parameters:
+    
+        clips : `Clip` query set
+            the clips to page through, e.g. as returned by `get_clips`
+            with `order=False`.
+            
+        after : (datetime, int) pair or `None`
+            the start time and ID of the last clip of the previous
+            page, or `None` for the first page.
+            
+        size : int or `None`
+            the maximum number of clips of the page, or `None` for
+            no limit.
+            
+    :Returns:
+        list of tuples of the values of the fields named by
+        `CLIP_PAGE_FIELD_NAMES`, one tuple per clip.
+    """
+    
+    if after is not None:
+        start_time, clip_id = after
+        clips = clips.filter(
+            Q(start_time__gt=start_time) |
+            Q(start_time=start_time, id__gt=clip_id))
+        
+    rows = clips.order_by('start_time', 'id').values_list(
+        *CLIP_PAGE_FIELD_NAMES)
+    
+    if size is not None:
+        rows = rows[:size]
+        
+    return list(rows)
+
+
 def _get_base_clips(station, mic_output, date, detector):
     
     kwargs = {}
@@ -482,23 +533,54 @@ def _filter_clips_by_annotation_if_needed(
             
             wildcard = archive.instance.STRING_ANNOTATION_VALUE_WILDCARD
             
-            # Get all annotated clips.
-            clips = clips.filter(string_annotation__info=info)
+            # We put all of the annotation conditions in one `filter`
+            # call so Django applies them to a single join with the
+            # string annotation table. Separate calls would create
+            # separate joins, one for each condition.
+            kwargs = {'string_annotation__info': info}
             
             if not annotation_value.endswith(wildcard):
                 # want clips with a particular annotation value
                 
-                clips = clips.filter(string_annotation__value=annotation_value)
+                kwargs['string_annotation__value'] = annotation_value
                 
             elif annotation_value != wildcard:
                 # want clips whose annotation values start with a prefix
                 
                 prefix = annotation_value[:-len(wildcard)]
                 
-                clips = clips.filter(
-                    string_annotation__value__startswith=prefix)
+                _add_annotation_value_prefix_kwargs(kwargs, prefix)
                 
-            return clips
+            return clips.filter(**kwargs)
+                
+
+def _add_annotation_value_prefix_kwargs(kwargs, prefix):
+    
+    """
+    Adds `filter` keyword arguments for an annotation value prefix.
+    
+    For SQLite we express the prefix condition as a range of values,
+    which SQLite can find with a search of the (info, value, clip)
+    index of the string annotation table. SQLite cannot use an index
+    for the `LIKE` expression with which Django implements a
+    `startswith` lookup. Note that the range is case sensitive, like
+    the matching of complete annotation values.
+    
+    For other databases we use a `startswith` lookup, since for
+    collations other than SQLite's binary one the values of a range
+    need not be exactly those that start with the prefix.
+    """
+    
+    if connections[Clip.objects.db].vendor == 'sqlite':
+        
+        kwargs['string_annotation__value__gte'] = prefix
+        
+        upper_bound = text_utils.get_prefix_upper_bound(prefix)
+        if upper_bound is not None:
+            kwargs['string_annotation__value__lt'] = upper_bound
+            
+    else:
+        kwargs['string_annotation__value__startswith'] = prefix
                 
 
 def _filter_clips_by_tag_if_needed(clips, tag_name):
@@ -560,12 +642,109 @@ def get_clip_annotations(clip):
     return dict((a.name, a.value) for a in annotations)
 
 
+def can_bulk_create_with_ids():
+    
+    """
+    Returns `True` if and only if Django's `bulk_create` sets the IDs
+    of the objects it creates for the archive database.
+    
+    As of this writing this is the case for PostgreSQL but not for
+    SQLite.
+    """
+    
+    features = connections[Clip.objects.db].features
+    
+    # The name of this feature changed in Django 3.0.
+    return getattr(
+        features, 'can_return_rows_from_bulk_insert',
+        getattr(features, 'can_return_ids_from_bulk_insert', False))
+
+
+def create_clips(clips):
+    
+    """
+    Inserts new clips into the archive database and sets their IDs.
+    
+    The clips are inserted with one bulk insert if the database returns
+    the IDs of bulk-inserted rows, and one at a time otherwise. This
+    function should be called within a transaction.
+    
+    :Parameters:
+    
+        clips : list of `Clip`
+            the unsaved clips to insert.
+    """
+    
+    if can_bulk_create_with_ids():
+        Clip.objects.bulk_create(clips)
+        
+    else:
+        for clip in clips:
+            clip.save(force_insert=True)
+            
+            
+def annotate_new_clips(
+        annotations, creation_time=None, creating_user=None,
+        creating_job=None, creating_processor=None):
+    
+    """
+    Annotates new clips in bulk.
+    
+    Unlike `annotate_clip`, this function does not check for existing
+    annotations, so it must be used only for clips that do not already
+    have the specified annotations, for example clips that were just
+    created. This function should be called within a transaction.
+    
+    :Parameters:
+    
+        annotations : sequence of (clip, annotation info, value) triples
+            the annotations to create.
+    """
+    
+    if creation_time is None:
+        creation_time = time_utils.get_utc_now()
+        
+    kwargs = {
+        'creation_time': creation_time,
+        'creating_user': creating_user,
+        'creating_job': creating_job,
+        'creating_processor': creating_processor
+    }
+    
+    StringAnnotation.objects.bulk_create([
+        StringAnnotation(clip=clip, info=info, value=value, **kwargs)
+        for clip, info, value in annotations])
+    
+    StringAnnotationEdit.objects.bulk_create([
+        StringAnnotationEdit(
+            clip=clip, info=info, action=StringAnnotationEdit.ACTION_SET,
+            value=value, **kwargs)
+        for clip, info, value in annotations])
+    
+    
+def _lock_clip(clip):
+    
+    """
+    Locks the database row of a clip until the end of the current
+    transaction.
+    
+    With a database that supports concurrent transactions, this keeps
+    concurrent transactions from modifying the annotations of the clip
+    at the same time. With SQLite it does nothing, but the archive lock
+    serializes all transactions.
+    """
+    
+    list(Clip.objects.select_for_update().filter(id=clip.id).values('id'))
+
+
 @archive_lock.atomic
 @transaction.atomic
 def annotate_clip(
         clip, annotation_info, value, creation_time=None, creating_user=None,
         creating_job=None, creating_processor=None):
     
+    _lock_clip(clip)
+    
     try:
         annotation = StringAnnotation.objects.get(
             clip=clip,
@@ -617,6 +796,8 @@ def delete_clip_annotation(
         clip, annotation_info, creation_time=None, creating_user=None,
         creating_job=None, creating_processor=None):
     
+    _lock_clip(clip)
+    
     try:
         annotation = StringAnnotation.objects.get(
             clip=clip,
@@ -7,9 +7,9 @@ import os.path
 
 from django.contrib.auth.models import User
 from django.db.models import (
-    BigIntegerField, CASCADE, CharField, DateField, DateTimeField,
-    FloatField, ForeignKey, IntegerField, ManyToManyField, Model,
-    SET_NULL, TextField)
+    BigIntegerField, BinaryField, BooleanField, CASCADE, CharField, DateField,
+    DateTimeField, FloatField, ForeignKey, Index, IntegerField,
+    ManyToManyField, Model, SET_NULL, TextField)
 import pytz
 
 from vesper.archive_paths import archive_paths
@@ -636,6 +636,56 @@ class RecordingFile(Model):
         return signal_utils.get_span(self.length, self.sample_rate)
 
 
+# A detection work unit records the progress of a detector on an index
+# interval of a recording file. The detect command creates a work unit
+# for each detector, recording file, and detection interval on which it
+# runs a detector, periodically updating its `processed_index` as it
+# commits detected clips and setting `complete` when the detector has
+# processed the whole interval. When the command is rerun, it skips
+# complete work units and resumes incomplete ones from near their
+# processed index instead of starting over. The `settings_hash` field
+# identifies the detector settings of a unit, so that work done with
+# other settings is not skipped. Start, end, and processed indices
+# are indices in the recording file.
+#
+# A work unit refers to the most recent job that worked on it, and is
+# deleted along with that job (and its clips) by the database's cascade
+# feature, so that deleting a redundant or bad detection job makes its
+# work eligible to be done again.
+class DetectionWorkUnit(Model):
+    
+    recording_file = ForeignKey(
+        RecordingFile, CASCADE,
+        related_name='detection_work_units',
+        related_query_name='detection_work_unit')
+    start_index = BigIntegerField()
+    end_index = BigIntegerField()
+    detector = ForeignKey(
+        Processor, CASCADE,
+        related_name='detection_work_units',
+        related_query_name='detection_work_unit')
+    settings_hash = CharField(max_length=64)
+    processed_index = BigIntegerField()
+    complete = BooleanField(default=False)
+    job = ForeignKey(
+        Job, CASCADE,
+        related_name='detection_work_units',
+        related_query_name='detection_work_unit')
+    update_time = DateTimeField()
+    
+    def __str__(self):
+        return '{} / {} / [{}, {}] / processed {}{}'.format(
+            str(self.recording_file), self.detector.name, self.start_index,
+            self.end_index, self.processed_index,
+            ' / complete' if self.complete else '')
+        
+    class Meta:
+        unique_together = (
+            'recording_file', 'start_index', 'end_index', 'detector',
+            'settings_hash')
+        db_table = 'vesper_detection_work_unit'
+
+
 # The station, recorder, and sample rate of a clip are the station,
 # recorder, and sample rate of its recording.
 #
@@ -869,6 +919,15 @@ class StringAnnotation(Model):
     class Meta:
         unique_together = ('clip', 'info')
         db_table = 'vesper_string_annotation'
+        
+        # Index for clip queries that filter by annotation value. The
+        # index includes the clip so that such queries need not read
+        # table rows.
+        indexes = [
+            Index(
+                fields=['info', 'value', 'clip'],
+                name='vesper_sa_info_value_clip_idx')
+        ]
     
     
 class StringAnnotationEdit(Model):
@@ -964,6 +1023,11 @@ class Tag(Model):
     class Meta:
         unique_together = ('clip', 'info')
         db_table = 'vesper_tag'
+        
+        # Index for clip queries that filter by tag.
+        indexes = [
+            Index(fields=['info', 'clip'], name='vesper_tag_info_clip_idx')
+        ]
      
      
 class TagEdit(Model):
@@ -1001,6 +1065,29 @@ class TagEdit(Model):
         db_table = 'vesper_tag_edit'
 
 
+# The archive metadata version is an integer that is incremented whenever
+# processors, annotation constraints, annotation infos, or tag infos are
+# created, modified, or deleted. The table has exactly one row, created
+# by the migration that creates the table. Processes that cache archive
+# metadata (see the `vesper.django.app.archive.Archive` class) compare
+# the version with that of their cache to decide whether the cache is
+# stale. The row also holds a pickled snapshot of the cached metadata
+# along with the version of the metadata from which it was created, so
+# that a process with a stale cache can usually load the snapshot
+# instead of rebuilding the cache from scratch.
+class ArchiveMetadataVersion(Model):
+    
+    version = BigIntegerField(default=0)
+    snapshot_version = BigIntegerField(null=True, blank=True)
+    snapshot = BinaryField(null=True, blank=True)
+    
+    def __str__(self):
+        return 'Archive Metadata Version {}'.format(self.version)
+    
+    class Meta:
+        db_table = 'vesper_archive_metadata_version'
+
+
 # class RecordingJob(Model):
 #     
 #     recording = ForeignKey(
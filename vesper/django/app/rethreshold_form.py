@@ -0,0 +1,40 @@
+from django import forms
+
+from vesper.django.app.models import Station
+import vesper.django.app.form_utils as form_utils
+
+
+_FORM_TITLE = 'Rethreshold'
+_DEFER_CLIP_CREATION_LABEL = 'Defer clip creation'
+    
+    
+def _get_field_default(name, default):
+    return form_utils.get_field_default(_FORM_TITLE, name, default)
+    
+    
+class RethresholdForm(forms.Form):
+    
+
+    detectors = forms.MultipleChoiceField(label='Detectors')
+    stations = forms.MultipleChoiceField(label='Stations')
+    start_date = forms.DateField(label='Start date')
+    end_date = forms.DateField(label='End date')
+    
+    defer_clip_creation = forms.BooleanField(
+        label=_DEFER_CLIP_CREATION_LABEL,
+        label_suffix='',
+        initial=_get_field_default(_DEFER_CLIP_CREATION_LABEL, False),
+        required=False)
+    
+    
+    def __init__(self, *args, **kwargs):
+        
+        super().__init__(*args, **kwargs)
+        
+        # Populate detectors field.
+        self.fields['detectors'].choices = \
+            form_utils.get_processor_choices('Detector')
+        
+        # Populate stations field.
+        station_names = sorted(s.name for s in Station.objects.all())
+        self.fields['stations'].choices = [(n, n) for n in station_names]
@@ -228,6 +228,56 @@ export class ClipAlbum {
     }
 
 
+    /*
+     * Appends clips to this album.
+     *
+     * Appending clips does not change the pages that precede the last
+     * page of the album, so the current page changes only if the album
+     * had no pages or the current page is the last one.
+     */
+    appendClips(clipInfos) {
+
+        const oldNumPages = this.numPages;
+        const viewSettings = this.settings.clipView;
+
+        for (const clipInfo of clipInfos) {
+            const clip = this._createClip([this.clips.length, clipInfo]);
+            clip.view = new this.clipViewClass(this, clip, viewSettings);
+            this.clips.push(clip);
+            this._clipViews.push(clip.view);
+        }
+
+        // Repaginate.
+        this._layout.settings = this.settings.layout;
+
+        this._clipManager.setPagination(this._layout.pagination);
+
+        if (this._rugPlot !== null)
+            this._rugPlot.onClipsAppended();
+
+        if (oldNumPages === 0) {
+
+            // Note that this assignment triggers a call to this._update,
+            // so we don't need to invoke this._update explicitly here.
+            this.pageNum = 0;
+
+        } else {
+
+            if (this.pageNum === oldNumPages - 1 && this._rugPlot !== null)
+                this._rugPlot.setPageClipNumRange(
+                    this.getPageClipNumRange(this.pageNum));
+
+            // Load any appended clips that the current page or the
+            // pages preloaded with it now include.
+            this._clipManager.pageNum = this.pageNum;
+
+            this._update();
+
+        }
+
+    }
+
+
 	_initUiElements() {
 	    
         this._clipsDiv = document.getElementById('clips');
@@ -297,6 +297,29 @@ export class ClipManager {
     }
 
 
+    /**
+     * Sets the pagination of this manager's clips after clips have been
+     * appended to them.
+     *
+     * Appending clips does not change the pages that precede the last
+     * page of the old pagination, but it may add clips to that page,
+     * so we no longer consider the page loaded. Its clips that are
+     * already loaded will not be loaded again when it is next loaded.
+     */
+    setPagination(pagination) {
+
+        const lastPageNum = this.pagination.length - 2;
+
+        if (this._loadedPageNums.has(lastPageNum)) {
+            this._numLoadedClips -= this._getNumPageClips(lastPageNum);
+            this._loadedPageNums.delete(lastPageNum);
+        }
+
+        this._pagination = pagination;
+
+    }
+
+
     _getNumPageClips(pageNum) {
         return this._getNumPageRangeClips(pageNum, 1);
     }
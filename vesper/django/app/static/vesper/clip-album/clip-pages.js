@@ -0,0 +1,114 @@
+/*
+ * Functions for getting clip album clips in pages from the server.
+ *
+ * The server sends the clips of a clip album in pages, the first with
+ * the clip album HTML and the rest in response to requests to the
+ * `/clips/json/` URL. A page is columnar, with parallel arrays of clip
+ * IDs, start indices, lengths, sample rates, and start times. Clip
+ * start times are millisecond offsets from the page's base time, and
+ * all of the clips of a page share the page's local time zone offset.
+ * See the `_get_clip_page` function of the server's `views` module.
+ */
+
+
+/*
+ * Gets clip infos for the pages of clips of a clip album that follow
+ * the first page, yielding an array of clip infos for each page as it
+ * arrives from the server.
+ *
+ * A clip info is an array of clip constructor arguments, namely
+ * the clip's ID, start index, length, sample rate, and start time.
+ */
+export async function* getLaterClipInfos(clipFilter, firstPage) {
+
+    let page = firstPage;
+
+    while (page.nextPageKey !== null) {
+        page = await _fetchClipPage(clipFilter, page.nextPageKey);
+        yield decodeClipPage(page);
+    }
+
+}
+
+
+async function _fetchClipPage(clipFilter, pageKey) {
+
+    const params = new URLSearchParams({
+        'station_mic': clipFilter.stationMicName,
+        'detector': clipFilter.detectorName,
+        'classification': clipFilter.classification,
+        'tag': clipFilter.tag,
+        'after': pageKey
+    });
+
+    if (clipFilter.date !== null)
+        params.set('date', clipFilter.date);
+
+    const response = await fetch(`/clips/json/?${params}`, {
+        credentials: 'same-origin'
+    });
+
+    if (!response.ok)
+        throw new Error(
+            `Clip page request failed with status ${response.status}.`);
+
+    return await response.json();
+
+}
+
+
+export function decodeClipPage(page) {
+
+    const clipInfos = new Array(page.ids.length);
+
+    for (let i = 0; i < page.ids.length; i++) {
+
+        const startTime = _formatTime(
+            page.baseTime + page.startTimes[i], page.timeZoneOffset,
+            page.timeZoneName);
+
+        clipInfos[i] = [
+            page.ids[i], page.startIndices[i], page.lengths[i],
+            page.sampleRates[i], startTime];
+
+    }
+
+    return clipInfos;
+
+}
+
+
+/*
+ * Formats a time like the server's `views._format_time` function,
+ * e.g. "2020-05-01 21:34:56.1 MDT".
+ */
+function _formatTime(utcTime, timeZoneOffset, timeZoneName) {
+
+    // Get local time as UTC `Date`, so that UTC getters return local
+    // time fields.
+    const t = new Date(utcTime + timeZoneOffset);
+
+    const date = [
+        t.getUTCFullYear(),
+        _pad(t.getUTCMonth() + 1, 2),
+        _pad(t.getUTCDate(), 2)
+    ].join('-');
+
+    const time = [
+        _pad(t.getUTCHours(), 2),
+        _pad(t.getUTCMinutes(), 2),
+        _pad(t.getUTCSeconds(), 2)
+    ].join(':');
+
+    let millis = _pad(t.getUTCMilliseconds(), 3).replace(/0+$/, '');
+    if (millis.length !== 0)
+        millis = '.' + millis;
+
+    return `${date} ${time}${millis} ${timeZoneName}`;
+
+}
+
+
+function _pad(n, length) {
+    return n.toString().padStart(length, '0');
+}
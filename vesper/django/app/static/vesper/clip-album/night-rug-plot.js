@@ -552,6 +552,12 @@ export class NightRugPlot {
 	}
 
 
+	onClipsAppended() {
+		this._clipTimes = this._clips.map(_getClipTime);
+		this._draw();
+	}
+
+
 }
 
 
@@ -1,4 +1,6 @@
 import { ClipAlbum } from '/static/vesper/clip-album/clip-album.js';
+import { decodeClipPage, getLaterClipInfos }
+    from '/static/vesper/clip-album/clip-pages.js';
 
 
 // Module-level state, set via `init` function.
@@ -20,11 +22,22 @@ export function init(state_) {
 let clipAlbum = null;
 
 
-function onLoad() {
+async function onLoad() {
+
+    // Show the clips of the first page, which the server sends with
+    // the page HTML, right away.
+    state.clips = decodeClipPage(state.clipPage);
     clipAlbum = new ClipAlbum(state);
+
+    // Append the clips of later pages as they arrive.
+    for await (const clipInfos of
+            getLaterClipInfos(state.clipFilter, state.clipPage))
+        clipAlbum.appendClips(clipInfos);
+
 }
 
 
 function onResize() {
-    clipAlbum.onResize();
+    if (clipAlbum !== null)
+        clipAlbum.onResize();
 }
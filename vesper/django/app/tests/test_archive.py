@@ -7,7 +7,8 @@ django.setup()
 
 from vesper.django.app.archive import Archive
 from vesper.django.app.models import (
-    AnnotationConstraint, AnnotationInfo, Processor)
+    AnnotationConstraint, AnnotationInfo, ArchiveMetadataVersion, Processor,
+    TagInfo)
 from vesper.singletons import preference_manager
 from vesper.tests.test_case import TestCase
 import vesper.util.time_utils as time_utils
@@ -139,11 +140,57 @@ class ArchiveTests(TestCase):
             
             
     def test_get_processor_ui_name_errors(self):
-        self._archive.refresh_processor_cache()
-        processor = Processor.objects.create(name='Bobo', type='Detector')
+        processor = Processor(name='Bobo', type='Detector')
         self._assert_raises(
             ValueError, self._archive.get_processor_ui_name, processor)
+        
+        
+    def test_metadata_change_invalidates_cache(self):
+        
+        def get_detector_names():
+            processors = self._archive.get_processors_of_type('Detector')
+            return [p.name for p in processors]
+        
+        self.assertEqual(
+            get_detector_names(), ['Thrush Detector', 'Tseep Detector'])
+        self.assertEqual(self._archive.get_tag_specs(), ['-----'])
+        
+        processor = Processor.objects.create(name='Bobo', type='Detector')
+        tag_info = TagInfo.objects.create(
+            name='Review', creation_time=time_utils.get_utc_now())
+        
+        self.assertEqual(
+            get_detector_names(),
+            ['Bobo', 'Thrush Detector', 'Tseep Detector'])
+        self.assertEqual(self._archive.get_tag_specs(), ['-----', 'Review'])
+        
         processor.delete()
+        tag_info.delete()
+        
+        self.assertEqual(
+            get_detector_names(), ['Thrush Detector', 'Tseep Detector'])
+        self.assertEqual(self._archive.get_tag_specs(), ['-----'])
+        
+        
+    def test_metadata_snapshot(self):
+        
+        names = [p.name for p in self._archive.get_processors_of_type(
+            'Classifier')]
+        
+        # Getting processors should have saved a snapshot for the
+        # current archive metadata version.
+        version = ArchiveMetadataVersion.objects.get()
+        self.assertEqual(version.snapshot_version, version.version)
+        
+        # A second archive should get the same processors from the
+        # snapshot.
+        archive = Archive()
+        self.assertEqual(
+            [p.name for p in archive.get_processors_of_type('Classifier')],
+            names)
+        self.assertEqual(
+            archive.get_string_annotation_values('Confidence'),
+            ('1', '2', '3'))
         
         
     def test_string_annotation_value_constants(self):
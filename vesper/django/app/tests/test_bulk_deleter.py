@@ -0,0 +1,122 @@
+import datetime
+import os
+
+import pytz
+
+# Set up Django.
+os.environ['DJANGO_SETTINGS_MODULE'] = 'vesper.django.project.settings'
+import django
+django.setup()
+
+from django.test import TestCase
+
+from vesper.django.app.bulk_deleter import BulkDeleter
+from vesper.django.app.models import (
+    Clip, DetectionWorkUnit, Device, DeviceModel, DeviceModelOutput,
+    DeviceOutput, Job, Processor, Recording, RecordingChannel,
+    RecordingFile, Station)
+
+
+_SAMPLE_RATE = 22050.
+_RECORDING_LENGTH = 3600 * 22050
+_START_TIME = datetime.datetime(2020, 5, 1, 2, tzinfo=pytz.utc)
+
+
+class BulkDeleterTests(TestCase):
+
+
+    def setUp(self):
+
+        station = Station.objects.create(
+            name='Station', time_zone='US/Mountain')
+
+        model = DeviceModel.objects.create(
+            name='Recorder Model', type='Recorder', manufacturer='Nagra',
+            model='X')
+
+        model_output = DeviceModelOutput.objects.create(
+            model=model, local_name='Output 0', channel_num=0)
+
+        recorder = Device.objects.create(
+            name='Recorder', model=model, serial_number='0')
+
+        mic_output = DeviceOutput.objects.create(
+            device=recorder, model_output=model_output)
+
+        duration = datetime.timedelta(
+            seconds=_RECORDING_LENGTH / _SAMPLE_RATE)
+
+        recording = Recording.objects.create(
+            station=station, recorder=recorder, num_channels=1,
+            length=_RECORDING_LENGTH, sample_rate=_SAMPLE_RATE,
+            start_time=_START_TIME, end_time=_START_TIME + duration,
+            creation_time=_START_TIME)
+
+        channel = RecordingChannel.objects.create(
+            recording=recording, channel_num=0, recorder_channel_num=0,
+            mic_output=mic_output)
+
+        self.file = RecordingFile.objects.create(
+            recording=recording, file_num=0, start_index=0,
+            length=_RECORDING_LENGTH)
+
+        self.job = Job.objects.create(
+            command='{}', status='Complete', creation_time=_START_TIME)
+
+        self.tseep = Processor.objects.create(
+            name='Tseep Detector', type='Detector')
+
+        self.thrush = Processor.objects.create(
+            name='Thrush Detector', type='Detector')
+
+        for i, detector in enumerate((self.tseep, self.tseep, self.thrush)):
+
+            start_time = _START_TIME + datetime.timedelta(seconds=i)
+
+            Clip.objects.create(
+                station=station, mic_output=mic_output,
+                recording_channel=channel, start_index=int(i * _SAMPLE_RATE),
+                length=int(_SAMPLE_RATE), sample_rate=_SAMPLE_RATE,
+                start_time=start_time,
+                end_time=start_time + datetime.timedelta(seconds=1),
+                date=datetime.date(2020, 4, 30), creation_time=_START_TIME,
+                creating_job=self.job, creating_processor=detector)
+
+            self._get_work_unit(detector, complete=True)
+
+
+    def _get_work_unit(self, detector, complete=False):
+
+        work_unit, _ = DetectionWorkUnit.objects.get_or_create(
+            recording_file=self.file, start_index=0,
+            end_index=_RECORDING_LENGTH, detector=detector,
+            settings_hash='', defaults={
+                'processed_index': 0,
+                'complete': complete,
+                'job': self.job,
+                'update_time': _START_TIME
+            })
+
+        return work_unit
+
+
+    def test_delete_clips(self):
+
+        clip_ids = Clip.objects.filter(
+            creating_processor=self.tseep).values_list('id', flat=True)
+
+        deleter = BulkDeleter(delete_audio_files=False)
+        clip_count = deleter.delete_clips(list(clip_ids))
+        deleter.close()
+
+        self.assertEqual(clip_count, 2)
+        self.assertEqual(Clip.objects.count(), 1)
+
+        # Work unit of detector whose clips were deleted is deleted,
+        # so that rerunning the detector does not skip its work.
+        self.assertFalse(
+            DetectionWorkUnit.objects.filter(detector=self.tseep).exists())
+        self.assertFalse(self._get_work_unit(self.tseep).complete)
+
+        # Work unit of other detector is not deleted.
+        self.assertTrue(self._get_work_unit(self.thrush).complete)
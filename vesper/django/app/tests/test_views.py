@@ -0,0 +1,53 @@
+import datetime
+import os
+
+import pytz
+
+# Set up Django.
+os.environ['DJANGO_SETTINGS_MODULE'] = 'vesper.django.project.settings'
+import django
+django.setup()
+
+from vesper.django.app.models import Station
+from vesper.tests.test_case import TestCase
+import vesper.django.app.views as views
+
+
+class ViewsTests(TestCase):
+
+
+    def test_find_time_zone_offset_change(self):
+
+        station = Station('Test', time_zone='US/Mountain')
+
+        # Clip start times of a sparse clip album page that spans
+        # several daylight saving time transitions.
+        rows = [
+            _create_clip_row(1, 2020, 10, 1),
+            _create_clip_row(2, 2020, 10, 15),
+            _create_clip_row(3, 2020, 11, 15),
+            _create_clip_row(4, 2021, 1, 15),
+            _create_clip_row(5, 2021, 3, 20),
+            _create_clip_row(6, 2021, 7, 1),
+            _create_clip_row(7, 2021, 11, 3)
+        ]
+
+        mdt = datetime.timedelta(hours=-6)
+        mst = datetime.timedelta(hours=-7)
+
+        cases = [
+            (rows, mdt, 2),
+            (rows[2:], mst, 2),
+            (rows[4:], mdt, 3),
+            ([], mdt, 0)
+        ]
+
+        for rows, time_zone_offset, expected in cases:
+            result = views._find_time_zone_offset_change(
+                rows, station, time_zone_offset)
+            self.assertEqual(result, expected)
+
+
+def _create_clip_row(clip_id, year, month, day):
+    start_time = datetime.datetime(year, month, day, 12, tzinfo=pytz.utc)
+    return (clip_id, 0, 22050, 22050., start_time)
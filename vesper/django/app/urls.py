@@ -19,14 +19,22 @@ urlpatterns = [
          views.batch_read_clip_audios,
          name='batch-read-clip-audios'),
         
+    path('batch/read/clip-spectrograms/',
+         views.batch_read_clip_spectrograms,
+         name='batch-read-clip-spectrograms'),
+        
     path('batch/read/clip-annotations/',
          views.batch_read_clip_annotations,
          name='batch-read-clip-annotations'),
         
+    path('clips/json/', views.clip_page_json, name='clip-page-json'),
     path('clips/<int:clip_id>/wav/', views.clip_wav, name='clip-wav'),
     path('clips/<int:clip_id>/annotations/json/', views.annotations_json,
          name='annotations'),
     
+    path('diagnostics/json/', views.diagnostics_json,
+         name='diagnostics-json'),
+    
     path('about-vesper/', views.about_vesper, name='about-vesper')
     
 ]
@@ -52,6 +60,7 @@ if not settings.ARCHIVE_READ_ONLY:
              name='import-old-bird-clips'),
     
         path('detect/', views.detect, name='detect'),
+        path('rethreshold/', views.rethreshold, name='rethreshold'),
         path('classify/', views.classify, name='classify'),
         path('execute-deferred-actions/', views.execute_deferred_actions,
              name='execute-deferred-actions'),
@@ -103,6 +112,10 @@ if not settings.ARCHIVE_READ_ONLY:
              name='presets-json'),
     
         path('jobs/<int:job_id>/', views.job, name='job'),
+        path('jobs/<int:job_id>/telemetry/json/', views.job_telemetry_json,
+             name='job-telemetry-json'),
+        path('jobs/telemetry/json/', views.jobs_telemetry_json,
+             name='jobs-telemetry-json'),
     
     ]
 
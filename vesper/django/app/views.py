@@ -1,5 +1,6 @@
 from pathlib import Path
 from urllib.parse import quote
+import atexit
 import datetime
 import itertools
 import json
@@ -15,6 +16,8 @@ from django.http import (
     HttpResponseNotAllowed, HttpResponseRedirect, HttpResponseServerError)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.csrf import csrf_exempt
 import numpy as np
 
@@ -37,6 +40,7 @@ from vesper.django.app.import_metadata_form import ImportMetadataForm
 from vesper.django.app.import_recordings_form import ImportRecordingsForm
 from vesper.django.app.models import (
     AnnotationInfo, Clip, Job, Station, StringAnnotation)
+from vesper.django.app.rethreshold_form import RethresholdForm
 from vesper.django.app.transfer_call_classifications_form import \
     TransferCallClassificationsForm
 from vesper.django.app.refresh_recording_audio_file_paths_form import \
@@ -46,18 +50,23 @@ from vesper.old_bird.export_clip_counts_csv_file_form import \
     ExportClipCountsCsvFileForm as OldBirdExportClipCountsCsvFileForm
 from vesper.old_bird.import_clips_form import ImportClipsForm
 from vesper.singletons import (
-    archive, clip_manager, job_manager, preference_manager, preset_manager)
+    archive, clip_manager, clip_spectrogram_manager, job_manager,
+    preference_manager, preset_manager)
 from vesper.util.bunch import Bunch
 from vesper.util.byte_buffer import ByteBuffer
+from vesper.util.recording_session_manager import (
+    RecordingSessionError, RecordingSessionManager)
+from vesper.util.singleton import Singleton
 import vesper.django.app.model_utils as model_utils
+import vesper.django.app.write_behind_service as write_behind_service
 import vesper.external_urls as external_urls
 from vesper.old_bird.add_old_bird_clip_start_indices_form import \
     AddOldBirdClipStartIndicesForm
 import vesper.old_bird.export_clip_counts_csv_file_utils as \
     old_bird_export_clip_counts_csv_file_utils
 import vesper.util.archive_lock as archive_lock
-import vesper.util.audio_file_utils as audio_file_utils
 import vesper.util.calendar_utils as calendar_utils
+import vesper.util.case_utils as case_utils
 import vesper.util.time_utils as time_utils
 import vesper.util.yaml_utils as yaml_utils
 import vesper.version as version
@@ -143,6 +152,9 @@ _DEFAULT_NAVBAR_DATA_READ_WRITE = yaml_utils.load(f'''
       - name: Detect
         url_name: detect
      
+      - name: Rethreshold
+        url_name: rethreshold
+     
       - name: Classify
         url_name: classify
       
@@ -309,6 +321,12 @@ _navbar_items = _create_navbar_items()
 
 _ONE_DAY = datetime.timedelta(days=1)
 _GET_AND_HEAD = ('GET', 'HEAD')
+_UTC_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+_CLIP_PAGE_SIZE = 2000
+"""Default number of clips of a page of clips sent to a client."""
+
+_MAX_CLIP_PAGE_SIZE = 20000
 
 
 def index(request):
@@ -350,6 +368,47 @@ def _create_detect_command_spec(form):
             'start_date': data['start_date'],
             'end_date': data['end_date'],
             'schedule': data['schedule'],
+            'defer_clip_creation': data['defer_clip_creation'],
+            'store_score_tracks': data['store_score_tracks'],
+            'skip_completed_work': data['skip_completed_work']
+        }
+    }
+
+
+@login_required
+@csrf_exempt
+def rethreshold(request):
+
+    if request.method in _GET_AND_HEAD:
+        form = RethresholdForm()
+
+    elif request.method == 'POST':
+
+        form = RethresholdForm(request.POST)
+
+        if form.is_valid():
+            command_spec = _create_rethreshold_command_spec(form)
+            return _start_job(command_spec, request.user)
+
+    else:
+        return HttpResponseNotAllowed(('GET', 'HEAD', 'POST'))
+
+    context = _create_template_context(request, 'Detect', form=form)
+
+    return render(request, 'vesper/rethreshold.html', context)
+
+
+def _create_rethreshold_command_spec(form):
+
+    data = form.cleaned_data
+
+    return {
+        'name': 'rethreshold',
+        'arguments': {
+            'detectors': data['detectors'],
+            'stations': data['stations'],
+            'start_date': data['start_date'],
+            'end_date': data['end_date'],
             'defer_clip_creation': data['defer_clip_creation']
         }
     }
@@ -930,15 +989,43 @@ def clip(request, clip_id):
     return render(request, 'vesper/clip.html', context)
 
 
+_CLIP_AUDIO_MAX_AGE = 3600
+"""
+Number of seconds for which browsers may reuse a clip audio file
+without revalidating it.
+"""
+
+_BYTE_RANGE_UNIT = 'bytes'
+
+
 def clip_wav(request, clip_id):
     
+    if request.method not in _GET_AND_HEAD:
+        return HttpResponseNotAllowed(_GET_AND_HEAD)
+    
     clip = get_object_or_404(Clip, pk=clip_id)
     
     content_type = 'audio/wav'
     
+    manager = clip_manager.instance
+    
+    # The audio of a clip is determined by its ID, start index, and
+    # length, so we use those as the entity tag of the clip's audio.
+    etag = quote_etag(manager.get_audio_file_version(clip))
+    last_modified_time = int(clip.creation_time.timestamp())
+    last_modified = http_date(last_modified_time)
+    
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified_time)
+    
+    if response is not None:
+        # client's copy of audio is current
+        
+        _set_clip_audio_cache_headers(response, etag, last_modified)
+        return response
+    
     try:
-        content = clip_manager.instance.get_audio_file_contents(
-            clip, content_type)
+        content = manager.get_audio_file_contents(clip, content_type)
         
     except Exception as e:
         logger = logging.getLogger('django.server')
@@ -948,13 +1035,131 @@ def clip_wav(request, clip_id):
                 str(clip), e.__class__.__name__, str(e)))
         return HttpResponseServerError()
 
-    response = HttpResponse()
-    response.write(content)
+    size = len(content)
+    byte_range = _get_clip_audio_byte_range(request, etag, size)
+    
+    if byte_range is None:
+        # whole audio file requested
+        
+        response = HttpResponse(content)
+        
+    elif byte_range == ():
+        # unsatisfiable range requested
+        
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'{_BYTE_RANGE_UNIT} */{size}'
+        return response
+    
+    else:
+        # satisfiable range requested
+        
+        start, end = byte_range
+        response = HttpResponse(content[start:end + 1], status=206)
+        response['Content-Range'] = \
+            f'{_BYTE_RANGE_UNIT} {start}-{end}/{size}'
+        
     response['Content-Type'] = content_type
-    response['Content-Length'] = len(content)
+    response['Content-Length'] = len(response.content)
+    response['Accept-Ranges'] = _BYTE_RANGE_UNIT
+    _set_clip_audio_cache_headers(response, etag, last_modified)
+    
     return response
 
 
+def _set_clip_audio_cache_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = f'private, max-age={_CLIP_AUDIO_MAX_AGE}'
+
+
+def _get_clip_audio_byte_range(request, etag, size):
+    
+    """
+    Gets the byte range requested by a clip audio request.
+    
+    Returns `None` if the whole audio file should be sent, an empty
+    tuple if the requested range is unsatisfiable, or a pair of
+    inclusive start and end byte offsets otherwise. Only single
+    ranges are supported: a request for multiple ranges gets the
+    whole file, as does a request whose `If-Range` header does not
+    match the audio's entity tag.
+    """
+    
+    header = request.META.get('HTTP_RANGE')
+    
+    if header is None:
+        return None
+    
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is not None and if_range != etag:
+        return None
+    
+    try:
+        unit, range_spec = header.split('=', 1)
+    except ValueError:
+        return None
+    
+    if unit.strip() != _BYTE_RANGE_UNIT or ',' in range_spec:
+        return None
+    
+    try:
+        start, end = (s.strip() for s in range_spec.split('-', 1))
+        start = int(start) if start else None
+        end = int(end) if end else None
+    except ValueError:
+        return None
+    
+    if start is None:
+        # suffix range, e.g. "bytes=-500"
+        
+        if end is None or end == 0:
+            return ()
+        
+        return (max(size - end, 0), size - 1)
+    
+    elif start >= size or (end is not None and end < start):
+        return ()
+    
+    else:
+        end = size - 1 if end is None else min(end, size - 1)
+        return (start, end)
+
+
+def diagnostics_json(request):
+    
+    """
+    Gets server diagnostics as JSON.
+    
+    Statistics are for the server process that handles the request.
+    """
+    
+    if request.method not in _GET_AND_HEAD:
+        return HttpResponseNotAllowed(_GET_AND_HEAD)
+    
+    audio_cache = clip_manager.instance.audio_file_cache
+    spectrogram_cache = clip_spectrogram_manager.instance.cache
+    
+    diagnostics = {
+        'clip_audio_cache': _get_cache_stats(audio_cache),
+        'clip_spectrogram_cache': _get_cache_stats(spectrogram_cache),
+        'write_behind_service': _get_write_behind_service_metrics()
+    }
+    
+    content = json.dumps(case_utils.snake_keys_to_camel(diagnostics))
+    return HttpResponse(content, content_type='application/json')
+
+
+def _get_cache_stats(cache):
+    return None if cache is None else cache.get_stats()
+
+
+def _get_write_behind_service_metrics():
+    if write_behind_service.is_enabled():
+        return write_behind_service.get_metrics()
+    else:
+        return None
+
+
 def presets_json(request, preset_type_name):
 
     preset_manager.instance.reload_presets()
@@ -977,9 +1182,7 @@ def _get_presets_json(preset_type_name):
     for the preset type.
     """
 
-    presets = preset_manager.instance.get_flattened_presets(preset_type_name)
-    presets = [(path, preset.camel_case_data) for path, preset in presets]
-    return json.dumps(presets)
+    return preset_manager.instance.get_presets_json(preset_type_name)
 
 
 @csrf_exempt
@@ -1086,8 +1289,7 @@ def annotation(request, clip_id, annotation_name):
             # (500) response.
             value = _get_request_body_as_text(request).strip()
 
-            model_utils.annotate_clip(
-                clip, info, value, creating_user=request.user)
+            _set_clip_annotation(clip, info, value, request.user)
 
             return HttpResponse()
 
@@ -1104,8 +1306,7 @@ def annotation(request, clip_id, annotation_name):
             clip = get_object_or_404(Clip, pk=clip_id)
             info = get_object_or_404(AnnotationInfo, name=name)
 
-            model_utils.delete_clip_annotation(
-                clip, info, creating_user=request.user)
+            _set_clip_annotation(clip, info, None, request.user)
 
             return HttpResponse()
 
@@ -1118,6 +1319,35 @@ def annotation(request, clip_id, annotation_name):
         return HttpResponseNotAllowed(('GET', 'HEAD', 'PUT', 'DELETE'))
 
 
+def _set_clip_annotation(clip, info, value, user):
+
+    """
+    Sets or (if `value` is `None`) deletes an annotation of a clip.
+
+    If the write-behind service is enabled, the write is performed by
+    the service, in a transaction that it may share with concurrent
+    writes of other requests and jobs. Either way, this function
+    returns after the write is committed.
+    """
+
+    if write_behind_service.is_enabled():
+
+        if value is None:
+            operation = write_behind_service.DeleteClipAnnotation(
+                clip.id, info.name, creating_user_id=user.id)
+        else:
+            operation = write_behind_service.AnnotateClip(
+                clip.id, info.name, value, creating_user_id=user.id)
+
+        write_behind_service.submit(operation).result()
+
+    elif value is None:
+        model_utils.delete_clip_annotation(clip, info, creating_user=user)
+
+    else:
+        model_utils.annotate_clip(clip, info, value, creating_user=user)
+
+
 def _get_request_body_as_text(request):
 
     # According to rfc6657, us-ascii is the default charset for the
@@ -1219,6 +1449,86 @@ def batch_read_clip_audios(request):
         return HttpResponseNotAllowed(['POST'])        
 
 
+@csrf_exempt
+def batch_read_clip_spectrograms(request):
+    
+    """
+    Gets spectrograms of a batch of clips.
+    
+    The request content is JSON with the following keys:
+    
+        clip_ids: list of clip IDs
+        settings_preset_path: path of a Clip Album Settings preset, with
+            path components separated by slashes
+        dtype: spectrogram data type, either "uint8" or "float16".
+            Optional, default "uint8".
+            
+    The response content comprises alternating binary spectrogram sizes
+    and spectrograms, one pair per clip. See the `ClipSpectrogramManager`
+    class for the spectrogram format.
+    """
+    
+    if request.method == 'POST':
+        
+        
+        # Parse request content JSON.
+        
+        try:
+            content = _get_request_body_as_json(request)
+        except HttpError as e:
+            return e.http_response
+
+        try:
+            content = json.loads(content)
+            clip_ids = content['clip_ids']
+            preset_path = content['settings_preset_path']
+            dtype = content.get('dtype', 'uint8')
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return HttpResponseBadRequest(
+                reason='Could not decode request JSON')
+        
+        preset = preset_manager.instance.get_preset(
+            'Clip Album Settings', tuple(preset_path.split('/')))
+        
+        if preset is None:
+            return HttpResponseBadRequest(
+                reason=f'Unrecognized settings preset "{preset_path}"')
+        
+        
+        # Get requested clip spectrograms.
+        
+        clips = [get_object_or_404(Clip, pk=i) for i in clip_ids]
+        
+        try:
+            spectrograms = clip_spectrogram_manager.instance.get_spectrograms(
+                clips, preset.data, dtype)
+            
+        except ValueError as e:
+            return HttpResponseBadRequest(reason=str(e))
+        
+        except Exception as e:
+            logger = logging.getLogger('django.server')
+            logger.error((
+                'Attempt to get spectrograms for {} clips failed with {} '
+                'exception. Exception message was: {}').format(
+                    len(clips), e.__class__.__name__, str(e)))
+            return HttpResponseServerError()
+            
+            
+        # Concatenate alternating binary spectrogram sizes and
+        # spectrograms to make response content.
+        sizes = [_get_uint32_bytes(len(s)) for s in spectrograms]
+        pairs = zip(sizes, spectrograms)
+        parts = itertools.chain.from_iterable(pairs)
+        content = b''.join(parts)
+        
+        # Construct response
+        return HttpResponse(content, content_type='application/octet-stream')
+    
+    else:
+        return HttpResponseNotAllowed(['POST'])        
+
+
 def _get_uint32_bytes(i):
     return np.array([i], dtype=np.dtype('<u4')).tobytes()
 
@@ -1579,8 +1889,7 @@ def night(request):
     archive_ = archive.instance
 
     # Reload presets and preferences to make sure we have the latest.
-    # TODO: For efficiency's sake, be more selective about what we reload.
-    # We might reload only presets of specified types, for example.
+    # Reloads are incremental, parsing only files that have changed.
     preset_manager.instance.reload_presets()
     preference_manager.instance.reload_preferences()
     preferences = preference_manager.instance.preferences
@@ -1625,8 +1934,9 @@ def night(request):
         detector=detector,
         annotation_name=annotation_name,
         annotation_value=annotation_value,
-        tag_name=tag_name)
-    clips_json = _get_clips_json(clips, station)
+        tag_name=tag_name,
+        order=False)
+    clip_page_json = _get_clip_page_json(clips, station)
 
     settings_presets_json = _get_presets_json('Clip Album Settings')
     commands_presets_json = _get_presets_json('Clip Album Commands')
@@ -1649,7 +1959,7 @@ def night(request):
         date=date_string,
         solar_event_times_json=solar_event_times_json,
         recordings_json=recordings_json,
-        clips_json=clips_json,
+        clip_page_json=clip_page_json,
         settings_presets_json=settings_presets_json,
         settings_preset_path=settings_preset_path,
         commands_presets_json=commands_presets_json,
@@ -1731,23 +2041,151 @@ def _get_recording_dict(recording, utc_to_local):
     }
 
 
-def _get_clips_json(clips, station):
+def _get_clip_page_json(clips, station, after=None, size=_CLIP_PAGE_SIZE):
+    page = _get_clip_page(clips, station, after, size)
+    return json.dumps(page)
 
-    # See note near the top of this file about why we send local
-    # instead of UTC times to clients.
 
-    utc_to_local = station.utc_to_local
-    clip_lists = [_get_clip_list(c, utc_to_local) for c in clips]
-    result = json.dumps(clip_lists)
-    return result
+def _get_clip_page(clips, station, after=None, size=_CLIP_PAGE_SIZE):
+
+    """
+    Gets one page of clips in columnar form.
+
+    The page is a dictionary of parallel arrays of clip IDs, start
+    indices, lengths, sample rates, and start times. Clip start times
+    are integer numbers of milliseconds after the page's base time,
+    itself the number of milliseconds after the UTC epoch of the start
+    time of the page's first clip. All of the clips of a page share a
+    single local time zone offset, so a client can compute local clip
+    start times without any time zone information beyond that of the
+    page. To ensure this, a page ends early at the first clip whose
+    local time zone offset differs from that of the page's first clip.
+
+    The page's `nextPageKey` is the `after` query parameter value with
+    which to request the next page, or `None` if there are no more clips.
+    """
+
+    # Get one more clip than we need to know whether there are more.
+    rows = model_utils.get_clip_page(clips, after, size + 1)
+
+    has_more = len(rows) > size
+    rows = rows[:size]
+
+    if len(rows) == 0:
+        time_zone_offset = 0
+        time_zone_name = None
+
+    else:
+
+        # See note near the top of this file about why we send local
+        # instead of UTC times to clients.
+        
+        first_time = station.utc_to_local(rows[0][-1])
+        time_zone_offset = first_time.utcoffset()
+        time_zone_name = first_time.strftime('%Z')
+
+        end = _find_time_zone_offset_change(rows, station, time_zone_offset)
+
+        if end != len(rows):
+            rows = rows[:end]
+            has_more = True
+
+        time_zone_offset = _get_milliseconds(time_zone_offset)
+
+    ids, start_indices, lengths, sample_rates, start_times = \
+        _transpose_clip_rows(rows)
+
+    base_time = start_times[0] if len(start_times) != 0 else 0
+    start_times = [t - base_time for t in start_times]
+
+    if has_more:
+        start_time, clip_id = rows[-1][-1], rows[-1][0]
+        next_page_key = _format_clip_page_key(start_time, clip_id)
+    else:
+        next_page_key = None
+
+    return {
+        'ids': ids,
+        'startIndices': start_indices,
+        'lengths': lengths,
+        'sampleRates': sample_rates,
+        'baseTime': base_time,
+        'startTimes': start_times,
+        'timeZoneOffset': time_zone_offset,
+        'timeZoneName': time_zone_name,
+        'nextPageKey': next_page_key
+    }
+
+
+def _find_time_zone_offset_change(rows, station, time_zone_offset):
+
+    """
+    Finds the index of the first of the specified clip rows whose
+    local time zone offset differs from the specified one, or the
+    number of rows if there is no such row.
+    """
+
+    # We scan the rows linearly rather than, say, comparing the offsets
+    # of only the first and last rows, since a page of a sparse clip
+    # album can span many months, and so several offset changes. The
+    # scan is cheap compared to the query that got the rows.
+    for i, row in enumerate(rows):
+        if station.utc_to_local(row[-1]).utcoffset() != time_zone_offset:
+            return i
+
+    return len(rows)
+
 
+def _transpose_clip_rows(rows):
 
-def _get_clip_list(c, utc_to_local):
+    if len(rows) == 0:
+        return [], [], [], [], []
 
-    # See note about UTC and local times near the top of this file.
-    start_time = _format_time(utc_to_local(c.start_time))
+    ids, start_indices, lengths, sample_rates, start_times = \
+        (list(column) for column in zip(*rows))
 
-    return [c.id, c.start_index, c.length, c.sample_rate, start_time]
+    start_times = [_get_epoch_milliseconds(t) for t in start_times]
+
+    return ids, start_indices, lengths, sample_rates, start_times
+
+
+def _get_epoch_milliseconds(time):
+    return _get_milliseconds(time - _UTC_EPOCH)
+
+
+def _get_milliseconds(delta):
+    microseconds = delta // datetime.timedelta(microseconds=1)
+    return (microseconds + 500) // 1000
+
+
+def _format_clip_page_key(start_time, clip_id):
+    microseconds = (start_time - _UTC_EPOCH) // datetime.timedelta(
+        microseconds=1)
+    return f'{microseconds}:{clip_id}'
+
+
+def _parse_clip_page_key(key):
+
+    """
+    Parses a clip page key, as created by `_format_clip_page_key`.
+
+    :Returns:
+        a (start time, clip ID) pair.
+
+    :Raises ValueError:
+        if the key is malformed.
+    """
+
+    try:
+        microseconds, clip_id = key.split(':')
+        microseconds = int(microseconds)
+        clip_id = int(clip_id)
+    except ValueError:
+        raise ValueError(f'Bad clip page key "{key}".')
+
+    start_time = _UTC_EPOCH + datetime.timedelta(microseconds=microseconds)
+
+    return start_time, clip_id
 
 
 def _format_time(time):
@@ -1775,6 +2213,64 @@ def _limit_index(index, min_index, max_index):
         return index
 
 
+def clip_page_json(request):
+
+    """
+    Gets one page of the clips of a clip album or night as JSON.
+
+    The clips are specified with the same query parameters as for the
+    `clip_album` and `night` views, with the `date` parameter optional.
+    The optional `after` parameter is the `nextPageKey` of the previous
+    page, and the optional `page_size` parameter is the maximum number
+    of clips of the page. See `_get_clip_page` for the page format.
+    """
+
+    if request.method not in _GET_AND_HEAD:
+        return HttpResponseNotAllowed(_GET_AND_HEAD)
+
+    params = request.GET
+    preferences = preference_manager.instance.preferences
+
+    try:
+
+        d = _get_clip_filter_data(params, preferences)
+
+        date_string = params.get('date')
+        if date_string:
+            date = time_utils.parse_date(*date_string.split('-'))
+        else:
+            date = None
+
+        after = params.get('after')
+        if after:
+            after = _parse_clip_page_key(after)
+        else:
+            after = None
+
+        page_size = int(params.get('page_size', _CLIP_PAGE_SIZE))
+        if page_size <= 0:
+            raise ValueError(f'Bad page size {page_size}.')
+        page_size = min(page_size, _MAX_CLIP_PAGE_SIZE)
+
+    except (TypeError, ValueError) as e:
+        return HttpResponseBadRequest(
+            f'Bad clip page request. Error message was: {str(e)}')
+
+    station, mic_output = d.sm_pair
+    clips = model_utils.get_clips(
+        station=station,
+        mic_output=mic_output,
+        date=date,
+        detector=d.detector,
+        annotation_name=d.annotation_name,
+        annotation_value=d.annotation_value,
+        tag_name=d.tag_name,
+        order=False)
+
+    content = _get_clip_page_json(clips, station, after, page_size)
+    return HttpResponse(content, content_type='application/json')
+
+
 def clip_album(request):
 
     # TODO: Combine this view with `night` view?
@@ -1783,8 +2279,7 @@ def clip_album(request):
     params = request.GET
     
     # Reload presets and preferences to make sure we have the latest.
-    # TODO: For efficiency's sake, be more selective about what we reload.
-    # We might reload only presets of specified types, for example.
+    # Reloads are incremental, parsing only files that have changed.
     preset_manager.instance.reload_presets()
     preference_manager.instance.reload_preferences()
     preferences = preference_manager.instance.preferences
@@ -1808,8 +2303,9 @@ def clip_album(request):
         detector=d.detector,
         annotation_name=d.annotation_name,
         annotation_value=d.annotation_value,
-        tag_name=d.tag_name)
-    clips_json = _get_clips_json(clips, station)
+        tag_name=d.tag_name,
+        order=False)
+    clip_page_json = _get_clip_page_json(clips, station)
 
     settings_presets_json = _get_presets_json('Clip Album Settings')
     commands_presets_json = _get_presets_json('Clip Album Commands')
@@ -1831,7 +2327,7 @@ def clip_album(request):
         tag=d.tag_spec,
         solar_event_times_json='null',
         recordings_json='[]',
-        clips_json=clips_json,
+        clip_page_json=clip_page_json,
         settings_presets_json=settings_presets_json,
         settings_preset_path=settings_preset_path,
         commands_presets_json=commands_presets_json,
@@ -2135,13 +2631,97 @@ def _create_add_old_bird_clip_start_indices_command_spec(form):
 
 
 def job(request, job_id):
+    
     job = get_object_or_404(Job, pk=job_id)
     command_spec = json.loads(job.command)
+    
+    now = time_utils.get_utc_now()
+    
+    if job.start_time is not None:
+        queue_wait = job.start_time - job.creation_time
+    elif job.status == 'Queued':
+        queue_wait = now - job.creation_time
+    else:
+        queue_wait = None
+        
+    if job.start_time is not None:
+        end_time = job.end_time if job.end_time is not None else now
+        run_time = end_time - job.start_time
+    else:
+        run_time = None
+        
+    if job.status == 'Queued':
+        queue_position = job_manager.instance.get_queue_position(job.id)
+    else:
+        queue_position = None
+        
+    if queue_position is not None:
+        position, queue_length = queue_position
+        queue_position = f'{position} of {queue_length}'
+        
     context = _create_template_context(
-        request, job=job, command_name=command_spec['name'])
+        request, job=job, command_name=command_spec['name'],
+        queue_wait=_format_duration(queue_wait),
+        run_time=_format_duration(run_time),
+        queue_position=queue_position)
+    
     return render(request, 'vesper/job.html', context)
 
 
+def _format_duration(duration):
+    
+    if duration is None:
+        return None
+    
+    seconds = max(int(duration.total_seconds()), 0)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    
+    return f'{hours}:{minutes:02d}:{seconds:02d}'
+
+
+def job_telemetry_json(request, job_id):
+    
+    """
+    Gets the telemetry of a job as JSON.
+    
+    The telemetry is `null` for jobs that have not started and for jobs
+    that ran before the server started.
+    """
+    
+    if request.method not in _GET_AND_HEAD:
+        return HttpResponseNotAllowed(_GET_AND_HEAD)
+    
+    job = get_object_or_404(Job, pk=job_id)
+    
+    content = {
+        'job_id': job.id,
+        'status': job.status,
+        'telemetry': job_manager.instance.get_job_telemetry(job.id)
+    }
+    
+    content = json.dumps(case_utils.snake_keys_to_camel(content))
+    return HttpResponse(content, content_type='application/json')
+
+
+def jobs_telemetry_json(request):
+    
+    """
+    Gets job telemetry aggregated by command as JSON.
+    
+    The aggregates include the jobs that have started since the server
+    started.
+    """
+    
+    if request.method not in _GET_AND_HEAD:
+        return HttpResponseNotAllowed(_GET_AND_HEAD)
+    
+    content = {'commands': job_manager.instance.get_command_telemetry()}
+    
+    content = json.dumps(case_utils.snake_keys_to_camel(content))
+    return HttpResponse(content, content_type='application/json')
+
+
 @csrf_exempt
 def about_vesper(request):
 
@@ -2165,8 +2745,21 @@ _SAMPLE_RATE = 24000
 _CHANNEL_COUNT = 1
 _SAMPLE_SIZE = 16
 
-# TODO: Create new recording in database and use its ID.
-_recording_id = 0
+
+def _create_recording_session_manager():
+
+    manager = RecordingSessionManager(
+        _RECORDING_DIR_PATH, _CHANNEL_COUNT, _SAMPLE_RATE, _SAMPLE_SIZE)
+
+    # Update the headers of and close the files of recordings that are
+    # still active when the server shuts down.
+    atexit.register(manager.stop_all_recordings)
+
+    return manager
+
+
+# TODO: Create new recordings in database and use their IDs.
+_recording_session_manager = Singleton(_create_recording_session_manager)
 
 
 def record(request):
@@ -2177,30 +2770,16 @@ def record(request):
 
     elif request.method == 'POST':
 
-        global _recording_id
+        recording_id = _recording_session_manager.instance.start_recording()
         
-        recording_id = _recording_id
-        
-        file_path = _get_recording_file_path(recording_id)
-        
-        audio_file_utils.write_empty_wave_file(
-            file_path, _CHANNEL_COUNT, _SAMPLE_RATE, _SAMPLE_SIZE)
-    
         content = json.dumps(dict(recordingId=recording_id))
         
-        _recording_id += 1
-        
         return HttpResponse(content, content_type='application/json')
  
     else:
         return HttpResponseNotAllowed(('GET', 'HEAD', 'POST'))
 
 
-def _get_recording_file_path(recording_id):
-    file_name = f'{recording_id}.wav'
-    return _RECORDING_DIR_PATH / file_name
-
-
 def recordings(request):
     
     if request.method == 'POST':
@@ -2210,17 +2789,20 @@ def recordings(request):
         except Exception:
             return HttpResponseBadRequest(
                 'Could not parse received recording data.')
-             
-        if data.action == 'append':
-            
-            recording_id = data.recording_id
-            start_index = data.start_index
-            samples = data.samples
-
-            _write_recording_samples(recording_id, start_index, samples)
+        
+        manager = _recording_session_manager.instance
+        
+        try:
             
-        else:
-            print('stop')
+            if data.action == 'append':
+                manager.append_samples(
+                    data.recording_id, data.start_index, data.samples)
+                
+            else:
+                manager.stop_recording(data.recording_id)
+                
+        except (RecordingSessionError, ValueError) as e:
+            return HttpResponseBadRequest(str(e))
         
         return HttpResponse()
     
@@ -2228,23 +2810,6 @@ def recordings(request):
         return HttpResponseNotAllowed(('POST',))
 
 
-def _write_recording_samples(recording_id, start_index, samples):
-    # _show_append_info(recording_id, start_index, samples)
-    file_path = _get_recording_file_path(recording_id)
-    audio_file_utils.write_wave_file_samples(file_path, start_index, samples)
-                
-            
-def _show_append_info(recording_id, start_index, samples):
-    
-    sample_count = len(samples)
-    min_sample = np.min(samples)
-    max_sample = np.max(samples)
-                 
-    print(
-        f'append {recording_id} {start_index} {sample_count} '
-        f'{min_sample} {max_sample}')
-    
-
 def _parse_recordings_post_data(data):
 
     b = ByteBuffer(data)
@@ -0,0 +1,789 @@
+"""
+Module containing the archive database write-behind service.
+
+The write-behind service is an optional single writer for archives that
+use SQLite. Rather than each job process and web request performing
+its own small archive database transactions (each of which must obtain
+the archive lock and pays the cost of an SQLite commit), clients submit
+typed write operations to the service, which performs them on one
+writer thread that owns its database connection. The writer groups
+operations that arrive close together into one transaction, so that
+many operations share one commit. The service puts the archive database
+in SQLite's write-ahead logging (WAL) mode, in which readers do not
+block the writer and vice versa.
+
+Each operation is performed inside its own savepoint within its group's
+transaction, so an operation that fails does not affect the other
+operations of its group. Submitting an operation returns a
+`concurrent.futures.Future` that completes when the operation's group
+commits, with the result of the operation or the exception it raised.
+
+The service runs in the main Vesper server process. Job processes
+submit operations to it through a `WriteBehindClient`, which connects
+to a `multiprocessing` manager server that the main process runs for
+the service. The service is enabled by the `write_behind` archive
+setting.
+
+The `submit` function of this module submits an operation to the
+service from any Vesper process. Use `is_enabled` to decide whether to
+submit an operation or to perform the corresponding write directly.
+"""
+
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from threading import Lock, Thread, local
+import logging
+import os
+import queue
+import time
+
+from django.db import connection, transaction
+
+from vesper.archive_settings import archive_settings
+from vesper.django.app.models import (
+    AnnotationInfo, Clip, Job, Processor, Tag, TagEdit, TagInfo, User)
+import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
+import vesper.util.time_utils as time_utils
+
+
+_logger = logging.getLogger(__name__)
+
+
+_MAX_GROUP_SIZE = 1000
+"""Maximum number of operations per transaction."""
+
+_MAX_GROUP_DELAY = .05
+"""
+Maximum time in seconds that the writer waits for more operations to
+add to a transaction after it receives the first one.
+"""
+
+_LATENCY_SAMPLE_COUNT = 1000
+"""Number of recent commit latencies from which metrics are computed."""
+
+_CLIENT_THREAD_COUNT = 8
+"""
+Number of threads with which a client submits operations. This is the
+maximum number of operations of a client that can be in progress at
+once, and hence that can share a transaction.
+"""
+
+
+class WriteOperation:
+
+    """
+    Archive database write operation.
+
+    An operation must be picklable, so it can be submitted from one
+    process and performed in another. Operations accordingly refer to
+    model instances by ID.
+    """
+
+
+    groupable = True
+    """
+    `True` if this operation can be performed inside a transaction
+    together with other operations, or `False` if it must be performed
+    in a transaction of its own.
+    """
+
+
+    def execute(self):
+
+        """
+        Performs this operation.
+
+        :Returns:
+            the picklable result of this operation.
+        """
+
+        raise NotImplementedError()
+
+
+class CreateClips(WriteOperation):
+
+    """
+    Creates clips.
+
+    Each clip is specified by a dictionary of `Clip` constructor
+    keyword arguments, with model instances specified by ID (for
+    example, with a `recording_channel_id` item rather than a
+    `recording_channel` item). The result of the operation is a list
+    of the IDs of the created clips.
+    """
+
+
+    def __init__(self, clips, annotations=None, creating_job_id=None):
+
+        """
+        :Parameters:
+
+            clips : list of dict
+                the clips to create.
+
+            annotations : list of dict or None
+                the annotations of the clips, as a list of mappings
+                from annotation names to values with one mapping
+                (or `None`) for each clip.
+
+            creating_job_id : int or None
+                the ID of the job creating the clips and annotations.
+        """
+
+        self.clips = clips
+        self.annotations = annotations
+        self.creating_job_id = creating_job_id
+
+
+    def execute(self):
+
+        clips = [Clip(**kwargs) for kwargs in self.clips]
+
+        model_utils.create_clips(clips)
+
+        if self.annotations is not None:
+
+            infos = {}
+
+            def get_info(name):
+                if name not in infos:
+                    infos[name] = _get_annotation_info(name)
+                return infos[name]
+
+            # Annotations are created with the creation time and
+            # creating processor of the first clip, since all clips
+            # of an operation are created by one processor at about
+            # the same time.
+            annotations = [
+                (clip, get_info(name), str(value))
+                for clip, a in zip(clips, self.annotations)
+                if a is not None
+                for name, value in a.items()]
+
+            if len(annotations) != 0:
+                model_utils.annotate_new_clips(
+                    annotations,
+                    creation_time=clips[0].creation_time,
+                    creating_job=_get_object(Job, self.creating_job_id),
+                    creating_processor=clips[0].creating_processor)
+
+        return [clip.id for clip in clips]
+
+
+class AnnotateClip(WriteOperation):
+
+    """Sets a string annotation of a clip. See `model_utils.annotate_clip`."""
+
+
+    def __init__(
+            self, clip_id, annotation_name, value, creation_time=None,
+            creating_user_id=None, creating_job_id=None,
+            creating_processor_id=None):
+
+        self.clip_id = clip_id
+        self.annotation_name = annotation_name
+        self.value = value
+        self.creation_time = creation_time
+        self.creating_user_id = creating_user_id
+        self.creating_job_id = creating_job_id
+        self.creating_processor_id = creating_processor_id
+
+
+    def execute(self):
+        model_utils.annotate_clip(
+            Clip.objects.get(id=self.clip_id),
+            _get_annotation_info(self.annotation_name), self.value,
+            **_get_creation_kwargs(self))
+
+
+class DeleteClipAnnotation(WriteOperation):
+
+    """
+    Deletes a string annotation of a clip. See
+    `model_utils.delete_clip_annotation`.
+    """
+
+
+    def __init__(
+            self, clip_id, annotation_name, creation_time=None,
+            creating_user_id=None, creating_job_id=None,
+            creating_processor_id=None):
+
+        self.clip_id = clip_id
+        self.annotation_name = annotation_name
+        self.creation_time = creation_time
+        self.creating_user_id = creating_user_id
+        self.creating_job_id = creating_job_id
+        self.creating_processor_id = creating_processor_id
+
+
+    def execute(self):
+        model_utils.delete_clip_annotation(
+            Clip.objects.get(id=self.clip_id),
+            _get_annotation_info(self.annotation_name),
+            **_get_creation_kwargs(self))
+
+
+class TagClip(WriteOperation):
+
+    """Tags a clip, if it is not already tagged."""
+
+
+    def __init__(
+            self, clip_id, tag_name, creation_time=None,
+            creating_user_id=None, creating_job_id=None,
+            creating_processor_id=None):
+
+        self.clip_id = clip_id
+        self.tag_name = tag_name
+        self.creation_time = creation_time
+        self.creating_user_id = creating_user_id
+        self.creating_job_id = creating_job_id
+        self.creating_processor_id = creating_processor_id
+
+
+    def execute(self):
+
+        clip = Clip.objects.get(id=self.clip_id)
+        info = TagInfo.objects.get(name=self.tag_name)
+
+        if not Tag.objects.filter(clip=clip, info=info).exists():
+            kwargs = _get_creation_kwargs(self)
+            Tag.objects.create(clip=clip, info=info, **kwargs)
+            TagEdit.objects.create(
+                clip=clip, info=info, action=TagEdit.ACTION_SET, **kwargs)
+
+
+class UntagClip(WriteOperation):
+
+    """Untags a clip, if it is tagged."""
+
+
+    def __init__(
+            self, clip_id, tag_name, creation_time=None,
+            creating_user_id=None, creating_job_id=None,
+            creating_processor_id=None):
+
+        self.clip_id = clip_id
+        self.tag_name = tag_name
+        self.creation_time = creation_time
+        self.creating_user_id = creating_user_id
+        self.creating_job_id = creating_job_id
+        self.creating_processor_id = creating_processor_id
+
+
+    def execute(self):
+
+        clip = Clip.objects.get(id=self.clip_id)
+        info = TagInfo.objects.get(name=self.tag_name)
+
+        deleted_count, _ = \
+            Tag.objects.filter(clip=clip, info=info).delete()
+
+        if deleted_count != 0:
+            TagEdit.objects.create(
+                clip=clip, info=info, action=TagEdit.ACTION_DELETE,
+                **_get_creation_kwargs(self))
+
+
+class DeleteClips(WriteOperation):
+
+    """
+    Deletes clips and their audio files with a `BulkDeleter`. The
+    result of the operation is the number of clips deleted.
+    """
+
+
+    # A bulk deleter commits its own transaction before queueing the
+    # deletion of clip audio files.
+    groupable = False
+
+
+    def __init__(self, clip_ids):
+        self.clip_ids = clip_ids
+
+
+    def execute(self):
+
+        # We import here to avoid a circular import.
+        from vesper.django.app.bulk_deleter import BulkDeleter
+
+        deleter = BulkDeleter()
+
+        try:
+            count = deleter.delete_clips(self.clip_ids)
+            deleter.wait_for_audio_file_deletions()
+
+        finally:
+            deleter.close()
+
+        return count
+
+
+def _get_annotation_info(name):
+    return AnnotationInfo.objects.get(name=name)
+
+
+def _get_object(model, object_id):
+    return None if object_id is None else model(id=object_id)
+
+
+def _get_creation_kwargs(op):
+
+    creation_time = op.creation_time
+    if creation_time is None:
+        creation_time = time_utils.get_utc_now()
+
+    return {
+        'creation_time': creation_time,
+        'creating_user': _get_object(User, op.creating_user_id),
+        'creating_job': _get_object(Job, op.creating_job_id),
+        'creating_processor': _get_object(
+            Processor, op.creating_processor_id)
+    }
+
+
+class WriteBehindService:
+
+    """
+    Performs archive database write operations on a writer thread,
+    grouping operations into transactions.
+    """
+
+
+    def __init__(
+            self, max_group_size=_MAX_GROUP_SIZE,
+            max_group_delay=_MAX_GROUP_DELAY):
+
+        self._max_group_size = max_group_size
+        self._max_group_delay = max_group_delay
+
+        self._queue = queue.Queue()
+        self._thread = None
+
+        self._metrics_lock = Lock()
+        self._operation_count = 0
+        self._failure_count = 0
+        self._commit_count = 0
+        self._commit_latencies = deque(maxlen=_LATENCY_SAMPLE_COUNT)
+        self._group_sizes = deque(maxlen=_LATENCY_SAMPLE_COUNT)
+
+
+    def start(self):
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+
+        """
+        Stops this service after performing all submitted operations.
+        """
+
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+    def submit(self, operation):
+
+        """
+        Submits an operation to this service.
+
+        :Parameters:
+
+            operation : WriteOperation
+                the operation to perform.
+
+        :Returns:
+            a `Future` for the result of the operation.
+        """
+
+        future = Future()
+        self._queue.put((operation, future, time.time()))
+        return future
+
+
+    def execute(self, operation):
+
+        """
+        Submits an operation to this service and waits for its result.
+        """
+
+        return self.submit(operation).result()
+
+
+    def _run(self):
+
+        _set_up_connection()
+
+        try:
+
+            while True:
+
+                group, stopping = self._get_group()
+
+                if len(group) != 0:
+                    self._execute_group(group)
+
+                if stopping:
+                    return
+
+        finally:
+            connection.close()
+
+
+    def _get_group(self):
+
+        """
+        Gets the next group of operations to perform.
+
+        :Returns:
+            the group and a boolean that indicates whether or not the
+            service is stopping.
+        """
+
+        item = self._queue.get()
+
+        if item is None:
+            return [], True
+
+        group = [item]
+
+        if not item[0].groupable:
+            return group, False
+
+        deadline = time.time() + self._max_group_delay
+
+        while len(group) < self._max_group_size:
+
+            timeout = deadline - time.time()
+
+            try:
+                if timeout > 0:
+                    item = self._queue.get(timeout=timeout)
+                else:
+                    item = self._queue.get_nowait()
+
+            except queue.Empty:
+                break
+
+            if item is None or not item[0].groupable:
+                # We must stop or perform an ungroupable operation
+                # after performing the current group. Put item back
+                # at the end of the queue, so the operations submitted
+                # before it are performed before it.
+                self._queue.put(item)
+                break
+
+            group.append(item)
+
+        return group, False
+
+
+    def _execute_group(self, group):
+
+        start_time = time.time()
+        results = []
+
+        try:
+
+            if not group[0][0].groupable:
+                # operation must be performed outside of a group
+                # transaction
+
+                results.append(_execute(group[0][0]))
+
+            else:
+
+                with archive_lock.atomic(), transaction.atomic():
+
+                    for operation, _, _ in group:
+
+                        # Perform each operation in its own savepoint,
+                        # so that if it fails its partial changes are
+                        # rolled back without affecting the rest of
+                        # the group.
+                        try:
+                            with transaction.atomic():
+                                results.append(_execute(operation))
+                        except Exception as e:
+                            results.append(e)
+
+        except Exception as e:
+            # commit failed
+
+            _logger.error(
+                f'Write-behind service transaction of {len(group)} '
+                f'operations failed with message: {str(e)}')
+
+            results = [e] * len(group)
+
+        end_time = time.time()
+
+        failure_count = 0
+
+        for (_, future, submit_time), result in zip(group, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+                failure_count += 1
+            else:
+                future.set_result(result)
+
+        with self._metrics_lock:
+            self._operation_count += len(group)
+            self._failure_count += failure_count
+            self._commit_count += 1
+            self._commit_latencies.append(end_time - start_time)
+            self._group_sizes.append(len(group))
+
+
+    def get_metrics(self):
+
+        """
+        Gets metrics for this service.
+
+        :Returns:
+            a dictionary with the following items:
+
+                queue_depth
+                    the number of submitted operations that have not
+                    yet been started.
+
+                operation_count
+                    the number of operations performed.
+
+                failure_count
+                    the number of operations that raised exceptions.
+
+                commit_count
+                    the number of transactions committed.
+
+                mean_group_size
+                    the mean number of operations per transaction.
+
+                mean_commit_latency
+                    the mean time in seconds to perform and commit a
+                    transaction.
+
+                max_commit_latency
+                    the maximum time in seconds to perform and commit
+                    a transaction.
+
+            The group size and commit latency statistics are for
+            recent transactions only.
+        """
+
+        with self._metrics_lock:
+
+            latencies = list(self._commit_latencies)
+            sizes = list(self._group_sizes)
+
+            return {
+                'queue_depth': self._queue.qsize(),
+                'operation_count': self._operation_count,
+                'failure_count': self._failure_count,
+                'commit_count': self._commit_count,
+                'mean_group_size': _mean(sizes),
+                'mean_commit_latency': _mean(latencies),
+                'max_commit_latency': max(latencies) if latencies else 0
+            }
+
+
+def _set_up_connection():
+
+    if connection.vendor == 'sqlite':
+
+        with connection.cursor() as cursor:
+
+            # Use write-ahead logging, so readers in other threads and
+            # processes do not block the writer or vice versa. The
+            # journal mode persists in the database file.
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+            # In WAL mode a `NORMAL` synchronous setting is safe from
+            # database corruption, and commits do not wait for fsync.
+            cursor.execute('PRAGMA synchronous=NORMAL')
+
+
+def _execute(operation):
+    return operation.execute()
+
+
+def _mean(values):
+    return sum(values) / len(values) if len(values) != 0 else 0
+
+
+class _ServiceManager(BaseManager):
+    pass
+
+
+class WriteBehindClient:
+
+    """
+    Client of a write-behind service in another process.
+
+    The client submits operations to the service via a manager server.
+    Each submission is performed by a thread of a small thread pool, so
+    several operations of a client can be in progress at once.
+    """
+
+
+    def __init__(self, address, authkey):
+
+        self._manager = _ServiceManager(address=address, authkey=authkey)
+        self._manager.connect()
+
+        self._local = local()
+        self._executor = ThreadPoolExecutor(_CLIENT_THREAD_COUNT)
+
+
+    def submit(self, operation):
+        return self._executor.submit(self._execute, operation)
+
+
+    def _execute(self, operation):
+        return self._get_service().execute(operation)
+
+
+    def _get_service(self):
+
+        # Each thread creates its own service proxy once, and uses it
+        # for all of its requests.
+        try:
+            return self._local.service
+        except AttributeError:
+            self._local.service = self._manager.get_service()
+            return self._local.service
+
+
+    def get_metrics(self):
+        return self._get_service().get_metrics()
+
+
+    def close(self):
+        self._executor.shutdown()
+
+
+_ServiceManager.register('get_service')
+
+
+_service = None
+_server_address = None
+_client = None
+_lock = Lock()
+
+
+def is_enabled():
+
+    """
+    Returns `True` if and only if the write-behind service is enabled
+    for the archive.
+    """
+
+    return archive_settings.write_behind and \
+        archive_settings.database.engine == 'SQLite'
+
+
+def get_service():
+
+    """
+    Gets the write-behind service of this process, starting it if
+    needed.
+
+    This function should be called only in the main Vesper process,
+    or in a process that does not run jobs.
+    """
+
+    global _service
+
+    with _lock:
+
+        if _service is None:
+            _service = WriteBehindService()
+            _service.start()
+
+        return _service
+
+
+def get_server_address():
+
+    """
+    Gets the address and authentication key of the manager server for
+    the write-behind service of this process, starting the service and
+    server if needed.
+
+    The address and key are passed to job processes, which use them to
+    create `WriteBehindClient` objects.
+    """
+
+    global _server_address
+
+    service = get_service()
+
+    with _lock:
+
+        if _server_address is None:
+
+            _ServiceManager.register('get_service', callable=lambda: service)
+
+            authkey = os.urandom(32)
+            manager = _ServiceManager(
+                address=('127.0.0.1', 0), authkey=authkey)
+            server = manager.get_server()
+
+            thread = Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+
+            _server_address = (server.address, authkey)
+
+        return _server_address
+
+
+def set_server_address(server_address):
+
+    """
+    Sets the address of the write-behind service for this process.
+
+    This function is called in job processes, with the address of the
+    service of the main Vesper process.
+    """
+
+    global _client
+
+    if server_address is not None:
+        address, authkey = server_address
+        _client = WriteBehindClient(address, authkey)
+
+
+def submit(operation):
+
+    """
+    Submits an operation to the write-behind service.
+
+    In a job process the operation is submitted to the service of the
+    main Vesper process, and in any other process it is submitted to
+    the process's own service.
+
+    :Returns:
+        a `Future` for the result of the operation.
+    """
+
+    if _client is not None:
+        return _client.submit(operation)
+    else:
+        return get_service().submit(operation)
+
+
+def get_metrics():
+
+    """Gets the metrics of the write-behind service."""
+
+    if _client is not None:
+        return _client.get_metrics()
+    else:
+        return get_service().get_metrics()
@@ -118,7 +118,14 @@ def _create_databases_setting_value():
             'USER': db.user,
             'PASSWORD': db.password,
             'HOST': db.host,
-            'PORT': db.port
+            'PORT': db.port,
+            
+            # Keep database connections open for reuse by subsequent
+            # requests served by the same thread, rather than opening
+            # a new connection for every request. Job processes do not
+            # serve requests, so they each use one connection for
+            # their lifetime.
+            'CONN_MAX_AGE': _get_connection_max_age(db)
         }
         
     else:
@@ -128,6 +135,17 @@ def _create_databases_setting_value():
     return {'default': value}
 
 
+def _get_connection_max_age(db):
+    try:
+        return db.connection_max_age
+    except AttributeError:
+        return _DEFAULT_CONNECTION_MAX_AGE
+    
+    
+_DEFAULT_CONNECTION_MAX_AGE = 600
+"""Default maximum PostgreSQL connection age, in seconds."""
+
+
 DATABASES = _create_databases_setting_value()
 
 
@@ -8,11 +8,19 @@ or alter the classification of a clip that has already been classified.
 """
 
 
+from collections import defaultdict
+
 from vesper.command.annotator import Annotator
 import vesper.django.app.model_utils as model_utils
 import vesper.util.nfc_coarse_classifier as nfc_coarse_classifier
 
 
+_CLIP_BATCH_SIZE = 1000
+"""
+Number of clips classified together by `CoarseClassifier.annotate_clips`.
+"""
+
+
 class CoarseClassifier(Annotator):
     
     
@@ -47,3 +55,60 @@ class CoarseClassifier(Annotator):
                     annotated = True
                     
         return annotated
+    
+    
+    def annotate_clips(self, clips):
+        
+        """
+        Annotates the specified clips.
+        
+        The clips are classified in batches of `_CLIP_BATCH_SIZE` clips,
+        computing segment features and classifying segments for each
+        batch at once rather than clip by clip. The result is the same
+        as that of calling `annotate` for each clip.
+        """
+        
+        clip_lists = self._get_clip_lists(clips)
+        
+        annotated_clip_count = 0
+        
+        for clip_type, clips in clip_lists.items():
+            
+            classifier = self._classifiers[clip_type]
+            
+            for i in range(0, len(clips), _CLIP_BATCH_SIZE):
+                
+                batch = clips[i:i + _CLIP_BATCH_SIZE]
+                
+                classifications = classifier.classify_clips(batch)
+                
+                for clip, classification in zip(batch, classifications):
+                    if classification is not None:
+                        self._annotate(clip, classification)
+                        annotated_clip_count += 1
+                        
+        return annotated_clip_count
+    
+    
+    def _get_clip_lists(self, clips):
+        
+        """
+        Gets a mapping from clip types to lists of unclassified clips
+        of those types.
+        """
+        
+        clip_lists = defaultdict(list)
+        
+        for clip in clips:
+            
+            if self._get_annotation_value(clip) is None:
+                # clip is unclassified
+                
+                clip_type = model_utils.get_clip_type(clip)
+                
+                if clip_type is not None:
+                    # clip was detected by Old Bird Tseep or Thrush
+                    
+                    clip_lists[clip_type].append(clip)
+                    
+        return clip_lists
@@ -19,6 +19,7 @@ from vesper.django.app.models import AnnotationInfo
 from vesper.mpg_ranch.nfc_bounding_interval_annotator_1_0.inferrer \
     import Inferrer
 from vesper.singletons import clip_manager
+from vesper.util.prefetching_iterator import PrefetchingIterator
 import vesper.django.app.model_utils as model_utils
 import vesper.mpg_ranch.nfc_bounding_interval_annotator_1_0.dataset_utils \
     as dataset_utils
@@ -29,6 +30,9 @@ _CLASSIFICATION_ANNOTATION_NAME = 'Classification'
 _START_INDEX_ANNOTATION_NAME = 'Call Start Index'
 _END_INDEX_ANNOTATION_NAME = 'Call End Index'
 
+_WAVEFORM_READ_THREAD_COUNT = 4
+"""Number of threads that read and resample clip waveforms."""
+
 _MODEL_INFOS = {
     
     # Tseep 14k
@@ -97,6 +101,8 @@ class Annotator(AnnotatorBase):
                 clips, waveform_dataset = \
                     self._get_clip_waveforms(clips, inference_sample_rate)
                 
+                # Note that this consumes the waveform dataset, which
+                # appends the clips whose waveforms it yields to `clips`.
                 bounds = inferrer.get_call_bounds(waveform_dataset)
                 
                 for clip, (start_index, end_index) in zip(clips, bounds):
@@ -131,10 +137,20 @@ class Annotator(AnnotatorBase):
     
     def _get_clip_waveforms(self, clips, inference_sample_rate):
         
+        """
+        Gets a dataset of clip waveforms.
+        
+        The waveforms are read and resampled on multiple threads as
+        the dataset is consumed, overlapping clip sample reads with
+        each other and with inference. The clips whose waveforms the
+        dataset yields are appended to the returned list of clips as
+        they are yielded. Clips whose samples cannot be obtained are
+        omitted from both the dataset and the list.
+        """
+        
         result_clips = []
-        waveforms = []
-
-        for clip in clips:
+        
+        def get_clip_waveform(clip):
             
             try:
                 waveform = self._get_clip_samples(clip, inference_sample_rate)
@@ -145,14 +161,27 @@ class Annotator(AnnotatorBase):
                     f'Could not annotate clip "{clip}", since its samples '
                     f'could not be obtained. Error message was: {str(e)}')
                 
+                return clip, None
+            
             else:
                 # got clip samples
                 
-                result_clips.append(clip)
-                waveforms.append(waveform)
+                return clip, waveform
+                
+        def generate_waveforms():
+            
+            with PrefetchingIterator(
+                    get_clip_waveform, clips,
+                    _WAVEFORM_READ_THREAD_COUNT) as waveforms:
+                
+                for clip, waveform in waveforms:
+                    if waveform is not None:
+                        result_clips.append(clip)
+                        yield waveform
                 
         waveforms = \
-            dataset_utils.create_waveform_dataset_from_tensors(waveforms)
+            dataset_utils.create_waveform_dataset_from_tensors(
+                generate_waveforms())
                         
         return result_clips, waveforms
                 
@@ -69,6 +69,11 @@ _WAVEFORM_EXAMPLE_FEATURES = {
 
 def create_waveform_dataset_from_tensors(waveforms):
     
+    # The waveforms can be any iterable, including a generator, in
+    # which case they are generated as the dataset is consumed. Note,
+    # however, that a dataset created from a generator can be consumed
+    # only once.
+    #
     # One might like to just say:
     #
     #     dataset = tf.data.Dataset.from_tensor_slices(waveforms)
@@ -6,6 +6,16 @@ import vesper.mpg_ranch.nfc_bounding_interval_annotator_1_0.dataset_utils \
     as dataset_utils
 
 
+_MIN_BATCH_SLICE_COUNT = 4096
+"""
+Minimum number of gram slices of a batch of waveforms whose call bounds
+are inferred together, except for the last batch.
+"""
+
+_PREDICTION_BATCH_SIZE = 512
+"""Batch size of model predictions."""
+
+
 class Inferrer:
     
     
@@ -29,26 +39,68 @@ class Inferrer:
     
     def get_call_bounds(self, waveform_dataset):
         
+        """
+        Gets call bounds for the waveforms of a dataset.
+        
+        To amortize the overhead of model predictions over many
+        waveforms, this method packs the spectrogram slices of
+        consecutive waveforms into batches of at least
+        `_MIN_BATCH_SLICE_COUNT` slices (except perhaps for the last
+        batch) and gets the scores of each batch with one prediction
+        per model, splitting the scores back into per-waveform score
+        sequences.
+        """
+        
         dataset = dataset_utils.create_inference_dataset(
             waveform_dataset, self._start_settings)
         
-        return tuple(
-            self._get_call_bounds(*element) for element in dataset)
+        bounds = []
+        elements = []
+        slice_count = 0
+        
+        for element in dataset:
+            
+            elements.append(element)
+            slice_count += len(element[0])
+            
+            if slice_count >= _MIN_BATCH_SLICE_COUNT:
+                bounds += self._get_batch_call_bounds(elements)
+                elements = []
+                slice_count = 0
+                
+        if len(elements) != 0:
+            bounds += self._get_batch_call_bounds(elements)
+            
+        return tuple(bounds)
+    
+    
+    def _get_batch_call_bounds(self, elements):
+        
+        forward_gram_slices = [e[0].numpy() for e in elements]
+        backward_gram_slices = [e[1].numpy() for e in elements]
+        
+        start_scores = _get_scores(self._start_model, forward_gram_slices)
+        end_scores = _get_scores(self._end_model, backward_gram_slices)
+        
+        return [
+            self._get_call_bounds(*args)
+            for args in zip(
+                start_scores, end_scores, backward_gram_slices, elements)]
     
     
     def _get_call_bounds(
-            self, forward_gram_slices, backward_gram_slices, *args):
+            self, start_scores, end_scores, backward_gram_slices, element):
         
         bounds = (
-            self._get_call_start_index(forward_gram_slices),
-            self._get_call_end_index(backward_gram_slices))
+            self._get_call_start_index(start_scores),
+            self._get_call_end_index(end_scores, backward_gram_slices))
         
-        return bounds + tuple(args)
+        return bounds + tuple(element[2:])
         
         
-    def _get_call_start_index(self, gram_slices):
+    def _get_call_start_index(self, scores):
         
-        if len(gram_slices) == 0:
+        if len(scores) == 0:
             # no gram slices
             
             return None
@@ -57,13 +109,11 @@ class Inferrer:
             # at least one gram slice
             
             start_index = self._get_call_bound_index(
-                self._start_model, self._start_settings, gram_slices)
+                self._start_settings, scores)
             return self._gram_index_to_waveform_index(start_index)
     
     
-    def _get_call_bound_index(self, model, settings, gram_slices):
-        
-        scores = model.predict(gram_slices).flatten()
+    def _get_call_bound_index(self, settings, scores):
         
         if settings.bound_type == 'Start':
             offset = settings.call_start_index_offset
@@ -88,9 +138,9 @@ class Inferrer:
         return waveform_index
     
         
-    def _get_call_end_index(self, gram_slices):
+    def _get_call_end_index(self, scores, gram_slices):
         
-        if len(gram_slices) == 0:
+        if len(scores) == 0:
             # no gram slices
             
             return None
@@ -99,7 +149,7 @@ class Inferrer:
             # at least one gram slice
             
             end_index = self._get_call_bound_index(
-                self._end_model, self._end_settings, gram_slices)
+                self._end_settings, scores)
             
             # Recover spectrogram length from slices shape.
             shape = gram_slices.shape
@@ -112,3 +162,30 @@ class Inferrer:
             end_index = gram_length - 1 - end_index
             
             return self._gram_index_to_waveform_index(end_index)
+
+
+def _get_scores(model, gram_slices):
+    
+    """
+    Gets model scores for a sequence of gram slice arrays.
+    
+    The scores for all of the arrays are computed with a single model
+    prediction. The returned list contains one score array per slice
+    array.
+    """
+    
+    counts = [len(s) for s in gram_slices]
+    
+    # Omit empty slice arrays, whose shapes may differ from those of
+    # the other arrays.
+    gram_slices = [s for s in gram_slices if len(s) != 0]
+    
+    if len(gram_slices) == 0:
+        scores = np.zeros(0)
+        
+    else:
+        gram_slices = np.concatenate(gram_slices)
+        scores = model.predict(
+            gram_slices, batch_size=_PREDICTION_BATCH_SIZE).flatten()
+        
+    return np.split(scores, np.cumsum(counts)[:-1])
@@ -87,6 +87,17 @@ class _Detector:
     `process_clip` method must accept two arguments, the start index and
     length of the detected clip.
     
+    A detector can also notify a score listener of the classifier scores
+    that it computes before thresholding them. Each time the detector
+    scores a chunk of input it invokes the score listener's
+    `process_scores` method with the scores and an offset, a pair
+    containing the start index and the length of the chunk. Scores and
+    offsets saved by a score listener can later be passed to the
+    `process_scores` method of another detector with the same
+    `score_track_name`, for example a detector of the same clip type
+    but with a different threshold, to detect clips without rerunning
+    the classifier.
+    
     See the `_TSEEP_SETTINGS` and `_THRUSH_SETTINGS` objects above for
     settings that make a `_Detector` detect higher-frequency and
     lower-frequency NFCs, respectively, using the MPG Ranch tseep and
@@ -98,7 +109,7 @@ class _Detector:
     
     def __init__(
             self, settings, input_sample_rate, listener,
-            extra_thresholds=None):
+            extra_thresholds=None, score_listener=None):
         
         open_mp_utils.work_around_multiple_copies_issue()
         
@@ -108,6 +119,7 @@ class _Detector:
         self._settings = settings
         self._input_sample_rate = input_sample_rate
         self._listener = listener
+        self._score_listener = score_listener
         
         s2f = signal_utils.seconds_to_frames
         
@@ -247,12 +259,8 @@ class _Detector:
             # questionable. In the future, I hope to obviate the trick by
             # implementing faster but proper resampling of 22050 Hz and
             # 44100 Hz input. 
-            if self._input_sample_rate == 22050:
-                self._purported_input_sample_rate = 22000
-            elif self._input_sample_rate == 44100:
-                self._purported_input_sample_rate = 44000
-            else:
-                self._purported_input_sample_rate = self._input_sample_rate
+            self._purported_input_sample_rate = \
+                self._get_purported_input_sample_rate()
              
             # start_time = time.time()
             
@@ -291,7 +299,45 @@ class _Detector:
         
         if _SCORE_OUTPUT_ENABLED:
             self._score_file_writer.write(samples, scores)
+            
+        if self._score_listener is not None:
+            offset = (self._input_chunk_start_index, input_length)
+            self._score_listener.process_scores(scores, offset)
          
+        self._process_scores(scores, input_length)
+        
+        
+    def _get_purported_input_sample_rate(self):
+        if self._input_sample_rate == 22050:
+            return 22000
+        elif self._input_sample_rate == 44100:
+            return 44000
+        else:
+            return self._input_sample_rate
+            
+            
+    def process_scores(self, scores, offset):
+        
+        """
+        Detects clips in scores computed previously by a detector with
+        the same score track name.
+        
+        This method can be called repeatedly with the scores and offsets
+        received by a score listener of the other detector, in the order
+        in which the listener received them, instead of calling the
+        `detect` method. The `complete_detection` method should be called
+        after the final call to this method.
+        """
+        
+        self._input_chunk_start_index, input_length = offset
+        self._purported_input_sample_rate = \
+            self._get_purported_input_sample_rate()
+            
+        self._process_scores(scores, input_length)
+        
+        
+    def _process_scores(self, scores, input_length):
+        
         for threshold in self._thresholds:
             peak_indices = signal_utils.find_peaks(scores, threshold)
             peak_scores = scores[peak_indices]
@@ -358,7 +404,9 @@ class _Detector:
         for all input.
         """
         
-        self._process_input_chunks(process_all_samples=True)
+        # The input buffer is `None` if detection was from saved scores.
+        if self._input_buffer is not None:
+            self._process_input_chunks(process_all_samples=True)
             
         self._listener.complete_processing()
         
@@ -425,11 +473,15 @@ class TseepDetector(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         super().__init__(
-            _TSEEP_SETTINGS, sample_rate, listener, extra_thresholds)
+            _TSEEP_SETTINGS, sample_rate, listener, extra_thresholds,
+            score_listener)
 
     
 def _tseep_settings(threshold):
@@ -444,184 +496,252 @@ class TseepDetector90(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0 90'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _tseep_settings(90)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class TseepDetector80(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0 80'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _tseep_settings(80)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class TseepDetector70(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0 70'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _tseep_settings(70)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class TseepDetector60(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0 60'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _tseep_settings(60)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class TseepDetector50(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0 50'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _tseep_settings(50)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class TseepDetector40(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0 40'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _tseep_settings(40)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class TseepDetector30(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0 30'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _tseep_settings(30)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class TseepDetector20(_Detector):
     
     
     extension_name = 'MPG Ranch Tseep Detector 1.0 20'
+    score_track_name = 'MPG Ranch Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _tseep_settings(20)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class ThrushDetector(_Detector):
      
      
     extension_name = 'MPG Ranch Thrush Detector 1.0'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
      
      
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         super().__init__(
-            _THRUSH_SETTINGS, sample_rate, listener, extra_thresholds)
+            _THRUSH_SETTINGS, sample_rate, listener, extra_thresholds,
+            score_listener)
 
 
 class ThrushDetector90(_Detector):
     
     
     extension_name = 'MPG Ranch Thrush Detector 1.0 90'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _thrush_settings(90)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class ThrushDetector80(_Detector):
     
     
     extension_name = 'MPG Ranch Thrush Detector 1.0 80'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _thrush_settings(80)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class ThrushDetector70(_Detector):
     
     
     extension_name = 'MPG Ranch Thrush Detector 1.0 70'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _thrush_settings(70)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class ThrushDetector60(_Detector):
     
     
     extension_name = 'MPG Ranch Thrush Detector 1.0 60'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _thrush_settings(60)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class ThrushDetector50(_Detector):
     
     
     extension_name = 'MPG Ranch Thrush Detector 1.0 50'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _thrush_settings(50)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
     
 class ThrushDetector40(_Detector):
     
     
     extension_name = 'MPG Ranch Thrush Detector 1.0 40'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _thrush_settings(40)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
 
 class ThrushDetector30(_Detector):
     
     
     extension_name = 'MPG Ranch Thrush Detector 1.0 30'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _thrush_settings(30)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
 
 
 class ThrushDetector20(_Detector):
     
     
     extension_name = 'MPG Ranch Thrush Detector 1.0 20'
+    score_track_name = 'MPG Ranch Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener, extra_thresholds=None):
+    def __init__(
+            self, sample_rate, listener, extra_thresholds=None,
+            score_listener=None):
         settings = _thrush_settings(20)
-        super().__init__(settings, sample_rate, listener, extra_thresholds)
+        super().__init__(
+            settings, sample_rate, listener, extra_thresholds, score_listener)
@@ -16,6 +16,12 @@ from vesper.command.annotator import Annotator
 import vesper.django.app.model_utils as model_utils
 
 
+_CLIP_BATCH_SIZE = 1000
+"""
+Number of clips classified together by `SpeciesClassifier.annotate_clips`.
+"""
+
+
 class SpeciesClassifier(Annotator):
     
     
@@ -47,6 +53,39 @@ class SpeciesClassifier(Annotator):
                     annotated = True
                     
         return annotated
+    
+    
+    def annotate_clips(self, clips):
+        
+        """
+        Annotates the specified clips.
+        
+        The clips are classified in batches of `_CLIP_BATCH_SIZE` clips,
+        computing call features and classifying calls for each batch at
+        once rather than clip by clip. The result is the same as that
+        of calling `annotate` for each clip.
+        """
+        
+        # Get tseep clips classified as calls, but not to species.
+        clips = [
+            clip for clip in clips
+            if self._get_annotation_value(clip) == 'Call' and
+            model_utils.get_clip_type(clip) == 'Tseep']
+        
+        annotated_clip_count = 0
+        
+        for i in range(0, len(clips), _CLIP_BATCH_SIZE):
+            
+            batch = clips[i:i + _CLIP_BATCH_SIZE]
+            
+            classifications = self._classifier.classify_clips(batch)
+            
+            for clip, classification in zip(batch, classifications):
+                if classification is not None:
+                    self._annotate(clip, classification)
+                    annotated_clip_count += 1
+                    
+        return annotated_clip_count
         
             
 def _create_classifier(name):
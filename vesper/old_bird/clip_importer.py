@@ -599,6 +599,18 @@ def _assert_recording_contains_clip(recording, clip_start_time, clip_end_time):
     
     
 def _copy_clip_audio_file(from_path, clip):
-    to_path = clip_manager.instance.get_audio_file_path(clip)
-    os_utils.create_parent_directory(to_path)
-    os_utils.copy_file(from_path, to_path)
+    
+    manager = clip_manager.instance
+    
+    if manager.segment_store is not None:
+        # clip audio stored in segment files
+        
+        samples, _ = audio_file_utils.read_wave_file(str(from_path))
+        manager.create_audio_file(clip, samples[0])
+        
+    else:
+        # clip audio stored in one file per clip
+        
+        to_path = manager.get_audio_file_path(clip)
+        os_utils.create_parent_directory(to_path)
+        os_utils.copy_file(from_path, to_path)
@@ -65,6 +65,17 @@ _THRUSH_SETTINGS = Bunch(
 )
 
 
+_MAX_BLOCK_SIZE = 131072
+"""
+maximum number of samples, summed over channels, that a detector
+processes at once.
+
+A multichannel detector processes longer inputs in consecutive blocks of
+at most this many samples. Processing much larger blocks is slower since
+the intermediate arrays of larger blocks do not fit in processor caches.
+"""
+
+
 # import datetime
 # 
 # 
@@ -110,14 +121,37 @@ class _Detector:
     and they could only run on one input file on a given computer at once.
     This reimplementation removes those limitations.
     
-    An instance of this class operates on a single audio channel. It has a
-    `detect` method that takes a NumPy array of samples. The method can be
-    called repeatedly with consecutive sample arrays. The `complete_detection`
-    method should be called after the final call to the `detect` method.
-    During detection, each time the detector detects a clip it notifies
-    a listener by invoking the listener's `process_clip` method. The
-    `process_clip` method must accept two arguments, the start index and
-    length of the detected clip.
+    By default an instance of this class operates on a single audio
+    channel. It has a `detect` method that takes a NumPy array of samples.
+    The method can be called repeatedly with consecutive sample arrays.
+    The `complete_detection` method should be called after the final call
+    to the `detect` method. During detection, each time the detector
+    detects a clip it notifies a listener by invoking the listener's
+    `process_clip` method. The `process_clip` method must accept two
+    arguments, the start index and length of the detected clip.
+    
+    An instance created with a `channel_count` operates on that many
+    audio channels at once. Its `detect` method takes two-dimensional
+    sample arrays whose first index is the channel number and whose
+    second index is the sample number, and it filters, integrates, and
+    thresholds all channels with single NumPy operations, which is
+    considerably faster than running one single-channel detector per
+    channel. Such a detector invokes its listener's `process_clip` method
+    with an additional `channel_num` keyword argument, the number of the
+    channel in which the clip was detected.
+    
+    A detector can also notify a score listener of the ratios that it
+    computes before thresholding them. Each time the detector computes
+    ratios it invokes the score listener's `process_scores` method with
+    the ratios and their index offset. The ratios of a multichannel
+    detector are a two-dimensional array with one row per channel, and
+    the ratios passed to its `process_scores` method must be, too.
+    Ratios and offsets saved by a
+    score listener can later be passed to the `process_scores` method
+    of another detector with the same settings, except possibly for the
+    ratio threshold, to detect clips without recomputing the ratios.
+    Detectors with the same `score_track_name` can share saved ratios
+    in this way.
     
     See the `_TSEEP_SETTINGS` and `_THRUSH_SETTINGS` objects above for
     settings that make a `_Detector` behave much like the original Old
@@ -135,17 +169,29 @@ class _Detector:
     """
     
     
-    def __init__(self, settings, sample_rate, listener):
+    supports_multichannel_input = True
+    
+    
+    def __init__(
+            self, settings, sample_rate, listener, score_listener=None,
+            channel_count=None):
         
         self._settings = settings
         self._sample_rate = sample_rate
         self._listener = listener
+        self._score_listener = score_listener
+        self._channel_count = channel_count
         
         self._signal_processor = self._create_signal_processor()
-        self._series_processor = self._create_series_processor()
+        
+        # We use one series processor per channel, since series
+        # processors have state.
+        num_channels = 1 if channel_count is None else channel_count
+        self._series_processors = [
+            self._create_series_processor() for _ in range(num_channels)]
         
         self._num_samples_processed = 0
-        self._recent_samples = np.array([], dtype='float')
+        self._recent_samples = np.zeros((num_channels, 0))
         self._initial_samples_repeated = False
         
 #         self._crossings_handler = _CrossingsHandler(sample_rate)
@@ -240,6 +286,11 @@ class _Detector:
         return self._sample_rate
     
     
+    @property
+    def channel_count(self):
+        return self._channel_count
+    
+    
     @property
     def listener(self):
         return self._transient_finder.listener
@@ -247,9 +298,27 @@ class _Detector:
     
     def detect(self, samples):
         
-        augmented_samples = np.concatenate((self._recent_samples, samples))
+        samples = self._get_channel_array(samples)
+        
+        channel_count, length = samples.shape
+        block_size = max(_MAX_BLOCK_SIZE // channel_count, 1)
         
-        if len(augmented_samples) <= self._signal_processor.latency:
+        if length <= block_size:
+            self._detect(samples)
+            
+        else:
+            # input is long
+            
+            for i in range(0, length, block_size):
+                self._detect(samples[:, i:i + block_size])
+                
+                
+    def _detect(self, samples):
+        
+        augmented_samples = np.concatenate(
+            (self._recent_samples, samples), axis=1)
+        
+        if augmented_samples.shape[1] <= self._signal_processor.latency:
             # don't yet have enough samples to fill processing pipeline
             
             self._recent_samples = augmented_samples
@@ -268,46 +337,127 @@ class _Detector:
                 
             # Add one to offset for agreement with original Old Bird detector.
             offset += 1
+            
+            if self._score_listener is not None:
+                self._score_listener.process_scores(
+                    self._get_output_array(ratios), offset)
                 
-            crossings = self._get_threshold_crossings(ratios, offset)
+            self._process_ratios(ratios, offset)
             
-#             self._crossings_handler.handle_crossings(crossings, self._lines)
+            # Save trailing samples for next call to this method.
+            self._recent_samples = \
+                augmented_samples[:, -self._signal_processor.latency:]
             
-            clips = self._series_processor.process(crossings)
+        self._num_samples_processed += samples.shape[1]
             
-            self._notify_listener(clips)
             
-            # Save trailing samples for next call to this method.
-            self._recent_samples = \
-                augmented_samples[-self._signal_processor.latency:]
+    def _get_channel_array(self, x):
+        
+        """
+        Gets a two-dimensional view of a detector input or score array,
+        with one row per channel.
+        """
+        
+        if self._channel_count is None:
+            return x[np.newaxis]
+        else:
+            return x
+        
+        
+    def _get_output_array(self, x):
+        
+        """Inverts `_get_channel_array`."""
+        
+        if self._channel_count is None:
+            return x[0]
+        else:
+            return x
+            
+            
+    def process_scores(self, ratios, offset):
+        
+        """
+        Detects clips in ratios computed previously by a detector with
+        the same settings, except possibly for the ratio threshold.
+        
+        This method can be called repeatedly with the ratios and offsets
+        received by a score listener of the other detector, in the order
+        in which the listener received them, instead of calling the
+        `detect` method. The `complete_detection` method should be called
+        after the final call to this method.
+        """
+        
+        ratios = self._get_channel_array(ratios)
+        
+        self._process_ratios(ratios, offset)
+        
+        # Ratio `i` is computed from the input sample with index
+        # `offset + i - 1`, so all of the input preceding the sample
+        # with index `offset + len(ratios)` has been processed.
+        self._num_samples_processed = offset + ratios.shape[1]
+        
+        
+    def _process_ratios(self, ratios, offset):
+        
+        channel_crossings = self._get_threshold_crossings(ratios, offset)
+        
+        for channel_num, crossings in enumerate(channel_crossings):
             
-        self._num_samples_processed += len(samples)
+#             self._crossings_handler.handle_crossings(crossings, self._lines)
+        
+            processor = self._series_processors[channel_num]
+            clips = processor.process(crossings)
+            self._notify_listener(clips, channel_num)
             
             
     def _get_threshold_crossings(self, ratios, offset):
+        
+        """
+        Gets the threshold crossings of a two-dimensional array of
+        ratios, with one row per channel.
+        
+        :Returns:
+            a list containing one list of crossings per channel. Each
+            crossing is an `(index, rise)` pair, where `rise` is `True`
+            for a rise above the threshold and `False` for a fall
+            below the threshold inverse. Crossings are in order of
+            increasing index, with falls preceding rises at the same
+            index.
+        """
     
         # Add one to index offset to compensate for processing latency
         # of this method.
         offset += 1
         
-        x0 = ratios[:-1]
-        x1 = ratios[1:]
+        x0 = ratios[:, :-1]
+        x1 = ratios[:, 1:]
         
         # Find indices where ratio rises above threshold.
         t = self.settings.ratio_threshold
-        rise_indices = np.where((x0 <= t) & (x1 > t))[0] + offset
+        rise_channel_nums, rise_indices = np.nonzero((x0 <= t) & (x1 > t))
         
         # Find indices where ratio falls below threshold inverse.
         t = 1 / t
-        fall_indices = np.where((x0 >= t) & (x1 < t))[0] + offset
-
-        # Tag rises and falls with booleans, combine, and sort.
-        return sorted(
-            [(i, True) for i in rise_indices] +
-            [(i, False) for i in fall_indices])
+        fall_channel_nums, fall_indices = np.nonzero((x0 >= t) & (x1 < t))
+        
+        # Tag rises and falls with booleans, combine, and sort by
+        # channel number, index, and tag.
+        channel_nums = np.concatenate((rise_channel_nums, fall_channel_nums))
+        indices = np.concatenate((rise_indices, fall_indices)) + offset
+        rises = np.concatenate((
+            np.ones(len(rise_indices), dtype='bool'),
+            np.zeros(len(fall_indices), dtype='bool')))
+        order = np.lexsort((rises, indices, channel_nums))
+        crossings = list(zip(indices[order].tolist(), rises[order].tolist()))
+        
+        # Split crossings by channel.
+        counts = np.bincount(channel_nums, minlength=ratios.shape[0])
+        ends = np.cumsum(counts).tolist()
+        starts = [0] + ends[:-1]
+        return [crossings[i:j] for i, j in zip(starts, ends)]
     
     
-    def _notify_listener(self, clips):
+    def _notify_listener(self, clips, channel_num):
         
         for start_index, length in clips:
             
@@ -319,7 +469,14 @@ class _Detector:
 #                 length, str(start_time), duration, str(end_time))
 #             self._lines.append((start_index, s))
 
-            self._listener.process_clip(start_index, length)
+            if self._channel_count is None:
+                self._listener.process_clip(start_index, length)
+                
+            else:
+                # detector is multichannel
+                
+                self._listener.process_clip(
+                    start_index, length, channel_num=channel_num)
             
             
     def complete_detection(self):
@@ -334,8 +491,9 @@ class _Detector:
         # minimum clip duration before the end of the input but for
         # which for whatever reason there has not yet been a fall.
         fall = (self._num_samples_processed, False)
-        clips = self._series_processor.complete_processing([fall])
-        self._notify_listener(clips)
+        for channel_num, processor in enumerate(self._series_processors):
+            clips = processor.complete_processing([fall])
+            self._notify_listener(clips, channel_num)
 
         if hasattr(self._listener, 'complete_processing'):
             self._listener.complete_processing()
@@ -367,11 +525,15 @@ class _FirFilter(_SignalProcessor):
     
     def __init__(self, coefficients):
         super().__init__(len(coefficients) - 1)
-        self._coefficients = coefficients
+        
+        # We store the coefficients as a one-row array so we can filter
+        # all channels of a multichannel input with one convolution.
+        self._coefficients = coefficients[np.newaxis]
         
         
     def process(self, x):
-        return signal.fftconvolve(x, self._coefficients, mode='valid')
+        return signal.fftconvolve(
+            x, self._coefficients, mode='valid', axes=-1)
     
     
 class _Squarer(_SignalProcessor):
@@ -417,7 +579,7 @@ class _Divider(_SignalProcessor):
         # with very small ones.
         x[np.where(x == 0)] = 1e-20
         
-        return x[self._delay:] / x[:-self._delay]
+        return x[..., self._delay:] / x[..., :-self._delay]
              
     
 class _SignalProcessorChain(_SignalProcessor):
@@ -765,20 +927,32 @@ class TseepDetector(_Detector):
     
     
     extension_name = 'Old Bird Tseep Detector Redux 1.1'
+    score_track_name = extension_name
     
     
-    def __init__(self, sample_rate, listener):
-        super().__init__(_TSEEP_SETTINGS, sample_rate, listener)
+    def __init__(
+            self, sample_rate, listener, score_listener=None,
+            channel_count=None):
+        
+        super().__init__(
+            _TSEEP_SETTINGS, sample_rate, listener, score_listener,
+            channel_count)
 
     
 class ThrushDetector(_Detector):
     
     
     extension_name = 'Old Bird Thrush Detector Redux 1.1'
+    score_track_name = extension_name
     
     
-    def __init__(self, sample_rate, listener):
-        super().__init__(_THRUSH_SETTINGS, sample_rate, listener)
+    def __init__(
+            self, sample_rate, listener, score_listener=None,
+            channel_count=None):
+        
+        super().__init__(
+            _THRUSH_SETTINGS, sample_rate, listener, score_listener,
+            channel_count)
         
         
 def _firls(numtaps, bands, desired):
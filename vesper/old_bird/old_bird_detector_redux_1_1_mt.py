@@ -123,8 +123,16 @@ class _Detector:
     method should be called after the final call to the `detect` method.
     During detection, each time the detector detects a clip it notifies
     a listener by invoking the listener's `process_clip` method. The
-    `process_clip` method must accept two arguments, the start index and
-    length of the detected clip.
+    `process_clip` method must accept three arguments, the start index and
+    length of the detected clip, and the detection threshold.
+    
+    A detector can also notify a score listener of the ratios that it
+    computes before thresholding them. Each time the detector computes
+    ratios it invokes the score listener's `process_scores` method with
+    the ratios and their index offset. Ratios and offsets saved by a
+    score listener can later be passed to the `process_scores` method
+    of another detector with the same settings but different thresholds
+    to detect clips at those thresholds without recomputing the ratios.
     
     See the `_TSEEP_SETTINGS` and `_THRUSH_SETTINGS` objects above for
     settings that make a `_Detector` behave much like the original Old
@@ -142,12 +150,15 @@ class _Detector:
     """
     
     
-    def __init__(self, settings, ratio_thresholds, sample_rate, listener):
+    def __init__(
+            self, settings, ratio_thresholds, sample_rate, listener,
+            score_listener=None):
         
         self._settings = settings
         self._ratio_thresholds = ratio_thresholds
         self._sample_rate = sample_rate
         self._listener = listener
+        self._score_listener = score_listener
         
         self._signal_processor = self._create_signal_processor()
         self._series_processors = self._create_series_processors()
@@ -282,18 +293,11 @@ class _Detector:
                 
             # Add one to offset for agreement with original Old Bird detector.
             offset += 1
+            
+            if self._score_listener is not None:
+                self._score_listener.process_scores(ratios, offset)
                 
-            for threshold in self._ratio_thresholds:
-                
-                crossings = \
-                    self._get_threshold_crossings(ratios, threshold, offset)
-                
-                # self._crossings_handler.handle_crossings(
-                #     crossings, self._lines)
-                
-                clips = self._series_processors[threshold].process(crossings)
-                
-                self._notify_listener(clips, threshold)
+            self._process_ratios(ratios, offset)
                 
             # Save trailing samples for next call to this method.
             self._recent_samples = \
@@ -302,6 +306,42 @@ class _Detector:
         self._num_samples_processed += len(samples)
             
             
+    def process_scores(self, ratios, offset):
+        
+        """
+        Detects clips in ratios computed previously by a detector with
+        the same settings.
+        
+        This method can be called repeatedly with the ratios and offsets
+        received by a score listener of the other detector, in the order
+        in which the listener received them, instead of calling the
+        `detect` method. The `complete_detection` method should be called
+        after the final call to this method.
+        """
+        
+        self._process_ratios(ratios, offset)
+        
+        # Ratio `i` is computed from the input sample with index
+        # `offset + i - 1`, so all of the input preceding the sample
+        # with index `offset + len(ratios)` has been processed.
+        self._num_samples_processed = offset + len(ratios)
+        
+        
+    def _process_ratios(self, ratios, offset):
+        
+        for threshold in self._ratio_thresholds:
+            
+            crossings = \
+                self._get_threshold_crossings(ratios, threshold, offset)
+            
+            # self._crossings_handler.handle_crossings(
+            #     crossings, self._lines)
+            
+            clips = self._series_processors[threshold].process(crossings)
+            
+            self._notify_listener(clips, threshold)
+            
+            
     def _get_threshold_crossings(self, ratios, threshold, offset):
     
         # Add one to index offset to compensate for processing latency
@@ -783,8 +823,10 @@ class TseepDetector(_Detector):
     extension_name = 'Old Bird Tseep Detector Redux 1.1'
     
     
-    def __init__(self, thresholds, sample_rate, listener):
-        super().__init__(_TSEEP_SETTINGS, thresholds, sample_rate, listener)
+    def __init__(self, thresholds, sample_rate, listener, score_listener=None):
+        super().__init__(
+            _TSEEP_SETTINGS, thresholds, sample_rate, listener,
+            score_listener)
 
     
 class ThrushDetector(_Detector):
@@ -793,8 +835,10 @@ class ThrushDetector(_Detector):
     extension_name = 'Old Bird Thrush Detector Redux 1.1'
     
     
-    def __init__(self, thresholds, sample_rate, listener):
-        super().__init__(_THRUSH_SETTINGS, thresholds, sample_rate, listener)
+    def __init__(self, thresholds, sample_rate, listener, score_listener=None):
+        super().__init__(
+            _THRUSH_SETTINGS, thresholds, sample_rate, listener,
+            score_listener)
         
         
 def _firls(numtaps, bands, desired):
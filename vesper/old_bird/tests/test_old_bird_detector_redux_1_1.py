@@ -1,6 +1,9 @@
 from unittest import TestCase
 
-from vesper.old_bird.old_bird_detector_redux_1_1 import _TransientFinder
+import numpy as np
+
+from vesper.old_bird.old_bird_detector_redux_1_1 import (
+    ThrushDetector, TseepDetector, _TransientFinder)
 
 
 _MIN_LENGTH = 100
@@ -96,3 +99,93 @@ class TransientFinderTests(TestCase):
                 clips += finder.process([crossing])
             clips += finder.complete_processing([_FINAL_FALL])
             self.assertEqual(clips, expected_clips)
+
+
+_SAMPLE_RATE = 22050
+
+
+class MultichannelDetectorTests(TestCase):
+    
+    
+    def test_detect(self):
+        
+        samples = np.stack([_create_samples(i) for i in range(3)])
+        
+        for cls in (TseepDetector, ThrushDetector):
+            
+            # Detect clips in all channels at once.
+            listener = _Listener()
+            scores = _ScoreListener()
+            detector = cls(_SAMPLE_RATE, listener, scores, channel_count=3)
+            for i in range(0, samples.shape[1], 10000):
+                detector.detect(samples[:, i:i + 10000])
+            detector.complete_detection()
+            
+            for channel_num, channel_samples in enumerate(samples):
+                
+                # Detect clips in one channel.
+                channel_listener = _Listener()
+                channel_scores = _ScoreListener()
+                detector = cls(
+                    _SAMPLE_RATE, channel_listener, channel_scores)
+                for i in range(0, len(channel_samples), 10000):
+                    detector.detect(channel_samples[i:i + 10000])
+                detector.complete_detection()
+                
+                self.assertNotEqual(channel_listener.clips, [])
+                self.assertEqual(
+                    listener.get_channel_clips(channel_num),
+                    channel_listener.clips)
+                
+                for (ratios, offset), (channel_ratios, channel_offset) in \
+                        zip(scores.chunks, channel_scores.chunks):
+                    self.assertTrue(
+                        np.array_equal(ratios[channel_num], channel_ratios))
+                    self.assertEqual(offset, channel_offset)
+            
+            
+class _Listener:
+    
+    
+    def __init__(self):
+        self.clips = []
+        
+        
+    def process_clip(self, start_index, length, channel_num=None):
+        if channel_num is None:
+            self.clips.append((start_index, length))
+        else:
+            self.clips.append((start_index, length, channel_num))
+            
+            
+    def get_channel_clips(self, channel_num):
+        return [(s, l) for s, l, c in self.clips if c == channel_num]
+    
+    
+class _ScoreListener:
+    
+    
+    def __init__(self):
+        self.chunks = []
+        
+        
+    def process_scores(self, scores, offset):
+        self.chunks.append((scores, offset))
+        
+        
+def _create_samples(seed):
+    
+    random = np.random.RandomState(seed)
+    samples = 100 * random.randn(10 * _SAMPLE_RATE)
+    
+    # Add tseep and thrush calls, at different times in different
+    # channels.
+    call_length = int(round(.15 * _SAMPLE_RATE))
+    times = np.arange(call_length) / _SAMPLE_RATE
+    for i in range(1, 5):
+        frequency = 7000 if i % 2 == 0 else 4000
+        call = 5000 * np.sin(2 * np.pi * frequency * times)
+        start_index = int(round((1.9 * i + .3 * seed) * _SAMPLE_RATE))
+        samples[start_index:start_index + call_length] += call
+        
+    return samples
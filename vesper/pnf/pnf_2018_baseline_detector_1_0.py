@@ -13,7 +13,7 @@ import numpy as np
 # from vesper.pnf.ratio_file_writer import RatioFileWriter
 from vesper.pnf.pnf_energy_detector_1_0 import (
     Detector, _FirFilter, _seconds_to_samples, _SeriesProcessor,
-    _SeriesProcessorChain)
+    _SeriesProcessorChain, _split_by_channel)
 from vesper.util.bunch import Bunch
 
 
@@ -56,27 +56,35 @@ class BaselineDetector(Detector):
         return _SeriesProcessorChain(processors)
     
         
-    def _get_threshold_crossings(self, ratios, threshold):
+    def _get_threshold_crossings(self, ratios, threshold, offset):
      
-        x0 = ratios[:-1]
-        x1 = ratios[1:]
+        x0 = ratios[:, :-1]
+        x1 = ratios[:, 1:]
          
         # Find indices where ratio rises above threshold.
         t = threshold
-        rise_indices = np.where((x0 <= t) & (x1 > t))[0] + 1
+        rise_channel_nums, rise_indices = np.nonzero((x0 <= t) & (x1 > t))
          
         # Find indices where ratio falls below threshold inverse.
         t = 1 / t
-        fall_indices = np.where((x0 >= t) & (x1 < t))[0] + 1
+        fall_channel_nums, fall_indices = np.nonzero((x0 >= t) & (x1 < t))
+        
+        # Tag rises and falls with booleans and combine.
+        channel_nums = np.concatenate((rise_channel_nums, fall_channel_nums))
+        indices = np.concatenate((rise_indices, fall_indices)) + 1
+        rises = np.concatenate((
+            np.ones(len(rise_indices), dtype='bool'),
+            np.zeros(len(fall_indices), dtype='bool')))
         
         # Convert indices to times.
-        rise_times = self._convert_indices_to_times(rise_indices)
-        fall_times = self._convert_indices_to_times(fall_indices)
+        times = self._convert_indices_to_times(indices, offset)
+        
+        # Sort by channel number, time, and tag.
+        order = np.lexsort((rises, times, channel_nums))
+        crossings = list(zip(times[order].tolist(), rises[order].tolist()))
         
-        # Tag rises and falls with booleans, combine, and sort.
-        return sorted(
-            [(t, True) for t in rise_times] +
-            [(t, False) for t in fall_times])
+        return _split_by_channel(
+            crossings, channel_nums[order], ratios.shape[0])
     
 
 class _TimeIntegrator(_FirFilter):
@@ -292,8 +300,10 @@ class TseepDetector(BaselineDetector):
     extension_name = 'PNF 2018 Baseline Tseep Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener):
-        super().__init__(_TSEEP_SETTINGS, sample_rate, listener)
+    def __init__(self, sample_rate, listener, channel_count=None):
+        super().__init__(
+            _TSEEP_SETTINGS, sample_rate, listener,
+            channel_count=channel_count)
 
 
 class ThrushDetector(BaselineDetector):
@@ -302,5 +312,7 @@ class ThrushDetector(BaselineDetector):
     extension_name = 'PNF 2018 Baseline Thrush Detector 1.0'
     
     
-    def __init__(self, sample_rate, listener):
-        super().__init__(_THRUSH_SETTINGS, sample_rate, listener)
+    def __init__(self, sample_rate, listener, channel_count=None):
+        super().__init__(
+            _THRUSH_SETTINGS, sample_rate, listener,
+            channel_count=channel_count)
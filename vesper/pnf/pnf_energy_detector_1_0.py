@@ -182,6 +182,17 @@ from the different sub-detectors?
 '''
     
     
+_MAX_BLOCK_SIZE = 131072
+"""
+Maximum number of samples, summed over channels, that a detector
+processes at once.
+
+A multichannel detector processes longer inputs in consecutive blocks of
+at most this many samples. Processing much larger blocks is slower since
+the intermediate arrays of larger blocks do not fit in processor caches.
+"""
+
+
 _TSEEP_SETTINGS = Bunch(
     window_type='hann',
     window_size=.005,                           # seconds
@@ -219,15 +230,35 @@ class Detector:
     """
     PNF energy detector.
 
-    An instance of this class operates on a single audio channel. It has a
-    `detect` method that takes a NumPy array of samples. The method can be
-    called repeatedly with consecutive sample arrays. The `complete_detection`
-    method should be called after the final call to the `detect` method.
-    During detection, each time the detector detects a clip it notifies
-    a listener by invoking the listener's `process_clip` method. The
-    `process_clip` method must accept three arguments, the start index and
-    length of the detected clip, and the detection threshold of the
-    detector.
+    By default an instance of this class operates on a single audio
+    channel. It has a `detect` method that takes a NumPy array of samples.
+    The method can be called repeatedly with consecutive sample arrays.
+    The `complete_detection` method should be called after the final call
+    to the `detect` method. During detection, each time the detector
+    detects a clip it notifies a listener by invoking the listener's
+    `process_clip` method. The `process_clip` method must accept three
+    arguments, the start index and length of the detected clip, and the
+    detection threshold of the detector.
+    
+    An instance created with a `channel_count` operates on that many
+    audio channels at once. Its `detect` method takes two-dimensional
+    sample arrays whose first index is the channel number and whose
+    second index is the sample number, and it computes spectrograms,
+    filters, and thresholds all channels with single NumPy operations.
+    Such a detector invokes its listener's `process_clip` method with an
+    additional `channel_num` keyword argument, the number of the channel
+    in which the clip was detected.
+    
+    A detector can also notify a score listener of the ratios that it
+    computes before thresholding them. Each time the detector computes
+    ratios it invokes the score listener's `process_scores` method with
+    the ratios and the time offset in seconds of the first of them.
+    The ratios of a multichannel detector are a two-dimensional array
+    with one row per channel, and the ratios passed to its
+    `process_scores` method must be, too. Ratios and offsets saved by a
+    score listener can later be passed to the `process_scores` method
+    of another detector with the same settings but different thresholds
+    to detect clips at those thresholds without recomputing the ratios.
     
     See the `_TSEEP_SETTINGS` and `_THRUSH_SETTINGS` objects above for
     tseep and thrush NFC detector settings. The `TseepDetector` and
@@ -237,20 +268,31 @@ class Detector:
     """
     
     
+    supports_multichannel_input = True
+    
+    
     def __init__(
             self, settings, input_sample_rate, listener,
-            debugging_listener=None):
+            debugging_listener=None, score_listener=None,
+            channel_count=None):
         
         self._settings = settings
         self._input_sample_rate = input_sample_rate
         self._listener = listener
         self._debugging_listener = debugging_listener
+        self._score_listener = score_listener
+        self._channel_count = channel_count
         
         self._signal_processor = self._create_signal_processor()
-        self._series_processors = self._create_series_processors()
+        
+        # We use one set of series processors per channel, since series
+        # processors have state.
+        num_channels = 1 if channel_count is None else channel_count
+        self._series_processors = [
+            self._create_series_processors() for _ in range(num_channels)]
         
         self._num_samples_processed = 0
-        self._unprocessed_samples = np.array([], dtype='float')
+        self._unprocessed_samples = np.zeros((num_channels, 0))
         self._num_samples_generated = 0
         
 #         self._ratio_file_writer = RatioFileWriter(
@@ -334,6 +376,11 @@ class Detector:
         return self._sample_rate
     
     
+    @property
+    def channel_count(self):
+        return self._channel_count
+    
+    
     @property
     def listener(self):
         return self._transient_finder.listener
@@ -341,6 +388,23 @@ class Detector:
     
     def detect(self, samples):
         
+        samples = self._get_channel_array(samples)
+        
+        channel_count, length = samples.shape
+        block_size = max(_MAX_BLOCK_SIZE // channel_count, 1)
+        
+        if length <= block_size:
+            self._detect(samples)
+            
+        else:
+            # input is long
+            
+            for i in range(0, length, block_size):
+                self._detect(samples[:, i:i + block_size])
+                
+                
+    def _detect(self, samples):
+        
         # TODO: Consider having each signal processor keep track of which
         # of its input samples it has processed, saving unprocessed samples
         # for future calls to the `process` function, and remove such
@@ -354,52 +418,124 @@ class Detector:
         
         # Concatenate unprocessed samples received in previous calls to
         # this method with new samples.
-        samples = np.concatenate((self._unprocessed_samples, samples))
+        samples = np.concatenate((self._unprocessed_samples, samples), axis=1)
         
         # Run signal processors on samples.
         ratios = self._signal_processor.process(samples)
            
         # self._ratio_file_writer.write(samples, ratios)
+        
+        offset = self._num_samples_processed / self._input_sample_rate + \
+            self._signal_processor.output_time_offset
+        
+        if self._score_listener is not None:
+            self._score_listener.process_scores(
+                self._get_output_array(ratios), offset)
           
-        for threshold in self._settings.thresholds:
-            crossings = self._get_threshold_crossings(ratios, threshold)
-            clips = self._series_processors[threshold].process(crossings)
-            self._notify_listener(clips, threshold)
+        self._process_ratios(ratios, offset)
             
-        num_samples_generated = len(ratios)
+        num_samples_generated = ratios.shape[1]
         num_samples_processed = \
             num_samples_generated * self._signal_processor.hop_size
         self._num_samples_processed += num_samples_processed
-        self._unprocessed_samples = samples[num_samples_processed:]
+        self._unprocessed_samples = samples[:, num_samples_processed:]
         self._num_samples_generated += num_samples_generated
             
             
-    def _get_threshold_crossings(self, ratios, threshold):
+    def _get_channel_array(self, x):
+        
+        """
+        Gets a two-dimensional view of a detector input or score array,
+        with one row per channel.
+        """
+        
+        if self._channel_count is None:
+            return x[np.newaxis]
+        else:
+            return x
+        
+        
+    def _get_output_array(self, x):
+        
+        """Inverts `_get_channel_array`."""
+        
+        if self._channel_count is None:
+            return x[0]
+        else:
+            return x
+            
+            
+    def process_scores(self, ratios, offset):
+        
+        """
+        Detects clips in ratios.
+        
+        The `detect` method calls this method with the ratios that it
+        computes. This method can also be called repeatedly with the
+        ratios and offsets received by a score listener of a detector
+        with the same settings, in the order in which the listener
+        received them, instead of calling the `detect` method. The
+        `complete_detection` method should be called after the final
+        call to this method.
+        """
+        
+        self._process_ratios(self._get_channel_array(ratios), offset)
+        
+        
+    def _process_ratios(self, ratios, offset):
+        
+        for threshold in self._settings.thresholds:
+            
+            channel_crossings = \
+                self._get_threshold_crossings(ratios, threshold, offset)
+            
+            for channel_num, crossings in enumerate(channel_crossings):
+                processor = self._series_processors[channel_num][threshold]
+                clips = processor.process(crossings)
+                self._notify_listener(clips, threshold, channel_num)
+            
+            
+    def _get_threshold_crossings(self, ratios, threshold, offset):
+        
+        """
+        Gets the threshold crossings of a two-dimensional array of
+        ratios, with one row per channel.
+        
+        :Returns:
+            a list containing one sequence of crossings per channel.
+        """
       
-        x0 = ratios[:-1]
-        x1 = ratios[1:]
+        x0 = ratios[:, :-1]
+        x1 = ratios[:, 1:]
           
         # Find indices where ratio rises above threshold.
         t = threshold
-        indices = np.where((x0 <= t) & (x1 > t))[0] + 1
+        channel_nums, indices = np.nonzero((x0 <= t) & (x1 > t))
+        indices += 1
           
         # Convert indices to times.
-        times = self._convert_indices_to_times(indices)
+        times = self._convert_indices_to_times(indices, offset)
          
-        return times
+        return _split_by_channel(times, channel_nums, ratios.shape[0])
     
     
-    def _convert_indices_to_times(self, indices):
-        input_fs = self._signal_processor.input_sample_rate
+    def _convert_indices_to_times(self, indices, offset):
         output_fs = self._signal_processor.output_sample_rate
-        offset = self._num_samples_processed / input_fs + \
-            self._signal_processor.output_time_offset
         return indices / output_fs + offset
     
     
-    def _notify_listener(self, clips, threshold):
-        for start_index, length in clips:
-            self._listener.process_clip(start_index, length, threshold)
+    def _notify_listener(self, clips, threshold, channel_num):
+        
+        if self._channel_count is None:
+            for start_index, length in clips:
+                self._listener.process_clip(start_index, length, threshold)
+                
+        else:
+            # detector is multichannel
+            
+            for start_index, length in clips:
+                self._listener.process_clip(
+                    start_index, length, threshold, channel_num=channel_num)
             
             
     def complete_detection(self):
@@ -409,10 +545,13 @@ class Detector:
         for all input.
         """
         
-        for threshold, processor in self._series_processors.items():
+        for threshold in self._settings.thresholds:
             
-            clips = processor.complete_processing([])
-            self._notify_listener(clips, threshold)
+            for channel_num, processors in \
+                    enumerate(self._series_processors):
+                
+                clips = processors[threshold].complete_processing([])
+                self._notify_listener(clips, threshold, channel_num)
             
             if hasattr(self._listener, 'complete_processing'):
                 self._listener.complete_processing(threshold)
@@ -422,6 +561,19 @@ def _seconds_to_samples(duration, sample_rate):
     return int(round(duration * sample_rate))
 
 
+def _split_by_channel(items, channel_nums, channel_count):
+    
+    """
+    Splits a sequence of items sorted by channel number into one
+    sequence per channel.
+    """
+    
+    counts = np.bincount(channel_nums, minlength=channel_count)
+    ends = np.cumsum(counts).tolist()
+    starts = [0] + ends[:-1]
+    return [items[i:j] for i, j in zip(starts, ends)]
+
+
 def _get_start_bin_num(frequency, bin_size):
     
     """
@@ -529,8 +681,16 @@ class _Spectrograph(_SignalProcessor):
     
     
     def process(self, x):
-        return tfa_utils.compute_spectrogram(
-            x, self.window, self.hop_size, self.dft_size)
+        
+        # We compute the spectrograms of the channels of multichannel
+        # input one at a time since for typical input sizes that is
+        # faster than computing them all at once: the intermediate
+        # arrays of one channel fit in processor caches much better
+        # than those of all channels.
+        return np.stack([
+            tfa_utils.compute_spectrogram(
+                samples, self.window, self.hop_size, self.dft_size)
+            for samples in x])
 
 
 class _FrequencyIntegrator(_SignalProcessor):
@@ -543,7 +703,7 @@ class _FrequencyIntegrator(_SignalProcessor):
         
         
     def process(self, x):
-        return x[:, self.start_bin_num:self.end_bin_num].sum(axis=1)
+        return x[..., self.start_bin_num:self.end_bin_num].sum(axis=-1)
 
         
 class _FirFilter(_SignalProcessor):
@@ -555,7 +715,12 @@ class _FirFilter(_SignalProcessor):
          
          
     def process(self, x):
-        return signal.fftconvolve(x, self.coefficients, mode='valid')
+        
+        # Filter all channels of a multichannel input with one
+        # convolution.
+        coefficients = self.coefficients[np.newaxis]
+        
+        return signal.fftconvolve(x, coefficients, mode='valid', axes=-1)
      
      
 class _FirPowerFilter(_FirFilter):
@@ -598,12 +763,20 @@ class _IirPowerFilter(_SignalProcessor):
         self._a = a
         self._b = b
         
-        # Initialize filter state.
-        self._state = np.zeros(max(len(a), len(b)) - 1)
+        # Filter state, with one row per channel. We initialize the
+        # state when we learn the number of channels.
+        self._state = None
 
 
     def process(self, x):
-        y, self._state = signal.lfilter(self._b, self._a, x, zi=self._state)
+        
+        if self._state is None:
+            order = max(len(self._a), len(self._b)) - 1
+            self._state = np.zeros(x.shape[:-1] + (order,))
+            
+        y, self._state = signal.lfilter(
+            self._b, self._a, x, axis=-1, zi=self._state)
+        
         return y
 
 
@@ -621,7 +794,7 @@ class _Divider(_SignalProcessor):
         # with very small ones.
         x[np.where(x == 0)] = 1e-20
          
-        return x[self.delay:] / x[:-self.delay]
+        return x[..., self.delay:] / x[..., :-self.delay]
              
     
 class _SignalProcessorChain(_SignalProcessor):
@@ -723,17 +896,29 @@ class TseepDetector(Detector):
     
     
     extension_name = 'PNF Tseep Energy Detector 1.0'
+    score_track_name = extension_name
     
     
-    def __init__(self, sample_rate, listener):
-        super().__init__(_TSEEP_SETTINGS, sample_rate, listener)
+    def __init__(
+            self, sample_rate, listener, score_listener=None,
+            channel_count=None):
+        
+        super().__init__(
+            _TSEEP_SETTINGS, sample_rate, listener,
+            score_listener=score_listener, channel_count=channel_count)
 
     
 class ThrushDetector(Detector):
     
     
     extension_name = 'PNF Thrush Energy Detector 1.0'
+    score_track_name = extension_name
     
     
-    def __init__(self, sample_rate, listener):
-        super().__init__(_THRUSH_SETTINGS, sample_rate, listener)
+    def __init__(
+            self, sample_rate, listener, score_listener=None,
+            channel_count=None):
+        
+        super().__init__(
+            _THRUSH_SETTINGS, sample_rate, listener,
+            score_listener=score_listener, channel_count=channel_count)
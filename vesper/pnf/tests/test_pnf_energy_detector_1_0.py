@@ -0,0 +1,126 @@
+from unittest import TestCase
+
+import numpy as np
+
+from vesper.pnf.pnf_2018_baseline_detector_1_0 import (
+    ThrushDetector as BaselineThrushDetector,
+    TseepDetector as BaselineTseepDetector)
+from vesper.pnf.pnf_energy_detector_1_0 import ThrushDetector, TseepDetector
+
+
+_SAMPLE_RATE = 24000
+
+
+class MultichannelDetectorTests(TestCase):
+    
+    
+    def test_detect(self):
+        
+        samples = np.stack([_create_samples(i) for i in range(3)])
+        
+        classes = (
+            TseepDetector, ThrushDetector, BaselineTseepDetector,
+            BaselineThrushDetector)
+        
+        for cls in classes:
+            
+            # Detect clips in all channels at once.
+            listener = _Listener()
+            detector = cls(_SAMPLE_RATE, listener, channel_count=3)
+            for i in range(0, samples.shape[1], 10000):
+                detector.detect(samples[:, i:i + 10000])
+            detector.complete_detection()
+            
+            self.assertEqual(listener.completion_count, 1)
+            
+            for channel_num, channel_samples in enumerate(samples):
+                
+                # Detect clips in one channel.
+                channel_listener = _Listener()
+                detector = cls(_SAMPLE_RATE, channel_listener)
+                for i in range(0, len(channel_samples), 10000):
+                    detector.detect(channel_samples[i:i + 10000])
+                detector.complete_detection()
+                
+                self.assertNotEqual(channel_listener.clips, [])
+                self.assertEqual(
+                    listener.get_channel_clips(channel_num),
+                    channel_listener.clips)
+                
+                
+    def test_process_scores(self):
+        
+        samples = np.stack([_create_samples(i) for i in range(2)])
+        
+        # Detect clips in samples, saving ratios.
+        listener = _Listener()
+        scores = _ScoreListener()
+        detector = TseepDetector(
+            _SAMPLE_RATE, listener, scores, channel_count=2)
+        for i in range(0, samples.shape[1], 10000):
+            detector.detect(samples[:, i:i + 10000])
+        detector.complete_detection()
+        
+        # Detect clips in saved ratios.
+        ratios_listener = _Listener()
+        detector = TseepDetector(
+            _SAMPLE_RATE, ratios_listener, channel_count=2)
+        for ratios, offset in scores.chunks:
+            self.assertEqual(ratios.shape[0], 2)
+            detector.process_scores(ratios, offset)
+        detector.complete_detection()
+        
+        self.assertNotEqual(listener.clips, [])
+        self.assertEqual(ratios_listener.clips, listener.clips)
+            
+            
+class _Listener:
+    
+    
+    def __init__(self):
+        self.clips = []
+        self.completion_count = 0
+        
+        
+    def process_clip(self, start_index, length, threshold, channel_num=None):
+        if channel_num is None:
+            self.clips.append((start_index, length, threshold))
+        else:
+            self.clips.append((start_index, length, threshold, channel_num))
+            
+            
+    def complete_processing(self, threshold):
+        self.completion_count += 1
+        
+        
+    def get_channel_clips(self, channel_num):
+        return [clip[:3] for clip in self.clips if clip[3] == channel_num]
+    
+    
+class _ScoreListener:
+    
+    
+    def __init__(self):
+        self.chunks = []
+        
+        
+    def process_scores(self, scores, offset):
+        self.chunks.append((scores, offset))
+        
+        
+def _create_samples(seed):
+    
+    random = np.random.RandomState(seed)
+    samples = 100 * random.randn(10 * _SAMPLE_RATE)
+    
+    # Add tseep and thrush calls, at different times in different
+    # channels.
+    call_length = int(round(.15 * _SAMPLE_RATE))
+    times = np.arange(call_length) / _SAMPLE_RATE
+    for i in range(1, 5):
+        frequency = 7000 if i % 2 == 0 else 4000
+        call = 5000 * np.sin(2 * np.pi * frequency * times)
+        start_index = int(round((1.9 * i + .3 * seed) * _SAMPLE_RATE))
+        samples[start_index:start_index + call_length] += call
+        
+    return samples
@@ -159,6 +159,7 @@ Command:
     - vesper.command.test_command.TestCommand
     - vesper.command.transfer_call_classifications_command.TransferCallClassificationsCommand
     - vesper.command.refresh_recording_audio_file_paths_command.RefreshRecordingAudioFilePathsCommand
+    - vesper.command.rethreshold_command.RethresholdCommand
     - vesper.old_bird.add_old_bird_clip_start_indices_command.AddOldBirdClipStartIndicesCommand
     
 Detector:
@@ -231,6 +232,15 @@ def _create_clip_manager():
 
 
 clip_manager = Singleton(_create_clip_manager)
+
+
+def _create_clip_spectrogram_manager():
+    from vesper.util.clip_spectrogram_manager import (
+        ClipSpectrogramManager, create_clip_spectrogram_cache)
+    return ClipSpectrogramManager(create_clip_spectrogram_cache())
+
+
+clip_spectrogram_manager = Singleton(_create_clip_spectrogram_manager)
                          
                          
 def _create_recording_manager():
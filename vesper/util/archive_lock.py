@@ -41,14 +41,15 @@ process should call this module's `create_lock` function, and the
 resulting lock should then be passed to other processes for them to
 use.
 
-Vesper archives that use a database engine that supports concurrent
-writes better than SQLite (perhaps PostgreSQL, for example) may not
-require this lock. In that case, we could make the value of the
-`_lock` attribute of this module an instance of our own context
-manager that can behave differently for different database back ends.
-Such a context manager might behave as the current one does when the
-database back end is SQLite, but do nothing when the back end is
-PostgreSQL.
+The archive lock is backend aware. It is a real lock only for archives
+that use SQLite. Archives that use PostgreSQL, which supports concurrent
+transactions well, get a lock that does nothing, so that (for example)
+detection jobs, classification jobs, and interactive annotation can
+write to such an archive at the same time. Code that must prevent
+concurrent modification of particular database rows (for example, the
+annotations of a clip) should lock those rows within its transaction
+with Django's `select_for_update`. On SQLite `select_for_update` does
+nothing, but the archive lock serializes all transactions anyway.
 
 I also tried using a semaphore that allowed just two concurrent
 transactions (see commented-out code below) and setting the SQLite
@@ -87,7 +88,7 @@ _lock = None
 
 def create_lock():
     
-    if archive_settings.database.engine == 'SQLite':
+    if serializes_writes():
         lock_class = RLock
     else:
         lock_class = DoNothingLock
@@ -95,6 +96,16 @@ def create_lock():
     set_lock(lock_class())
 
 
+def serializes_writes():
+    
+    """
+    Returns `True` if and only if the archive lock serializes archive
+    database transactions.
+    """
+    
+    return archive_settings.database.engine == 'SQLite'
+
+
 def set_lock(lock):
     global _lock
     _lock = lock
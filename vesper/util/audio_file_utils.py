@@ -236,11 +236,65 @@ def write_empty_wave_file(file_path, channel_count, sample_rate, sample_size):
         raise ValueError(
             'Sorry, but currently only 16-bit WAVE files are supported.')
     
-    contents = _create_wave_file_header(
-        channel_count, sample_rate, sample_size, 0)
-    
     with open(file_path, 'wb') as file_:
-        file_.write(contents)
+        write_wave_file_header(file_, channel_count, sample_rate, sample_size)
+    
+    
+def write_wave_file_header(
+        file_, channel_count, sample_rate, sample_size, frame_count=0):
+    
+    """
+    Writes a WAVE file header to the start of an open file.
+    
+    The file position is left at the end of the header. The header's
+    chunk sizes are computed from `frame_count`, so this function can
+    also be used to update the header of a file whose samples have
+    been written incrementally, for example with
+    `write_wave_file_frames`.
+    """
+    
+    header = _create_wave_file_header(
+        channel_count, sample_rate, sample_size, frame_count)
+    
+    file_.seek(0, io.SEEK_SET)
+    write_size = file_.write(header)
+    
+    if write_size != len(header):
+        _handle_file_write_error(len(header), write_size)
+        
+        
+def write_wave_file_frames(file_, start_index, samples):
+    
+    """
+    Writes sample frames to an open 16-bit WAVE file.
+    
+    Unlike `write_wave_file_samples`, this function neither reads nor
+    updates the file's header, so it is suitable for streaming many
+    small writes to a file that is kept open. The caller is responsible
+    for updating the header (see `write_wave_file_header`) before the
+    file is closed. If `start_index` is beyond the end of the file, the
+    file is extended and the intervening frames read as zeros.
+    
+    :Parameters:
+        file_ : binary file
+            the file to write to, open for writing and seeking.
+            
+        start_index : int
+            the index of the first sample frame to write.
+            
+        samples : NumPy array
+            two-dimensional array of samples to write, with the first
+            dimension the channel count.
+    """
+    
+    if len(samples.shape) != 2:
+        raise ValueError(
+            'Sample array for WAVE file write must have two dimensions.')
+        
+    bytes_per_sample_frame = samples.shape[0] * _WAVE_SAMPLE_DTYPE.itemsize
+    offset = _WAVE_HEADER_SIZE + start_index * bytes_per_sample_frame
+    file_.seek(offset, io.SEEK_SET)
+    _write_samples_to_file(file_, samples)
     
     
 def _create_wave_file_header(
@@ -6,13 +6,20 @@ from threading import Lock
 import os.path
 
 from vesper.archive_paths import archive_paths
+from vesper.archive_settings import archive_settings
 from vesper.signal.wave_audio_file import WaveAudioFileReader
 from vesper.singletons import recording_manager
 from vesper.util.bunch import Bunch
+from vesper.util.clip_segment_store import ClipSegmentStore
+from vesper.util.disk_lru_cache import DiskLruCache
 import vesper.util.audio_file_utils as audio_file_utils
 import vesper.util.os_utils as os_utils
 
 
+_CLIP_AUDIO_STORAGE_FILES = 'Files'
+_CLIP_AUDIO_STORAGE_SEGMENTS = 'Segments'
+
+
 class ClipManagerError(Exception):
     pass
 
@@ -26,15 +33,59 @@ class ClipManager:
         self._rm = recording_manager.instance
         self._file_reader_cache = {}
         self._read_lock = Lock()
+        self._audio_file_cache = _create_audio_file_cache()
+        self._segment_store = _create_segment_store()
+        
         
+    @property
+    def segment_store(self):
+        
+        """
+        the segment store that holds the audio of clips, or `None` if
+        clip audio is stored in one audio file per clip.
+        """
+        
+        return self._segment_store
+    
+    
+    @property
+    def audio_file_cache(self):
+        
+        """
+        the cache of audio file contents created from recordings for
+        clips that have no audio files, or `None` if caching is disabled.
+        """
+        
+        return self._audio_file_cache
+    
+    
+    def get_audio_file_version(self, clip):
+        
+        """
+        Gets a string that identifies the version of the audio of the
+        specified clip.
         
+        The audio of a clip is determined by the clip's ID, start index,
+        and length, so the version changes when either of the latter
+        two changes. The version is suitable for use as an HTTP entity
+        tag and as a cache key.
+        """
+        
+        return '{}-{}-{}'.format(clip.id, clip.start_index, clip.length)
+    
+    
     def get_audio_file_path(self, clip):
         return _get_audio_file_path(clip.id)
     
         
     def has_audio_file(self, clip):
-        path = self.get_audio_file_path(clip)
-        return os.path.exists(path)
+        
+        if self._segment_store is not None:
+            return clip.id in self._segment_store
+        
+        else:
+            path = self.get_audio_file_path(clip)
+            return os.path.exists(path)
         
     
     def get_audio(self, clip):
@@ -106,12 +157,33 @@ class ClipManager:
             
        
     def _get_samples_from_audio_file(self, clip, start_index, length):
+        
+        if self._segment_store is not None:
+            return self._get_samples_from_segment_store(
+                clip, start_index, length)
+        
         path = self.get_audio_file_path(clip)
         samples, _ = audio_file_utils.read_wave_file(path)
         end_index = start_index + length
         return samples[0, start_index:end_index]
 
 
+    def _get_samples_from_segment_store(self, clip, start_index, length):
+        
+        # We raise `FileNotFoundError` for a clip that is not in the
+        # segment store, just as for a clip that has no audio file, so
+        # that callers fall back to getting samples from recordings in
+        # either case.
+        
+        try:
+            return self._segment_store.get_samples(
+                clip.id, start_index, length)
+        
+        except KeyError:
+            raise FileNotFoundError(
+                f'Clip segment store has no audio for clip {clip.id}.')
+
+
     def _get_samples_from_recording(
             self, clip, start_offset=None, length=None):
         
@@ -263,15 +335,40 @@ class ClipManager:
             return self._get_audio_file_contents_from_audio_file(clip)
             
         except FileNotFoundError:
-            return self._get_audio_file_contents_from_recording(clip)
+            return self._get_cached_audio_file_contents(clip)
             
             
     def _get_audio_file_contents_from_audio_file(self, clip):
+        
+        if self._segment_store is not None:
+            samples = self._get_samples_from_segment_store(clip, 0, None)
+            return _create_audio_file_contents(samples, clip.sample_rate)
+        
         path = self.get_audio_file_path(clip)
         with open(path, 'rb') as file_:
             return file_.read()
         
 
+    def _get_cached_audio_file_contents(self, clip):
+        
+        cache = self._audio_file_cache
+        
+        if cache is None:
+            return self._get_audio_file_contents_from_recording(clip)
+        
+        key = self.get_audio_file_version(clip)
+        
+        contents = cache.get(key)
+        
+        if contents is None:
+            # cache miss
+            
+            contents = self._get_audio_file_contents_from_recording(clip)
+            cache.put(key, contents)
+            
+        return contents
+        
+        
     def _get_audio_file_contents_from_recording(self, clip):
         samples = self._get_samples_from_recording(clip)
         return _create_audio_file_contents(samples, clip.sample_rate)
@@ -290,8 +387,14 @@ class ClipManager:
             the clip whose audio file should be deleted.
         """
         
-        path = self.get_audio_file_path(clip)
-        os_utils.delete_file(path)
+        if self._segment_store is not None:
+            self._segment_store.remove(clip.id)
+        else:
+            path = self.get_audio_file_path(clip)
+            os_utils.delete_file(path)
+        
+        if self._audio_file_cache is not None:
+            self._audio_file_cache.remove(self.get_audio_file_version(clip))
         
             
     def create_audio_file(self, clip, samples=None):
@@ -321,6 +424,10 @@ class ClipManager:
         
     def _create_audio_file(self, clip, samples, path=None):
         
+        if path is None and self._segment_store is not None:
+            self._segment_store.put_samples(clip.id, samples)
+            return
+        
         # Get 2-D version of `samples` for call to
         # `audio_file_utils.write_wave_file`.
         # TODO: Enhance `audio_file_utils.write_wave_file` to obviate this.
@@ -354,6 +461,36 @@ class ClipManager:
         self._create_audio_file(clip, samples, path)        
         
         
+def _create_audio_file_cache():
+    
+    max_size = archive_settings.clip_audio_cache_max_size
+    
+    if max_size <= 0:
+        return None
+    
+    else:
+        return DiskLruCache(
+            archive_paths.clip_audio_cache_dir_path,
+            int(max_size * 2 ** 20))
+
+
+def _create_segment_store():
+    
+    storage = archive_settings.clip_audio_storage
+    
+    if storage == _CLIP_AUDIO_STORAGE_FILES:
+        return None
+    
+    elif storage == _CLIP_AUDIO_STORAGE_SEGMENTS:
+        return ClipSegmentStore(archive_paths.clip_segment_dir_path)
+    
+    else:
+        raise ClipManagerError(
+            f'Unrecognized clip audio storage "{storage}" in archive '
+            f'settings. Storage must be "{_CLIP_AUDIO_STORAGE_FILES}" '
+            f'or "{_CLIP_AUDIO_STORAGE_SEGMENTS}".')
+
+
 _CLIPS_DIR_FORMAT = (3, 3, 3)
 
 
@@ -0,0 +1,904 @@
+"""Module containing `ClipSegmentStore` class."""
+
+
+from pathlib import Path
+from threading import Lock
+import logging
+import mmap
+import os
+import re
+
+import numpy as np
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+_logger = logging.getLogger(__name__)
+
+
+_SAMPLE_DTYPE = np.dtype('<i2')
+_SAMPLE_SIZE = _SAMPLE_DTYPE.itemsize
+
+_INDEX_RECORD_DTYPE = np.dtype([
+    ('clip_id', '<i8'),
+    ('segment_num', '<i4'),
+    ('length', '<i4'),
+    ('offset', '<i8')
+])
+"""
+Clip index file record type.
+
+The offset of a record is the byte offset in its segment file of the
+first sample of its clip, and the length is the clip length in samples.
+A record whose segment number is `_DELETED` indicates that its clip was
+removed from the store.
+"""
+
+_INDEX_RECORD_SIZE = _INDEX_RECORD_DTYPE.itemsize
+
+_DELETED = -1
+
+_INDEX_FILE_NAME = 'Index.dat'
+_INDEX_LOCK_FILE_NAME = 'Index.lock'
+_TEMP_FILE_NAME_SUFFIX = '.tmp'
+_SEGMENT_FILE_NAME_FORMAT = 'Segment {:06d}.dat'
+_SEGMENT_FILE_NAME_RE = re.compile(r'^Segment (\d{6})\.dat$')
+
+_DEFAULT_MAX_SEGMENT_SIZE = 2 ** 30     # bytes
+
+_DEFAULT_COMPACTION_THRESHOLD = .5
+"""
+Default minimum fraction of the size of a segment file occupied by
+removed clips for the file to be compacted.
+"""
+
+
+class ClipSegmentStore:
+
+    """
+    Clip audio store that packs the samples of many clips into large
+    segment files.
+
+    A clip segment store keeps the samples of clips as 16-bit integers
+    appended to segment files in a store directory. Storing many clips
+    per file avoids the per-file overhead in inodes, directory entries,
+    and file system block padding of storing one file per clip, and
+    makes backups of large archives much faster.
+
+    The location of each clip in the segment files is recorded in an
+    append-only index file of fixed-size records. When a store is
+    opened, the index file is read into a compact, in-memory index of
+    sorted NumPy arrays. Subsequent changes are kept in a dictionary
+    until the next compaction. Segment files are read via memory maps.
+
+    Removing a clip leaves its samples in their segment file as garbage.
+    The `compact` method rewrites the live clips of segment files that
+    contain too much garbage to new segment files and deletes the old
+    files.
+
+    Several processes can use a store at once, for example the Vesper
+    server and a job that creates clips. Each process appends samples
+    only to segment files that it creates itself, and appends each
+    index record to the shared index file with a single write to a
+    file opened for appending, while holding an inter-process lock on
+    a lock file in the store directory. When a process does not find
+    a clip in its index, it reads any records that other processes
+    have appended to the index file since it last read it. Compaction, however,
+    requires exclusive use of a store.
+
+    Samples are appended to a segment file before the index record
+    that refers to them, so an interrupted write leaves at worst some
+    unreferenced samples in a segment file.
+
+    The methods of this class are thread safe.
+    """
+
+
+    def __init__(self, dir_path, max_segment_size=_DEFAULT_MAX_SEGMENT_SIZE):
+
+        """
+        Initializes this store.
+
+        :Parameters:
+
+            dir_path : str or Path
+                the store directory. The directory is created if it
+                does not exist.
+
+            max_segment_size : int
+                the maximum size of a segment file, in bytes. A segment
+                file can exceed this size only if it contains just one
+                clip.
+        """
+
+        self._dir_path = Path(dir_path)
+        self._max_segment_size = max_segment_size
+
+        self._lock = Lock()
+
+        self._segment_num = None
+        """
+        Number of segment to which this process appends samples, or
+        `None` if there is no such segment.
+        """
+
+        self._segment_file = None
+        """Segment file to which samples are appended, or `None`."""
+
+        self._maps = {}
+        """Mapping from segment numbers to segment file memory maps."""
+
+        self._index_fd = None
+
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+
+        self._index_lock = _FileLock(self._dir_path / _INDEX_LOCK_FILE_NAME)
+        """
+        Inter-process lock held while writing to the index file, so
+        that a process can tell a partial record at the end of the
+        file from a record that another process is appending.
+        """
+
+        self._load()
+
+
+    @property
+    def _index_file_path(self):
+        return self._dir_path / _INDEX_FILE_NAME
+
+
+    def _load(self):
+
+        """Loads this store's index and segment file sizes."""
+
+        if self._index_fd is not None:
+            os.close(self._index_fd)
+
+        self._index_fd = os.open(
+            self._index_file_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+
+        self._index_file_id = _get_file_id(os.fstat(self._index_fd))
+
+        records = _read_index_file(self._index_file_path, self._index_lock)
+        self._index_file_position = len(records) * _INDEX_RECORD_SIZE
+
+        # Keep only last record for each clip, since a later record
+        # supersedes any earlier ones.
+        reversed_records = records[::-1]
+        _, i = np.unique(reversed_records['clip_id'], return_index=True)
+        records = reversed_records[i]
+
+        # Drop records of removed clips.
+        records = records[records['segment_num'] != _DELETED]
+
+        self._set_index(records)
+
+        self._segment_sizes = self._get_segment_sizes()
+        """Mapping from segment numbers to segment file sizes."""
+
+        self._live_sizes = self._get_live_sizes()
+        """
+        Mapping from segment numbers to total sizes of the samples of
+        the clips of the segments that have not been removed.
+        """
+
+
+    def _set_index(self, records):
+
+        # `records` is sorted by clip ID.
+
+        self._clip_ids = np.ascontiguousarray(records['clip_id'])
+        self._segment_nums = np.ascontiguousarray(records['segment_num'])
+        self._lengths = np.ascontiguousarray(records['length'])
+        self._offsets = np.ascontiguousarray(records['offset'])
+
+        self._changes = {}
+        """
+        Mapping from clip IDs to (segment number, offset, length) triples,
+        or to `None` for removed clips, for changes to the index since
+        the index arrays were set.
+        """
+
+        self._clip_count = len(records)
+
+
+    def _get_segment_sizes(self):
+
+        sizes = {}
+
+        for path in self._dir_path.iterdir():
+            m = _SEGMENT_FILE_NAME_RE.match(path.name)
+            if m is not None:
+                sizes[int(m.group(1))] = path.stat().st_size
+
+        return sizes
+
+
+    def _get_live_sizes(self):
+
+        if len(self._segment_nums) == 0:
+            return {}
+
+        sizes = np.bincount(
+            self._segment_nums,
+            weights=self._lengths.astype('float64') * _SAMPLE_SIZE)
+
+        # Include segments whose clips all have zero length, so that
+        # every segment of the index has a live size.
+        return dict(
+            (int(num), int(sizes[num]))
+            for num in np.unique(self._segment_nums))
+
+
+    @property
+    def dir_path(self):
+        return self._dir_path
+
+
+    @property
+    def clip_count(self):
+        with self._lock:
+            self._catch_up()
+            return self._clip_count
+
+
+    def get_stats(self):
+
+        """Gets a dictionary of statistics about this store."""
+
+        with self._lock:
+            self._catch_up()
+            total_size = sum(self._segment_sizes.values())
+            live_size = sum(self._live_sizes.values())
+            return {
+                'dir_path': str(self._dir_path),
+                'clip_count': self._clip_count,
+                'segment_count': len(self._segment_sizes),
+                'size': total_size,
+                'garbage_size': total_size - live_size
+            }
+
+
+    def __contains__(self, clip_id):
+        with self._lock:
+            return self._find_location(clip_id) is not None
+
+
+    def get_length(self, clip_id):
+
+        """
+        Gets the length of the specified clip, or `None` if the clip
+        is not in this store.
+        """
+
+        with self._lock:
+            location = self._find_location(clip_id)
+            return None if location is None else location[2]
+
+
+    def get_samples(self, clip_id, start_offset=0, length=None):
+
+        """
+        Gets samples of the specified clip.
+
+        :Parameters:
+
+            clip_id : int
+                the ID of the clip.
+
+            start_offset : int
+                the offset from the start of the clip of the samples
+                to get.
+
+            length : int or None
+                the number of samples to get, or `None` to get samples
+                through the end of the clip.
+
+        :Returns:
+            one-dimensional NumPy array of samples.
+
+        :Raises KeyError:
+            if the clip is not in this store.
+
+        :Raises ValueError:
+            if the specified samples are not all in the clip.
+        """
+
+        with self._lock:
+
+            location = self._find_location(clip_id)
+
+            if location is None:
+                raise KeyError(clip_id)
+
+            clip_length = location[2]
+
+            if length is None:
+                length = clip_length - start_offset
+
+            if start_offset < 0 or length < 0 or \
+                    start_offset + length > clip_length:
+                raise ValueError(
+                    f'Requested samples [{start_offset}, '
+                    f'{start_offset + length}) are not all in clip '
+                    f'{clip_id}, whose length is {clip_length}.')
+
+            if length == 0:
+                return np.zeros(0, _SAMPLE_DTYPE)
+
+            try:
+                return self._read_samples(location, start_offset, length)
+
+            except FileNotFoundError:
+                # segment file deleted by compaction in another process
+
+                self._load()
+
+                location = self._get_location(clip_id)
+
+                if location is None:
+                    raise KeyError(clip_id)
+
+                return self._read_samples(location, start_offset, length)
+
+
+    def _read_samples(self, location, start_offset, length):
+
+        segment_num, offset, _ = location
+
+        offset += start_offset * _SAMPLE_SIZE
+        end = offset + length * _SAMPLE_SIZE
+
+        map_ = self._get_map(segment_num, end)
+
+        # Copy samples so they do not reference the memory map,
+        # which we may close.
+        return np.frombuffer(map_, _SAMPLE_DTYPE, length, offset).copy()
+
+
+    def _find_location(self, clip_id):
+
+        location = self._get_location(clip_id)
+
+        if location is None:
+            # clip not in our index, but may have been added by another
+            # process since we last read index file
+
+            if self._catch_up():
+                location = self._get_location(clip_id)
+
+        return location
+
+
+    def _get_location(self, clip_id):
+
+        try:
+            return self._changes[clip_id]
+
+        except KeyError:
+
+            i = np.searchsorted(self._clip_ids, clip_id)
+
+            if i == len(self._clip_ids) or self._clip_ids[i] != clip_id:
+                return None
+
+            else:
+                return (
+                    int(self._segment_nums[i]), int(self._offsets[i]),
+                    int(self._lengths[i]))
+
+
+    def _catch_up(self):
+
+        """
+        Reads index records appended to the index file since we last
+        read it.
+
+        :Returns:
+            `True` if there were new records, or `False` otherwise.
+        """
+
+        try:
+            stat = os.stat(self._index_file_path)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is None or _get_file_id(stat) != self._index_file_id or \
+                stat.st_size < self._index_file_position:
+            # index file replaced by compaction in another process
+
+            self._load()
+            return True
+
+        end = stat.st_size - stat.st_size % _INDEX_RECORD_SIZE
+
+        if end == self._index_file_position:
+            return False
+
+        with open(self._index_file_path, 'rb') as file_:
+            file_.seek(self._index_file_position)
+            data = file_.read(end - self._index_file_position)
+
+        self._index_file_position += len(data)
+
+        records = np.frombuffer(data, _INDEX_RECORD_DTYPE)
+
+        for clip_id, segment_num, length, offset in records.tolist():
+            self._apply_record(clip_id, segment_num, offset, length)
+
+        return True
+
+
+    def _apply_record(self, clip_id, segment_num, offset, length):
+
+        old_location = self._get_location(clip_id)
+
+        if old_location is not None:
+            old_segment_num, _, old_length = old_location
+            self._live_sizes[old_segment_num] = \
+                self._live_sizes.get(old_segment_num, 0) - \
+                old_length * _SAMPLE_SIZE
+            self._clip_count -= 1
+
+        if segment_num == _DELETED:
+            self._changes[clip_id] = None
+
+        else:
+
+            size = length * _SAMPLE_SIZE
+
+            self._changes[clip_id] = (segment_num, offset, length)
+            self._live_sizes[segment_num] = \
+                self._live_sizes.get(segment_num, 0) + size
+            self._clip_count += 1
+
+            # Update size of segment, which may be being appended to
+            # by another process.
+            self._segment_sizes[segment_num] = max(
+                self._segment_sizes.get(segment_num, 0), offset + size)
+
+
+    def _get_map(self, segment_num, end):
+
+        map_ = self._maps.get(segment_num)
+
+        if map_ is None or len(map_) < end:
+            # no map for segment, or map does not include samples
+            # appended to segment since it was created
+
+            if map_ is not None:
+                map_.close()
+
+            path = self._get_segment_file_path(segment_num)
+
+            with open(path, 'rb') as file_:
+                map_ = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self._maps[segment_num] = map_
+
+        return map_
+
+
+    def _get_segment_file_path(self, segment_num):
+        return self._dir_path / _SEGMENT_FILE_NAME_FORMAT.format(segment_num)
+
+
+    def put_samples(self, clip_id, samples):
+
+        """
+        Adds samples of a clip to this store.
+
+        If the store already contains samples for the clip, they are
+        replaced.
+
+        :Parameters:
+
+            clip_id : int
+                the ID of the clip.
+
+            samples : NumPy array
+                the samples of the clip, either one-dimensional or
+                two-dimensional with one channel.
+        """
+
+        samples = np.asarray(samples).reshape(-1).astype(_SAMPLE_DTYPE)
+
+        with self._lock:
+            segment_num, offset = self._append_samples(samples)
+            self._write_index_record(
+                clip_id, segment_num, offset, len(samples))
+
+
+    def _append_samples(self, samples):
+
+        size = samples.nbytes
+
+        if self._segment_file is not None:
+
+            segment_size = self._segment_sizes[self._segment_num]
+
+            if segment_size != 0 and \
+                    segment_size + size > self._max_segment_size:
+                # current segment is full
+
+                self._close_segment_file()
+
+        if self._segment_file is None:
+            self._create_segment_file()
+
+        segment_num = self._segment_num
+        offset = self._segment_sizes[segment_num]
+
+        self._segment_file.write(samples.tobytes())
+
+        # Flush samples before writing index record that refers to them.
+        self._segment_file.flush()
+
+        self._segment_sizes[segment_num] = offset + size
+
+        return segment_num, offset
+
+
+    def _create_segment_file(self):
+
+        segment_num = max(self._segment_sizes.keys(), default=-1) + 1
+
+        # Create a new segment file of our own, skipping any numbers
+        # taken by other processes.
+        while True:
+
+            path = self._get_segment_file_path(segment_num)
+
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            except FileExistsError:
+                segment_num += 1
+            else:
+                break
+
+        self._segment_file = os.fdopen(fd, 'wb')
+        self._segment_num = segment_num
+        self._segment_sizes[segment_num] = 0
+
+
+    def _write_index_record(self, clip_id, segment_num, offset, length):
+
+        record = np.array(
+            [(clip_id, segment_num, length, offset)], _INDEX_RECORD_DTYPE)
+
+        # Write record with a single write to the index file, which
+        # is open for appending, so that concurrent appends from other
+        # processes do not interleave with it.
+        with self._index_lock:
+            os.write(self._index_fd, record.tobytes())
+
+        # Read the record, along with any appended before it by other
+        # processes, into our index.
+        self._catch_up()
+
+
+    def sync(self):
+
+        """
+        Forces the samples and index records that this store has
+        written to disk.
+
+        Samples added to a store are flushed to the operating system
+        but not forced to disk, so a system crash can lose them. Call
+        this method before, for example, deleting the only other copy
+        of samples added to the store.
+        """
+
+        with self._lock:
+
+            if self._segment_file is not None:
+                self._segment_file.flush()
+                os.fsync(self._segment_file.fileno())
+
+            os.fsync(self._index_fd)
+
+            # Force any new segment or index file entries to disk.
+            _sync_directory(self._dir_path)
+
+
+    def remove(self, clip_id):
+
+        """
+        Removes the specified clip from this store.
+
+        If the clip is not in the store, this method does nothing.
+        The samples of a removed clip continue to occupy space in
+        their segment file until the file is compacted.
+        """
+
+        with self._lock:
+            if self._find_location(clip_id) is not None:
+                self._write_index_record(clip_id, _DELETED, 0, 0)
+
+
+    def compact(self, threshold=_DEFAULT_COMPACTION_THRESHOLD):
+
+        """
+        Compacts this store.
+
+        The live clips of each segment file for which at least the
+        specified fraction of the file's size is garbage are appended
+        to new segment files. The index file is then rewritten to
+        contain exactly one record for each clip of the store, and
+        finally the compacted segment files are deleted. The new
+        segment files and index file are forced to disk before any
+        segment file is deleted, so a crash during compaction cannot
+        lose clip samples. At worst it leaves compacted segment files
+        that are entirely garbage, which the next compaction deletes.
+
+        This method must not be called while other processes are
+        using this store.
+
+        :Parameters:
+            threshold : float
+                the minimum fraction of the size of a segment file that
+                must be garbage for the file to be compacted.
+
+        :Returns:
+            the number of bytes reclaimed.
+        """
+
+        with self._lock:
+
+            self._catch_up()
+
+            # Start a new segment so we don't append clips to a
+            # segment that we are compacting.
+            self._close_segment_file()
+
+            segment_nums = [
+                num for num, size in sorted(self._segment_sizes.items())
+                if size != 0 and
+                (size - self._live_sizes.get(num, 0)) / size >= threshold]
+
+            reclaimed_size = 0
+
+            if len(segment_nums) != 0:
+
+                items = self._get_index_items()
+
+                for segment_num in segment_nums:
+                    reclaimed_size += \
+                        self._compact_segment(segment_num, items)
+
+                self._close_segment_file()
+
+            self._rewrite_index_file()
+
+            # Delete compacted segment files only now that the new
+            # index file, which does not refer to them, is on disk.
+            for segment_num in segment_nums:
+                os.remove(self._get_segment_file_path(segment_num))
+
+            self._load()
+
+        _logger.info(
+            f'Compacted {len(segment_nums)} clip segment file(s), '
+            f'reclaiming {reclaimed_size} bytes.')
+
+        return reclaimed_size
+
+
+    def _compact_segment(self, segment_num, items):
+
+        size = self._segment_sizes[segment_num]
+        path = self._get_segment_file_path(segment_num)
+
+        with open(path, 'rb') as file_:
+
+            for clip_id, (num, offset, length) in items.items():
+
+                if num == segment_num:
+
+                    file_.seek(offset)
+                    data = file_.read(length * _SAMPLE_SIZE)
+                    samples = np.frombuffer(data, _SAMPLE_DTYPE)
+
+                    new_segment_num, new_offset = \
+                        self._append_samples(samples)
+
+                    # We rewrite the index file after compaction, so
+                    # we don't write records for the moved clips.
+                    self._changes[clip_id] = \
+                        (new_segment_num, new_offset, length)
+                    self._live_sizes[new_segment_num] = \
+                        self._live_sizes.get(new_segment_num, 0) + len(data)
+
+        map_ = self._maps.pop(segment_num, None)
+        if map_ is not None:
+            map_.close()
+
+        del self._segment_sizes[segment_num]
+        live_size = self._live_sizes.pop(segment_num, 0)
+
+        return size - live_size
+
+
+    def _get_index_items(self):
+
+        """
+        Gets a mapping from the IDs of the clips of this store to
+        their (segment number, offset, length) triples.
+        """
+
+        items = dict(zip(
+            self._clip_ids.tolist(),
+            zip(self._segment_nums.tolist(), self._offsets.tolist(),
+                self._lengths.tolist())))
+
+        for clip_id, location in self._changes.items():
+            if location is None:
+                items.pop(clip_id, None)
+            else:
+                items[clip_id] = location
+
+        return items
+
+
+    def _rewrite_index_file(self):
+
+        items = self._get_index_items()
+
+        records = np.array(
+            [(clip_id, num, length, offset)
+             for clip_id, (num, offset, length) in sorted(items.items())],
+            _INDEX_RECORD_DTYPE)
+
+        # Write new index to temporary file and then replace old one,
+        # so that the index file is never incomplete.
+        temp_path = self._index_file_path.with_name(
+            _INDEX_FILE_NAME + _TEMP_FILE_NAME_SUFFIX)
+        with open(temp_path, 'wb') as file_:
+            file_.write(records.tobytes())
+            file_.flush()
+            os.fsync(file_.fileno())
+
+        with self._index_lock:
+            os.replace(temp_path, self._index_file_path)
+
+        # Force replacement to disk.
+        _sync_directory(self._dir_path)
+
+
+    def _close_segment_file(self):
+
+        if self._segment_file is not None:
+
+            # Force samples to disk, since once a segment file is
+            # closed this process no longer tracks it, and compaction
+            # must not delete the only copy of a clip's samples before
+            # the copy it makes is on disk.
+            self._segment_file.flush()
+            os.fsync(self._segment_file.fileno())
+
+            self._segment_file.close()
+            self._segment_file = None
+            self._segment_num = None
+
+
+    def close(self):
+
+        """Closes this store."""
+
+        with self._lock:
+
+            self._close_segment_file()
+
+            for map_ in self._maps.values():
+                map_.close()
+            self._maps = {}
+
+            os.close(self._index_fd)
+            self._index_fd = None
+
+            self._index_lock.close()
+
+
+def _sync_directory(path):
+
+    """Forces the entries of a directory to disk."""
+
+    # Directories cannot be opened, and need not be synced, on Windows.
+    if os.name == 'nt':
+        return
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _get_file_id(stat):
+    return (stat.st_dev, stat.st_ino)
+
+
+def _read_index_file(path, lock):
+
+    data = _read_file(path)
+
+    if len(data) % _INDEX_RECORD_SIZE != 0:
+        # index file ends with partial record
+
+        # The record may be partial either because a write to the
+        # file was interrupted or because another process is appending
+        # it. Processes append records only while holding the lock, so
+        # we read the file again while holding it to tell which.
+        with lock:
+
+            data = _read_file(path)
+
+            extra_size = len(data) % _INDEX_RECORD_SIZE
+
+            if extra_size != 0:
+                # index file ends with partial record from interrupted
+                # write
+
+                _logger.warning(
+                    f'Clip segment store index file "{path}" ends with '
+                    f'a partial record, which will be ignored.')
+
+                data = data[:-extra_size]
+
+                with open(path, 'r+b') as file_:
+                    file_.truncate(len(data))
+
+    return np.frombuffer(data, _INDEX_RECORD_DTYPE)
+
+
+def _read_file(path):
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return b''
+
+
+class _FileLock:
+
+    """Inter-process lock implemented with a lock file."""
+
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT)
+
+
+    def __enter__(self):
+
+        if os.name == 'nt':
+
+            # Lock first byte of file. `msvcrt.locking` gives up after
+            # trying for about ten seconds, so we keep trying until it
+            # succeeds.
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                except OSError:
+                    continue
+                else:
+                    break
+
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+
+    def __exit__(self, exception_type, exception, traceback):
+
+        if os.name == 'nt':
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+    def close(self):
+        os.close(self._fd)
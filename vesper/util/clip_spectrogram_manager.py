@@ -0,0 +1,365 @@
+"""Module containing `ClipSpectrogramManager` class."""
+
+
+from collections import defaultdict
+import hashlib
+import json
+import struct
+
+import numpy as np
+import scipy.signal
+
+from vesper.archive_paths import archive_paths
+from vesper.archive_settings import archive_settings
+from vesper.singletons import clip_manager
+from vesper.util.bunch import Bunch
+from vesper.util.disk_lru_cache import DiskLruCache
+import vesper.util.time_frequency_analysis_utils as tfa_utils
+
+
+# Defaults for spectrogram settings that a clip album settings preset
+# omits, as in the default clip album settings of the `clip-album`
+# JavaScript module.
+_DEFAULT_WINDOW_TYPE = 'Hann'
+_DEFAULT_WINDOW_SIZE = .005             # seconds
+_DEFAULT_HOP_SIZE = 20                  # percent of window size
+_DEFAULT_SPECTRAL_INTERPOLATION_FACTOR = 1
+_DEFAULT_REFERENCE_POWER = 1e-9
+_DEFAULT_POWER_RANGE = (10, 100)        # decibels
+
+_WINDOW_FUNCTION_NAMES = {
+    'Blackman': 'blackman',
+    'Hamming': 'hamming',
+    'Hann': 'hann',
+    'Nuttall': 'nuttall',
+    'Rectangular': 'boxcar'
+}
+
+_SAMPLE_SCALE_FACTOR = 1 / 32768
+"""
+Factor by which clip samples are scaled before spectrogram computation.
+
+Browsers decode 16-bit audio files to samples in [-1, 1], so we do the
+same to get the same spectrogram values.
+"""
+
+SPECTROGRAM_DTYPES = ('uint8', 'float16')
+
+_MAX_BATCH_SAMPLE_COUNT = 10000000
+"""
+Maximum total number of samples of the clips of one batched spectrogram
+computation. This limits the memory used by a computation.
+"""
+
+_WARM_CACHE_BATCH_SIZE = 100
+"""Number of clips whose spectrograms are computed at once to warm a cache."""
+
+_SPECTROGRAM_HEADER_FORMAT = '<II'
+
+
+class ClipSpectrogramManager:
+
+    """
+    Computes and caches quantized clip spectrograms.
+
+    A clip spectrogram manager computes spectrograms of clips according
+    to the spectrogram computation settings of clip album settings
+    presets, and quantizes them for transmission to clients. Spectrogram
+    values are decibels with respect to the reference power of the
+    settings. They are quantized either to float16 values or to uint8
+    values, with the latter spanning the power range of the settings'
+    spectrogram display settings linearly from 0 to 255.
+
+    Spectrograms of many clips are computed together with one batched
+    FFT per clip sample rate. Computed spectrograms are stored in a
+    content-addressed disk cache whose keys combine the version of a
+    clip's audio (see `ClipManager.get_audio_file_version`) with a hash
+    of the spectrogram settings.
+
+    A spectrogram is represented by a byte string comprising a header
+    of two little-endian uint32 values, the spectrum count and the
+    spectrum size, followed by the spectrogram values, spectrum by
+    spectrum.
+    """
+
+
+    def __init__(self, cache=None):
+        self._clip_manager = clip_manager.instance
+        self._cache = cache
+
+
+    @property
+    def cache(self):
+
+        """
+        the spectrogram cache of this manager, or `None` if the manager
+        does not cache spectrograms.
+        """
+
+        return self._cache
+
+
+    def get_spectrograms(self, clips, settings, dtype='uint8'):
+
+        """
+        Gets spectrograms of the specified clips.
+
+        :Parameters:
+
+            clips : sequence of `Clip` objects
+                the clips whose spectrograms to get.
+
+            settings : dict
+                clip album settings, i.e. the data of a clip album
+                settings preset.
+
+            dtype : str
+                the spectrogram data type, either "uint8" or "float16".
+
+        :Returns:
+            list of spectrogram byte strings, one per clip.
+
+        :Raises ValueError:
+            if the specified data type is not supported.
+        """
+
+        if dtype not in SPECTROGRAM_DTYPES:
+            raise ValueError(
+                f'Unsupported spectrogram data type "{dtype}". Supported '
+                f'types are {", ".join(SPECTROGRAM_DTYPES)}.')
+
+        settings = _get_spectrogram_settings(settings)
+        settings_hash = _get_settings_hash(settings, dtype)
+
+        results = [None] * len(clips)
+        misses = defaultdict(list)
+
+        for i, clip in enumerate(clips):
+
+            key = self._get_cache_key(clip, settings_hash)
+
+            if self._cache is not None:
+                results[i] = self._cache.get(key)
+
+            if results[i] is None:
+                misses[clip.sample_rate].append((i, clip, key))
+
+        for sample_rate, items in misses.items():
+
+            computation = _get_computation_settings(settings, sample_rate)
+
+            for batch in _generate_batches(items):
+
+                spectrograms = self._compute_spectrograms(
+                    [clip for _, clip, _ in batch], computation)
+
+                for (i, _, key), spectrogram in zip(batch, spectrograms):
+
+                    contents = _encode_spectrogram(
+                        spectrogram, dtype, settings.power_range)
+
+                    if self._cache is not None:
+                        self._cache.put(key, contents)
+
+                    results[i] = contents
+
+        return results
+
+
+    def warm_cache(self, clips, settings, dtype='uint8'):
+
+        """
+        Computes and caches the spectrograms of the specified clips.
+
+        :Returns:
+            the number of clips whose spectrograms were cached.
+        """
+
+        if self._cache is None:
+            return 0
+
+        count = 0
+        batch = []
+
+        for clip in clips:
+
+            batch.append(clip)
+
+            if len(batch) == _WARM_CACHE_BATCH_SIZE:
+                self.get_spectrograms(batch, settings, dtype)
+                count += len(batch)
+                batch = []
+
+        if len(batch) != 0:
+            self.get_spectrograms(batch, settings, dtype)
+            count += len(batch)
+
+        return count
+
+
+    def _get_cache_key(self, clip, settings_hash):
+        version = self._clip_manager.get_audio_file_version(clip)
+        return f'{version}/{settings_hash}'
+
+
+    def _compute_spectrograms(self, clips, computation):
+
+        signals = [
+            self._clip_manager.get_samples(clip) * _SAMPLE_SCALE_FACTOR
+            for clip in clips]
+
+        spectrograms = tfa_utils.compute_spectrograms(
+            signals, computation.window, computation.hop_size,
+            computation.dft_size)
+
+        return [
+            _scale_spectrogram(s, computation.reference_power)
+            for s in spectrograms]
+
+
+def _get_spectrogram_settings(settings):
+
+    spectrogram = settings.get('clip_view', {}).get('spectrogram', {})
+    computation = spectrogram.get('computation', {})
+    display = spectrogram.get('display', {})
+    window = computation.get('window', {})
+
+    return Bunch(
+        window_type=window.get('type', _DEFAULT_WINDOW_TYPE),
+        window_size=float(window.get('size', _DEFAULT_WINDOW_SIZE)),
+        hop_size=float(computation.get('hop_size', _DEFAULT_HOP_SIZE)),
+        spectral_interpolation_factor=int(computation.get(
+            'spectral_interpolation_factor',
+            _DEFAULT_SPECTRAL_INTERPOLATION_FACTOR)),
+        reference_power=float(computation.get(
+            'reference_power', _DEFAULT_REFERENCE_POWER)),
+        power_range=tuple(
+            float(p)
+            for p in display.get('power_range', _DEFAULT_POWER_RANGE)))
+
+
+def _get_settings_hash(settings, dtype):
+    data = dict(settings.__dict__, dtype=dtype)
+    text = json.dumps(data, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _get_computation_settings(settings, sample_rate):
+
+    # This follows the `_getLowLevelSpectrogramSettings` function of
+    # the `spectrogram-clip-view` JavaScript module.
+
+    float_window_size = settings.window_size * sample_rate
+    window_size = max(int(round(float_window_size)), 1)
+
+    try:
+        function_name = _WINDOW_FUNCTION_NAMES[settings.window_type]
+    except KeyError:
+        raise ValueError(
+            f'Unrecognized window type "{settings.window_type}".')
+
+    window = scipy.signal.get_window(function_name, window_size, fftbins=False)
+
+    hop_size = max(int(round(settings.hop_size / 100 * float_window_size)), 1)
+    hop_size = min(hop_size, window_size)
+
+    factor = settings.spectral_interpolation_factor
+    dft_size = tfa_utils.get_dft_size(window_size)
+    if factor > 1 and factor & (factor - 1) == 0:
+        # factor is a power of two greater than one
+        dft_size *= factor
+
+    return Bunch(
+        window=window,
+        hop_size=hop_size,
+        dft_size=dft_size,
+        reference_power=settings.reference_power)
+
+
+def _scale_spectrogram(spectrogram, reference_power):
+
+    # Double the values of all but the first and last bins to include
+    # the energy of the negative frequency bins, as browsers do.
+    if spectrogram.shape[1] > 2:
+        spectrogram[:, 1:-1] *= 2
+
+    return tfa_utils.linear_to_log(
+        spectrogram, reference_power, out=spectrogram)
+
+
+def _generate_batches(items):
+
+    batch = []
+    sample_count = 0
+
+    for item in items:
+
+        length = item[1].length
+
+        if len(batch) != 0 and \
+                sample_count + length > _MAX_BATCH_SAMPLE_COUNT:
+            yield batch
+            batch = []
+            sample_count = 0
+
+        batch.append(item)
+        sample_count += length
+
+    if len(batch) != 0:
+        yield batch
+
+
+def _encode_spectrogram(spectrogram, dtype, power_range):
+
+    if dtype == 'uint8':
+        min_power, max_power = power_range
+        scale = 255 / (max_power - min_power) if max_power != min_power else 0
+        values = (spectrogram - min_power) * scale
+        np.clip(values, 0, 255, out=values)
+        values = np.round(values).astype(np.uint8)
+
+    else:
+        values = spectrogram.astype('<f2')
+
+    num_spectra, spectrum_size = spectrogram.shape
+    header = struct.pack(_SPECTROGRAM_HEADER_FORMAT, num_spectra, spectrum_size)
+
+    return header + values.tobytes()
+
+
+def decode_spectrogram(contents, dtype):
+
+    """
+    Decodes a spectrogram byte string created by a
+    `ClipSpectrogramManager`.
+
+    :Returns:
+        the spectrogram as a two-dimensional NumPy array.
+    """
+
+    header_size = struct.calcsize(_SPECTROGRAM_HEADER_FORMAT)
+    num_spectra, spectrum_size = struct.unpack_from(
+        _SPECTROGRAM_HEADER_FORMAT, contents)
+
+    dtype = np.uint8 if dtype == 'uint8' else np.dtype('<f2')
+    values = np.frombuffer(contents, dtype, offset=header_size)
+
+    return values.reshape((num_spectra, spectrum_size))
+
+
+def create_clip_spectrogram_cache():
+
+    """
+    Creates the spectrogram cache of an archive, or returns `None`
+    if spectrogram caching is disabled.
+    """
+
+    max_size = archive_settings.clip_spectrogram_cache_max_size
+
+    if max_size <= 0:
+        return None
+
+    else:
+        return DiskLruCache(
+            archive_paths.clip_spectrogram_cache_dir_path,
+            int(max_size * 2 ** 20))
@@ -0,0 +1,387 @@
+"""
+Module containing functions and classes for deferred clip files.
+
+A deferred clip file contains information about clips that a detection
+job found but for which it deferred the creation of archive database
+records. The clips are stored in columnar batches, each of which
+comprises a small JSON header followed by one NumPy array per column.
+A file can be read one batch at a time, so it need never be loaded into
+memory all at once, and reading can start at any batch.
+
+A file has the following layout:
+
+    magic bytes (b'VDCF')
+    format version (little-endian uint32)
+    batch 0
+    batch 1
+    ...
+
+Each batch has the following layout:
+
+    header size (little-endian uint32)
+    header (UTF-8 JSON)
+    column arrays
+
+The header is a JSON object with a `clip_count` item whose value is the
+number of clips of the batch and an `annotations` item whose value is
+an object mapping annotation names to lists of annotation values. The
+column arrays follow the header, first the arrays of `COLUMNS` in
+order and then one `<i4` array for each annotation of the header, in
+header order. The elements of an annotation array are indices into
+the annotation's list of values, with -1 indicating that a clip does
+not have the annotation.
+"""
+
+
+from pathlib import Path
+import datetime
+import json
+import os
+import struct
+
+import numpy as np
+import pytz
+
+from vesper.util.bunch import Bunch
+
+
+FILE_NAME_EXTENSION = '.clips'
+
+COLUMNS = (
+    ('recording_channel_ids', '<i8'),
+    ('start_indices', '<i8'),
+    ('lengths', '<i8'),
+    ('creation_times', '<i8'),
+    ('creating_job_ids', '<i8'),
+    ('creating_processor_ids', '<i8'))
+"""
+Deferred clip file columns, as (name, dtype) pairs.
+
+Creation times are in microseconds since the UTC epoch.
+"""
+
+_MAGIC = b'VDCF'
+_VERSION = 1
+_FILE_HEADER = struct.Struct('<4sI')
+_BATCH_HEADER_SIZE = struct.Struct('<I')
+_ANNOTATION_DTYPE = '<i4'
+_ROW_SIZE = sum(np.dtype(dtype).itemsize for _, dtype in COLUMNS)
+_TEMP_FILE_NAME_SUFFIX = '.part'
+_DEFAULT_BATCH_SIZE = 10000
+_UTC_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+
+class DeferredClipFileError(Exception):
+    pass
+
+
+class DeferredClipFileWriter:
+
+    """
+    Writes a deferred clip file.
+
+    Clips are buffered and written a batch at a time. The file is
+    written to a temporary file that is renamed when the writer is
+    closed, so a complete file appears at the specified path only after
+    all of its clips have been written.
+    """
+
+
+    def __init__(self, file_path, batch_size=_DEFAULT_BATCH_SIZE):
+
+        self._file_path = Path(file_path)
+        self._batch_size = batch_size
+
+        self._temp_file_path = Path(
+            str(self._file_path) + _TEMP_FILE_NAME_SUFFIX)
+        self._file = open(self._temp_file_path, 'wb')
+        self._file.write(_FILE_HEADER.pack(_MAGIC, _VERSION))
+
+        self._rows = []
+        self._annotations = []
+        self._clip_count = 0
+
+
+    @property
+    def file_path(self):
+        return self._file_path
+
+
+    @property
+    def clip_count(self):
+        return self._clip_count
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+
+    def write_clip(
+            self, recording_channel_id, start_index, length, creation_time,
+            creating_job_id, creating_processor_id, annotations=None):
+
+        self._rows.append((
+            recording_channel_id, start_index, length,
+            _get_epoch_microseconds(creation_time), creating_job_id,
+            creating_processor_id))
+
+        self._annotations.append(annotations)
+
+        self._clip_count += 1
+
+        if len(self._rows) == self._batch_size:
+            self._write_batch()
+
+
+    def _write_batch(self):
+
+        if len(self._rows) == 0:
+            return
+
+        columns = list(zip(*self._rows))
+        header, annotation_columns = _encode_annotations(self._annotations)
+
+        header['clip_count'] = len(self._rows)
+        header_bytes = json.dumps(header).encode('utf-8')
+
+        file_ = self._file
+        file_.write(_BATCH_HEADER_SIZE.pack(len(header_bytes)))
+        file_.write(header_bytes)
+
+        for (_, dtype), values in zip(COLUMNS, columns):
+            file_.write(np.array(values, dtype=dtype).tobytes())
+
+        for codes in annotation_columns:
+            file_.write(codes.tobytes())
+
+        self._rows = []
+        self._annotations = []
+
+
+    def close(self):
+
+        if self._file is None:
+            return
+
+        self._write_batch()
+        self._file.close()
+        self._file = None
+
+        os.replace(self._temp_file_path, self._file_path)
+
+
+def _get_epoch_microseconds(dt):
+    delta = dt - _UTC_EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _encode_annotations(annotations):
+
+    # Get annotation names in order of first appearance.
+    names = {}
+    for a in annotations:
+        if a is not None:
+            for name in a:
+                names.setdefault(name, None)
+
+    values = dict((name, {}) for name in names)
+    columns = dict(
+        (name, np.full(len(annotations), -1, dtype=_ANNOTATION_DTYPE))
+        for name in names)
+
+    for i, a in enumerate(annotations):
+        if a is not None:
+            for name, value in a.items():
+                codes = values[name]
+                columns[name][i] = codes.setdefault(str(value), len(codes))
+
+    header = {
+        'annotations': dict(
+            (name, list(values[name].keys())) for name in names)
+    }
+
+    return header, [columns[name] for name in names]
+
+
+def get_datetime(epoch_microseconds):
+
+    """
+    Gets a UTC `datetime` from a deferred clip file creation time.
+
+    :Parameters:
+
+        epoch_microseconds : int
+            time in microseconds since the UTC epoch.
+
+    :Returns:
+        the corresponding UTC `datetime`.
+    """
+
+    return _UTC_EPOCH + \
+        datetime.timedelta(microseconds=int(epoch_microseconds))
+
+
+def read_batches(file_path, start_batch_num=0):
+
+    """
+    Generates the batches of a deferred clip file.
+
+    The file is read one batch at a time. Batches that precede the
+    start batch are skipped without reading their column data.
+
+    :Parameters:
+
+        file_path : str or Path
+            the path of the file to read.
+
+        start_batch_num : int
+            the number of the first batch to generate.
+
+    :Returns:
+        a generator of (batch number, batch) pairs. Each batch is a
+        `Bunch` with a `clip_count` attribute, one NumPy array
+        attribute for each column of `COLUMNS`, and an `annotations`
+        attribute that maps annotation names to (codes, values)
+        pairs, where `codes` is a NumPy array of indices into the list
+        of annotation values `values`, with -1 indicating that a clip
+        does not have the annotation.
+
+    :Raises DeferredClipFileError:
+        if the file is not a valid deferred clip file.
+    """
+
+    with open(file_path, 'rb') as file_:
+
+        _read_file_header(file_, file_path)
+
+        batch_num = 0
+
+        while True:
+
+            header = _read_batch_header(file_, file_path)
+
+            if header is None:
+                return
+
+            clip_count = header['clip_count']
+            annotation_names = list(header['annotations'].keys())
+
+            data_size = clip_count * (
+                _ROW_SIZE +
+                len(annotation_names) * np.dtype(_ANNOTATION_DTYPE).itemsize)
+
+            if batch_num < start_batch_num:
+                file_.seek(data_size, os.SEEK_CUR)
+
+            else:
+
+                data = file_.read(data_size)
+
+                if len(data) != data_size:
+                    raise DeferredClipFileError(
+                        f'Deferred clip file "{file_path}" is truncated.')
+
+                yield batch_num, _create_batch(data, clip_count, header)
+
+            batch_num += 1
+
+
+def _read_file_header(file_, file_path):
+
+    data = file_.read(_FILE_HEADER.size)
+
+    if len(data) != _FILE_HEADER.size:
+        magic, version = None, None
+    else:
+        magic, version = _FILE_HEADER.unpack(data)
+
+    if magic != _MAGIC:
+        raise DeferredClipFileError(
+            f'File "{file_path}" is not a deferred clip file.')
+
+    if version != _VERSION:
+        raise DeferredClipFileError(
+            f'Deferred clip file "{file_path}" has unsupported format '
+            f'version {version}.')
+
+
+def _read_batch_header(file_, file_path):
+
+    data = file_.read(_BATCH_HEADER_SIZE.size)
+
+    if len(data) == 0:
+        # at end of file
+
+        return None
+
+    if len(data) != _BATCH_HEADER_SIZE.size:
+        raise DeferredClipFileError(
+            f'Deferred clip file "{file_path}" is truncated.')
+
+    size, = _BATCH_HEADER_SIZE.unpack(data)
+
+    data = file_.read(size)
+
+    if len(data) != size:
+        raise DeferredClipFileError(
+            f'Deferred clip file "{file_path}" is truncated.')
+
+    return json.loads(data.decode('utf-8'))
+
+
+def _create_batch(data, clip_count, header):
+
+    batch = Bunch(clip_count=clip_count, annotations={})
+
+    offset = 0
+
+    for name, dtype in COLUMNS:
+        array = np.frombuffer(data, dtype, clip_count, offset)
+        setattr(batch, name, array)
+        offset += array.nbytes
+
+    for name, values in header['annotations'].items():
+        codes = np.frombuffer(data, _ANNOTATION_DTYPE, clip_count, offset)
+        batch.annotations[name] = (codes, values)
+        offset += codes.nbytes
+
+    return batch
+
+
+def create_batch(clips):
+
+    """
+    Creates a deferred clip file batch from a sequence of clips.
+
+    :Parameters:
+
+        clips : sequence of sequences
+            the clips of the batch. Each clip is a (recording channel
+            ID, start index, length, creation time, creating job ID,
+            creating processor ID, annotations) sequence, as in the
+            pickled deferred action files of earlier Vesper versions.
+
+    :Returns:
+        the batch, as it would be generated by `read_batches`.
+    """
+
+    columns = list(zip(*clips)) if len(clips) != 0 else [()] * 7
+
+    creation_times = [_get_epoch_microseconds(t) for t in columns[3]]
+    header, annotation_columns = _encode_annotations(columns[6])
+
+    batch = Bunch(clip_count=len(clips), annotations={})
+
+    values = list(columns[:3]) + [creation_times] + list(columns[4:6])
+    for (name, dtype), v in zip(COLUMNS, values):
+        setattr(batch, name, np.array(v, dtype=dtype))
+
+    for (name, values), codes in \
+            zip(header['annotations'].items(), annotation_columns):
+        batch.annotations[name] = (codes, values)
+
+    return batch
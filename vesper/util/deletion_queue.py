@@ -0,0 +1,453 @@
+"""Module containing class `DeletionQueue`."""
+
+
+from pathlib import Path
+from threading import Condition, Thread
+import logging
+import os
+import queue
+import time
+
+import numpy as np
+
+from vesper.util.bunch import Bunch
+import vesper.util.os_utils as os_utils
+
+
+_logger = logging.getLogger(__name__)
+
+
+_FILE_NAME_FORMAT = 'Deletions {:020d} {:d} {:d}.npy'
+_PENDING_FILE_NAME_SUFFIX = '.pending'
+_PROCESSING_FILE_NAME_SUFFIX = '.processing'
+
+
+class DeletionQueue:
+
+    """
+    Persistent queue of deletions performed by a background thread.
+
+    A deletion queue performs deletions of things (for example, files)
+    that are identified by rows of integers. The rows of a queue have
+    a fixed number of columns. For each queued row, the queue's
+    background thread invokes a deletion function on the row.
+
+    Rows are queued in two phases, so that the queue can be used to
+    perform deletions only after an associated database transaction
+    commits. The `prepare` method writes rows to a pending file in the
+    queue directory, the `commit` method makes the pending file ready
+    for processing, and the `abort` method deletes it. Ready files
+    persist until all of their rows have been processed, so
+    deletions interrupted by a crash are performed the next time a
+    queue is started for the directory. The `recover` method resolves
+    pending files left by a crash.
+
+    Several queues, in one or more processes, can share a directory.
+    A queue claims each ready file before processing it by renaming
+    the file to a processing file name that includes the ID of the
+    queue's process, so that only one queue processes each file. A
+    file that another queue claims first counts as processed. When a
+    queue starts, it reclaims the processing files of processes that
+    no longer exist.
+
+    The deletion function must be idempotent, since a row whose
+    processing is interrupted by a crash is processed again later.
+    """
+
+
+    def __init__(self, dir_path, delete, column_count):
+
+        """
+        Initializes this queue.
+
+        :Parameters:
+
+            dir_path : str or Path
+                the queue directory. The directory is created if it
+                does not exist.
+
+            delete : function
+                the deletion function. The function is invoked with
+                one argument, a tuple of the integers of a row.
+
+            column_count : int
+                the number of columns of the rows of this queue.
+        """
+
+        self._dir_path = Path(dir_path)
+        self._delete = delete
+        self._column_count = column_count
+
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+
+        self._file_num = 0
+        self._paths = queue.Queue()
+        self._thread = None
+
+        self._condition = Condition()
+        self._queued_count = 0
+        self._deleted_count = 0
+        self._failure_count = 0
+        self._start_time = None
+
+
+    @property
+    def dir_path(self):
+        return self._dir_path
+
+
+    def recover(self, resolve):
+
+        """
+        Resolves pending files left by processes that crashed.
+
+        This method resolves only the pending files of processes that
+        no longer exist, so it can be called while other processes
+        are preparing and committing rows.
+
+        :Parameters:
+
+            resolve : function
+                function that determines which rows of a pending file
+                to delete. The function is invoked with one argument,
+                a NumPy array of the rows of the file, and should
+                return a NumPy array of the rows to delete.
+
+        :Returns:
+            the number of rows recovered.
+        """
+
+        count = 0
+
+        pattern = '*' + _PENDING_FILE_NAME_SUFFIX
+
+        for path in sorted(self._dir_path.glob(pattern)):
+
+            if os_utils.process_exists(_get_pending_file_pid(path)):
+                # pending file may belong to transaction in progress
+
+                continue
+
+            try:
+                rows = _load_rows(path)
+
+            except FileNotFoundError:
+                # another queue recovered file first
+
+                continue
+
+            except Exception as e:
+
+                # A process that crashed while writing a pending file
+                # did so before committing the file's transaction, so
+                # none of the file's rows need deletion.
+                _logger.warning(
+                    f'Could not read pending deletion queue file '
+                    f'"{path}", so it will be discarded. Error message '
+                    f'was: {str(e)}')
+                _delete_file(path)
+                continue
+
+            rows = resolve(rows)
+
+            if len(rows) != 0:
+                _save_rows(path, rows)
+                os.replace(path, _get_ready_file_path(path))
+                count += len(rows)
+
+            else:
+                path.unlink()
+
+        return count
+
+
+    def start(self):
+
+        """
+        Starts processing the ready files of this queue.
+
+        Ready files left by previous processes are processed first,
+        in the order in which they were committed.
+        """
+
+        self._reclaim_processing_files()
+
+        for path in sorted(self._dir_path.glob('*.npy')):
+
+            try:
+                rows = _load_rows(path)
+
+            except FileNotFoundError:
+                # another queue claimed file after we listed it
+
+                continue
+
+            except Exception as e:
+                _logger.error(
+                    f'Could not read deletion queue file "{path}". '
+                    f'Error message was: {str(e)}')
+                continue
+
+            self._enqueue(path, len(rows))
+
+        self._start_time = time.time()
+
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+
+    def _reclaim_processing_files(self):
+
+        """
+        Makes the processing files of processes that no longer exist
+        ready again.
+        """
+
+        pattern = '*' + _PROCESSING_FILE_NAME_SUFFIX
+
+        for path in self._dir_path.glob(pattern):
+
+            ready_path, pid = _parse_processing_file_path(path)
+
+            if not os_utils.process_exists(pid):
+
+                try:
+                    os.replace(path, ready_path)
+
+                except FileNotFoundError:
+                    # another queue reclaimed file first
+
+                    pass
+
+
+    def prepare(self, rows):
+
+        """
+        Writes rows to a pending file.
+
+        :Parameters:
+
+            rows : NumPy array
+                the rows, a two-dimensional array of integers with
+                one column for each column of this queue.
+
+        :Returns:
+            a ticket to pass to `commit` or `abort`.
+        """
+
+        rows = np.asarray(rows, dtype='<i8').reshape((-1, self._column_count))
+
+        file_name = _FILE_NAME_FORMAT.format(
+            time.time_ns(), os.getpid(), self._file_num)
+        self._file_num += 1
+
+        path = self._dir_path / (file_name + _PENDING_FILE_NAME_SUFFIX)
+        _save_rows(path, rows)
+
+        return Bunch(path=path, row_count=len(rows))
+
+
+    def commit(self, ticket):
+
+        """Queues the rows of a pending file for deletion."""
+
+        path = _get_ready_file_path(ticket.path)
+        os.replace(ticket.path, path)
+        self._enqueue(path, ticket.row_count)
+
+
+    def abort(self, ticket):
+
+        """Discards the rows of a pending file."""
+
+        ticket.path.unlink()
+
+
+    def _enqueue(self, path, row_count):
+
+        with self._condition:
+            self._queued_count += row_count
+
+        self._paths.put((path, row_count))
+
+
+    def _run(self):
+
+        while True:
+
+            item = self._paths.get()
+
+            if item is None:
+                return
+
+            path, row_count = item
+
+            processing_path = _get_processing_file_path(path)
+            processed_count = 0
+
+            try:
+
+                try:
+                    os.replace(path, processing_path)
+
+                except FileNotFoundError:
+                    # another queue claimed file
+
+                    self._count_processed_rows(row_count)
+                    continue
+
+                for row in _load_rows(processing_path).tolist():
+                    failed = not self._delete_row(row, path)
+                    self._count_processed_rows(1, failed)
+                    processed_count += 1
+
+                processing_path.unlink()
+
+            except Exception as e:
+
+                _logger.error(
+                    f'Processing of deletion queue file "{path}" failed '
+                    f'with message: {str(e)}')
+
+                # Count the unprocessed rows of the file as processed
+                # and failed, so that `join` does not wait for them.
+                self._count_processed_rows(
+                    max(row_count - processed_count, 0), True)
+
+
+    def _delete_row(self, row, path):
+
+        try:
+            self._delete(tuple(row))
+
+        except Exception as e:
+            _logger.error(
+                f'Deletion for row {row} of deletion queue file '
+                f'"{path}" failed with message: {str(e)}')
+            return False
+
+        else:
+            return True
+
+
+    def _count_processed_rows(self, count, failed=False):
+
+        with self._condition:
+            self._deleted_count += count
+            if failed:
+                self._failure_count += count
+            self._condition.notify_all()
+
+
+    def get_stats(self):
+
+        """
+        Gets statistics for this queue.
+
+        :Returns:
+            a `Bunch` with attributes `queued_count` (the number of
+            rows queued since this queue was started), `deleted_count`
+            (the number of queued rows processed), `failure_count` (the
+            number of processed rows for which the deletion function
+            raised an exception), and `rate` (the number of rows
+            processed per second since this queue was started).
+        """
+
+        with self._condition:
+
+            if self._start_time is None:
+                rate = 0
+            else:
+                elapsed_time = time.time() - self._start_time
+                rate = self._deleted_count / elapsed_time \
+                    if elapsed_time != 0 else 0
+
+            return Bunch(
+                queued_count=self._queued_count,
+                deleted_count=self._deleted_count,
+                failure_count=self._failure_count,
+                rate=rate)
+
+
+    def join(self, timeout=None):
+
+        """
+        Waits for the processing of all queued rows to complete.
+
+        :Parameters:
+
+            timeout : float or None
+                the maximum time to wait, in seconds, or `None` to
+                wait indefinitely.
+
+        :Returns:
+            `True` if processing completed, or `False` if the wait
+            timed out.
+        """
+
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._deleted_count == self._queued_count, timeout)
+
+
+    def close(self):
+
+        """
+        Stops the background thread of this queue.
+
+        Queued rows that have not been processed remain in the queue
+        directory, to be processed by the next queue started for it.
+        """
+
+        if self._thread is not None:
+            self._paths.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+def _get_ready_file_path(pending_file_path):
+    name = pending_file_path.name[:-len(_PENDING_FILE_NAME_SUFFIX)]
+    return pending_file_path.with_name(name)
+
+
+def _get_pending_file_pid(pending_file_path):
+
+    """Gets the ID of the process that wrote a pending file."""
+
+    # See `_FILE_NAME_FORMAT`.
+    return int(pending_file_path.name.split(' ')[2])
+
+
+def _get_processing_file_path(ready_file_path):
+    name = '{}.{}{}'.format(
+        ready_file_path.name, os.getpid(), _PROCESSING_FILE_NAME_SUFFIX)
+    return ready_file_path.with_name(name)
+
+
+def _parse_processing_file_path(processing_file_path):
+
+    """
+    Gets the ready file path and process ID of a processing file path.
+    """
+
+    name = processing_file_path.name[:-len(_PROCESSING_FILE_NAME_SUFFIX)]
+    name, pid = name.rsplit('.', 1)
+    return processing_file_path.with_name(name), int(pid)
+
+
+def _delete_file(path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _save_rows(path, rows):
+    with open(path, 'wb') as file_:
+        np.save(file_, rows)
+        file_.flush()
+        os.fsync(file_.fileno())
+
+
+def _load_rows(path):
+    return np.load(path)
@@ -0,0 +1,669 @@
+"""
+Engine for evaluating detectors on a corpus of recordings.
+
+The `run_detectors` function runs a set of detectors, each with a grid
+of detection thresholds, on a corpus of recordings. Recordings are
+processed in parallel by a pool of worker processes, and each recording
+is read only once for all of the detectors that run on it.
+
+Detectors that support score listeners and have a `process_scores`
+method (for example the Old Bird redux 1.1 multi-threshold detectors and
+the PNF energy detectors) can cache their pre-threshold score tracks.
+When a cache directory is specified, the engine saves the score track
+of each such detector for each recording to the directory. Subsequent
+runs of the same detector (as identified by its name and settings) on
+the same recording detect clips from the cached track instead of
+rerunning the detector's signal processing, so evaluating a detector
+at new thresholds takes seconds rather than hours. Cached score tracks
+are stored as 32-bit floats, and clips for cached detectors are always
+detected from the stored tracks, so results do not depend on whether
+a track was computed or loaded from the cache. A cache directory
+should be cleared when detector code changes.
+
+The `evaluate_detections` function matches detected clips with
+annotated calls, using vectorized NumPy operations, and computes
+precision, recall, and F1 for each detector, recording, and threshold.
+"""
+
+
+from multiprocessing import Pool
+from pathlib import Path
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from vesper.signal.wave_audio_file import WaveAudioFileReader
+from vesper.util.score_track_file import ScoreTrackWriter
+import vesper.util.score_track_file as score_track_file
+
+
+_logger = logging.getLogger(__name__)
+
+
+DEFAULT_CHUNK_SIZE = 100000
+"""
+Default recording read chunk size, in samples.
+
+Detectors run fastest for intermediate chunk sizes, depending on aspects
+of the particular computer on which they are run. For sufficiently small
+chunk sizes processing loop overhead becomes large, while for larger chunk
+sizes memory cache misses become a problem.
+"""
+
+EVALUATION_COLUMNS = (
+    'Detector', 'Recording', 'Threshold', 'Ground Truth Calls',
+    'Detected Calls', 'Detected Clips', 'Precision', 'Recall', 'F1')
+"""Columns of rows returned by `evaluate_detections`."""
+
+_SCORES_DTYPE = 'float32'
+
+
+class DetectorSpec:
+
+    """
+    Specification of a detector to evaluate.
+
+    :Parameters:
+        name : str
+            the detector name.
+        create_detector : function
+            a picklable function that creates a detector. The function
+            must accept four arguments, namely a sequence of detection
+            thresholds, an input sample rate, a clip listener, and a
+            score listener (possibly `None`), and return a detector with
+            `detect` and `complete_detection` methods. If the detector
+            also has a `process_scores` method, it must notify the score
+            listener of the scores it computes, and its score tracks can
+            be cached.
+        thresholds : sequence of numbers
+            the thresholds at which to evaluate the detector.
+        settings : `Bunch`, dict, or `None`
+            the detector settings. Detectors with the same name but
+            different settings have separate score track caches.
+    """
+
+
+    def __init__(self, name, create_detector, thresholds, settings=None):
+        self.name = name
+        self.create_detector = create_detector
+        self.thresholds = tuple(thresholds)
+        self.settings = settings
+
+
+    @property
+    def cache_key(self):
+        return json.dumps(
+            {'name': self.name, 'settings': self.settings},
+            sort_keys=True, default=_get_json_value)
+
+
+def _get_json_value(x):
+    if hasattr(x, '__dict__'):
+        return x.__dict__
+    elif isinstance(x, np.generic):
+        return x.item()
+    else:
+        return str(x)
+
+
+def run_detectors(
+        detector_specs, recordings, cache_dir_path=None, process_count=None,
+        chunk_size=DEFAULT_CHUNK_SIZE, open_recording=None):
+
+    """
+    Runs detectors on recordings.
+
+    :Parameters:
+        detector_specs : sequence of `DetectorSpec` objects
+            the detectors to run.
+        recordings : sequence of `(name, file_path)` pairs
+            the recordings on which to run the detectors. Detectors run
+            on the first channel of each recording.
+        cache_dir_path : path or `None`
+            the score track cache directory, or `None` to not cache
+            score tracks.
+        process_count : int or `None`
+            the number of worker processes, or `None` to use one per CPU.
+        chunk_size : int
+            the recording read chunk size, in samples.
+        open_recording : function or `None`
+            a picklable function that opens a recording file given its
+            path and returns a reader with `sample_rate` and `length`
+            attributes and `read` and `close` methods like those of
+            `WaveAudioFileReader`. If `None`, `WaveAudioFileReader` is
+            used.
+
+    :Returns:
+        a dictionary mapping `(detector name, recording name)` pairs to
+        dictionaries that map thresholds to detected clips. The clips
+        for a threshold are an `n` by 2 NumPy array of clip start
+        indices and lengths, sorted by start index.
+    """
+
+    if open_recording is None:
+        open_recording = WaveAudioFileReader
+
+    if cache_dir_path is not None:
+        cache_dir_path = Path(cache_dir_path)
+        cache_dir_path.mkdir(parents=True, exist_ok=True)
+
+    tasks = [
+        (detector_specs, recording, cache_dir_path, chunk_size,
+         open_recording)
+        for recording in recordings]
+
+    detections = {}
+
+    pool = Pool(process_count)
+
+    try:
+
+        for recording_name, results in \
+                pool.imap_unordered(_run_detectors_on_recording, tasks):
+
+            for detector_name, clips in results.items():
+                detections[(detector_name, recording_name)] = clips
+
+    except BaseException:
+        pool.terminate()
+        raise
+
+    else:
+        pool.close()
+
+    finally:
+        pool.join()
+
+    return detections
+
+
+def _run_detectors_on_recording(task):
+
+    specs, (recording_name, file_path), cache_dir_path, chunk_size, \
+        open_recording = task
+
+    start_time = time.time()
+
+    results = {}
+    live_specs = []
+
+    for spec in specs:
+
+        track = _load_score_track(cache_dir_path, spec, file_path)
+
+        if track is None:
+            live_specs.append(spec)
+        else:
+            results[spec.name] = _detect_from_score_track(spec, track)
+
+    cached_count = len(results)
+
+    if len(live_specs) != 0:
+        results.update(_run_live_detectors(
+            live_specs, file_path, cache_dir_path, chunk_size,
+            open_recording))
+
+    elapsed_time = time.time() - start_time
+    _logger.info(
+        f'Ran {len(specs)} detectors ({cached_count} from cached score '
+        f'tracks) on recording "{recording_name}" in {elapsed_time:.1f} '
+        f'seconds.')
+
+    return recording_name, results
+
+
+def _run_live_detectors(
+        specs, file_path, cache_dir_path, chunk_size, open_recording):
+
+    reader = open_recording(str(file_path))
+
+    try:
+
+        sample_rate = reader.sample_rate
+
+        runs = [
+            _LiveDetectorRun(spec, sample_rate, file_path, cache_dir_path)
+            for spec in specs]
+
+        for start_index in range(0, reader.length, chunk_size):
+            length = min(chunk_size, reader.length - start_index)
+            samples = reader.read(start_index, length)[0]
+            for run in runs:
+                run.detector.detect(samples)
+
+    finally:
+        reader.close()
+
+    return dict((run.spec.name, run.complete()) for run in runs)
+
+
+class _LiveDetectorRun:
+
+    """Run of a detector on a recording that is not cached."""
+
+
+    def __init__(self, spec, sample_rate, file_path, cache_dir_path):
+
+        self.spec = spec
+        self._sample_rate = sample_rate
+
+        self._collector = _ClipCollector()
+
+        if cache_dir_path is None:
+            self._track_writer = None
+        else:
+            self._track_writer = ScoreTrackWriter(
+                _get_score_track_file_path(cache_dir_path, spec, file_path),
+                sample_rate, _SCORES_DTYPE)
+
+        self.detector = spec.create_detector(
+            spec.thresholds, sample_rate, self._collector,
+            self._track_writer)
+
+
+    def complete(self):
+
+        self.detector.complete_detection()
+
+        if self._track_writer is None:
+            return self._collector.get_clips(self.spec.thresholds)
+
+        elif not hasattr(self.detector, 'process_scores'):
+            # detector does not support score tracks
+
+            self._track_writer.discard()
+            return self._collector.get_clips(self.spec.thresholds)
+
+        else:
+            # detector supports score tracks
+
+            # Detect clips from the saved score track rather than using
+            # the clips detected above, so that results are the same
+            # as for subsequent runs that use the saved track.
+            track = self._track_writer.close()
+            return _detect_from_score_track(self.spec, track)
+
+
+class _ClipCollector:
+
+    """Detector listener that collects clips."""
+
+
+    def __init__(self):
+        self._clips = {}
+
+
+    def process_clip(self, start_index, length, threshold):
+        self._clips.setdefault(threshold, []).append((start_index, length))
+
+
+    def get_clips(self, thresholds):
+        return dict(
+            (t, _create_clips_array(self._clips.get(t, [])))
+            for t in thresholds)
+
+
+def _create_clips_array(clips):
+
+    clips = np.array(clips, dtype='int64').reshape((-1, 2))
+
+    # Sort clips by start index and then by length.
+    indices = np.lexsort((clips[:, 1], clips[:, 0]))
+
+    return clips[indices]
+
+
+def _get_score_track_file_path(cache_dir_path, spec, recording_file_path):
+
+    """
+    Gets the score track cache file path for the specified detector
+    and recording, without a file name extension.
+    """
+
+    recording_file_path = Path(recording_file_path)
+    stat = os.stat(recording_file_path)
+
+    key = json.dumps([
+        spec.cache_key, str(recording_file_path.resolve()), stat.st_size,
+        stat.st_mtime_ns])
+
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    return cache_dir_path / digest
+
+
+def _load_score_track(cache_dir_path, spec, recording_file_path):
+
+    if cache_dir_path is None:
+        return None
+
+    file_path = _get_score_track_file_path(
+        cache_dir_path, spec, recording_file_path)
+
+    if not score_track_file.score_track_exists(file_path):
+        return None
+
+    return score_track_file.read_score_track(file_path)
+
+
+def _detect_from_score_track(spec, track):
+
+    collector = _ClipCollector()
+
+    detector = spec.create_detector(
+        spec.thresholds, track.sample_rate, collector, None)
+
+    for scores, offset in track.get_chunks():
+        detector.process_scores(scores, offset)
+
+    detector.complete_detection()
+
+    return collector.get_clips(spec.thresholds)
+
+
+def write_detections_file(file_path, detections):
+
+    """
+    Writes detections to a CSV file.
+
+    Each row of the file describes one clip, with columns "Detector",
+    "Recording", "Threshold", "Start Index", and "Length".
+
+    :Parameters:
+        file_path : path
+            the path of the file to write.
+        detections : dict
+            detections as returned by `run_detectors`.
+    """
+
+    with open(file_path, 'w', newline='') as file_:
+
+        writer = csv.writer(file_)
+
+        writer.writerow(
+            ['Detector', 'Recording', 'Threshold', 'Start Index', 'Length'])
+
+        for (detector_name, recording_name), clips in \
+                sorted(detections.items()):
+
+            for threshold in sorted(clips.keys()):
+                for start_index, length in clips[threshold]:
+                    writer.writerow([
+                        detector_name, recording_name, threshold,
+                        start_index, length])
+
+
+def get_clip_windows(clips, window):
+
+    """
+    Gets the call center windows of clips.
+
+    :Parameters:
+        clips : `n` by 2 NumPy array
+            clip start indices and lengths.
+        window : `(offset, length)` pair
+            the start offset and length in samples of the window within
+            each clip that must contain a call center for the clip to
+            be considered a detection of the call. Windows are truncated
+            to their clips.
+
+    :Returns:
+        window start and end index arrays.
+    """
+
+    clips = np.asarray(clips, dtype='int64').reshape((-1, 2))
+
+    clip_start_indices = clips[:, 0]
+    clip_end_indices = clip_start_indices + clips[:, 1]
+
+    window_offset, window_length = window
+
+    window_start_indices = np.minimum(
+        clip_start_indices + window_offset, clip_end_indices)
+
+    window_end_indices = np.minimum(
+        window_start_indices + window_length, clip_end_indices)
+
+    return window_start_indices, window_end_indices
+
+
+def match_clips_with_calls(clips, call_center_indices, window):
+
+    """
+    Matches clips with calls.
+
+    Clips are matched with calls one to one, greedily in time order: each
+    call is matched with the first clip not yet matched whose window ends
+    after the call center, if that window also starts at or before the
+    call center.
+
+    When clip window start and end indices are both nondecreasing, which
+    is the case when all clips have the same length, matching is
+    performed with vectorized NumPy operations. Otherwise clips and calls
+    are matched one at a time.
+
+    :Parameters:
+        clips : `n` by 2 NumPy array
+            clip start indices and lengths, sorted by start index.
+        call_center_indices : sequence of ints
+            call center indices, sorted.
+        window : `(offset, length)` pair
+            clip call center window, as for `get_clip_windows`.
+
+    :Returns:
+        a pair of arrays of the indices of matched clips and the indices
+        of the calls with which they are matched.
+    """
+
+    starts, ends = get_clip_windows(clips, window)
+    centers = np.asarray(call_center_indices, dtype='int64')
+
+    if np.all(np.diff(starts) >= 0) and np.all(np.diff(ends) >= 0):
+        return _match_clips_with_calls_vectorized(starts, ends, centers)
+    else:
+        return _match_clips_with_calls_sequentially(starts, ends, centers)
+
+
+def _match_clips_with_calls_vectorized(starts, ends, centers):
+
+    # Since window start and end indices are nondecreasing, the windows
+    # that contain a call center form a contiguous range. Window `i` can
+    # match call `j` if and only if `lo[j] <= i < hi[j]`.
+    lo = np.searchsorted(ends, centers, 'right')
+    hi = np.searchsorted(starts, centers, 'right')
+
+    # Calls with no candidate windows are never matched and do not
+    # affect the matching of other calls, so we discard them.
+    call_indices = np.nonzero(lo < hi)[0]
+    lo = lo[call_indices]
+    hi = hi[call_indices]
+
+    # The window that the greedy algorithm considers for a call is the
+    # first one at or after `lo` that has not been matched with an
+    # earlier call. If all calls from some point on are matched, the
+    # window considered for call `k` after that point is
+    #
+    #     k + max(previous + 1, max(lo[j] - j for j <= k))
+    #
+    # where `previous` is the index of the window matched before that
+    # point, and indices are relative to that point. We compute that
+    # for all remaining calls at once, accept matches up to the first
+    # call for which the considered window does not contain the call
+    # center, and repeat for the calls following that call. Calls with
+    # candidate windows that go unmatched are rare (they occur only when
+    # two calls are close enough that one window can match either), so
+    # there are few repetitions.
+
+    matched_clips = []
+    matched_calls = []
+
+    previous = -1
+    start = 0
+    count = len(call_indices)
+
+    while start != count:
+
+        k = np.arange(count - start)
+
+        windows = k + np.maximum(
+            np.maximum.accumulate(lo[start:] - k), previous + 1)
+
+        failures = np.nonzero(windows >= hi[start:])[0]
+
+        end = failures[0] if len(failures) != 0 else len(k)
+
+        matched_clips.append(windows[:end])
+        matched_calls.append(call_indices[start:start + end])
+
+        if end != 0:
+            previous = windows[end - 1]
+
+        # Skip the unmatched call, if there is one.
+        start += min(end + 1, len(k))
+
+    return _concatenate(matched_clips), _concatenate(matched_calls)
+
+
+def _concatenate(arrays):
+    if len(arrays) == 0:
+        return np.zeros(0, dtype='int64')
+    else:
+        return np.concatenate(arrays).astype('int64')
+
+
+def _match_clips_with_calls_sequentially(starts, ends, centers):
+
+    clip_count = len(starts)
+    call_count = len(centers)
+
+    i = 0
+    j = 0
+
+    matched_clips = []
+    matched_calls = []
+
+    while i != clip_count and j != call_count:
+
+        if ends[i] <= centers[j]:
+            # clip window i precedes call center j
+
+            i += 1
+
+        elif starts[i] > centers[j]:
+            # clip window i follows call center j
+
+            j += 1
+
+        else:
+            # clip window i includes call center j
+
+            matched_clips.append(i)
+            matched_calls.append(j)
+
+            i += 1
+            j += 1
+
+    return (
+        np.array(matched_clips, dtype='int64'),
+        np.array(matched_calls, dtype='int64'))
+
+
+def evaluate_detections(detections, call_center_indices, call_center_windows):
+
+    """
+    Evaluates detections against annotated calls.
+
+    :Parameters:
+        detections : dict
+            detections as returned by `run_detectors`.
+        call_center_indices : dict
+            mapping from `(detector name, recording name)` pairs to
+            sorted sequences of the indices of the centers of the calls
+            that the detector should detect in the recording.
+        call_center_windows : dict
+            mapping from detector names to clip call center windows,
+            as for `get_clip_windows`.
+
+    :Returns:
+        a list of rows with the columns of `EVALUATION_COLUMNS`, sorted
+        by detector name, recording name, and threshold. Precision,
+        recall, and F1 are percentages, and are `NaN` when undefined.
+    """
+
+    rows = []
+
+    for (detector_name, recording_name), clips in sorted(detections.items()):
+
+        centers = call_center_indices.get(
+            (detector_name, recording_name), [])
+        window = call_center_windows[detector_name]
+
+        for threshold in sorted(clips.keys()):
+
+            threshold_clips = clips[threshold]
+
+            matched_clips, _ = match_clips_with_calls(
+                threshold_clips, centers, window)
+
+            rows.append([
+                detector_name, recording_name, threshold, len(centers),
+                len(matched_clips), len(threshold_clips)])
+
+    return _add_precision_recall_f1(rows)
+
+
+def aggregate_evaluation(rows):
+
+    """
+    Aggregates evaluation rows over recordings.
+
+    :Parameters:
+        rows : list
+            rows as returned by `evaluate_detections`.
+
+    :Returns:
+        a list of rows like those returned by `evaluate_detections`,
+        with one row for each detector and threshold summarizing all
+        recordings, and `None` in the "Recording" column.
+    """
+
+    counts = {}
+
+    for detector_name, _, threshold, *row_counts, _, _, _ in rows:
+        key = (detector_name, threshold)
+        counts[key] = counts.get(key, np.zeros(3, dtype='int64')) + row_counts
+
+    aggregate_rows = [
+        [detector_name, None, threshold] + list(c)
+        for (detector_name, threshold), c in sorted(counts.items())]
+
+    return _add_precision_recall_f1(aggregate_rows)
+
+
+def _add_precision_recall_f1(rows):
+
+    if len(rows) == 0:
+        return rows
+
+    counts = np.array([row[3:6] for row in rows], dtype='float64')
+    call_counts, detected_call_counts, clip_counts = counts.T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = detected_call_counts / clip_counts
+        r = detected_call_counts / call_counts
+        f1 = 2 * p * r / (p + r)
+
+    for row, values in zip(rows, np.stack((p, r, f1), axis=1)):
+        row[3:6] = [int(c) for c in row[3:6]]
+        row += [_to_percent(v) for v in values]
+
+    return rows
+
+
+def _to_percent(x):
+    return float(np.round(1000 * x) / 10)
@@ -0,0 +1,328 @@
+"""Module containing `DiskLruCache` class."""
+
+
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+import hashlib
+import logging
+import os
+import tempfile
+
+
+_logger = logging.getLogger(__name__)
+
+
+_TEMP_FILE_NAME_SUFFIX = '.tmp'
+
+
+class DiskLruCache:
+
+    """
+    Size-limited cache of byte strings stored as files in a directory.
+
+    The cache maps string keys to byte strings. Each cached byte string
+    is stored in its own file, whose name is derived from a hash of the
+    key. When the total size of the cached byte strings exceeds the
+    cache's maximum size, least recently used items are evicted until
+    it no longer does.
+
+    A cache is initialized from the contents of its directory, so items
+    persist across processes. Files are written to a temporary file and
+    then renamed into place, so concurrent readers never see partially
+    written items. Note, however, that each process has its own view of
+    the cache's recency order and statistics.
+
+    The methods of this class are thread safe.
+    """
+
+
+    def __init__(self, dir_path, max_size):
+
+        """
+        Initializes this cache.
+
+        :Parameters:
+
+            dir_path : str or Path
+                the cache directory. The directory is created if it
+                does not exist.
+
+            max_size : int
+                the maximum total size of the cached items, in bytes.
+                If this is zero, nothing is cached.
+        """
+
+        self._dir_path = Path(dir_path)
+        self._max_size = max_size
+
+        self._lock = Lock()
+
+        self._items = OrderedDict()
+        """
+        Mapping from item file paths to item sizes, ordered from least
+        recently used to most recently used.
+        """
+
+        self._size = 0
+        self._hit_count = 0
+        self._miss_count = 0
+
+        self._load_items()
+
+
+    def _load_items(self):
+
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+
+        items = []
+
+        for dir_path, _, file_names in os.walk(self._dir_path):
+
+            for file_name in file_names:
+
+                path = Path(dir_path) / file_name
+
+                if file_name.endswith(_TEMP_FILE_NAME_SUFFIX):
+                    # temporary file left over from interrupted write
+
+                    _delete_file(path)
+
+                else:
+
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+
+                    items.append((stat.st_mtime, path, stat.st_size))
+
+        # Order items by modification time, which we update when an
+        # item is used.
+        items.sort()
+
+        for _, path, size in items:
+            self._items[path] = size
+            self._size += size
+
+        self._evict()
+
+
+    @property
+    def dir_path(self):
+        return self._dir_path
+
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+
+    @property
+    def size(self):
+        with self._lock:
+            return self._size
+
+
+    @property
+    def item_count(self):
+        with self._lock:
+            return len(self._items)
+
+
+    @property
+    def hit_count(self):
+        with self._lock:
+            return self._hit_count
+
+
+    @property
+    def miss_count(self):
+        with self._lock:
+            return self._miss_count
+
+
+    @property
+    def hit_ratio(self):
+
+        """
+        the fraction of `get` calls since this cache was initialized
+        that found their item, or `None` if there have been no calls.
+        """
+
+        with self._lock:
+            count = self._hit_count + self._miss_count
+            return self._hit_count / count if count != 0 else None
+
+
+    def get_stats(self):
+
+        """Gets a dictionary of statistics about this cache."""
+
+        with self._lock:
+            count = self._hit_count + self._miss_count
+            return {
+                'dir_path': str(self._dir_path),
+                'max_size': self._max_size,
+                'size': self._size,
+                'item_count': len(self._items),
+                'hit_count': self._hit_count,
+                'miss_count': self._miss_count,
+                'hit_ratio':
+                    self._hit_count / count if count != 0 else None
+            }
+
+
+    def get(self, key):
+
+        """
+        Gets the item with the specified key.
+
+        :Returns:
+            the item's bytes, or `None` if the item is not in the cache.
+        """
+
+        path = self._get_item_file_path(key)
+
+        try:
+
+            with open(path, 'rb') as file_:
+                contents = file_.read()
+
+        except FileNotFoundError:
+
+            with self._lock:
+                self._miss_count += 1
+                self._forget(path)
+
+            return None
+
+        with self._lock:
+
+            self._hit_count += 1
+
+            if path in self._items:
+                self._items.move_to_end(path)
+            else:
+                # item added by another process
+
+                self._add(path, len(contents))
+
+        # Record use in file modification time so that recency order
+        # survives restarts.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return contents
+
+
+    def put(self, key, contents):
+
+        """Adds an item to this cache, replacing any existing item."""
+
+        size = len(contents)
+
+        if size > self._max_size:
+            return
+
+        path = self._get_item_file_path(key)
+        temp_path = None
+
+        try:
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            fd, temp_path = tempfile.mkstemp(
+                suffix=_TEMP_FILE_NAME_SUFFIX, dir=str(path.parent))
+
+            try:
+                file_ = os.fdopen(fd, 'wb')
+            except BaseException:
+                os.close(fd)
+                raise
+
+            with file_:
+                file_.write(contents)
+
+            os.replace(temp_path, path)
+            temp_path = None
+
+        except OSError as e:
+            _logger.warning(
+                f'Could not write cache file "{path}". Error message '
+                f'was: {str(e)}')
+            return
+
+        finally:
+            if temp_path is not None:
+                _delete_file(temp_path)
+
+        with self._lock:
+            self._forget(path)
+            self._add(path, size)
+            self._evict()
+
+
+    def remove(self, key):
+
+        """
+        Removes the item with the specified key from this cache.
+
+        If the item is not in the cache, this method does nothing.
+        """
+
+        path = self._get_item_file_path(key)
+
+        with self._lock:
+            self._forget(path)
+
+        _delete_file(path)
+
+
+    def clear(self):
+
+        """Removes all items from this cache."""
+
+        with self._lock:
+            paths = list(self._items.keys())
+            self._items.clear()
+            self._size = 0
+
+        for path in paths:
+            _delete_file(path)
+
+
+    def _get_item_file_path(self, key):
+
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+        # Spread files across subdirectories to keep directories small.
+        return self._dir_path / name[:2] / name
+
+
+    def _add(self, path, size):
+        self._items[path] = size
+        self._size += size
+
+
+    def _forget(self, path):
+        size = self._items.pop(path, None)
+        if size is not None:
+            self._size -= size
+
+
+    def _evict(self):
+
+        while self._size > self._max_size:
+            path, size = self._items.popitem(last=False)
+            self._size -= size
+            _delete_file(path)
+
+
+def _delete_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -6,6 +6,7 @@ import math
 import numpy as np
 
 from vesper.util.spectrogram import Spectrogram
+import vesper.util.time_frequency_analysis_utils as tfa_utils
 
 
 # TODO: Change both "config" and "params" to "settings".
@@ -76,6 +77,93 @@ def get_segment_features(segment, config):
     return (features, spectra, time)
 
 
+def get_segments_features(segments, sample_rate, config):
+    
+    """
+    Gets the features of a batch of segments.
+    
+    This function computes the same features as `get_segment_features`,
+    but for many segments at once. It computes the spectrograms of all
+    of the segments with one STFT of a three-dimensional array of
+    analysis records, and pools and normalizes the spectrograms with
+    array operations rather than one segment at a time. The features
+    are identical to the ones `get_segment_features` computes for the
+    segments individually.
+    
+    :Parameters:
+    
+        segments : NumPy array
+            two-dimensional array of segment samples, one segment per
+            row.
+            
+            The array may be a strided view of a longer array, for
+            example one whose rows are overlapping segments of a clip.
+            
+        sample_rate : `float`
+            the segment sample rate in hertz.
+            
+        config : `object`
+            the feature settings, as for `get_segment_features`.
+            
+    :Returns:
+        a pair `(features, time)`. `features` is a two-dimensional
+        array of segment features with one row per segment, and `time`
+        is the time of the features relative to the start of each
+        segment.
+    """
+    
+    c = config
+    params = c.spectrogram_params
+    window = params.window
+    
+    segment_count = len(segments)
+    
+    dft_size, _ = tfa_utils.get_dft_analysis_data(
+        sample_rate, window.size, params.dft_size)
+    
+    # Compute segment spectrograms. The spectra have shape
+    # (segment count, spectrum count, bin count).
+    spectra = tfa_utils.compute_spectrogram(
+        segments, window.samples, params.hop_size, dft_size)
+    tfa_utils.scale_spectrogram(spectra, out=spectra)
+    if params.reference_power is not None:
+        tfa_utils.linear_to_log(
+            spectra, params.reference_power, out=spectra)
+        
+    # Note that `get_segment_features` does not use the result of its
+    # call to `spectra.clip`, so it does not clip spectra to the
+    # configured power range. We do not either, so our features are
+    # identical to its features, on which the classifiers that use
+    # them were trained.
+    
+    # Remove portions of spectra outside of specified frequency range.
+    start_index = _freq_to_index(c.min_freq, sample_rate, dft_size)
+    end_index = _freq_to_index(c.max_freq, sample_rate, dft_size) + 1
+    spectra = spectra[:, :, start_index:end_index]
+    
+    spectra = _sum_adjacent_batch(spectra, c.pooling_block_size)
+    
+    # Compute time of features from times of spectra as
+    # `get_segment_features` does.
+    spectrum_count = tfa_utils.get_num_analysis_records(
+        segments.shape[1], window.size, params.hop_size)
+    offset = (window.size - 1) / 2. / sample_rate
+    times = offset + np.arange(spectrum_count) / \
+        (float(sample_rate) / params.hop_size)
+    n = spectra.shape[1] * c.pooling_block_size[0]
+    time = (times[0] + times[n - 1]) / 2.
+    
+    feature_count = spectra.shape[1] * spectra.shape[2]
+    features = spectra.reshape((segment_count, feature_count))
+    features = _normalize_rows(features)
+    
+    if c.include_norm_in_features:
+        norms = np.array([_norm(x) for x in spectra])
+        features = np.hstack([features, norms.reshape((segment_count, 1))])
+        
+    return (features, time)
+
+
 def _freq_to_index(freq, sample_rate, dft_size):
     bin_size = sample_rate / dft_size
     return int(round(freq / bin_size))
@@ -104,6 +192,44 @@ def _sum_adjacent(x, block_size):
     return x
 
 
+def _sum_adjacent_batch(x, block_size):
+    
+    """
+    Performs the `_sum_adjacent` operation on each of a batch of arrays.
+    
+    This function performs the same array operations as `_sum_adjacent`,
+    but with an additional leading batch axis, so that each of its
+    results is identical to (and has the same memory layout as) the
+    corresponding result of `_sum_adjacent`.
+    """
+    
+    m, n = block_size
+    k, xm, xn = x.shape
+    
+    xm = (xm // m) * m
+    xn = (xn // n) * n
+    x = x[:, :xm, :xn]
+    
+    # Sum columns.
+    x = x.reshape((k, xm, xn // n, n))
+    x = x.sum(3)
+    xn //= n
+    
+    # Sum rows.
+    x = x.transpose((0, 2, 1))
+    x.shape = (k, xn, xm // m, m)
+    x = x.sum(3)
+    x = x.transpose((0, 2, 1))
+    
+    return x
+
+
+def _normalize_rows(x):
+    norms = np.sqrt(np.sum(x * x.conj(), axis=1))
+    norms[norms == 0] = 1
+    return x / norms.reshape((len(x), 1))
+
+
 def _normalize(x):
 
     # Replaced `np.linalg.norm` with our own norm on 2016-04-21 due to
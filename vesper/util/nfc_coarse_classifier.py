@@ -121,14 +121,55 @@ class NfcCoarseClassifier(object):
         
     def classify_clip(self, clip):
         segment_classifications, _, _ = self.classify_clip_segments(clip)
-        if np.any(segment_classifications == 1):
-            return 'Call'
-        else:
-            return None
+        return _get_clip_classification(segment_classifications)
+    
+    
+    def classify_clips(self, clips):
+        
+        """
+        Classifies a sequence of clips.
+        
+        This method computes the features of the segments of all of
+        the clips with array operations and classifies all of the
+        segments with a single call to the segment classifier, which
+        is much faster than classifying the clips one at a time. The
+        classifications are the same as those of `classify_clip`.
+        
+        :Parameters:
+            clips : sequence of `Clip` objects
+                the clips to classify.
+                
+        :Returns:
+            a list of clip classifications, with one classification
+            per clip. A classification is `'Call'` or `None`.
+        """
+        
+        features = [self._get_clip_segment_features(c)[0] for c in clips]
+        
+        segment_classifications = \
+            _classify_segments(self._segment_classifier, features)
+        
+        return [
+            _get_clip_classification(c) for c in segment_classifications]
     
     
     def classify_clip_segments(self, clip):
         
+        features, frame_rate, start_time = \
+            self._get_clip_segment_features(clip)
+            
+        if len(features) == 0:
+            classifications = np.array([], dtype='int32')
+            start_time = None
+            
+        else:
+            classifications = self._segment_classifier.predict(features)
+        
+        return (classifications, frame_rate, start_time)
+    
+    
+    def _get_clip_segment_features(self, clip):
+        
         # Our classifiers are designed for clips with a particular sample
         # rate, so resample to that rate if needed.
         audio = clip_manager.instance.get_audio(clip)
@@ -141,44 +182,69 @@ class NfcCoarseClassifier(object):
         segment_length = u.seconds_to_frames(c.segment_duration, sample_rate)
         hop_size = u.seconds_to_frames(c.segment_hop_size, sample_rate)
         
-        pairs = [self._classify_segment(s, c)
-                 for s in _generate_segments(audio, segment_length, hop_size)]
-                
-        if len(pairs) == 0:
-            classifications = np.array([], dtype='int32')
-            start_time = None
-             
-        else:
-            classifications, times = zip(*pairs)
-            classifications = np.array(classifications)
-            start_time = times[0]
+        segments = _get_segments(audio.samples, segment_length, hop_size)
+        
+        features, time = nfc_classification_utils.get_segments_features(
+            segments, float(sample_rate), c)
         
         frame_rate = sample_rate / hop_size
 
-        return (classifications, frame_rate, start_time)
+        return (features, frame_rate, time)
     
     
-    def _classify_segment(self, segment, config):
-        features, _, time = \
-            nfc_classification_utils.get_segment_features(segment, config)
-        return (self._segment_classifier.predict([features])[0], time)
-
-        
-def _generate_segments(audio, segment_length, hop_size, start_index=0):
+def _get_clip_classification(segment_classifications):
+    if np.any(segment_classifications == 1):
+        return 'Call'
+    else:
+        return None
+    
+    
+def _classify_segments(segment_classifier, features):
     
-    samples = audio.samples
-    sample_rate = float(audio.sample_rate)
+    """
+    Classifies the segments of several clips with one call to a segment
+    classifier.
     
-    n = len(samples)
-    i = start_index
+    :Parameters:
+        segment_classifier : scikit-learn classifier
+            the segment classifier.
+            
+        features : list of NumPy arrays
+            segment features, one two-dimensional array per clip.
+            
+    :Returns:
+        a list of segment classification arrays, one per clip.
+    """
+    
+    counts = [len(f) for f in features]
     
-    while i + segment_length <= n:
+    features = [f for f in features if len(f) != 0]
+    
+    if len(features) == 0:
+        classifications = np.array([], dtype='int32')
+    else:
+        classifications = segment_classifier.predict(np.concatenate(features))
         
-        segment = Bunch(
-            samples=samples[i:i + segment_length],
-            sample_rate=sample_rate,
-            start_time=i / sample_rate)
+    return np.split(classifications, np.cumsum(counts)[:-1])
+
         
-        yield segment
+def _get_segments(samples, segment_length, hop_size):
+    
+    """
+    Gets the segments of a sample array as a two-dimensional array.
+    
+    The segments start every `hop_size` samples, and there are as many
+    of them as fit in the samples. The array is a strided view of the
+    samples, and should not be written to.
+    """
+    
+    if len(samples) < segment_length:
+        segment_count = 0
+    else:
+        segment_count = 1 + (len(samples) - segment_length) // hop_size
         
-        i += hop_size
+    stride = samples.strides[0]
+    
+    return np.lib.stride_tricks.as_strided(
+        samples, (segment_count, segment_length), (hop_size * stride, stride),
+        writeable=False)
@@ -29,6 +29,54 @@ class NfcSpeciesClassifier(object):
 
     
     def classify_clip(self, clip):
+        return self.classify_clips([clip])[0]
+    
+    
+    def classify_clips(self, clips):
+        
+        """
+        Classifies a sequence of clips.
+        
+        This method finds the call of each clip and computes the
+        features of all of the calls with array operations, and then
+        classifies all of the calls with a single call to the segment
+        classifier.
+        
+        :Parameters:
+            clips : sequence of `Clip` objects
+                the clips to classify.
+                
+        :Returns:
+            a list of clip classifications, with one classification
+            per clip. A classification is a clip class name or `None`.
+        """
+        
+        calls = [self._get_call(clip) for clip in clips]
+        
+        # Get indices of clips for which we found calls. All calls have
+        # the same length and sample rate.
+        indices = [i for i, call in enumerate(calls) if call is not None]
+        
+        classifications = [None] * len(clips)
+        
+        if len(indices) != 0:
+            
+            segments = np.array([calls[i].samples for i in indices])
+            sample_rate = calls[indices[0]].sample_rate
+            
+            features, _ = nfc_classification_utils.get_segments_features(
+                segments, sample_rate, self._config)
+            
+            clip_class_names = self._segment_classifier.predict(features)
+            
+            for i, clip_class_name in zip(indices, clip_class_names):
+                if clip_class_name != 'Unclassified':
+                    classifications[i] = clip_class_name
+                    
+        return classifications
+
+
+    def _get_call(self, clip):
         
         # Our species classifiers are designed for clips with a particular
         # sample rate, so resample to that rate if needed.
@@ -40,20 +88,7 @@ class NfcSpeciesClassifier(object):
         if selection is None:
             return None
         
-        call = extract_call(audio, selection, self._config)
-        
-        if call is None:
-            return None
-        
-        features, _, _ = nfc_classification_utils.get_segment_features(
-            call, self._config)
-        
-        clip_class_name = self._segment_classifier.predict([features])[0]
-        
-        if clip_class_name == 'Unclassified':
-            return None
-        else:
-            return clip_class_name
+        return extract_call(audio, selection, self._config)
 
 
 class SegmentClassifier(object):
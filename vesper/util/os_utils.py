@@ -1,6 +1,7 @@
 """Operating system utility functions."""
        
 
+import ctypes
 import os
 import re
 import shutil
@@ -231,3 +232,55 @@ def read_yaml_file(path):
         raise OSError(
             'Could not load YAML file "{:s}". Error message was: {:s}'.format(
                 path, str(e)))
+
+
+def process_exists(pid):
+    
+    """
+    Returns `True` if and only if a process with the specified ID exists.
+    """
+    
+    if os.name == 'nt':
+        return _windows_process_exists(pid)
+    
+    try:
+        os.kill(pid, 0)
+        
+    except ProcessLookupError:
+        return False
+    
+    except PermissionError:
+        # process exists but belongs to another user
+        
+        return True
+    
+    else:
+        return True
+    
+    
+_WINDOWS_PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+_WINDOWS_ERROR_ACCESS_DENIED = 5
+_WINDOWS_STILL_ACTIVE = 259
+
+
+def _windows_process_exists(pid):
+    
+    # We don't use `os.kill` on Windows since there it terminates the
+    # process for any signal other than `CTRL_C_EVENT` and
+    # `CTRL_BREAK_EVENT`.
+    
+    kernel32 = ctypes.windll.kernel32
+    
+    handle = kernel32.OpenProcess(
+        _WINDOWS_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    
+    if not handle:
+        return ctypes.GetLastError() == _WINDOWS_ERROR_ACCESS_DENIED
+    
+    try:
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        return exit_code.value == _WINDOWS_STILL_ACTIVE
+    
+    finally:
+        kernel32.CloseHandle(handle)
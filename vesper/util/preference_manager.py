@@ -17,12 +17,26 @@ class PreferenceManager:
         
         
     def _load_preferences(self, preference_dir_path):
+        self._file_stamp = _get_file_stamp(preference_dir_path)
         self._preferences = _load_preferences(preference_dir_path)
         self._preference_dir_path = preference_dir_path
         
         
     def reload_preferences(self):
-        self._load_preferences(self._preference_dir_path)
+        
+        """
+        Reloads preferences if the preference file has changed.
+        
+        The file is considered to have changed if it has been created,
+        removed, or modified since preferences were last loaded, as
+        indicated by its modification time and size. Checking this
+        costs only a single `stat` call.
+        """
+        
+        file_stamp = _get_file_stamp(self._preference_dir_path)
+        
+        if file_stamp != self._file_stamp:
+            self._load_preferences(self._preference_dir_path)
         
         
     @property
@@ -47,7 +61,8 @@ class PreferenceManager:
         preference_dir_path = test_module_dir_path / 'data' / test_module_name
             
         # Push current preferences onto stack.
-        self._stack.append((self._preference_dir_path, self._preferences))
+        self._stack.append(
+            (self._preference_dir_path, self._preferences, self._file_stamp))
         
         # Load test preferences.
         self._load_preferences(preference_dir_path)
@@ -57,7 +72,8 @@ class PreferenceManager:
         
         """Pops test preferences."""
         
-        self._preference_dir_path, self._preferences = self._stack.pop()
+        self._preference_dir_path, self._preferences, self._file_stamp = \
+            self._stack.pop()
     
     
 class _Preferences:
@@ -111,6 +127,21 @@ def _get_item(preferences, name):
         return _get_item(preferences[parts[0]], parts[1])
             
             
+def _get_file_stamp(file_path):
+    
+    """
+    Gets the modification time and size of a file, or `None` if the
+    file does not exist.
+    """
+    
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    else:
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    
 def _load_preferences(file_path):
     
     defaults_message = 'Will use default preference values.'
@@ -0,0 +1,113 @@
+"""Module containing class `PrefetchingIterator`."""
+
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PrefetchingIterator:
+    
+    """
+    Iterator that applies a function to items on worker threads.
+    
+    The iterator yields the results of applying a function to the items
+    of an iterable, in item order. It applies the function to upcoming
+    items on worker threads while its consumer processes the results
+    for earlier items, keeping at most `prefetch_count` results in
+    progress or waiting to be yielded. This overlaps function
+    applications that wait on I/O, for example reading clip samples,
+    with each other and with the consumer's processing.
+    
+    If a function application raises an exception, the exception is
+    raised by the `__next__` call that would otherwise have returned
+    the result of the application.
+    
+    The function must be safe to call concurrently on multiple threads.
+    The iterator shuts down its worker threads when it is exhausted or
+    closed, or when it exits as a context manager.
+    """
+    
+    
+    def __init__(self, function, items, thread_count=4, prefetch_count=None):
+        
+        if prefetch_count is None:
+            prefetch_count = 4 * thread_count
+            
+        self._function = function
+        self._items = iter(items)
+        self._thread_count = thread_count
+        self._prefetch_count = prefetch_count
+        
+        self._executor = ThreadPoolExecutor(thread_count)
+        self._futures = deque()
+        self._items_exhausted = False
+        
+        self._submit_items()
+        
+        
+    @property
+    def thread_count(self):
+        return self._thread_count
+    
+    
+    @property
+    def prefetch_count(self):
+        return self._prefetch_count
+    
+    
+    def _submit_items(self):
+        
+        while not self._items_exhausted and \
+                len(self._futures) < self._prefetch_count:
+            
+            try:
+                item = next(self._items)
+                
+            except StopIteration:
+                self._items_exhausted = True
+                
+            else:
+                future = self._executor.submit(self._function, item)
+                self._futures.append(future)
+                
+                
+    def __iter__(self):
+        return self
+    
+    
+    def __next__(self):
+        
+        if len(self._futures) == 0:
+            self.close()
+            raise StopIteration
+        
+        future = self._futures.popleft()
+        
+        self._submit_items()
+        
+        return future.result()
+    
+    
+    def close(self):
+        
+        """
+        Closes this iterator, cancelling function applications that
+        have not yet started and shutting down worker threads.
+        """
+        
+        for future in self._futures:
+            future.cancel()
+            
+        self._futures.clear()
+        self._items_exhausted = True
+        
+        self._executor.shutdown()
+        
+        
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+        return False
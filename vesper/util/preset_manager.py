@@ -1,9 +1,13 @@
 """Module that loads and provides access to presets."""
 
 
+from threading import Lock
+import json
 import logging
 import os
 
+from vesper.util.bunch import Bunch
+
 
 _YAML_FILE_NAME_EXTENSION = '.yaml'
 
@@ -40,23 +44,164 @@ class PresetManager:
         
         self._preset_dir_path = preset_dir_path
         
+        self._lock = Lock()
+        """Lock that serializes reloads."""
+        
+        self._preset_files = {}
+        """
+        Mapping from preset file paths to (file stamp, preset) pairs,
+        where a file stamp is a (modification time, size) pair and the
+        preset is `None` if the file could not be parsed.
+        """
+        
+        self._type_data = {}
+        """
+        Mapping from preset type names to `Bunch` objects holding the
+        directory tree scanned for the preset type and presets and data
+        derived from them.
+        """
+        
+        self._unrecognized_dir_paths = set()
+        
         self.reload_presets()
         
         
     def reload_presets(self):
         
-        self._preset_data = \
-            _load_presets(self._preset_dir_path, self._preset_types)
-        """Mapping from preset type names to collections of presets."""
-        
-        self._preset_dicts = dict(
-            (type_name, dict(_flatten_presets(preset_data)))
-            for type_name, preset_data in self._preset_data.items())
         """
-        Mapping from preset type names to mappings from preset paths to
-        presets.
+        Reloads presets from the preset directory.
+        
+        A reload is incremental. It scans the preset directory tree and
+        gets the modification time and size of each preset file, but
+        parses only files that are new or whose modification time or
+        size have changed since the last reload. The presets of a preset
+        type, and data derived from them such as flattened presets and
+        preset JSON, are reassembled only if files of that type have
+        been added, modified, or removed.
+        
+        :Raises ValueError:
+            if the preset directory does not exist.
         """
         
+        with self._lock:
+            
+            trees = self._scan_preset_dir()
+            
+            file_paths = set()
+            type_data = {}
+            
+            for type_name, (preset_type, tree) in trees.items():
+                
+                data = self._type_data.get(type_name)
+                
+                if data is None or data.tree != tree:
+                    # presets of this type are new or have changed
+                    
+                    data = self._create_type_data(tree, preset_type)
+                    
+                type_data[type_name] = data
+                
+                _get_tree_file_paths(tree, file_paths)
+                
+            # Forget presets of files that no longer exist.
+            self._preset_files = dict(
+                (path, item) for path, item in self._preset_files.items()
+                if path in file_paths)
+            
+            self._type_data = type_data
+            
+            
+    def _scan_preset_dir(self):
+        
+        preset_dir_path = self._preset_dir_path
+        
+        if not os.path.exists(preset_dir_path):
+            message = 'Preset directory "{}" does not exist.'.format(
+                preset_dir_path)
+            logging.error(message)
+            raise ValueError(message)
+        
+        elif not os.path.isdir(preset_dir_path):
+            message = 'Path "{}" exists but is not a preset directory.'.format(
+                preset_dir_path)
+            logging.error(message)
+            raise ValueError(message)
+            
+        preset_types = dict((t.extension_name, t) for t in self._preset_types)
+        trees = {}
+        
+        for entry in _scan_dir(preset_dir_path):
+            
+            if entry.is_dir():
+                
+                try:
+                    preset_type = preset_types[entry.name]
+                    
+                except KeyError:
+                    
+                    # Warn only once per directory, since we scan the
+                    # preset directory on every reload.
+                    if entry.path not in self._unrecognized_dir_paths:
+                        self._unrecognized_dir_paths.add(entry.path)
+                        logging.warning((
+                            'Preset manager encountered directory for '
+                            'unrecognized preset type "{}" at "{}".').format(
+                                entry.name, entry.path))
+                
+                else:
+                    trees[entry.name] = (preset_type, _scan_tree(entry.path))
+                    
+        return trees
+    
+    
+    def _create_type_data(self, tree, preset_type):
+        
+        preset_data = self._get_preset_data(tree, preset_type)
+        flattened_presets = _flatten_presets(preset_data)
+        
+        return Bunch(
+            tree=tree,
+            preset_data=preset_data,
+            flattened_presets=flattened_presets,
+            preset_dict=dict(flattened_presets),
+            presets_json=None)
+    
+    
+    def _get_preset_data(self, tree, preset_type):
+        
+        dir_path, files, subdir_trees = tree
+        
+        presets = []
+        
+        for file_name, stamp in files:
+            preset = self._get_preset(dir_path, file_name, stamp, preset_type)
+            if preset is not None:
+                presets.append(preset)
+                
+        presets.sort(key=lambda p: p.name)
+        
+        preset_data = dict(
+            (subdir_name, self._get_preset_data(subdir_tree, preset_type))
+            for subdir_name, subdir_tree in subdir_trees.items())
+        
+        return (tuple(presets), preset_data)
+    
+    
+    def _get_preset(self, dir_path, file_name, stamp, preset_type):
+        
+        file_path = os.path.join(dir_path, file_name)
+        
+        item = self._preset_files.get(file_path)
+        
+        if item is None or item[0] != stamp:
+            # file is new or has changed since we last parsed it
+            
+            preset = _load_preset(dir_path, file_name, preset_type)
+            item = (stamp, preset)
+            self._preset_files[file_path] = item
+            
+        return item[1]
+        
 
     @property
     def preset_dir_path(self):
@@ -103,13 +248,13 @@ class PresetManager:
         """
         
         try:
-            data = self._preset_data[type_name]
+            data = self._type_data[type_name]
             
         except KeyError:
             return ((), {})
         
         else:
-            return _copy_preset_data(data)
+            return _copy_preset_data(data.preset_data)
 
 
     def get_flattened_presets(self, type_name):
@@ -134,8 +279,45 @@ class PresetManager:
             ordered lexicographically by path.
         """
         
-        presets = self.get_presets(type_name)
-        return _flatten_presets(presets)
+        try:
+            data = self._type_data[type_name]
+        except KeyError:
+            return ()
+        else:
+            return data.flattened_presets
+    
+    
+    def get_presets_json(self, type_name):
+        
+        """
+        Gets all presets of the specified type as JSON.
+        
+        The returned JSON is a list of [<preset path>, <preset data>]
+        pairs, where the preset path is the path relative to the directory
+        for the preset type and the preset data are the camel case data
+        of the preset. The JSON is computed once and then cached until
+        the presets of the specified type change.
+        
+        :Parameters:
+            type_name : str
+                the name of a preset type.
+                
+        :Returns:
+            JSON for all presets of the specified type.
+        """
+        
+        data = self._type_data.get(type_name)
+        
+        if data is None:
+            return '[]'
+        
+        if data.presets_json is None:
+            presets = [
+                (path, preset.camel_case_data)
+                for path, preset in data.flattened_presets]
+            data.presets_json = json.dumps(presets)
+            
+        return data.presets_json
     
     
     def get_preset(self, type_name, preset_path):
@@ -157,14 +339,14 @@ class PresetManager:
             the specified preset, or `None` if there is no such preset.
         """
         
-        presets = self._preset_dicts.get(type_name)
+        data = self._type_data.get(type_name)
         
-        if presets is None:
+        if data is None:
             return None
         else:
             if isinstance(preset_path, str):
                 preset_path = (preset_path,)
-            return presets.get(preset_path)
+            return data.preset_dict.get(preset_path)
         
         
 def _get_preset_types(preset_types):
@@ -177,74 +359,55 @@ def _get_preset_types(preset_types):
     return tuple(types)
 
 
-def _load_presets(preset_dir_path, preset_types):
+def _scan_dir(dir_path):
+    with os.scandir(dir_path) as entries:
+        return sorted(entries, key=lambda e: e.name)
+
+
+def _scan_tree(dir_path):
     
-    if not os.path.exists(preset_dir_path):
-        message = 'Preset directory "{}" does not exist.'.format(
-            preset_dir_path)
-        logging.error(message)
-        raise ValueError(message)
+    """
+    Scans a preset directory tree.
     
-    elif not os.path.isdir(preset_dir_path):
-        message = 'Path "{}" exists but is not a preset directory.'.format(
-            preset_dir_path)
-        logging.error(message)
-        raise ValueError(message)
-        
-    else:
-        # have preset directory
-        
-        preset_types = dict((t.extension_name, t) for t in preset_types)
-        preset_data = {}
+    :Returns:
+        a (<dir path>, <files>, <subdir trees>) triple, where <files> is
+        a tuple of (<file name>, <file stamp>) pairs for the preset files
+        of the directory, a file stamp is a (<modification time>, <size>)
+        pair, and <subdir trees> is a dictionary that maps subdirectory
+        names to triples for the subdirectories. Two scans of a tree
+        yield equal triples unless preset files have been added, modified,
+        or removed between the scans.
+    """
+    
+    files = []
+    subdir_trees = {}
+    
+    for entry in _scan_dir(dir_path):
         
-        for _, dir_names, _ in os.walk(preset_dir_path):
+        if entry.is_dir():
+            subdir_trees[entry.name] = _scan_tree(entry.path)
             
-            for dir_name in dir_names:
-                
-                dir_path = os.path.join(preset_dir_path, dir_name)
-                
-                try:
-                    preset_type = preset_types[dir_name]
-                    
-                except KeyError:
-                    logging.warning((
-                        'Preset manager encountered directory for '
-                        'unrecognized preset type "{}" at "{}".').format(
-                            dir_name, dir_path))
-                
-                else:
-                    preset_data[dir_name] = \
-                        _load_presets_aux(dir_path, preset_type)
-                    
-            # Stop walk from visiting subdirectories.
-            del dir_names[:]
-                      
-        return preset_data
-        
+        elif _get_preset_name(entry.name) is not None:
+            
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            
+            files.append((entry.name, (stat.st_mtime_ns, stat.st_size)))
+            
+    return (dir_path, tuple(files), subdir_trees)
+
 
-def _load_presets_aux(dir_path, preset_type):
+def _get_tree_file_paths(tree, file_paths):
     
-    presets = []
-    preset_data = {}
+    dir_path, files, subdir_trees = tree
     
-    for _, subdir_names, file_names in os.walk(dir_path):
+    for file_name, _ in files:
+        file_paths.add(os.path.join(dir_path, file_name))
         
-        for file_name in file_names:
-            preset = _load_preset(dir_path, file_name, preset_type)
-            if preset is not None:
-                presets.append(preset)
-                            
-        for subdir_name in subdir_names:
-            subdir_path = os.path.join(dir_path, subdir_name)
-            preset_data[subdir_name] = \
-                _load_presets_aux(subdir_path, preset_type)
-                
-        # Stop walk from visiting subdirectories.
-        del subdir_names[:]
-        
-    presets.sort(key=lambda p: p.name)
-    
-    return (tuple(presets), preset_data)
+    for subdir_tree in subdir_trees.values():
+        _get_tree_file_paths(subdir_tree, file_paths)
         
         
 def _load_preset(dir_path, file_name, preset_type):
@@ -266,7 +429,7 @@ def _get_preset_name(file_name):
 def _parse_preset(file_path, preset_name, preset_type):
     
     try:
-        file_ = open(file_path, 'rU')
+        file_ = open(file_path, 'r')
     except:
         logging.error(
             'Preset manager could not open preset file "{}".'.format(file_path))
@@ -0,0 +1,445 @@
+"""Module containing `RecordingSessionManager` class."""
+
+
+from pathlib import Path
+from threading import Lock
+import bisect
+import logging
+import time
+
+import vesper.util.audio_file_utils as audio_file_utils
+
+
+_logger = logging.getLogger(__name__)
+
+
+_DEFAULT_HEADER_UPDATE_PERIOD = 10
+"""
+Default period, in seconds of recorded audio, between WAVE file header
+updates of a recording session.
+"""
+
+_DEFAULT_IDLE_TIMEOUT = 300
+"""
+Default time, in seconds, after which a recording session to which no
+samples have been appended is stopped.
+"""
+
+
+class RecordingSessionError(Exception):
+    pass
+
+
+class RecordingSessionManager:
+
+    """
+    Manages streaming writes of recordings to WAVE files.
+
+    A recording session manager writes the samples of one or more
+    concurrent recordings to WAVE files in a recording directory, one
+    file per recording. Unlike `audio_file_utils.write_wave_file_samples`,
+    which opens a file and reads and rewrites its header for every write,
+    the manager keeps the file of each active recording open and updates
+    its header only periodically, and when the recording is stopped.
+
+    Appends to a recording may arrive out of order. The manager writes
+    each append at its position in the file and keeps track of which
+    sample frames have been written, so that any gaps that remain when
+    a recording is stopped can be reported.
+
+    A recording to which no samples have been appended for longer than
+    the manager's idle timeout, for example because the browser that
+    was making it went away, is stopped the next time a recording is
+    started or appended to.
+
+    The methods of this class are thread safe.
+    """
+
+
+    def __init__(
+            self, recording_dir_path, channel_count, sample_rate,
+            sample_size=16, header_update_period=_DEFAULT_HEADER_UPDATE_PERIOD,
+            idle_timeout=_DEFAULT_IDLE_TIMEOUT):
+
+        """
+        Initializes this manager.
+
+        :Parameters:
+
+            recording_dir_path : str or Path
+                the directory in which to create recording files.
+
+            channel_count : int
+                the number of channels of recordings.
+
+            sample_rate : int
+                the sample rate of recordings, in hertz.
+
+            sample_size : int
+                the sample size of recordings, in bits.
+
+            header_update_period : int or float
+                the number of seconds of recorded audio after which the
+                header of a recording file is updated. The header is
+                always updated when a recording is stopped.
+
+            idle_timeout : int, float, or None
+                the number of seconds after which a recording to which
+                no samples have been appended is stopped, or `None` if
+                idle recordings should not be stopped.
+        """
+
+        self._recording_dir_path = Path(recording_dir_path)
+        self._channel_count = channel_count
+        self._sample_rate = sample_rate
+        self._sample_size = sample_size
+        self._header_update_frame_count = \
+            max(int(round(header_update_period * sample_rate)), 1)
+        self._idle_timeout = idle_timeout
+
+        self._lock = Lock()
+        """Lock protecting `_sessions` and `_next_recording_id`."""
+
+        self._sessions = {}
+        """Mapping from recording IDs to active recording sessions."""
+
+        self._next_recording_id = None
+        """
+        Next recording ID, or `None` if recording IDs have not yet
+        been initialized from the recording directory.
+        """
+
+
+    @property
+    def recording_dir_path(self):
+        return self._recording_dir_path
+
+
+    @property
+    def active_recording_ids(self):
+        with self._lock:
+            return tuple(sorted(self._sessions.keys()))
+
+
+    def get_recording_file_path(self, recording_id):
+        extension = audio_file_utils.WAVE_FILE_NAME_EXTENSION
+        file_name = f'{recording_id}{extension}'
+        return self._recording_dir_path / file_name
+
+
+    def start_recording(self):
+
+        """
+        Starts a new recording.
+
+        :Returns:
+            the ID of the new recording.
+        """
+
+        self.stop_idle_recordings()
+
+        with self._lock:
+
+            if self._next_recording_id is None:
+                self._next_recording_id = self._get_initial_recording_id()
+
+            recording_id = self._next_recording_id
+            self._next_recording_id += 1
+
+            path = self.get_recording_file_path(recording_id)
+
+            session = _RecordingSession(
+                recording_id, path, self._channel_count, self._sample_rate,
+                self._sample_size, self._header_update_frame_count)
+
+            self._sessions[recording_id] = session
+
+        return recording_id
+
+
+    def _get_initial_recording_id(self):
+
+        # Start after the largest ID of any existing recording file,
+        # so that we do not overwrite files of previous server runs.
+
+        self._recording_dir_path.mkdir(parents=True, exist_ok=True)
+
+        extension = audio_file_utils.WAVE_FILE_NAME_EXTENSION
+        max_id = -1
+
+        for path in self._recording_dir_path.glob('*' + extension):
+            try:
+                max_id = max(max_id, int(path.stem))
+            except ValueError:
+                continue
+
+        return max_id + 1
+
+
+    def append_samples(self, recording_id, start_index, samples):
+
+        """
+        Writes samples to a recording.
+
+        :Parameters:
+
+            recording_id : int
+                the ID of the recording.
+
+            start_index : int
+                the index in the recording of the first sample frame
+                to write.
+
+            samples : NumPy array
+                two-dimensional array of samples, with the first
+                dimension the channel count.
+
+        :Raises RecordingSessionError:
+            if there is no active recording with the specified ID.
+        """
+
+        self.stop_idle_recordings()
+
+        session = self._get_session(recording_id)
+        session.append_samples(start_index, samples)
+
+
+    def stop_recording(self, recording_id):
+
+        """
+        Stops a recording.
+
+        The header of the recording file is updated and the file is
+        closed.
+
+        :Returns:
+            the intervals of sample frames that were never written to
+            the recording, as a tuple of (start index, end index) pairs.
+            The frames of these intervals read as zeros.
+
+        :Raises RecordingSessionError:
+            if there is no active recording with the specified ID.
+        """
+
+        with self._lock:
+            session = self._sessions.pop(recording_id, None)
+
+        if session is None:
+            _raise_unknown_recording_error(recording_id)
+
+        gaps = session.close()
+
+        if len(gaps) != 0:
+            _logger.warning(
+                f'Recording {recording_id} was stopped with {len(gaps)} '
+                f'unwritten interval(s) of sample frames: {gaps}.')
+
+        return gaps
+
+
+    def stop_all_recordings(self):
+
+        """Stops all active recordings."""
+
+        for recording_id in self.active_recording_ids:
+            try:
+                self.stop_recording(recording_id)
+            except RecordingSessionError:
+                # recording stopped on another thread
+                pass
+
+
+    def stop_idle_recordings(self):
+
+        """
+        Stops active recordings to which no samples have been appended
+        for longer than this manager's idle timeout.
+
+        :Returns:
+            the IDs of the stopped recordings.
+        """
+
+        if self._idle_timeout is None:
+            return ()
+
+        now = time.monotonic()
+
+        with self._lock:
+            recording_ids = tuple(
+                recording_id
+                for recording_id, session in self._sessions.items()
+                if now - session.activity_time > self._idle_timeout)
+
+        for recording_id in recording_ids:
+
+            _logger.warning(
+                f'Stopping recording {recording_id} since no samples have '
+                f'been appended to it for over {self._idle_timeout} '
+                f'seconds.')
+
+            try:
+                self.stop_recording(recording_id)
+            except RecordingSessionError:
+                # recording stopped on another thread
+                pass
+
+        return recording_ids
+
+
+    def _get_session(self, recording_id):
+
+        with self._lock:
+            session = self._sessions.get(recording_id)
+
+        if session is None:
+            _raise_unknown_recording_error(recording_id)
+
+        return session
+
+
+def _raise_unknown_recording_error(recording_id):
+    raise RecordingSessionError(
+        f'There is no active recording with ID {recording_id}.')
+
+
+class _RecordingSession:
+
+    """Open recording file together with its write state."""
+
+
+    def __init__(
+            self, recording_id, file_path, channel_count, sample_rate,
+            sample_size, header_update_frame_count):
+
+        self.recording_id = recording_id
+        self.file_path = file_path
+
+        self._channel_count = channel_count
+        self._sample_rate = sample_rate
+        self._sample_size = sample_size
+        self._header_update_frame_count = header_update_frame_count
+
+        self._lock = Lock()
+
+        self.activity_time = time.monotonic()
+        """Monotonic time of creation or last append of this session."""
+
+        self._file = open(str(file_path), 'w+b')
+        audio_file_utils.write_wave_file_header(
+            self._file, channel_count, sample_rate, sample_size)
+
+        self._frame_count = 0
+        """Number of sample frames in recording file."""
+
+        self._header_frame_count = 0
+        """Number of sample frames recorded in file header."""
+
+        self._interval_starts = []
+        self._interval_ends = []
+        """
+        Start and end indices of the disjoint, sorted intervals of
+        sample frames that have been written to the recording file.
+        """
+
+
+    def append_samples(self, start_index, samples):
+
+        if start_index < 0:
+            raise ValueError(
+                f'Bad start index {start_index} for append to recording '
+                f'{self.recording_id}. Start index must be nonnegative.')
+
+        if len(samples.shape) != 2 or samples.shape[0] != self._channel_count:
+            raise ValueError(
+                f'Sample array for append to recording {self.recording_id} '
+                f'must be two-dimensional with {self._channel_count} '
+                f'channel(s).')
+
+        length = samples.shape[1]
+
+        if length == 0:
+            return
+
+        end_index = start_index + length
+
+        self.activity_time = time.monotonic()
+
+        with self._lock:
+
+            if self._file is None:
+                _raise_unknown_recording_error(self.recording_id)
+
+            audio_file_utils.write_wave_file_frames(
+                self._file, start_index, samples)
+
+            self._add_interval(start_index, end_index)
+
+            self._frame_count = max(self._frame_count, end_index)
+
+            if self._frame_count - self._header_frame_count >= \
+                    self._header_update_frame_count:
+                self._update_header()
+
+
+    def _add_interval(self, start_index, end_index):
+
+        starts = self._interval_starts
+        ends = self._interval_ends
+
+        # Find range of existing intervals that overlap or abut the
+        # new one, and merge them with it.
+        i = bisect.bisect_left(ends, start_index)
+        j = bisect.bisect_right(starts, end_index)
+
+        if i < j:
+            start_index = min(start_index, starts[i])
+            end_index = max(end_index, ends[j - 1])
+
+        starts[i:j] = [start_index]
+        ends[i:j] = [end_index]
+
+
+    def _update_header(self):
+
+        audio_file_utils.write_wave_file_header(
+            self._file, self._channel_count, self._sample_rate,
+            self._sample_size, self._frame_count)
+
+        # Flush so that readers of the file see the samples that the
+        # updated header describes.
+        self._file.flush()
+
+        self._header_frame_count = self._frame_count
+
+
+    @property
+    def gaps(self):
+
+        with self._lock:
+
+            gaps = []
+            end_index = 0
+
+            for start, end in zip(self._interval_starts, self._interval_ends):
+                if start > end_index:
+                    gaps.append((end_index, start))
+                end_index = end
+
+            return tuple(gaps)
+
+
+    def close(self):
+
+        gaps = self.gaps
+
+        with self._lock:
+
+            if self._file is not None:
+
+                try:
+                    self._update_header()
+                finally:
+                    self._file.close()
+                    self._file = None
+
+        return gaps
@@ -0,0 +1,343 @@
+"""
+Functions and classes for reading and writing detector score track files.
+
+A detector score track is the sequence of scores (for example, power
+ratios or classifier outputs) that a detector computes from its input
+before thresholding them to detect clips. Detectors that support score
+tracks accept a *score listener*, whose `process_scores` method they
+call with each chunk of scores they compute along with an *offset*
+that locates the chunk in the detector's input, and have a
+`process_scores` method of their own that detects clips from a chunk
+of scores and its offset. Recording the chunks received by a score
+listener and later passing them in order to the `process_scores`
+method of a detector with the same settings but possibly different
+thresholds detects the clips the detector would have detected from
+the original input, but much faster.
+
+A score track is stored in two files with a common path and different
+extensions. The scores file contains the concatenated scores of all
+chunks as raw little-endian values, so it can be memory-mapped. The
+metadata file is a NumPy .npz file containing the sample rate of the
+detector input, the length and offset of each chunk, the score data
+type and scale factor, and optional JSON-serializable attributes.
+The metadata file is written last, and both files are written under
+temporary names and then renamed, so a score track exists only if it
+is complete.
+
+Scores can be stored as 16-bit floats, 16-bit integers, or 32-bit
+floats. Sixteen-bit floats have a relative precision of about .05
+percent, which is ample for detection thresholds but means that clips
+detected from a 16-bit track at thresholds very close to scores in the
+track can differ from clips detected from the original scores. For
+16-bit integers, scores are multiplied by a scale factor and rounded.
+Scores outside of the range of the storage type are clipped to it.
+"""
+
+
+import json
+import os
+
+import numpy as np
+
+
+DEFAULT_DTYPE = 'float16'
+"""Default score storage type."""
+
+SCORES_FILE_NAME_EXTENSION = '.scores'
+METADATA_FILE_NAME_EXTENSION = '.npz'
+
+_DTYPES = {
+    'float16': np.dtype('<f2'),
+    'int16': np.dtype('<i2'),
+    'float32': np.dtype('<f4'),
+}
+
+
+class ScoreTrackError(Exception):
+    pass
+
+
+class ScoreTrack:
+
+    """
+    Detector score track.
+
+    The `scores` attribute of a score track is a (typically memory-mapped)
+    array of the stored scores, in their storage type and scale. Use the
+    `get_chunks` method to get the scores in the form in which they were
+    written.
+    """
+
+
+    def __init__(
+            self, sample_rate, scores, scale, chunk_lengths, offsets,
+            attributes):
+
+        self.sample_rate = sample_rate
+        self.scores = scores
+        self.scale = scale
+        self.chunk_lengths = chunk_lengths
+        self.offsets = offsets
+        self.attributes = attributes
+
+
+    @property
+    def chunk_count(self):
+        return len(self.chunk_lengths)
+
+
+    def get_chunks(self):
+
+        """Generates the `(scores, offset)` pairs of this track in order."""
+
+        start_index = 0
+
+        for length, offset in zip(self.chunk_lengths, self.offsets):
+
+            end_index = start_index + length
+
+            scores = np.array(self.scores[start_index:end_index], 'float64')
+
+            if self.scale is not None:
+                scores /= self.scale
+
+            yield scores, _get_offset(offset)
+
+            start_index = end_index
+
+
+def _get_offset(offset):
+
+    if offset.ndim == 0:
+        return offset.item()
+
+    else:
+        # offset is an array
+
+        return tuple(offset.tolist())
+
+
+class ScoreTrackWriter:
+
+    """
+    Detector score listener that writes a score track.
+
+    Scores are written to disk as they arrive rather than accumulated
+    in memory, since the tracks of some detectors (for example the
+    Old Bird detectors, whose tracks have the same sample rate as their
+    input) are large.
+
+    Chunk offsets can be numbers or tuples of numbers. All of the offsets
+    of a track must be of the same form.
+    """
+
+
+    def __init__(
+            self, file_path, sample_rate, dtype=DEFAULT_DTYPE, scale=None,
+            attributes=None):
+
+        """
+        Initializes this writer.
+
+        :Parameters:
+            file_path : path
+                the score track file path, without a file name extension.
+            sample_rate : int or float
+                the sample rate of the detector input.
+            dtype : str
+                the score storage type, "float16", "int16", or "float32".
+            scale : float
+                the factor by which to multiply scores before storing
+                them, or `None`. A scale factor is required for type
+                "int16".
+            attributes : dict
+                JSON-serializable attributes to store with the track,
+                or `None`.
+
+        :Raises ScoreTrackError:
+            if the storage type is not recognized, or if it is "int16"
+            and no scale factor is specified.
+        """
+
+        try:
+            self._dtype = _DTYPES[dtype]
+        except KeyError:
+            raise ScoreTrackError(
+                'Unrecognized score track data type "{}".'.format(dtype))
+
+        if dtype == 'int16' and scale is None:
+            raise ScoreTrackError(
+                'A scale factor is required for score track data type '
+                '"int16".')
+
+        if self._dtype.kind == 'i':
+            info = np.iinfo(self._dtype)
+        else:
+            info = np.finfo(self._dtype)
+        self._min_score = info.min
+        self._max_score = info.max
+
+        self._scores_file_path = _get_scores_file_path(file_path)
+        self._metadata_file_path = _get_metadata_file_path(file_path)
+
+        self._sample_rate = sample_rate
+        self._scale = scale
+        self._attributes = {} if attributes is None else attributes
+        self._chunk_lengths = []
+        self._offsets = []
+
+        os.makedirs(self._scores_file_path.parent, exist_ok=True)
+
+        self._temp_scores_file_path = \
+            _get_temp_file_path(self._scores_file_path)
+        self._scores_file = open(self._temp_scores_file_path, 'wb')
+
+
+    def process_scores(self, scores, offset):
+
+        scores = np.asarray(scores, dtype='float64')
+
+        if self._scale is not None:
+            scores = scores * self._scale
+
+        if self._dtype.kind == 'i':
+            scores = np.round(scores)
+
+        scores = np.clip(scores, self._min_score, self._max_score)
+
+        self._scores_file.write(scores.astype(self._dtype).tobytes())
+        self._chunk_lengths.append(len(scores))
+        self._offsets.append(offset)
+
+
+    def close(self):
+
+        """
+        Completes the score track.
+
+        :Returns:
+            the completed track, as a `ScoreTrack`.
+        """
+
+        self._scores_file.close()
+        os.replace(self._temp_scores_file_path, self._scores_file_path)
+
+        chunk_lengths = np.array(self._chunk_lengths, dtype='int64')
+        offsets = np.array(self._offsets)
+        scale = np.nan if self._scale is None else self._scale
+
+        temp_file_path = _get_temp_file_path(self._metadata_file_path)
+        with open(temp_file_path, 'wb') as file_:
+            np.savez(
+                file_, sample_rate=self._sample_rate,
+                dtype=self._dtype.str, scale=scale,
+                chunk_lengths=chunk_lengths, offsets=offsets,
+                attributes=json.dumps(self._attributes))
+        os.replace(temp_file_path, self._metadata_file_path)
+
+        return _read_score_track(self._metadata_file_path)
+
+
+    def discard(self):
+
+        """Closes this writer without completing its score track."""
+
+        self._scores_file.close()
+        os.remove(self._temp_scores_file_path)
+
+
+def _get_scores_file_path(file_path):
+    return file_path.with_name(file_path.name + SCORES_FILE_NAME_EXTENSION)
+
+
+def _get_metadata_file_path(file_path):
+    return file_path.with_name(file_path.name + METADATA_FILE_NAME_EXTENSION)
+
+
+def _get_temp_file_path(file_path):
+    return file_path.with_name(
+        '{}.{}.tmp'.format(file_path.name, os.getpid()))
+
+
+def score_track_exists(file_path):
+
+    """
+    Determines whether or not the specified score track exists.
+
+    :Parameters:
+        file_path : path
+            the score track file path, without a file name extension.
+    """
+
+    return _get_metadata_file_path(file_path).exists()
+
+
+def read_score_track(file_path):
+
+    """
+    Reads a score track, memory-mapping its scores.
+
+    :Parameters:
+        file_path : path
+            the score track file path, without a file name extension.
+
+    :Returns:
+        the score track, as a `ScoreTrack`.
+    """
+
+    return _read_score_track(_get_metadata_file_path(file_path))
+
+
+def _read_score_track(metadata_file_path):
+
+    with np.load(metadata_file_path) as metadata:
+        sample_rate = metadata['sample_rate'].item()
+        dtype = np.dtype(metadata['dtype'].item())
+        scale = metadata['scale'].item()
+        chunk_lengths = metadata['chunk_lengths']
+        offsets = metadata['offsets']
+        attributes = json.loads(metadata['attributes'].item())
+
+    if np.isnan(scale):
+        scale = None
+
+    name = metadata_file_path.name[:-len(METADATA_FILE_NAME_EXTENSION)]
+    scores_file_path = _get_scores_file_path(
+        metadata_file_path.with_name(name))
+
+    if chunk_lengths.sum() == 0:
+        # track is empty
+
+        # `np.memmap` cannot map empty files.
+        scores = np.zeros(0, dtype=dtype)
+
+    else:
+        scores = np.memmap(scores_file_path, dtype=dtype, mode='r')
+
+    return ScoreTrack(
+        sample_rate, scores, scale, chunk_lengths, offsets, attributes)
+
+
+def get_score_track_file_paths(dir_path):
+
+    """
+    Gets the file paths of the score tracks in a directory.
+
+    :Parameters:
+        dir_path : path
+            the directory path.
+
+    :Returns:
+        the sorted file paths of the score tracks in the directory,
+        without file name extensions. If the directory does not
+        exist, the list is empty.
+    """
+
+    if not dir_path.exists():
+        return []
+
+    n = len(METADATA_FILE_NAME_EXTENSION)
+
+    return sorted(
+        p.with_name(p.name[:-n])
+        for p in dir_path.glob('*' + METADATA_FILE_NAME_EXTENSION))
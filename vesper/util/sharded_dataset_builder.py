@@ -0,0 +1,328 @@
+"""
+Utility functions for building sharded ML datasets from clip HDF5 files.
+
+A dataset part (for example, the training part of a dataset) is a list
+of clips, each identified by an `(input_num, clip_id)` pair, where
+`input_num` is the index of an input clip HDF5 file and `clip_id` is
+the name of the clip's HDF5 dataset within the file's "clips" group.
+The `build_dataset_part` function shuffles the clips of a dataset part
+deterministically, divides them into shards, and writes the shards to
+record files in parallel with a pool of worker processes. Each worker
+opens the input files itself and reads its clips from them directly,
+in file order, so that workers do not contend for shared file handles
+and reads are as sequential as possible.
+
+The function that creates a serialized example from an HDF5 clip
+dataset is supplied by the caller, so the same builder can create
+datasets for different classifiers, for example the MPG Ranch coarse
+and species classifiers. The function must be picklable, i.e. either
+a module-level function or a `functools.partial` of one.
+
+`write_manifest` writes a YAML manifest for a dataset that lists the
+shards of each dataset part along with their example counts and SHA-256
+checksums, and `read_manifest` reads it back.
+"""
+
+
+from multiprocessing import Pool
+from pathlib import Path
+import hashlib
+import random
+
+import vesper.util.os_utils as os_utils
+import vesper.util.yaml_utils as yaml_utils
+
+
+DEFAULT_SHARD_SIZE = 10000
+"""Default maximum number of examples per shard."""
+
+DEFAULT_FILE_NAME_FORMAT = '{}_{:04d}.tfrecords'
+"""
+Default shard file name format.
+
+The format is applied to the dataset part name and the shard number.
+"""
+
+MANIFEST_FILE_NAME = 'Manifest.yaml'
+
+_CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def get_shards(clips, shard_size=DEFAULT_SHARD_SIZE, seed=0):
+
+    """
+    Shuffles clips deterministically and divides them into shards.
+
+    :Parameters:
+        clips : sequence of clips
+            the clips to shard. This sequence is not modified.
+        shard_size : int
+            the maximum number of clips per shard.
+        seed : int
+            the seed of the shuffle. The same clips, shard size, and
+            seed always yield the same shards.
+
+    :Returns:
+        a list of lists of clips, one per shard.
+    """
+
+    clips = list(clips)
+    random.Random(seed).shuffle(clips)
+
+    return [
+        clips[i:i + shard_size] for i in range(0, len(clips), shard_size)]
+
+
+def build_dataset_part(
+        input_file_paths, clips, part_name, output_dir_path, create_example,
+        shard_size=DEFAULT_SHARD_SIZE, file_name_format=None, seed=0,
+        process_count=None, open_input_file=None, write_records=None,
+        listener=None):
+
+    """
+    Builds one part of a sharded dataset.
+
+    :Parameters:
+        input_file_paths : sequence of paths
+            the paths of the input clip HDF5 files. A clip's input
+            number indexes this sequence.
+        clips : sequence of `(input_num, clip_id)` pairs
+            the clips of the dataset part.
+        part_name : str
+            the name of the dataset part, for example "Training".
+        output_dir_path : path
+            the directory to which to write the shard files.
+        create_example : function
+            a picklable function that creates a serialized example
+            (a `bytes` object) from an HDF5 clip dataset.
+        shard_size : int
+            the maximum number of examples per shard.
+        file_name_format : str
+            the shard file name format, applied to the part name and
+            the shard number. If `None`, `DEFAULT_FILE_NAME_FORMAT` is
+            used.
+        seed : int
+            the seed of the deterministic clip shuffle.
+        process_count : int
+            the number of worker processes, or `None` to use one per CPU.
+        open_input_file : function
+            a picklable function that opens an input file and returns
+            a mapping from clip IDs to clip datasets. If `None`, the
+            "clips" group of an HDF5 file is returned.
+        write_records : function
+            a picklable function that writes a sequence of serialized
+            examples to a file, given the file path and the examples.
+            If `None`, the examples are written to a TFRecord file.
+        listener : function
+            a function that is called with the information for each
+            shard after the shard is written, or `None`.
+
+    :Returns:
+        a list of shard information dictionaries, in shard order. Each
+        dictionary has `file_name`, `example_count`, and `sha256` items.
+    """
+
+    if file_name_format is None:
+        file_name_format = DEFAULT_FILE_NAME_FORMAT
+
+    if open_input_file is None:
+        open_input_file = _open_hdf5_clips_group
+
+    if write_records is None:
+        write_records = write_tfrecord_file
+
+    output_dir_path = Path(output_dir_path)
+
+    shards = get_shards(clips, shard_size, seed)
+
+    tasks = [
+        (clips, output_dir_path / file_name_format.format(part_name, i))
+        for i, clips in enumerate(shards)]
+
+    initargs = (
+        tuple(str(p) for p in input_file_paths), open_input_file,
+        create_example, write_records)
+
+    shard_infos = []
+
+    pool = Pool(process_count, _init_worker, initargs)
+
+    try:
+
+        # `imap` yields results in task order, so the returned shard
+        # infos and listener notifications do not depend on the order
+        # in which the workers happen to finish.
+        for shard_info in pool.imap(_write_shard, tasks):
+
+            shard_infos.append(shard_info)
+
+            if listener is not None:
+                listener(shard_info)
+
+    except BaseException:
+        pool.terminate()
+        raise
+
+    else:
+        pool.close()
+
+    finally:
+        pool.join()
+
+    return shard_infos
+
+
+def _open_hdf5_clips_group(file_path):
+
+    # We import `h5py` here rather than at the top of this module so
+    # the module can be used with other input file types without it.
+    import h5py
+
+    return h5py.File(file_path, 'r')['clips']
+
+
+def write_tfrecord_file(file_path, examples):
+
+    # We import TensorFlow here rather than at the top of this module
+    # since it is slow to import and only dataset builders need it.
+    import tensorflow as tf
+
+    with tf.io.TFRecordWriter(str(file_path)) as writer:
+        for example in examples:
+            writer.write(example)
+
+
+# Per-process worker state, set by `_init_worker`.
+_worker = None
+
+
+def _init_worker(
+        input_file_paths, open_input_file, create_example, write_records):
+
+    global _worker
+
+    _worker = _Worker(
+        input_file_paths, open_input_file, create_example, write_records)
+
+
+def _write_shard(task):
+    clips, file_path = task
+    return _worker.write_shard(clips, file_path)
+
+
+class _Worker:
+
+
+    def __init__(
+            self, input_file_paths, open_input_file, create_example,
+            write_records):
+
+        self._input_file_paths = input_file_paths
+        self._open_input_file = open_input_file
+        self._create_example = create_example
+        self._write_records = write_records
+
+        # Input files are opened lazily, so a worker opens only the
+        # files from which it reads clips.
+        self._clip_groups = {}
+
+
+    def write_shard(self, clips, file_path):
+
+        # Read clips in input file and clip ID order for locality, but
+        # write their examples in shuffled order.
+        examples = [None] * len(clips)
+        read_order = sorted(range(len(clips)), key=lambda i: clips[i])
+        for i in read_order:
+            input_num, clip_id = clips[i]
+            clip_group = self._get_clip_group(input_num)
+            examples[i] = self._create_example(clip_group[clip_id])
+
+        os_utils.create_parent_directory(file_path)
+        self._write_records(file_path, examples)
+
+        return {
+            'file_name': file_path.name,
+            'example_count': len(examples),
+            'sha256': get_file_checksum(file_path)
+        }
+
+
+    def _get_clip_group(self, input_num):
+
+        group = self._clip_groups.get(input_num)
+
+        if group is None:
+            file_path = self._input_file_paths[input_num]
+            group = self._open_input_file(file_path)
+            self._clip_groups[input_num] = group
+
+        return group
+
+
+def get_file_checksum(file_path):
+
+    """Gets the SHA-256 checksum of a file as a hexadecimal string."""
+
+    hash_ = hashlib.sha256()
+
+    with open(file_path, 'rb') as file_:
+        for block in iter(lambda: file_.read(_CHECKSUM_BLOCK_SIZE), b''):
+            hash_.update(block)
+
+    return hash_.hexdigest()
+
+
+def write_manifest(dir_path, parts, settings=None):
+
+    """
+    Writes a dataset manifest.
+
+    :Parameters:
+        dir_path : path
+            the dataset directory.
+        parts : dict
+            mapping from dataset part names to lists of shard information
+            dictionaries as returned by `build_dataset_part`. The shard
+            file names are relative to the subdirectory of `dir_path`
+            with the part's name.
+        settings : dict
+            dataset build settings to include in the manifest, or `None`.
+    """
+
+    manifest = {
+        'parts': dict(
+            (name, {
+                'example_count': sum(s['example_count'] for s in shards),
+                'shards': shards
+            })
+            for name, shards in parts.items())
+    }
+
+    if settings is not None:
+        manifest['settings'] = settings
+
+    file_path = Path(dir_path) / MANIFEST_FILE_NAME
+    os_utils.create_parent_directory(file_path)
+
+    with open(file_path, 'w') as file_:
+        yaml_utils.dump(manifest, file_, default_flow_style=False)
+
+
+def read_manifest(dir_path):
+
+    """
+    Reads a dataset manifest.
+
+    :Parameters:
+        dir_path : path
+            the dataset directory.
+
+    :Returns:
+        the manifest, as a dictionary.
+    """
+
+    file_path = Path(dir_path) / MANIFEST_FILE_NAME
+
+    with open(file_path) as file_:
+        return yaml_utils.load(file_)
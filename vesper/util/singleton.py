@@ -1,6 +1,9 @@
 """Module containing class `Singleton`."""
 
 
+from threading import RLock
+
+
 # TODO: Get rid of this module and the `Singletons` module by putting
 # singletons in the modules that define their classes. Allow programmers
 # to use singletons, for example the plugin manager, by writing things
@@ -26,7 +29,8 @@ class Singleton:
     using a factory function specified at initialization. The instance
     is available to clients via the `instance` property. The instance
     is created lazily, which avoids import cycles that would otherwise
-    occur in many situations.
+    occur in many situations. It is created at most once, even when
+    several threads access the `instance` property concurrently.
     """
     
     
@@ -43,10 +47,13 @@ class Singleton:
         
         self._instance_factory = instance_factory
         self._instance = None
+        self._lock = RLock()
         
         
     @property
     def instance(self):
         if self._instance is None:
-            self._instance = self._instance_factory()
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._instance_factory()
         return self._instance
@@ -0,0 +1,193 @@
+from pathlib import Path
+import tempfile
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.clip_segment_store import ClipSegmentStore
+
+
+class ClipSegmentStoreTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_put_and_get(self):
+
+        store = ClipSegmentStore(self.dir_path)
+
+        samples = dict((i, _create_samples(i, 100 + i)) for i in range(1, 6))
+        for clip_id, s in samples.items():
+            store.put_samples(clip_id, s)
+
+        self.assertEqual(store.clip_count, 5)
+
+        for clip_id, s in samples.items():
+            self.assertIn(clip_id, store)
+            self.assertEqual(store.get_length(clip_id), len(s))
+            self._assert_arrays_equal(store.get_samples(clip_id), s)
+
+        self._assert_arrays_equal(
+            store.get_samples(3, 10, 20), samples[3][10:30])
+
+        self.assertNotIn(10, store)
+        self.assertIsNone(store.get_length(10))
+        self._assert_raises(KeyError, store.get_samples, 10)
+        self._assert_raises(ValueError, store.get_samples, 1, 100, 10)
+
+        store.close()
+
+
+    def test_persistence(self):
+
+        store = ClipSegmentStore(self.dir_path)
+        store.put_samples(1, _create_samples(1, 10))
+        store.put_samples(2, _create_samples(2, 10))
+        store.put_samples(1, _create_samples(3, 20))
+        store.remove(2)
+        store.sync()
+        store.close()
+
+        store = ClipSegmentStore(self.dir_path)
+        self.assertEqual(store.clip_count, 1)
+        self.assertNotIn(2, store)
+        self._assert_arrays_equal(
+            store.get_samples(1), _create_samples(3, 20))
+
+        # Appends after reopening should go to a new segment.
+        store.put_samples(4, _create_samples(4, 10))
+        self._assert_arrays_equal(
+            store.get_samples(4), _create_samples(4, 10))
+        store.close()
+
+
+    def test_segments_and_compaction(self):
+
+        # Each segment holds at most five 100-sample clips.
+        store = ClipSegmentStore(self.dir_path, max_segment_size=1000)
+
+        for clip_id in range(20):
+            store.put_samples(clip_id, _create_samples(clip_id, 100))
+
+        stats = store.get_stats()
+        self.assertEqual(stats['segment_count'], 4)
+        self.assertEqual(stats['size'], 4000)
+        self.assertEqual(stats['garbage_size'], 0)
+
+        # Remove most clips of first segment and one of second. Only
+        # first segment should be compacted.
+        for clip_id in (0, 1, 2, 5):
+            store.remove(clip_id)
+
+        self.assertEqual(store.get_stats()['garbage_size'], 800)
+
+        reclaimed_size = store.compact()
+        self.assertEqual(reclaimed_size, 600)
+
+        stats = store.get_stats()
+        self.assertEqual(stats['clip_count'], 16)
+        self.assertEqual(stats['garbage_size'], 200)
+        self.assertEqual(stats['size'], 3400)
+
+        for clip_id in range(3, 20):
+            if clip_id != 5:
+                self._assert_arrays_equal(
+                    store.get_samples(clip_id),
+                    _create_samples(clip_id, 100))
+
+        store.close()
+
+        # Compacted index should load.
+        store = ClipSegmentStore(self.dir_path, max_segment_size=1000)
+        self.assertEqual(store.clip_count, 16)
+        self._assert_arrays_equal(store.get_samples(3), _create_samples(3, 100))
+        store.close()
+
+
+    def test_concurrent_stores(self):
+
+        # Two stores for the same directory, as in two processes.
+        store_a = ClipSegmentStore(self.dir_path)
+        store_b = ClipSegmentStore(self.dir_path)
+
+        store_a.put_samples(1, _create_samples(1, 10))
+        store_b.put_samples(2, _create_samples(2, 20))
+        store_a.put_samples(3, _create_samples(3, 30))
+
+        # Each store should see the clips of the other.
+        for store in (store_a, store_b):
+            for clip_id, length in ((1, 10), (2, 20), (3, 30)):
+                self._assert_arrays_equal(
+                    store.get_samples(clip_id),
+                    _create_samples(clip_id, length))
+
+        store_b.remove(1)
+        self.assertNotIn(1, store_b)
+
+        # Each store writes to its own segment file.
+        self.assertEqual(store_a.get_stats()['segment_count'], 2)
+
+        store_a.close()
+        store_b.close()
+
+        # Compaction should move clip 3 from the first segment file,
+        # a quarter of which is garbage.
+        store = ClipSegmentStore(self.dir_path)
+        self.assertEqual(store.clip_count, 2)
+        self.assertEqual(store.compact(.5), 0)
+        self.assertEqual(store.compact(.25), 20)
+        self._assert_arrays_equal(store.get_samples(3), _create_samples(3, 30))
+        store.close()
+
+
+    def test_partial_index_record(self):
+
+        store = ClipSegmentStore(self.dir_path)
+        store.put_samples(1, _create_samples(1, 10))
+        store.close()
+
+        # Simulate interrupted index write.
+        with open(self.dir_path / 'Index.dat', 'ab') as file_:
+            file_.write(b'\x00' * 5)
+
+        store = ClipSegmentStore(self.dir_path)
+        self.assertEqual(store.clip_count, 1)
+        self._assert_arrays_equal(store.get_samples(1), _create_samples(1, 10))
+
+        # Partial record should have been truncated, so that later
+        # records are read correctly.
+        store.put_samples(2, _create_samples(2, 20))
+        store.close()
+
+        store = ClipSegmentStore(self.dir_path)
+        self.assertEqual(store.clip_count, 2)
+        self._assert_arrays_equal(store.get_samples(2), _create_samples(2, 20))
+        store.close()
+
+
+    def test_zero_length_clips(self):
+
+        store = ClipSegmentStore(self.dir_path)
+        store.put_samples(1, _create_samples(1, 0))
+        store.put_samples(2, _create_samples(2, 0))
+        store.close()
+
+        # Replace and remove clips of a segment that contains only
+        # zero-length clips.
+        store = ClipSegmentStore(self.dir_path)
+        store.put_samples(1, _create_samples(1, 10))
+        store.remove(2)
+        self.assertEqual(store.clip_count, 1)
+        self._assert_arrays_equal(store.get_samples(1), _create_samples(1, 10))
+        store.close()
+
+
+def _create_samples(clip_id, length):
+    return (np.arange(length) + 1000 * clip_id).astype('<i2')
@@ -0,0 +1,117 @@
+from pathlib import Path
+import datetime
+import tempfile
+
+import numpy as np
+import pytz
+
+from vesper.tests.test_case import TestCase
+from vesper.util.deferred_clip_file import DeferredClipFileError
+import vesper.util.deferred_clip_file as deferred_clip_file
+
+
+_CREATION_TIME = datetime.datetime(2020, 5, 1, 12, 34, 56, 789, tzinfo=pytz.utc)
+
+
+class DeferredClipFileTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = Path(self._temp_dir.name) / 'Job 1 Part 000.clips'
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_write_and_read(self):
+
+        clips = _create_clips(7)
+
+        with deferred_clip_file.DeferredClipFileWriter(
+                self.file_path, batch_size=3) as writer:
+
+            for clip in clips:
+                writer.write_clip(*clip)
+
+            # File should not appear until writer is closed.
+            self.assertFalse(self.file_path.exists())
+
+        self.assertEqual(writer.clip_count, 7)
+
+        batches = list(deferred_clip_file.read_batches(self.file_path))
+        self.assertEqual([n for n, _ in batches], [0, 1, 2])
+        self.assertEqual([b.clip_count for _, b in batches], [3, 3, 1])
+
+        self._assert_batch(batches[1][1], clips[3:6])
+
+        # Read starting at second batch.
+        batches = list(deferred_clip_file.read_batches(self.file_path, 2))
+        self.assertEqual(len(batches), 1)
+        batch_num, batch = batches[0]
+        self.assertEqual(batch_num, 2)
+        self._assert_batch(batch, clips[6:])
+
+
+    def _assert_batch(self, batch, clips):
+
+        expected = deferred_clip_file.create_batch(clips)
+
+        self.assertEqual(batch.clip_count, expected.clip_count)
+
+        for name, _ in deferred_clip_file.COLUMNS:
+            self._assert_arrays_equal(
+                getattr(batch, name), getattr(expected, name))
+
+        self.assertEqual(batch.annotations.keys(), expected.annotations.keys())
+
+        for name, (codes, values) in batch.annotations.items():
+            expected_codes, expected_values = expected.annotations[name]
+            self._assert_arrays_equal(codes, expected_codes)
+            self.assertEqual(values, expected_values)
+
+
+    def test_create_batch(self):
+
+        batch = deferred_clip_file.create_batch(_create_clips(4))
+
+        self._assert_arrays_equal(batch.start_indices, np.array([0, 1000, 2000, 3000]))
+        self.assertEqual(
+            deferred_clip_file.get_datetime(batch.creation_times[0]),
+            _CREATION_TIME)
+
+        codes, values = batch.annotations['Detector Score']
+        self._assert_arrays_equal(codes, np.array([0, -1, 1, -1]))
+        self.assertEqual(values, ['0', '20'])
+
+
+    def test_invalid_files(self):
+
+        with open(self.file_path, 'wb') as file_:
+            file_.write(b'bobo')
+
+        self._assert_raises(
+            DeferredClipFileError, list,
+            deferred_clip_file.read_batches(self.file_path))
+
+        with deferred_clip_file.DeferredClipFileWriter(self.file_path) \
+                as writer:
+            for clip in _create_clips(2):
+                writer.write_clip(*clip)
+
+        with open(self.file_path, 'ab') as file_:
+            file_.write(b'\x10\x00')
+
+        self._assert_raises(
+            DeferredClipFileError, list,
+            deferred_clip_file.read_batches(self.file_path))
+
+
+def _create_clips(count):
+
+    # Every other clip has a detector score annotation.
+    return [
+        (1 + i % 2, 1000 * i, 500 + i, _CREATION_TIME, 10, 20,
+         {'Detector Score': 10 * i} if i % 2 == 0 else None)
+        for i in range(count)]
@@ -0,0 +1,187 @@
+from pathlib import Path
+import os
+import tempfile
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.deletion_queue import DeletionQueue
+
+
+_DEAD_PID = 999999999
+"""ID of a process that does not exist."""
+
+
+class DeletionQueueTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self._temp_dir.name)
+        self.deleted_rows = []
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def _create_queue(self):
+        return DeletionQueue(self.dir_path, self.deleted_rows.append, 2)
+
+
+    def test_commit_and_abort(self):
+
+        queue = self._create_queue()
+        queue.start()
+
+        ticket = queue.prepare([[1, 10], [2, 20]])
+        queue.commit(ticket)
+
+        ticket = queue.prepare([[3, 30]])
+        queue.abort(ticket)
+
+        ticket = queue.prepare(np.array([[4, 40]]))
+        queue.commit(ticket)
+
+        self.assertTrue(queue.join(5))
+        queue.close()
+
+        self.assertEqual(self.deleted_rows, [(1, 10), (2, 20), (4, 40)])
+
+        stats = queue.get_stats()
+        self.assertEqual(stats.queued_count, 3)
+        self.assertEqual(stats.deleted_count, 3)
+        self.assertEqual(stats.failure_count, 0)
+
+        # All queue files should have been deleted.
+        self.assertEqual(list(self.dir_path.iterdir()), [])
+
+
+    def test_recovery(self):
+
+        # Simulate a crash after one deletion was committed and another
+        # was prepared but not committed.
+        queue = self._create_queue()
+        queue.commit(queue.prepare([[1, 10]]))
+        ticket = queue.prepare([[2, 20], [3, 30]])
+        _set_pending_file_pid(ticket.path, _DEAD_PID)
+
+        # Prepare rows in a process that still exists.
+        live_ticket = queue.prepare([[4, 40]])
+
+        # Recover, resolving that only row 3 of pending file should
+        # be deleted.
+        queue = self._create_queue()
+        count = queue.recover(lambda rows: rows[rows[:, 0] == 3])
+        self.assertEqual(count, 1)
+
+        # Pending file of process that exists should not be recovered.
+        self.assertTrue(live_ticket.path.exists())
+        live_ticket.path.unlink()
+
+        queue.start()
+        self.assertTrue(queue.join(5))
+        queue.close()
+
+        self.assertEqual(self.deleted_rows, [(1, 10), (3, 30)])
+        self.assertEqual(list(self.dir_path.iterdir()), [])
+
+
+    def test_deletion_failure(self):
+
+        def delete(row):
+            if row[0] == 2:
+                raise OSError('Could not delete.')
+            self.deleted_rows.append(row)
+
+        queue = DeletionQueue(self.dir_path, delete, 2)
+        queue.start()
+        queue.commit(queue.prepare([[1, 10], [2, 20], [3, 30]]))
+        self.assertTrue(queue.join(5))
+        queue.close()
+
+        self.assertEqual(self.deleted_rows, [(1, 10), (3, 30)])
+        self.assertEqual(queue.get_stats().failure_count, 1)
+
+
+    def test_file_failure(self):
+
+        # Commit a deletion before starting the queue, and truncate
+        # its file so that the queue cannot read it.
+        queue = self._create_queue()
+        queue.commit(queue.prepare([[1, 10], [2, 20]]))
+        [path] = self.dir_path.glob('*.npy')
+        path.write_bytes(path.read_bytes()[:10])
+
+        # Truncate a pending file left by a crashed process.
+        ticket = queue.prepare([[3, 30]])
+        ticket.path.write_bytes(b'')
+        _set_pending_file_pid(ticket.path, _DEAD_PID)
+
+        self.assertEqual(queue.recover(lambda rows: rows), 0)
+
+        queue.start()
+        queue.commit(queue.prepare([[4, 40]]))
+
+        # Rows of file that could not be read count as failed.
+        self.assertTrue(queue.join(5))
+        queue.close()
+
+        self.assertEqual(self.deleted_rows, [(4, 40)])
+
+        stats = queue.get_stats()
+        self.assertEqual(stats.queued_count, 3)
+        self.assertEqual(stats.deleted_count, 3)
+        self.assertEqual(stats.failure_count, 2)
+
+        # Truncated pending file is discarded.
+        self.assertEqual(list(self.dir_path.glob('*.pending')), [])
+
+
+    def test_shared_directory(self):
+
+        # Commit deletions that are processed by whichever of two
+        # queues started for the same directory claims them first.
+        queue = self._create_queue()
+        for i in range(20):
+            queue.commit(queue.prepare([[i, 10 * i]]))
+
+        queues = [self._create_queue() for _ in range(2)]
+        for queue in queues:
+            queue.start()
+
+        for queue in queues:
+            self.assertTrue(queue.join(5))
+            queue.close()
+
+        self.assertEqual(
+            sorted(self.deleted_rows), [(i, 10 * i) for i in range(20)])
+        self.assertEqual(list(self.dir_path.iterdir()), [])
+
+
+    def test_processing_file_reclamation(self):
+
+        # Simulate a crash of a process while it was processing a
+        # file, and a process that is still processing one.
+        queue = self._create_queue()
+        queue.commit(queue.prepare([[1, 10]]))
+        queue.commit(queue.prepare([[2, 20]]))
+        dead_path, live_path = sorted(self.dir_path.glob('*.npy'))
+        dead_path.rename(
+            dead_path.with_name(f'{dead_path.name}.{_DEAD_PID}.processing'))
+        live_path.rename(
+            live_path.with_name(f'{live_path.name}.{os.getpid()}.processing'))
+
+        queue = self._create_queue()
+        queue.start()
+        self.assertTrue(queue.join(5))
+        queue.close()
+
+        self.assertEqual(self.deleted_rows, [(1, 10)])
+        self.assertEqual(len(list(self.dir_path.iterdir())), 1)
+
+
+def _set_pending_file_pid(path, pid):
+    parts = path.name.split(' ')
+    parts[2] = str(pid)
+    path.rename(path.with_name(' '.join(parts)))
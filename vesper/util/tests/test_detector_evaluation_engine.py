@@ -0,0 +1,257 @@
+from pathlib import Path
+import tempfile
+import wave
+
+import numpy as np
+
+from vesper.old_bird.old_bird_detector_redux_1_1_mt import TseepDetector
+from vesper.pnf.pnf_energy_detector_1_0 import Detector, _TSEEP_SETTINGS
+from vesper.tests.test_case import TestCase
+from vesper.util.bunch import Bunch
+import vesper.util.detector_evaluation_engine as engine
+
+
+_SAMPLE_RATE = 24000
+_RECORDING_DURATION = 20
+_CALL_INTERVAL = 1.3
+_CALL_DURATION = .05
+_CALL_FREQUENCY = 7000
+
+
+class DetectorEvaluationEngineTests(TestCase):
+
+
+    def test_match_clips_with_calls(self):
+
+        np.random.seed(0)
+
+        for clip_count in (0, 1, 10, 100):
+            for call_count in (0, 1, 10, 100):
+                for window in ((0, 50), (20, 30), (50, 200)):
+
+                    clips = _create_random_clips(clip_count, 60)
+                    centers = np.sort(np.random.randint(0, 3000, call_count))
+
+                    clip_indices, call_indices = \
+                        engine.match_clips_with_calls(clips, centers, window)
+
+                    expected = _match_clips_with_calls(
+                        clips, centers, window)
+
+                    self.assertEqual(
+                        list(zip(clip_indices, call_indices)), expected)
+
+
+    def test_match_clips_with_calls_variable_lengths(self):
+
+        # Clips with different lengths can have windows whose end indices
+        # decrease, which the engine handles sequentially.
+        clips = np.array([[0, 100], [10, 20], [50, 100], [60, 10]])
+        centers = [15, 25, 55, 65, 120]
+        window = (0, 100)
+
+        clip_indices, call_indices = \
+            engine.match_clips_with_calls(clips, centers, window)
+
+        self.assertEqual(
+            list(zip(clip_indices, call_indices)),
+            _match_clips_with_calls(clips, centers, window))
+
+
+    def test_run_detectors(self):
+
+        with tempfile.TemporaryDirectory() as dir_path:
+
+            dir_path = Path(dir_path)
+
+            recordings = [
+                ('1', _create_recording_file(dir_path / '1.wav', 0)),
+                ('2', _create_recording_file(dir_path / '2.wav', 1))]
+
+            specs = [
+                engine.DetectorSpec(
+                    'PNF', _create_pnf_detector, (1.5, 2, 2.7, 4),
+                    _TSEEP_SETTINGS),
+                engine.DetectorSpec(
+                    'Old Bird', _create_old_bird_detector, (1.3, 2, 5))]
+
+            cache_dir_path = dir_path / 'Cache'
+
+            # Run detectors without cache, then with cache twice, once
+            # computing score tracks and once reading them from the cache.
+            results = [
+                engine.run_detectors(
+                    specs, recordings, path, process_count=2,
+                    chunk_size=10000)
+                for path in (None, cache_dir_path, cache_dir_path)]
+
+            for detections in results[1:]:
+                self._assert_detections_equal(detections, results[0])
+
+            detections = results[0]
+
+            self.assertEqual(
+                sorted(detections.keys()),
+                [('Old Bird', '1'), ('Old Bird', '2'),
+                 ('PNF', '1'), ('PNF', '2')])
+
+            # Each detector should detect all calls at its lowest threshold.
+            call_count = _get_call_count()
+            for (detector_name, _), clips in detections.items():
+                spec = specs[0] if detector_name == 'PNF' else specs[1]
+                self.assertEqual(
+                    len(clips[spec.thresholds[0]]), call_count)
+
+            # Score tracks are cached, one per detector per recording.
+            self.assertEqual(len(list(cache_dir_path.glob('*.npz'))), 4)
+
+            # Changing thresholds uses the cached score tracks.
+            specs[0] = engine.DetectorSpec(
+                'PNF', _create_pnf_detector, (3, 3.5), _TSEEP_SETTINGS)
+            detections = engine.run_detectors(
+                specs, recordings, cache_dir_path, process_count=1,
+                chunk_size=10000)
+            self.assertEqual(len(list(cache_dir_path.glob('*.npz'))), 4)
+            self.assertEqual(
+                sorted(detections[('PNF', '1')].keys()), [3, 3.5])
+
+            # Evaluate detections.
+            centers = _get_call_center_indices()
+            call_center_indices = dict(
+                (key, centers) for key in detections.keys())
+            windows = {'PNF': (0, 7200), 'Old Bird': (0, 7200)}
+            rows = engine.evaluate_detections(
+                detections, call_center_indices, windows)
+
+            n = call_count
+            row = rows[0]
+            self.assertEqual(row[:6], ['Old Bird', '1', 1.3, n, n, n])
+            self.assertEqual(row[6:], [100., 100., 100.])
+
+            aggregate_rows = engine.aggregate_evaluation(rows)
+            n = 2 * call_count
+            self.assertEqual(
+                aggregate_rows[0][:6], ['Old Bird', None, 1.3, n, n, n])
+
+
+    def _assert_detections_equal(self, a, b):
+        self.assertEqual(sorted(a.keys()), sorted(b.keys()))
+        for key, clips in a.items():
+            self.assertEqual(sorted(clips.keys()), sorted(b[key].keys()))
+            for threshold, threshold_clips in clips.items():
+                self._assert_arrays_equal(threshold_clips, b[key][threshold])
+
+
+    def test_evaluate_detections(self):
+
+        detections = {
+            ('D', 'R'): {
+                1: np.array([[0, 10], [20, 10], [40, 10]]),
+                2: np.array([[20, 10]]),
+                3: np.zeros((0, 2), dtype='int64')
+            }
+        }
+
+        call_center_indices = {('D', 'R'): [5, 25, 65, 85]}
+        windows = {'D': (0, 10)}
+
+        rows = engine.evaluate_detections(
+            detections, call_center_indices, windows)
+
+        self.assertEqual(rows[0], ['D', 'R', 1, 4, 2, 3, 66.7, 50., 57.1])
+        self.assertEqual(rows[1], ['D', 'R', 2, 4, 1, 1, 100., 25., 40.])
+        self.assertEqual(rows[2][:6], ['D', 'R', 3, 4, 0, 0])
+        self.assertTrue(np.isnan(rows[2][6]))
+
+
+def _create_random_clips(count, length):
+    start_indices = np.sort(np.random.randint(0, 3000, count))
+    return np.stack((start_indices, np.full(count, length)), axis=1)
+
+
+def _match_clips_with_calls(clips, call_center_indices, window):
+
+    # Reference implementation, from the `evaluate_detectors` detector
+    # evaluation script.
+
+    def get_clip_window(clip):
+        clip_start_index, clip_length = clip
+        clip_end_index = clip_start_index + clip_length
+        window_start_offset, window_length = window
+        window_start_index = min(
+            clip_start_index + window_start_offset, clip_end_index)
+        window_end_index = min(
+            window_start_index + window_length, clip_end_index)
+        return (window_start_index, window_end_index)
+
+    clip_windows = [get_clip_window(clip) for clip in clips]
+
+    clip_count = len(clips)
+    call_count = len(call_center_indices)
+
+    i = 0
+    j = 0
+
+    matches = []
+
+    while i != clip_count and j != call_count:
+
+        window_start_index, window_end_index = clip_windows[i]
+        call_center_index = call_center_indices[j]
+
+        if window_end_index <= call_center_index:
+            i += 1
+
+        elif window_start_index > call_center_index:
+            j += 1
+
+        else:
+            matches.append((i, j))
+            i += 1
+            j += 1
+
+    return matches
+
+
+def _get_call_count():
+    return int(_RECORDING_DURATION / _CALL_INTERVAL) - 1
+
+
+def _get_call_start_indices():
+    times = _CALL_INTERVAL * np.arange(1, _get_call_count() + 1)
+    return np.round(times * _SAMPLE_RATE).astype('int64')
+
+
+def _get_call_center_indices():
+    offset = int(round(_CALL_DURATION * _SAMPLE_RATE / 2))
+    return _get_call_start_indices() + offset
+
+
+def _create_recording_file(file_path, seed):
+
+    random = np.random.RandomState(seed)
+    length = _RECORDING_DURATION * _SAMPLE_RATE
+    samples = 100 * random.randn(length)
+
+    call_length = int(round(_CALL_DURATION * _SAMPLE_RATE))
+    times = np.arange(call_length) / _SAMPLE_RATE
+    call = 5000 * np.sin(2 * np.pi * _CALL_FREQUENCY * times)
+    for start_index in _get_call_start_indices():
+        samples[start_index:start_index + call_length] += call
+
+    with wave.open(str(file_path), 'wb') as writer:
+        writer.setparams((1, 2, _SAMPLE_RATE, length, 'NONE', None))
+        writer.writeframes(samples.astype('<i2').tobytes())
+
+    return file_path
+
+
+def _create_pnf_detector(thresholds, sample_rate, listener, score_listener):
+    settings = Bunch(_TSEEP_SETTINGS, thresholds=thresholds)
+    return Detector(
+        settings, sample_rate, listener, score_listener=score_listener)
+
+
+def _create_old_bird_detector(
+        thresholds, sample_rate, listener, score_listener):
+    return TseepDetector(thresholds, sample_rate, listener, score_listener)
@@ -0,0 +1,122 @@
+from pathlib import Path
+import tempfile
+
+from vesper.tests.test_case import TestCase
+from vesper.util.disk_lru_cache import DiskLruCache
+
+
+class DiskLruCacheTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_get_and_put(self):
+
+        cache = DiskLruCache(self.dir_path, 100)
+
+        self.assertIsNone(cache.hit_ratio)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.hit_ratio, 0)
+
+        cache.put('a', b'one')
+        cache.put('b', b'two')
+
+        self.assertEqual(cache.get('a'), b'one')
+        self.assertEqual(cache.get('b'), b'two')
+        self.assertIsNone(cache.get('c'))
+
+        self.assertEqual(cache.size, 6)
+        self.assertEqual(cache.item_count, 2)
+        self.assertEqual(cache.hit_count, 2)
+        self.assertEqual(cache.miss_count, 2)
+        self.assertEqual(cache.hit_ratio, .5)
+        self.assertEqual(cache.get_stats()['hit_ratio'], .5)
+
+        # Replace item.
+        cache.put('a', b'three')
+        self.assertEqual(cache.get('a'), b'three')
+        self.assertEqual(cache.size, 8)
+        self.assertEqual(cache.item_count, 2)
+
+
+    def test_eviction(self):
+
+        cache = DiskLruCache(self.dir_path, 10)
+
+        cache.put('a', b'aaaa')
+        cache.put('b', b'bbbb')
+
+        # Use `a` so that `b` is least recently used.
+        cache.get('a')
+
+        cache.put('c', b'cccc')
+
+        self.assertEqual(cache.get('a'), b'aaaa')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), b'cccc')
+        self.assertEqual(cache.size, 8)
+
+        # Items larger than cache are not cached.
+        cache.put('d', bytes(11))
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.size, 8)
+
+
+    def test_persistence(self):
+
+        cache = DiskLruCache(self.dir_path, 100)
+        cache.put('a', b'one')
+        cache.put('b', b'two')
+
+        cache = DiskLruCache(self.dir_path, 100)
+        self.assertEqual(cache.item_count, 2)
+        self.assertEqual(cache.size, 6)
+        self.assertEqual(cache.get('a'), b'one')
+
+        # Reducing maximum size evicts items on initialization.
+        cache = DiskLruCache(self.dir_path, 4)
+        self.assertEqual(cache.item_count, 1)
+
+
+    def test_remove_and_clear(self):
+
+        cache = DiskLruCache(self.dir_path, 100)
+        cache.put('a', b'one')
+        cache.put('b', b'two')
+
+        cache.remove('a')
+        cache.remove('x')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size, 3)
+
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.size, 0)
+        self.assertEqual(cache.item_count, 0)
+
+
+    def test_disabled(self):
+        cache = DiskLruCache(self.dir_path, 0)
+        cache.put('a', b'one')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.item_count, 0)
+
+
+    def test_failed_put(self):
+
+        cache = DiskLruCache(self.dir_path, 100)
+
+        # Writing a string to a binary file fails.
+        self._assert_raises(TypeError, cache.put, 'a', 'one')
+
+        # Temporary file is deleted.
+        file_paths = [p for p in self.dir_path.rglob('*') if p.is_file()]
+        self.assertEqual(file_paths, [])
+        self.assertEqual(cache.item_count, 0)
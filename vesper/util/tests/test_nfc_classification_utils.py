@@ -0,0 +1,90 @@
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.bunch import Bunch
+import vesper.util.data_windows as data_windows
+import vesper.util.nfc_classification_utils as nfc_classification_utils
+
+
+_SAMPLE_RATE = 22050.
+
+
+class NfcClassificationUtilsTests(TestCase):
+    
+    
+    def test_get_segments_features(self):
+        
+        np.random.seed(0)
+        samples = np.random.randn(10000) * 1000
+        
+        for pooling_block_size in ((1, 1), (2, 1), (1, 3), (3, 2)):
+            for include_norm_in_features in (False, True):
+                for reference_power in (None, 1.):
+                    
+                    config = _create_config(
+                        pooling_block_size, include_norm_in_features,
+                        reference_power)
+                    
+                    self._test_get_segments_features(samples, config)
+                    
+                    
+    def _test_get_segments_features(self, samples, config):
+        
+        segment_length = 1500
+        hop_size = 700
+        
+        # Get segments as a strided view of samples.
+        segment_count = 1 + (len(samples) - segment_length) // hop_size
+        stride = samples.strides[0]
+        segments = np.lib.stride_tricks.as_strided(
+            samples, (segment_count, segment_length),
+            (hop_size * stride, stride), writeable=False)
+        
+        features, time = nfc_classification_utils.get_segments_features(
+            segments, _SAMPLE_RATE, config)
+        
+        self.assertEqual(len(features), segment_count)
+        
+        # Compare features with features computed one segment at a time.
+        for i in range(segment_count):
+            
+            segment = Bunch(
+                samples=samples[i * hop_size:i * hop_size + segment_length],
+                sample_rate=_SAMPLE_RATE)
+            
+            expected_features, _, expected_time = \
+                nfc_classification_utils.get_segment_features(
+                    segment, config)
+                
+            self.assertTrue(np.array_equal(features[i], expected_features))
+            self.assertEqual(time, expected_time)
+            
+            
+    def test_get_segments_features_with_no_segments(self):
+        
+        config = _create_config((2, 2), True, 1.)
+        segments = np.zeros((0, 1500))
+        
+        features, _ = nfc_classification_utils.get_segments_features(
+            segments, _SAMPLE_RATE, config)
+        
+        self.assertEqual(features.shape[0], 0)
+            
+            
+def _create_config(
+        pooling_block_size, include_norm_in_features, reference_power):
+    
+    spectrogram_params = Bunch(
+        window=data_windows.create_window('Hann', 110),
+        hop_size=55,
+        dft_size=128,
+        reference_power=reference_power)
+    
+    return Bunch(
+        spectrogram_params=spectrogram_params,
+        min_power=-10,
+        max_power=65,
+        min_freq=5000,
+        max_freq=10000,
+        pooling_block_size=pooling_block_size,
+        include_norm_in_features=include_norm_in_features)
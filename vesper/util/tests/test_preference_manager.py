@@ -1,4 +1,6 @@
 from pathlib import Path
+import os
+import tempfile
 
 from vesper.tests.test_case import TestCase
 from vesper.util.preference_manager import PreferenceManager
@@ -73,3 +75,37 @@ class PreferenceManagerTests(TestCase):
     def test_non_mapping_preference_file(self):
         p = PreferenceManager(_NON_MAPPING_PREFERENCE_FILE_PATH).preferences
         self.assertEqual(len(p), 0)
+        
+        
+    def test_reload_preferences(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            file_path = Path(dir_path) / 'Preferences.yaml'
+            
+            manager = PreferenceManager(file_path)
+            self.assertEqual(len(manager.preferences), 0)
+            
+            _write_preferences(file_path, 'one: 1\n')
+            manager.reload_preferences()
+            self.assertEqual(manager.preferences['one'], 1)
+            
+            # Reload of unchanged file should keep preferences.
+            preferences = manager.preferences
+            manager.reload_preferences()
+            self.assertIs(manager.preferences, preferences)
+            
+            _write_preferences(file_path, 'one: 2\n')
+            manager.reload_preferences()
+            self.assertEqual(manager.preferences['one'], 2)
+            
+            
+def _write_preferences(path, contents):
+    
+    with open(path, 'w') as file_:
+        file_.write(contents)
+        
+    # Make sure modification time changes even on file systems with
+    # coarse timestamps.
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
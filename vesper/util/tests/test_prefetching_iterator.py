@@ -0,0 +1,78 @@
+import threading
+import time
+
+from vesper.tests.test_case import TestCase
+from vesper.util.prefetching_iterator import PrefetchingIterator
+
+
+class PrefetchingIteratorTests(TestCase):
+
+
+    def test_iteration(self):
+        
+        def square(x):
+            
+            # Sleep for a time that decreases with `x` so function
+            # applications complete out of order.
+            time.sleep(.001 * (10 - x % 10))
+            
+            return x * x
+        
+        for item_count in (0, 1, 5, 50):
+            for thread_count in (1, 4):
+                for prefetch_count in (None, 1, 3):
+                    
+                    items = range(item_count)
+                    
+                    results = list(PrefetchingIterator(
+                        square, items, thread_count, prefetch_count))
+                    
+                    self.assertEqual(results, [x * x for x in items])
+                    
+                    
+    def test_prefetch_count(self):
+        
+        lock = threading.Lock()
+        started = []
+        
+        def record(x):
+            with lock:
+                started.append(x)
+            return x
+        
+        iterator = PrefetchingIterator(record, range(100), 2, 5)
+        
+        self.assertEqual(iterator.thread_count, 2)
+        self.assertEqual(iterator.prefetch_count, 5)
+        
+        with iterator:
+            
+            self.assertEqual(next(iterator), 0)
+            
+            # Wait for prefetched function applications to complete.
+            time.sleep(.1)
+            
+            # The iterator should have started applying the function
+            # to no more than the next five items.
+            self.assertTrue(max(started) <= 5)
+            
+            
+    def test_exception(self):
+        
+        def check(x):
+            if x == 3:
+                raise ValueError('Bad item.')
+            return x
+        
+        iterator = PrefetchingIterator(check, range(10))
+        
+        with iterator:
+            
+            for i in range(3):
+                self.assertEqual(next(iterator), i)
+                
+            with self.assertRaises(ValueError):
+                next(iterator)
+            
+            # Iteration can continue after an exception.
+            self.assertEqual(next(iterator), 4)
@@ -1,3 +1,7 @@
+from pathlib import Path
+import os
+import tempfile
+
 from vesper.tests.test_case import TestCase
 from vesper.util.preset import Preset
 from vesper.util.preset_manager import PresetManager
@@ -26,7 +30,10 @@ class B(_Preset):
     
     extension_name = 'B'
     
+    parse_count = 0
+    
     def __init__(self, name, data):
+        B.parse_count += 1
         data = yaml_utils.load(data)
         super().__init__(name, data)
         
@@ -119,3 +126,57 @@ class PresetManagerTests(TestCase):
         for type_name, path, expected in cases:
             preset = self.manager.get_preset(type_name, path)
             self.assertEqual(preset, expected)
+
+
+    def test_get_presets_json(self):
+        self.assertEqual(
+            self.manager.get_presets_json('B'), '[[["1"], 1], [["2"], 2]]')
+        self.assertEqual(self.manager.get_presets_json('X'), '[]')
+        
+        
+    def test_incremental_reload(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            type_dir_path = Path(dir_path) / 'B'
+            type_dir_path.mkdir()
+            
+            _write_preset(type_dir_path / '1.yaml', '1')
+            _write_preset(type_dir_path / '2.yaml', '2')
+            
+            B.parse_count = 0
+            manager = PresetManager((A, B), dir_path)
+            self.assertEqual(B.parse_count, 2)
+            json_ = manager.get_presets_json('B')
+            
+            # Reload with no changes should parse nothing and keep JSON.
+            manager.reload_presets()
+            self.assertEqual(B.parse_count, 2)
+            self.assertIs(manager.get_presets_json('B'), json_)
+            
+            # Reload after modification should parse only modified file.
+            _write_preset(type_dir_path / '2.yaml', '22')
+            manager.reload_presets()
+            self.assertEqual(B.parse_count, 3)
+            self.assertEqual(manager.get_preset('B', '2').data, 22)
+            self.assertEqual(
+                manager.get_presets_json('B'), '[[["1"], 1], [["2"], 22]]')
+            
+            # Reload after addition and removal.
+            _write_preset(type_dir_path / '3.yaml', '3')
+            os.remove(type_dir_path / '1.yaml')
+            manager.reload_presets()
+            self.assertEqual(B.parse_count, 4)
+            expected = ((('2',), B('2', '22')), (('3',), B('3', '3')))
+            self.assertEqual(manager.get_flattened_presets('B'), expected)
+            
+            
+def _write_preset(path, contents):
+    
+    with open(path, 'w') as file_:
+        file_.write(contents)
+        
+    # Make sure modification time changes even on file systems with
+    # coarse timestamps.
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
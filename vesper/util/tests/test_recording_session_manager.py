@@ -0,0 +1,180 @@
+from pathlib import Path
+import tempfile
+import time
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.recording_session_manager import (
+    RecordingSessionError, RecordingSessionManager)
+import vesper.util.audio_file_utils as audio_file_utils
+
+
+_SAMPLE_RATE = 24000
+
+
+class RecordingSessionManagerTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def _create_manager(self, channel_count=1, header_update_period=10):
+        return RecordingSessionManager(
+            self.dir_path, channel_count, _SAMPLE_RATE,
+            header_update_period=header_update_period)
+
+
+    def test_in_order_appends(self):
+
+        for channel_count in (1, 2):
+
+            manager = self._create_manager(channel_count)
+            recording_id = manager.start_recording()
+
+            samples = _create_samples(channel_count, 1000)
+            for start_index in range(0, 1000, 100):
+                manager.append_samples(
+                    recording_id, start_index,
+                    samples[:, start_index:start_index + 100])
+
+            gaps = manager.stop_recording(recording_id)
+            self.assertEqual(gaps, ())
+
+            path = manager.get_recording_file_path(recording_id)
+            self._assert_file_samples(path, samples)
+
+
+    def test_out_of_order_appends(self):
+
+        manager = self._create_manager()
+        recording_id = manager.start_recording()
+
+        samples = _create_samples(1, 500)
+        for start_index in (300, 0, 400, 100, 200):
+            manager.append_samples(
+                recording_id, start_index,
+                samples[:, start_index:start_index + 100])
+
+        gaps = manager.stop_recording(recording_id)
+        self.assertEqual(gaps, ())
+
+        path = manager.get_recording_file_path(recording_id)
+        self._assert_file_samples(path, samples)
+
+
+    def test_gaps(self):
+
+        manager = self._create_manager()
+        recording_id = manager.start_recording()
+
+        samples = _create_samples(1, 500)
+        for start_index in (100, 400):
+            manager.append_samples(
+                recording_id, start_index,
+                samples[:, start_index:start_index + 100])
+
+        gaps = manager.stop_recording(recording_id)
+        self.assertEqual(gaps, ((0, 100), (200, 400)))
+
+        expected = samples.copy()
+        expected[:, :100] = 0
+        expected[:, 200:400] = 0
+        path = manager.get_recording_file_path(recording_id)
+        self._assert_file_samples(path, expected)
+
+
+    def test_header_update_period(self):
+
+        # Header should be updated after every 240 frames.
+        manager = self._create_manager(header_update_period=.01)
+        recording_id = manager.start_recording()
+        path = manager.get_recording_file_path(recording_id)
+
+        samples = _create_samples(1, 300)
+
+        manager.append_samples(recording_id, 0, samples[:, :200])
+        self.assertEqual(audio_file_utils.get_wave_file_info(
+            str(path)).length, 0)
+
+        manager.append_samples(recording_id, 200, samples[:, 200:])
+        self.assertEqual(audio_file_utils.get_wave_file_info(
+            str(path)).length, 300)
+
+        manager.stop_recording(recording_id)
+
+
+    def test_recording_ids(self):
+
+        manager = self._create_manager()
+        ids = [manager.start_recording() for _ in range(3)]
+        self.assertEqual(ids, [0, 1, 2])
+        self.assertEqual(manager.active_recording_ids, (0, 1, 2))
+        manager.stop_all_recordings()
+        self.assertEqual(manager.active_recording_ids, ())
+
+        # A new manager should not reuse the IDs of existing files.
+        manager = self._create_manager()
+        self.assertEqual(manager.start_recording(), 3)
+        manager.stop_all_recordings()
+
+
+    def test_errors(self):
+
+        manager = self._create_manager()
+        samples = _create_samples(1, 10)
+
+        self._assert_raises(
+            RecordingSessionError, manager.append_samples, 0, 0, samples)
+        self._assert_raises(RecordingSessionError, manager.stop_recording, 0)
+
+        recording_id = manager.start_recording()
+        self._assert_raises(
+            ValueError, manager.append_samples, recording_id, -1, samples)
+        self._assert_raises(
+            ValueError, manager.append_samples, recording_id, 0,
+            _create_samples(2, 10))
+        manager.stop_recording(recording_id)
+
+        self._assert_raises(
+            RecordingSessionError, manager.stop_recording, recording_id)
+
+
+    def test_idle_recordings(self):
+
+        manager = RecordingSessionManager(
+            self.dir_path, 1, _SAMPLE_RATE, idle_timeout=.1)
+
+        idle_id = manager.start_recording()
+        manager.append_samples(idle_id, 0, _create_samples(1, 100))
+
+        time.sleep(.2)
+
+        # Starting a recording stops the idle one, updating its header.
+        active_id = manager.start_recording()
+        self.assertEqual(manager.active_recording_ids, (active_id,))
+        path = manager.get_recording_file_path(idle_id)
+        self._assert_file_samples(path, _create_samples(1, 100))
+
+        self._assert_raises(
+            RecordingSessionError, manager.append_samples, idle_id, 100,
+            _create_samples(1, 100))
+
+        manager.stop_all_recordings()
+
+
+    def _assert_file_samples(self, path, expected):
+        samples, sample_rate = audio_file_utils.read_wave_file(str(path))
+        self.assertEqual(sample_rate, _SAMPLE_RATE)
+        self._assert_arrays_equal(samples, expected)
+
+
+def _create_samples(channel_count, length):
+    samples = np.arange(channel_count * length, dtype='<i2')
+    return samples.reshape((channel_count, length))
@@ -0,0 +1,222 @@
+from pathlib import Path
+import tempfile
+
+import numpy as np
+
+from vesper.old_bird.old_bird_detector_redux_1_1 import TseepDetector
+from vesper.tests.test_case import TestCase
+from vesper.util.score_track_file import ScoreTrackError, ScoreTrackWriter
+import vesper.util.score_track_file as score_track_file
+
+
+_SAMPLE_RATE = 22050
+
+
+class ScoreTrackFileTests(TestCase):
+
+
+    def test_write_and_read(self):
+
+        chunks = [
+            (np.array([1.5, 2.25, 3]), 0),
+            (np.array([]), 3),
+            (np.array([4.125, 5]), 3)
+        ]
+
+        with tempfile.TemporaryDirectory() as dir_path:
+
+            file_path = Path(dir_path) / 'Tracks' / 'Track'
+
+            self.assertFalse(score_track_file.score_track_exists(file_path))
+
+            writer = ScoreTrackWriter(
+                file_path, _SAMPLE_RATE, 'float32',
+                attributes={'channel_num': 1})
+
+            for scores, offset in chunks:
+                writer.process_scores(scores, offset)
+
+            track = writer.close()
+
+            self.assertTrue(score_track_file.score_track_exists(file_path))
+
+            for track in (track, score_track_file.read_score_track(file_path)):
+
+                self.assertEqual(track.sample_rate, _SAMPLE_RATE)
+                self.assertEqual(track.chunk_count, 3)
+                self.assertEqual(track.attributes, {'channel_num': 1})
+                self.assertIsNone(track.scale)
+                self.assertIsInstance(track.scores, np.memmap)
+                self.assertEqual(track.scores.dtype, np.dtype('<f4'))
+                self._assert_chunks_equal(track.get_chunks(), chunks)
+
+            self.assertEqual(
+                score_track_file.get_score_track_file_paths(file_path.parent),
+                [file_path])
+
+
+    def _assert_chunks_equal(self, chunks, expected):
+        chunks = list(chunks)
+        self.assertEqual(len(chunks), len(expected))
+        for (scores, offset), (expected_scores, expected_offset) in \
+                zip(chunks, expected):
+            self._assert_arrays_equal(scores, expected_scores)
+            self.assertEqual(offset, expected_offset)
+            self.assertEqual(type(offset), type(expected_offset))
+
+
+    def test_data_types(self):
+
+        scores = np.array([-1e6, -2.5, 0, .001, 1.3, 2.71828, 1e6])
+
+        cases = [
+            ('float16', None, np.clip(scores, -65504, 65504), .001),
+            ('int16', 1000, np.clip(scores, -32.768, 32.767), .0005),
+            ('float32', None, scores, 1e-6)
+        ]
+
+        with tempfile.TemporaryDirectory() as dir_path:
+
+            for dtype, scale, expected, tolerance in cases:
+
+                file_path = Path(dir_path) / dtype
+
+                writer = ScoreTrackWriter(
+                    file_path, _SAMPLE_RATE, dtype, scale)
+                writer.process_scores(scores, 1.5)
+                writer.close()
+
+                track = score_track_file.read_score_track(file_path)
+                [(track_scores, offset)] = list(track.get_chunks())
+
+                self.assertEqual(offset, 1.5)
+                self.assertEqual(track.scale, scale)
+                self.assertTrue(np.allclose(
+                    track_scores, expected, rtol=tolerance, atol=tolerance))
+
+                extension = score_track_file.SCORES_FILE_NAME_EXTENSION
+                scores_file_path = \
+                    file_path.with_name(file_path.name + extension)
+                item_size = 4 if dtype == 'float32' else 2
+                self.assertEqual(
+                    scores_file_path.stat().st_size, item_size * len(scores))
+
+
+    def test_tuple_offsets(self):
+
+        chunks = [
+            (np.array([.25, .5]), (0, 100)),
+            (np.array([.75]), (100, 50))
+        ]
+
+        with tempfile.TemporaryDirectory() as dir_path:
+
+            file_path = Path(dir_path) / 'Track'
+
+            writer = ScoreTrackWriter(file_path, _SAMPLE_RATE)
+            for scores, offset in chunks:
+                writer.process_scores(scores, offset)
+            track = writer.close()
+
+            self._assert_chunks_equal(track.get_chunks(), chunks)
+
+
+    def test_empty_track(self):
+
+        with tempfile.TemporaryDirectory() as dir_path:
+
+            file_path = Path(dir_path) / 'Track'
+
+            ScoreTrackWriter(file_path, _SAMPLE_RATE).close()
+
+            track = score_track_file.read_score_track(file_path)
+            self.assertEqual(track.chunk_count, 0)
+            self.assertEqual(list(track.get_chunks()), [])
+
+
+    def test_discard(self):
+
+        with tempfile.TemporaryDirectory() as dir_path:
+
+            dir_path = Path(dir_path)
+
+            writer = ScoreTrackWriter(dir_path / 'Track', _SAMPLE_RATE)
+            writer.process_scores(np.ones(10), 0)
+            writer.discard()
+
+            self.assertEqual(list(dir_path.iterdir()), [])
+            self.assertEqual(
+                score_track_file.get_score_track_file_paths(dir_path), [])
+
+
+    def test_writer_errors(self):
+
+        with tempfile.TemporaryDirectory() as dir_path:
+
+            file_path = Path(dir_path) / 'Track'
+
+            self._assert_raises(
+                ScoreTrackError, ScoreTrackWriter, file_path, _SAMPLE_RATE,
+                'float64')
+
+            self._assert_raises(
+                ScoreTrackError, ScoreTrackWriter, file_path, _SAMPLE_RATE,
+                'int16')
+
+
+    def test_detection_from_score_track(self):
+
+        samples = _create_samples()
+
+        for dtype in ('float32', 'float16'):
+
+            with tempfile.TemporaryDirectory() as dir_path:
+
+                file_path = Path(dir_path) / 'Track'
+
+                # Detect clips from samples, writing score track.
+                writer = ScoreTrackWriter(file_path, _SAMPLE_RATE, dtype)
+                listener = _Listener()
+                detector = TseepDetector(_SAMPLE_RATE, listener, writer)
+                for i in range(0, len(samples), 10000):
+                    detector.detect(samples[i:i + 10000])
+                detector.complete_detection()
+                writer.close()
+
+                self.assertEqual(len(listener.clips), 5)
+
+                # Detect clips from score track.
+                track = score_track_file.read_score_track(file_path)
+                track_listener = _Listener()
+                detector = TseepDetector(_SAMPLE_RATE, track_listener)
+                for scores, offset in track.get_chunks():
+                    detector.process_scores(scores, offset)
+                detector.complete_detection()
+
+                self.assertEqual(track_listener.clips, listener.clips)
+
+
+class _Listener:
+
+
+    def __init__(self):
+        self.clips = []
+
+
+    def process_clip(self, start_index, length):
+        self.clips.append((start_index, length))
+
+
+def _create_samples():
+
+    random = np.random.RandomState(0)
+    samples = 100 * random.randn(10 * _SAMPLE_RATE)
+
+    call_length = int(round(.05 * _SAMPLE_RATE))
+    times = np.arange(call_length) / _SAMPLE_RATE
+    call = 5000 * np.sin(2 * np.pi * 7000 * times)
+    for i in range(1, 6):
+        start_index = int(round(1.6 * i * _SAMPLE_RATE))
+        samples[start_index:start_index + call_length] += call
+
+    return samples
@@ -0,0 +1,147 @@
+from pathlib import Path
+import tempfile
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+import vesper.util.sharded_dataset_builder as builder
+
+
+_INPUT_COUNT = 3
+_CLIPS_PER_INPUT = 10
+
+
+class ShardedDatasetBuilderTests(TestCase):
+
+
+    def test_get_shards(self):
+
+        clips = list(range(25))
+
+        shards = builder.get_shards(clips, 10, seed=1)
+
+        self.assertEqual([len(s) for s in shards], [10, 10, 5])
+        self.assertEqual(sorted(sum(shards, [])), clips)
+
+        # Shuffle is deterministic and does not modify its input.
+        self.assertEqual(builder.get_shards(clips, 10, seed=1), shards)
+        self.assertEqual(clips, list(range(25)))
+
+        # Different seeds yield different shuffles.
+        self.assertNotEqual(builder.get_shards(clips, 10, seed=2), shards)
+
+        self.assertEqual(builder.get_shards([], 10), [])
+
+
+    def test_build_dataset_part(self):
+
+        with tempfile.TemporaryDirectory() as dir_path:
+
+            dir_path = Path(dir_path)
+            input_file_paths = _create_input_files(dir_path)
+
+            clips = [
+                (i, _get_clip_id(j))
+                for i in range(_INPUT_COUNT)
+                for j in range(_CLIPS_PER_INPUT)]
+
+            results = [
+                self._build_dataset_part(
+                    input_file_paths, clips, dir_path / str(process_count),
+                    process_count)
+                for process_count in (1, 3)]
+
+            # Results do not depend on the number of worker processes.
+            self.assertEqual(results[0], results[1])
+
+            shard_infos, examples = results[0]
+
+            self.assertEqual(
+                [s['file_name'] for s in shard_infos],
+                ['Training_0000.dat', 'Training_0001.dat',
+                 'Training_0002.dat', 'Training_0003.dat'])
+
+            self.assertEqual(
+                [s['example_count'] for s in shard_infos], [8, 8, 8, 6])
+
+            # Each clip appears exactly once, in shuffled order.
+            expected = sorted(_get_example(*c) for c in clips)
+            self.assertEqual(sorted(examples), expected)
+            self.assertNotEqual(examples, expected)
+
+            # Manifest round trip.
+            part_dir_path = dir_path / '1'
+            builder.write_manifest(
+                part_dir_path, {'Training': shard_infos}, {'seed': 0})
+            manifest = builder.read_manifest(part_dir_path)
+            part = manifest['parts']['Training']
+            self.assertEqual(part['example_count'], len(clips))
+            self.assertEqual(part['shards'], shard_infos)
+            self.assertEqual(manifest['settings'], {'seed': 0})
+
+            for shard_info in shard_infos:
+                file_path = part_dir_path / shard_info['file_name']
+                self.assertEqual(
+                    builder.get_file_checksum(file_path),
+                    shard_info['sha256'])
+
+
+    def _build_dataset_part(
+            self, input_file_paths, clips, output_dir_path, process_count):
+
+        notified_shard_infos = []
+
+        shard_infos = builder.build_dataset_part(
+            input_file_paths, clips, 'Training', output_dir_path,
+            _create_example, shard_size=8,
+            file_name_format='{}_{:04d}.dat', process_count=process_count,
+            open_input_file=_open_input_file, write_records=_write_records,
+            listener=notified_shard_infos.append)
+
+        self.assertEqual(notified_shard_infos, shard_infos)
+
+        examples = []
+        for shard_info in shard_infos:
+            file_path = output_dir_path / shard_info['file_name']
+            with open(file_path) as file_:
+                examples += file_.read().split()
+
+        return shard_infos, examples
+
+
+def _get_clip_id(clip_num):
+    return 'clip_{}'.format(clip_num)
+
+
+def _get_example(input_num, clip_id):
+    return '{}/{}'.format(input_num, clip_id)
+
+
+def _create_input_files(dir_path):
+
+    file_paths = []
+
+    for i in range(_INPUT_COUNT):
+        file_path = dir_path / 'Input {}.npz'.format(i)
+        arrays = dict(
+            (_get_clip_id(j), np.array([i, j]))
+            for j in range(_CLIPS_PER_INPUT))
+        np.savez(file_path, **arrays)
+        file_paths.append(file_path)
+
+    return file_paths
+
+
+def _open_input_file(file_path):
+    return np.load(file_path)
+
+
+def _create_example(clip):
+    input_num, clip_num = clip
+    return _get_example(input_num, _get_clip_id(clip_num)).encode()
+
+
+def _write_records(file_path, examples):
+    with open(file_path, 'wb') as file_:
+        for example in examples:
+            file_.write(example + b'\n')
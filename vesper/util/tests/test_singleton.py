@@ -0,0 +1,37 @@
+from threading import Thread
+import time
+
+from vesper.tests.test_case import TestCase
+from vesper.util.singleton import Singleton
+
+
+class SingletonTests(TestCase):
+
+
+    def test_concurrent_creation(self):
+
+        instances = []
+
+        def create_instance():
+            # Sleep so that other threads access the singleton while
+            # the instance is being created.
+            time.sleep(.1)
+            instance = object()
+            instances.append(instance)
+            return instance
+
+        singleton = Singleton(create_instance)
+
+        results = []
+        threads = [
+            Thread(target=lambda: results.append(singleton.instance))
+            for _ in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(instances), 1)
+        self.assertEqual(results, instances * 5)
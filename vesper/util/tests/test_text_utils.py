@@ -1,3 +1,5 @@
+import sys
+
 from vesper.tests.test_case import TestCase
 import vesper.util.text_utils as text_utils
 
@@ -52,3 +54,38 @@ class TextUtilsTests(TestCase):
         for x, expected in cases:
             result = text_utils.format_number(x)
             self.assertEqual(result, expected)
+            
+            
+    def test_get_prefix_upper_bound(self):
+        
+        max_char = chr(sys.maxunicode)
+        
+        cases = (
+            ('', None),
+            ('a', 'b'),
+            ('Call.', 'Call/'),
+            ('Call.WIWA', 'Call.WIWB'),
+            ('a' + max_char, 'b'),
+            (max_char * 2, None),
+            ('a\ud7ff', 'a\ue000')
+        )
+        
+        for prefix, expected in cases:
+            result = text_utils.get_prefix_upper_bound(prefix)
+            self.assertEqual(result, expected)
+            
+        # Check that strings that start with a prefix are in the range
+        # the prefix and its upper bound define, and that other
+        # strings are not.
+        prefix = 'Call.'
+        upper_bound = text_utils.get_prefix_upper_bound(prefix)
+        strings = (
+            ('Call', False),
+            ('Call.', True),
+            ('Call.WIWA', True),
+            ('Call.' + max_char, True),
+            ('Call/', False),
+            ('Calm', False),
+            ('call.', False))
+        for s, expected in strings:
+            self.assertEqual(prefix <= s < upper_bound, expected)
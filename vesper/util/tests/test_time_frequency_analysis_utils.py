@@ -274,6 +274,36 @@ class TimeFrequencyAnalysisUtilsTests(TestCase):
         return spectrum.reshape((1, len(spectrum)))
 
 
+    def test_compute_spectrograms(self):
+
+        # This tests that computing the spectrograms of several signals
+        # of different lengths at once yields the same results as
+        # computing them one at a time.
+
+        window = np.hanning(8)
+        hop_size = 4
+        dft_size = 16
+
+        signals = [
+            np.random.randn(n) for n in (0, 7, 8, 9, 100, 33)]
+
+        spectrograms = tfa_utils.compute_spectrograms(
+            signals, window, hop_size, dft_size)
+
+        self.assertEqual(len(spectrograms), len(signals))
+
+        for samples, actual in zip(signals, spectrograms):
+
+            expected = tfa_utils.compute_spectrogram(
+                samples, window, hop_size, dft_size)
+
+            self.assertEqual(actual.shape, expected.shape)
+            self.assertTrue(np.allclose(actual, expected))
+
+        self.assertEqual(
+            tfa_utils.compute_spectrograms([], window, hop_size), [])
+
+
     def test_scale_spectrogram(self):
 
         cases = [
@@ -1,6 +1,13 @@
 """Utility functions pertaining to text."""
 
 
+import sys
+
+
+_SURROGATES_START = 0xD800
+_SURROGATES_END = 0xE000
+
+
 def create_string_item_list(items):
     
     """
@@ -64,6 +71,44 @@ def format_number(x):
             return str(i)
 
 
+def get_prefix_upper_bound(prefix):
+    
+    """
+    Gets the least string that is greater than every string that
+    starts with the specified prefix, in code point order.
+    
+    A string starts with a nonempty prefix if and only if it is at
+    least the prefix and less than the upper bound. This allows
+    prefix queries to be expressed as range queries, which databases
+    can satisfy with index searches.
+    
+    :Parameters:
+    
+        prefix : str
+            the prefix.
+            
+    :Returns:
+        the upper bound, or `None` if there is no such string, i.e. if
+        `prefix` is empty or comprises only the maximum code point.
+    """
+    
+    # Strip trailing maximum code points, which cannot be incremented.
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    
+    if len(prefix) == 0:
+        return None
+    
+    else:
+        
+        code_point = ord(prefix[-1]) + 1
+        
+        # Skip surrogate code points, which cannot be encoded in UTF-8.
+        if code_point == _SURROGATES_START:
+            code_point = _SURROGATES_END
+            
+        return prefix[:-1] + chr(code_point)
+        
+        
 def create_count_text(count, singular_units_text, plural_units_text=None):
     units = create_units_text(count, singular_units_text, plural_units_text)
     return '{} {}'.format(count, units)
@@ -107,6 +107,45 @@ def compute_spectrogram(samples, window, hop_size, dft_size=None):
     return magnitudes * magnitudes
 
 
+def compute_spectrograms(signals, window, hop_size, dft_size=None):
+
+    """
+    Computes the spectrograms of a sequence of real signals.
+
+    The signals may have different lengths. Rather than computing one
+    short-time Fourier transform per signal, this function gathers the
+    analysis records of all of the signals into a single array and
+    transforms them with one call to `np.fft.rfft`, which is much
+    faster than separate calls when there are many short signals, for
+    example the clips of a clip album page.
+
+    :Returns:
+        a list of spectrograms, one per signal. Each spectrogram is a
+        two-dimensional array of squared STFT magnitudes whose first
+        dimension is time and whose second dimension is frequency.
+    """
+
+    window_size = len(window)
+
+    if dft_size is None:
+        dft_size = get_dft_size(window_size)
+
+    record_arrays = [
+        _get_analysis_records(np.asarray(s), window_size, hop_size)
+        for s in signals]
+
+    if len(record_arrays) == 0:
+        return []
+
+    records = np.concatenate(record_arrays)
+    stft = np.fft.rfft(window * records, n=dft_size)
+    spectra = stft.real * stft.real + stft.imag * stft.imag
+
+    # Split spectra by signal.
+    counts = [len(r) for r in record_arrays]
+    return np.split(spectra, np.cumsum(counts)[:-1])
+
+
 def compute_stft(samples, window, hop_size, dft_size=None):
 
     """Computes the short-time Fourier transform (STFT) of a real signal."""